@@ -4,3 +4,10 @@ from django.apps import AppConfig
 class AccountsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'accounts'
+
+    def ready(self):
+        # Registram os checks e os sinais que invalidam o cache de usuários do JWT
+        from . import authentication, checks  # noqa: F401
+        from auth_project.metricas import registrar_coletor
+        from .tokens import tamanho_das_tabelas
+        registrar_coletor(tamanho_das_tabelas)
@@ -0,0 +1,124 @@
+"""
+Versões assíncronas das views de autenticação e perfil, servidas pelo
+asgi.py (ver auth_project/urls_asgi.py)
+
+Sob ASGI as views síncronas (DRF) rodam todas numa mesma thread; estas
+esperam o banco e o hash da senha sem ocupar o event loop, então um único
+processo uvicorn atende muitas conexões lentas ao mesmo tempo.
+"""
+import functools
+import json
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth import aauthenticate
+from django.http import JsonResponse
+from django.utils.decorators import method_decorator
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_GET, require_POST
+from rest_framework.exceptions import AuthenticationFailed
+from .authentication import CachedJWTAuthentication
+from .serializers import CustomUserReadSerializer, UserLoginSerializer
+from .tokens import RefreshToken
+
+_jwt = CachedJWTAuthentication()
+
+
+async def usuario_do_token(request):
+    """
+    Usuário ativo do Bearer token da requisição, ou None (sem token, token
+    inválido, usuário inexistente, inativo ou com o token revogado). Mesmas
+    regras do CachedJWTAuthentication das views síncronas: só a busca do
+    usuário vai ao banco, e só quando ele não está no cache.
+    """
+    header = _jwt.get_header(request)
+    if header is None:
+        return None
+    try:
+        raw_token = _jwt.get_raw_token(header)
+        if raw_token is None:
+            return None
+        return await _jwt.aget_user(_jwt.get_validated_token(raw_token))
+    except AuthenticationFailed:
+        # InvalidToken e o AuthenticationFailed do simplejwt são subclasses
+        return None
+
+
+def nao_autenticado():
+    """401 no mesmo formato do DRF"""
+    response = JsonResponse(
+        {'detail': 'As credenciais de autenticação não foram fornecidas ou são inválidas.'},
+        status=401
+    )
+    response['WWW-Authenticate'] = 'Bearer realm="api"'
+    return response
+
+
+def jwt_requerido(view):
+    """Equivalente assíncrono de IsAuthenticated com JWTAuthentication"""
+    @functools.wraps(view)
+    async def _view(request, *args, **kwargs):
+        user = await usuario_do_token(request)
+        if user is None:
+            return nao_autenticado()
+        request.user = user
+        return await view(request, *args, **kwargs)
+    return _view
+
+
+@method_decorator(csrf_exempt, name='dispatch')
+@method_decorator(jwt_requerido, name='dispatch')
+class AsyncAPIView(View):
+    """Base das views assíncronas em classe: exige JWT e dispensa CSRF, como o APIView"""
+
+
+def dados_da_requisicao(request):
+    """
+    Corpo JSON ou de formulário
+
+    Raises:
+        ValueError: JSON malformado
+    """
+    if request.content_type == 'application/json':
+        return json.loads(request.body or b'{}')
+    return request.POST
+
+
+def _gerar_tokens(user):
+    # Com o token_blacklist instalado, for_user grava o OutstandingToken
+    refresh = RefreshToken.for_user(user)
+    return {
+        'refresh': str(refresh),
+        'access': str(refresh.access_token),
+    }
+
+
+@csrf_exempt
+@require_POST
+async def login_user(request):
+    """Autentica um usuário"""
+    try:
+        serializer = UserLoginSerializer(data=dados_da_requisicao(request))
+    except ValueError:
+        return JsonResponse({'error': 'JSON inválido.'}, status=400)
+    if not serializer.is_valid():
+        return JsonResponse(serializer.errors, status=400)
+
+    user = await aauthenticate(
+        request,
+        username=serializer.validated_data['email'],
+        password=serializer.validated_data['password']
+    )
+    if user and user.is_active:
+        return JsonResponse({
+            'user': CustomUserReadSerializer(user).data,
+            'tokens': await sync_to_async(_gerar_tokens)(user),
+        }, status=200)
+    return JsonResponse({'error': 'Credenciais inválidas ou conta desativada.'}, status=401)
+
+
+@require_GET
+@jwt_requerido
+async def get_user_profile(request):
+    """Retorna o perfil do usuário autenticado"""
+    return JsonResponse(CustomUserReadSerializer(request.user).data)
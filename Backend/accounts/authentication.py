@@ -0,0 +1,323 @@
+"""
+Autenticação JWT com cache dos usuários resolvidos pelo token
+
+O JWTAuthentication do simplejwt busca o CustomUser no banco em toda
+requisição autenticada. O CachedJWTAuthentication guarda os campos de
+leitura do usuário (CAMPOS_EM_CACHE) num LRU com TTL por processo e,
+opcionalmente, num cache do Django compartilhado entre processos
+(JWT_USER_CACHE['BACKEND']), e monta o usuário a partir deles, sem consulta.
+
+O usuário montado só tem esses campos carregados: os demais (password,
+is_staff, ...) são adiados, buscados no banco se acessados, e save() grava
+só os campos carregados ou alterados.
+
+A entrada sai do cache quando o usuário é salvo ou apagado (sinais
+post_save/post_delete: edição de perfil, troca de senha, desativação no
+perform_destroy, admin) e no logout. Para os outros processos, a invalidação
+também grava uma nova versão do usuário em JWT_USER_CACHE['VERSION_BACKEND']
+(alias de CACHES, 'default' por padrão); cada acerto local confere essa
+versão e descarta a cópia que ficou para trás. Se esse cache não é
+compartilhado (o LocMemCache padrão do Django), a cópia local dos outros
+processos só expira pelo TTL: ele é o atraso máximo para uma desativação
+valer em todos.
+
+Acertos e falhas vão para /metrics (auth_user_cache_total) e para
+cache_de_usuarios().estatisticas().
+"""
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.core.signals import setting_changed
+from django.db import router
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+
+from auth_project import metricas
+from .models import CustomUser
+
+# Campos de CustomUserReadSerializer: o perfil sai do cache sem consulta
+CAMPOS_EM_CACHE = ('id', 'email', 'username', 'first_name', 'last_name', 'date_joined', 'is_active')
+
+PADRAO = {'TTL': 60, 'MAX_ENTRIES': 10000, 'BACKEND': None, 'VERSION_BACKEND': 'default'}
+
+LOCAL = 'local'
+COMPARTILHADO = 'compartilhado'
+FALHA = 'miss'
+
+
+class CacheDeUsuarios:
+    """
+    LRU com TTL de {user_id: campos do usuário}, seguro entre threads, na
+    frente de um cache do Django opcional (alias de CACHES). Com versoes
+    (alias de CACHES), cada entrada local guarda a versão do usuário lida ao
+    buscá-la e só vale enquanto ela for a atual.
+    """
+
+    def __init__(self, ttl, maximo, backend=None, versoes=None):
+        self.ttl = ttl
+        self.maximo = maximo
+        self.backend = caches[backend] if backend else None
+        self.versoes = caches[versoes] if versoes else None
+        self._entradas = OrderedDict()
+        self._lock = threading.Lock()
+        self._geracao = 0
+        self._contagens = {LOCAL: 0, COMPARTILHADO: 0, FALHA: 0}
+
+    @staticmethod
+    def chave(user_id):
+        return f'jwt_user:{user_id}'
+
+    @staticmethod
+    def chave_versao(user_id):
+        return f'jwt_user_versao:{user_id}'
+
+    def versao(self, user_id):
+        """Versão atual do usuário (None sem versoes ou se nunca foi invalidado)"""
+        if self.versoes is None:
+            return None
+        return self.versoes.get(self.chave_versao(user_id))
+
+    async def aversao(self, user_id):
+        if self.versoes is None:
+            return None
+        return await self.versoes.aget(self.chave_versao(user_id))
+
+    def _contar(self, resultado):
+        with self._lock:
+            self._contagens[resultado] += 1
+        metricas.incrementar('auth_user_cache_total', resultado=resultado)
+
+    def _local(self, user_id, versao):
+        with self._lock:
+            entrada = self._entradas.get(user_id)
+            if entrada is None:
+                return None
+            dados, expira, versao_entrada = entrada
+            if expira <= time.monotonic() or versao_entrada != versao:
+                # Expirada, ou invalidada por outro processo
+                del self._entradas[user_id]
+                return None
+            self._entradas.move_to_end(user_id)
+            return dados
+
+    def _guardar_local(self, user_id, dados, geracao, versao):
+        with self._lock:
+            if geracao != self._geracao:
+                # Houve invalidação enquanto o banco era lido: os dados podem ser anteriores a ela
+                return False
+            self._entradas[user_id] = (dados, time.monotonic() + self.ttl, versao)
+            self._entradas.move_to_end(user_id)
+            while len(self._entradas) > self.maximo:
+                self._entradas.popitem(last=False)
+            return True
+
+    @property
+    def geracao(self):
+        """Capture antes de ler o banco e passe para guardar()"""
+        return self._geracao
+
+    def obter(self, user_id):
+        """
+        Campos do usuário, ou None (falha: capture geracao e versao(), busque
+        no banco e chame guardar)
+        """
+        geracao = self._geracao
+        versao = self.versao(user_id)
+        dados = self._local(user_id, versao)
+        if dados is not None:
+            self._contar(LOCAL)
+            return dados
+        if self.backend is not None:
+            dados = self.backend.get(self.chave(user_id))
+            if dados is not None:
+                self._guardar_local(user_id, dados, geracao, versao)
+                self._contar(COMPARTILHADO)
+                return dados
+        self._contar(FALHA)
+        return None
+
+    async def aobter(self, user_id):
+        geracao = self._geracao
+        versao = await self.aversao(user_id)
+        dados = self._local(user_id, versao)
+        if dados is not None:
+            self._contar(LOCAL)
+            return dados
+        if self.backend is not None:
+            dados = await self.backend.aget(self.chave(user_id))
+            if dados is not None:
+                self._guardar_local(user_id, dados, geracao, versao)
+                self._contar(COMPARTILHADO)
+                return dados
+        self._contar(FALHA)
+        return None
+
+    def guardar(self, user_id, dados, geracao, versao=None):
+        if self._guardar_local(user_id, dados, geracao, versao) and self.backend is not None:
+            self.backend.set(self.chave(user_id), dados, self.ttl)
+
+    async def aguardar(self, user_id, dados, geracao, versao=None):
+        if self._guardar_local(user_id, dados, geracao, versao) and self.backend is not None:
+            await self.backend.aset(self.chave(user_id), dados, self.ttl)
+
+    def invalidar(self, user_id):
+        with self._lock:
+            self._geracao += 1
+            self._entradas.pop(user_id, None)
+        if self.backend is not None:
+            self.backend.delete(self.chave(user_id))
+        if self.versoes is not None:
+            # Entradas locais anteriores a esta versão expiram dentro do TTL,
+            # então a marca não precisa durar mais que ele
+            self.versoes.set(self.chave_versao(user_id), uuid.uuid4().hex, self.ttl)
+
+    def limpar(self):
+        with self._lock:
+            self._geracao += 1
+            self._entradas.clear()
+
+    def estatisticas(self):
+        """
+        Returns:
+            dict: acertos locais e compartilhados, falhas, taxa de acerto e entradas locais
+        """
+        with self._lock:
+            contagens = dict(self._contagens)
+            entradas = len(self._entradas)
+        total = sum(contagens.values())
+        acertos = contagens[LOCAL] + contagens[COMPARTILHADO]
+        return {
+            'hits_local': contagens[LOCAL],
+            'hits_compartilhado': contagens[COMPARTILHADO],
+            'misses': contagens[FALHA],
+            'hit_rate': acertos / total if total else 0.0,
+            'entradas': entradas,
+        }
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def cache_de_usuarios():
+    """Cache do processo, criado com JWT_USER_CACHE na primeira chamada"""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                configuracao = {**PADRAO, **getattr(settings, 'JWT_USER_CACHE', {})}
+                _cache = CacheDeUsuarios(
+                    configuracao['TTL'], configuracao['MAX_ENTRIES'], configuracao['BACKEND'],
+                    configuracao['VERSION_BACKEND'],
+                )
+    return _cache
+
+
+def invalidar_usuario(user_id):
+    """Remove o usuário do cache deste processo e do compartilhado, e troca a versão dele"""
+    cache_de_usuarios().invalidar(user_id)
+
+
+@receiver(setting_changed)
+def _recriar_cache(setting, **kwargs):
+    global _cache
+    if setting == 'JWT_USER_CACHE':
+        _cache = None
+
+
+@receiver(post_save, sender=CustomUser)
+@receiver(post_delete, sender=CustomUser)
+def _invalidar_ao_alterar(sender, instance, **kwargs):
+    invalidar_usuario(instance.pk)
+
+
+def _campos(user):
+    return {campo: getattr(user, campo) for campo in CAMPOS_EM_CACHE}
+
+
+def montar_usuario(dados):
+    """CustomUser com CAMPOS_EM_CACHE carregados e os demais adiados"""
+    campos = [campo.attname for campo in CustomUser._meta.concrete_fields if campo.attname in dados]
+    return CustomUser.from_db(
+        router.db_for_read(CustomUser), campos, [dados[campo] for campo in campos]
+    )
+
+
+def _consulta(user_id):
+    return CustomUser.objects.filter(**{api_settings.USER_ID_FIELD: user_id}).only(*CAMPOS_EM_CACHE)
+
+
+def usuario_por_id(user_id):
+    """
+    Usuário do claim do token, do cache ou do banco (uma consulta)
+
+    Returns:
+        CustomUser | None: None se não existir
+    """
+    cache = cache_de_usuarios()
+    dados = cache.obter(user_id)
+    if dados is None:
+        geracao, versao = cache.geracao, cache.versao(user_id)
+        user = _consulta(user_id).first()
+        if user is None:
+            return None
+        dados = _campos(user)
+        cache.guardar(user_id, dados, geracao, versao)
+    return montar_usuario(dados)
+
+
+async def ausuario_por_id(user_id):
+    """Versão assíncrona de usuario_por_id"""
+    cache = cache_de_usuarios()
+    dados = await cache.aobter(user_id)
+    if dados is None:
+        geracao, versao = cache.geracao, await cache.aversao(user_id)
+        user = await _consulta(user_id).afirst()
+        if user is None:
+            return None
+        dados = _campos(user)
+        await cache.aguardar(user_id, dados, geracao, versao)
+    return montar_usuario(dados)
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    JWTAuthentication que resolve o usuário por usuario_por_id (cache antes do
+    banco). aget_user é o mesmo caminho para as views assíncronas
+    (accounts/async_views.py).
+    """
+
+    def get_user(self, validated_token):
+        if api_settings.CHECK_REVOKE_TOKEN:
+            # A verificação compara com o hash da senha, que não fica em cache
+            return super().get_user(validated_token)
+        return self._verificar(usuario_por_id(self._user_id(validated_token)))
+
+    async def aget_user(self, validated_token):
+        if api_settings.CHECK_REVOKE_TOKEN:
+            return await sync_to_async(super().get_user)(validated_token)
+        return self._verificar(await ausuario_por_id(self._user_id(validated_token)))
+
+    @staticmethod
+    def _user_id(validated_token):
+        try:
+            return validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_("Token contained no recognizable user identification"))
+
+    @staticmethod
+    def _verificar(user):
+        if user is None:
+            raise AuthenticationFailed(_("User not found"), code="user_not_found")
+        if not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+        return user
@@ -1,5 +1,8 @@
+from asgiref.sync import sync_to_async
 from django.contrib.auth.backends import ModelBackend
 from django.contrib.auth import get_user_model
+from django.db.models import Q
+from django.db.models.functions import Lower
 
 User = get_user_model()
 
@@ -7,6 +10,12 @@ class EmailBackend(ModelBackend):
     """
     Backend de autenticação customizado para autenticar usando email
     quando USERNAME_FIELD é 'email'
+    
+    Um login custa uma consulta (email ou username, sem diferenciar
+    maiúsculas, pelos índices de Lower(campo)) e um único hash de senha,
+    inclusive quando o usuário não existe. Um hash em algoritmo ou custo
+    antigo é regravado pelo check_password no login bem-sucedido (um hash e
+    um UPDATE a mais, uma vez por usuário; ver PASSWORD_HASHER).
     """
     def authenticate(self, request, username=None, password=None, **kwargs):
         if username is None:
@@ -15,18 +24,38 @@ class EmailBackend(ModelBackend):
         if username is None or password is None:
             return None
         
-        try:
-            # Tentar autenticar usando email
-            user = User.objects.get(email=username)
-        except User.DoesNotExist:
-            # Tentar autenticar usando username (fallback)
-            try:
-                user = User.objects.get(username=username)
-            except User.DoesNotExist:
-                return None
+        user = self.buscar_usuario(username)
+        if user is None:
+            # Calcula um hash mesmo assim: sem isso, a resposta mais rápida
+            # revelaria que o email não tem conta
+            User().set_password(password)
+            return None
         
         if user.check_password(password) and self.user_can_authenticate(user):
             return user
         
         return None
-
+    
+    def buscar_usuario(self, identificador):
+        """
+        Usuário pelo email ou, na falta dele, pelo username, em uma consulta.
+        Coincidências exatas vêm antes das que só diferem em maiúsculas.
+        """
+        normalizado = identificador.strip().lower()
+        candidatos = list(
+            User.objects
+            .annotate(email_lower=Lower('email'), username_lower=Lower('username'))
+            .filter(Q(email_lower=normalizado) | Q(username_lower=normalizado))
+        )
+        if not candidatos:
+            return None
+        return min(candidatos, key=lambda user: (
+            user.email_lower != normalizado,
+            user.email != identificador,
+            user.username != identificador,
+        ))
+    
+    async def aauthenticate(self, request, username=None, password=None, **kwargs):
+        # O aauthenticate do ModelBackend só busca por USERNAME_FIELD; aqui
+        # vale a mesma busca por email e depois username (hash numa thread)
+        return await sync_to_async(self.authenticate)(request, username, password, **kwargs)
@@ -0,0 +1,22 @@
+from django.contrib.auth.hashers import get_hasher
+from django.core.checks import Error, Tags, register
+
+
+@register(Tags.security)
+def verificar_hasher_de_senha(app_configs, **kwargs):
+    """
+    Sem a biblioteca do PASSWORD_HASHER (argon2-cffi), todo registro e troca
+    de senha falharia em tempo de execução: acusa já no check/runserver
+    """
+    hasher = get_hasher()
+    if hasher.library is None:
+        return []
+    try:
+        hasher._load_library()
+    except ValueError:
+        return [Error(
+            f"O hasher de senha padrão ({hasher.algorithm}) requer a biblioteca {hasher.library!r}, não instalada.",
+            hint='pip install argon2-cffi, ou escolha outro PASSWORD_HASHER (pbkdf2, scrypt).',
+            id='accounts.E001',
+        )]
+    return []
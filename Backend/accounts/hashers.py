@@ -0,0 +1,48 @@
+"""
+Hashers de senha com o custo lido de settings.PASSWORD_HASHER_COSTS
+
+Mesmos algoritmos (e formato de hash) dos hashers do Django: hashes gravados
+por um verificam no outro. A diferença é que o custo vem das settings a cada
+uso, então mudar PASSWORD_HASHER_COSTS muda o custo dos hashes novos e faz o
+must_update regravar os antigos no próximo login bem-sucedido.
+
+Qual algoritmo grava os hashes novos é escolhido por PASSWORD_HASHER em
+auth_project/settings.py.
+"""
+from django.conf import settings
+from django.contrib.auth import hashers
+
+
+class _CustoConfiguravel:
+    """Atributo de custo com valor de PASSWORD_HASHER_COSTS[chave], ou o padrão do Django"""
+    chave = None
+
+    def _custo(self, nome):
+        custos = getattr(settings, 'PASSWORD_HASHER_COSTS', {}).get(self.chave, {})
+        valor = custos.get(nome)
+        return getattr(super(), nome) if valor is None else valor
+
+
+def _custo(nome):
+    return property(lambda self: self._custo(nome))
+
+
+class PBKDF2PasswordHasher(_CustoConfiguravel, hashers.PBKDF2PasswordHasher):
+    chave = 'pbkdf2'
+    iterations = _custo('iterations')
+
+
+class ScryptPasswordHasher(_CustoConfiguravel, hashers.ScryptPasswordHasher):
+    chave = 'scrypt'
+    work_factor = _custo('work_factor')
+    block_size = _custo('block_size')
+    parallelism = _custo('parallelism')
+    maxmem = _custo('maxmem')
+
+
+class Argon2PasswordHasher(_CustoConfiguravel, hashers.Argon2PasswordHasher):
+    """Requer argon2-cffi (pip install argon2-cffi)"""
+    chave = 'argon2'
+    time_cost = _custo('time_cost')
+    memory_cost = _custo('memory_cost')
+    parallelism = _custo('parallelism')
@@ -0,0 +1,38 @@
+"""
+Compacta o token_blacklist: remove em lotes os refresh tokens expirados
+(OutstandingToken e BlacklistedToken), que o ROTATE_REFRESH_TOKENS e o
+BLACKLIST_AFTER_ROTATION acumulam a cada refresh e logout.
+
+Rodar periodicamente (cron/systemd timer, ex.: uma vez por hora) ou como
+processo dedicado com --loop.
+"""
+import time
+
+from django.core.management.base import BaseCommand
+
+from accounts.tokens import compactar_blacklist
+from auth_project import metricas
+
+
+class Command(BaseCommand):
+    help = 'Remove refresh tokens expirados do token_blacklist em lotes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Tokens removidos por transação')
+        parser.add_argument('--max-batches', type=int, default=None, help='Para depois de N lotes (o resto fica para a próxima)')
+        parser.add_argument('--pause', type=float, default=0.0, help='Segundos entre lotes, para dar vez às outras escritas')
+        parser.add_argument('--loop', action='store_true', help='Continua compactando indefinidamente')
+        parser.add_argument('--interval', type=float, default=3600, help='Segundos entre compactações no modo --loop')
+
+    def handle(self, *args, **options):
+        while True:
+            resultado = compactar_blacklist(options['batch_size'], options['max_batches'], options['pause'])
+            metricas.gravar()
+            self.stdout.write(
+                f"{resultado.outstanding} token(s) expirado(s) removido(s) "
+                f"({resultado.blacklisted} na blacklist) em {resultado.lotes} lote(s)"
+                + (f"; restam {resultado.restantes} expirado(s)" if resultado.restantes else "")
+            )
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
@@ -1,5 +1,6 @@
 from django.contrib.auth.models import AbstractUser, BaseUserManager
 from django.db import models
+from django.db.models.functions import Lower
 from django.utils import timezone
 
 class CustomUserManager(BaseUserManager):
@@ -48,6 +49,19 @@ class CustomUser(AbstractUser):
         db_table = 'custom_user'
         verbose_name = 'Usuário'
         verbose_name_plural = 'Usuários'
+        indexes = [
+            # Paginação por chave da listagem (só usuários ativos)
+            models.Index(
+                fields=['date_joined', 'id'], name='custom_user_ativo_joined_idx',
+                condition=models.Q(is_active=True)
+            ),
+            # Busca por prefixo sem diferenciar maiúsculas (ver filtrar_usuarios)
+            # e login por email ou username (EmailBackend.buscar_usuario)
+            models.Index(Lower('email'), name='custom_user_email_lower_idx'),
+            models.Index(Lower('username'), name='custom_user_username_lower_idx'),
+            models.Index(Lower('first_name'), name='custom_user_first_lower_idx'),
+            models.Index(Lower('last_name'), name='custom_user_last_lower_idx'),
+        ]
     
     def __str__(self):
         name = f"{self.first_name} {self.last_name}".strip()
@@ -0,0 +1,94 @@
+"""
+Paginação por chave (keyset) da listagem de usuários
+"""
+import base64
+import binascii
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class UserKeysetPagination(BasePagination):
+    """
+    Do cadastro mais novo para o mais antigo, pela chave (date_joined, id).
+
+    Em vez de OFFSET, cada página continua depois da última linha da anterior
+    (o cursor codifica a chave dela): o custo é o mesmo na primeira página e
+    na milésima, usando o índice custom_user_ativo_joined_idx. Só avança
+    (next); a resposta é {"next": url ou null, "results": [...]}.
+    """
+    page_size = 50
+    max_page_size = 500
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    ordering = ('-date_joined', '-id')
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        tamanho = self._tamanho_pagina(request)
+
+        chave = self._decodificar(request.query_params.get(self.cursor_query_param))
+        if chave is not None:
+            date_joined, user_id = chave
+            queryset = queryset.filter(Q(date_joined__lt=date_joined) | Q(date_joined=date_joined, id__lt=user_id))
+
+        linhas = list(queryset.order_by(*self.ordering)[:tamanho + 1])
+        self.proxima = None
+        if len(linhas) > tamanho:
+            linhas = linhas[:tamanho]
+            self.proxima = self._codificar(linhas[-1])
+        return linhas
+
+    def get_paginated_response(self, data):
+        return Response({'next': self.get_next_link(), 'results': data})
+
+    def get_next_link(self):
+        if self.proxima is None:
+            return None
+        return replace_query_param(self.request.build_absolute_uri(), self.cursor_query_param, self.proxima)
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+    def _tamanho_pagina(self, request):
+        try:
+            tamanho = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return min(max(tamanho, 1), self.max_page_size)
+
+    def _codificar(self, linha):
+        """Cursor da linha (dict de .values() ou instância)"""
+        if isinstance(linha, dict):
+            date_joined, user_id = linha['date_joined'], linha['id']
+        else:
+            date_joined, user_id = linha.date_joined, linha.id
+        return base64.urlsafe_b64encode(f"{date_joined.isoformat()}|{user_id}".encode()).decode()
+
+    def _decodificar(self, cursor):
+        """
+        Raises:
+            NotFound: cursor malformado (como o CursorPagination do DRF)
+        """
+        if not cursor:
+            return None
+        try:
+            texto = base64.urlsafe_b64decode(cursor.encode()).decode()
+            data, user_id = texto.rsplit('|', 1)
+            date_joined = parse_datetime(data)
+            if date_joined is None:
+                raise ValueError(data)
+            return date_joined, int(user_id)
+        except (binascii.Error, UnicodeDecodeError, ValueError):
+            raise NotFound('Cursor inválido.')
@@ -1,9 +1,10 @@
 from rest_framework import serializers
-from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
 from django.contrib.auth import authenticate
 from django.contrib.auth.password_validation import validate_password
 from django.core.exceptions import ValidationError
 from .models import CustomUser
+from .tokens import RefreshToken
 
 class CustomUserReadSerializer(serializers.ModelSerializer):
     """Serializer apenas para leitura (sem campos de senha)"""
@@ -12,6 +13,18 @@ class CustomUserReadSerializer(serializers.ModelSerializer):
         fields = ('id', 'email', 'username', 'first_name', 'last_name', 'date_joined', 'is_active')
         read_only_fields = ('id', 'date_joined', 'is_active')
 
+# Mesma saída do CustomUserReadSerializer, sem instanciar campos por usuário
+_date_joined = serializers.DateTimeField()
+
+def representar_usuarios(linhas):
+    """
+    Caminho rápido do CustomUserReadSerializer para listas: recebe dicts de
+    .values(*CustomUserReadSerializer.Meta.fields) e só formata a data.
+    """
+    for linha in linhas:
+        linha['date_joined'] = _date_joined.to_representation(linha['date_joined'])
+    return linhas
+
 class CustomUserSerializer(serializers.ModelSerializer):
     password = serializers.CharField(write_only=True, min_length=8, required=False)
     password_confirm = serializers.CharField(write_only=True, required=False)
@@ -105,6 +118,8 @@ class CustomUserSerializer(serializers.ModelSerializer):
         return CustomUserReadSerializer(instance).data
 
 class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
+    token_class = RefreshToken
+    
     @classmethod
     def get_token(cls, user):
         token = super().get_token(user)
@@ -133,14 +148,15 @@ class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
             if not user.is_active:
                 raise serializers.ValidationError('Conta desativada.')
             
-            if not user.check_password(password):
-                raise serializers.ValidationError('Credenciais inválidas.')
-            
             attrs['user'] = user
             return attrs
         else:
             raise serializers.ValidationError('Email e senha são obrigatórios.')
 
+class CustomTokenRefreshSerializer(TokenRefreshSerializer):
+    """Refresh com a blacklist consultada por accounts.tokens.RefreshToken (SIMPLE_JWT['TOKEN_REFRESH_SERIALIZER'])"""
+    token_class = RefreshToken
+
 class UserLoginSerializer(serializers.Serializer):
     email = serializers.EmailField()
     password = serializers.CharField()
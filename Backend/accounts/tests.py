@@ -1,3 +1,453 @@
-from django.test import TestCase
+import csv
+import importlib.util
+import io
+from unittest import mock
 
-# Create your tests here.
+from django.test import AsyncClient, TestCase, override_settings
+from rest_framework.test import APIClient
+
+from .models import CustomUser
+
+
+class AsyncAuthTestCase(TestCase):
+    """Testes para login e perfil pelas views assíncronas (asgi.py)"""
+    
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(
+            email='login@example.com',
+            password='testpass123',
+            username='loginuser'
+        )
+    
+    async def test_login_e_perfil(self):
+        client = AsyncClient()
+        response = await client.post(
+            '/api/auth/login/', {'email': 'login@example.com', 'password': 'testpass123'},
+            content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.resolver_match.func.__module__, 'accounts.async_views')
+        access = response.json()['tokens']['access']
+        
+        response = await client.get('/api/profile/', headers={'Authorization': f'Bearer {access}'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['email'], 'login@example.com')
+        
+        response = await client.get('/api/profile/', headers={'Authorization': 'Bearer invalido'})
+        self.assertEqual(response.status_code, 401)
+    
+    async def test_token_revogado_e_usuario_inativo(self):
+        from rest_framework_simplejwt.settings import api_settings
+        from rest_framework_simplejwt.tokens import AccessToken
+        
+        client = AsyncClient()
+        # override_settings(SIMPLE_JWT=...) troca o objeto api_settings, e quem já o importou não vê
+        with mock.patch.object(api_settings, 'CHECK_REVOKE_TOKEN', True):
+            cabecalho = {'Authorization': f'Bearer {AccessToken.for_user(self.user)}'}
+            self.assertEqual((await client.get('/api/profile/', headers=cabecalho)).status_code, 200)
+            # Troca de senha revoga os tokens emitidos antes dela, como nas views síncronas
+            self.user.set_password('outrasenha456')
+            await self.user.asave()
+            self.assertEqual((await client.get('/api/profile/', headers=cabecalho)).status_code, 401)
+        
+        cabecalho = {'Authorization': f'Bearer {AccessToken.for_user(self.user)}'}
+        self.user.is_active = False
+        await self.user.asave()
+        self.assertEqual((await client.get('/api/profile/', headers=cabecalho)).status_code, 401)
+    
+    async def test_login_invalido(self):
+        client = AsyncClient()
+        response = await client.post('/api/auth/login/', {'email': 'login@example.com', 'password': 'errada'})
+        self.assertEqual(response.status_code, 401)
+        response = await client.post('/api/auth/login/', {'email': 'nao-e-email'})
+        self.assertEqual(response.status_code, 400)
+
+
+class ExportacaoUsuariosTestCase(TestCase):
+    """Testes para a exportação de usuários (download_excel_report)"""
+    
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(
+            email='admin@example.com', password='testpass123', username='admin', first_name='Ádmin'
+        )
+        for indice in range(5):
+            CustomUser.objects.create(email=f'u{indice}@example.com', username=f'u{indice}')
+        CustomUser.objects.create(email='inativo@example.com', username='inativo', is_active=False)
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+    
+    def test_xlsx_em_uma_consulta(self):
+        import openpyxl
+        
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/reports/download-excel/')
+        self.assertEqual(response.status_code, 200)
+        planilha = openpyxl.load_workbook(io.BytesIO(b''.join(response.streaming_content)))
+        linhas = list(planilha['Relatório de Usuários'].values)
+        response.close()
+        self.assertEqual(linhas[0], ('ID', 'Nome', 'Sobrenome', 'Email', 'Data de Cadastro'))
+        self.assertEqual(len(linhas), 7)
+        self.assertEqual(linhas[1][1], 'Ádmin')
+    
+    def test_csv_transmitido(self):
+        response = self.client.get('/api/reports/download-excel/?formato=csv')
+        self.assertEqual(response.status_code, 200)
+        linhas = list(csv.reader(io.StringIO(b''.join(response.streaming_content).decode('utf-8-sig'))))
+        self.assertEqual(len(linhas), 7)
+        self.assertEqual(linhas[1][3], 'admin@example.com')
+        
+        response = self.client.get('/api/reports/download-excel/?formato=pdf')
+        self.assertEqual(response.status_code, 400)
+
+
+class UserListTestCase(TestCase):
+    """Testes para a listagem paginada de usuários (UserListCreateView)"""
+    
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(email='lista@example.com', password='testpass123', username='lista')
+        # Mesma data de cadastro em vários: o id desempata a chave
+        data = self.user.date_joined
+        for indice in range(6):
+            CustomUser.objects.create(
+                email=f'Pessoa{indice}@example.com', username=f'p{indice}', first_name=f'Nome{indice}', date_joined=data
+            )
+        CustomUser.objects.create(email='inativo@example.com', username='inativo', is_active=False)
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+    
+    def test_paginacao_por_chave(self):
+        vistos = []
+        url = '/api/users/?page_size=2'
+        while url:
+            with self.assertNumQueries(1):
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertLessEqual(len(response.data['results']), 2)
+            vistos += [usuario['id'] for usuario in response.data['results']]
+            url = response.data['next']
+        
+        esperados = list(
+            CustomUser.objects.filter(is_active=True).order_by('-date_joined', '-id').values_list('id', flat=True)
+        )
+        self.assertEqual(vistos, esperados)
+        
+        response = self.client.get('/api/users/?cursor=invalido')
+        self.assertEqual(response.status_code, 404)
+    
+    def test_mesma_saida_do_serializer(self):
+        from .serializers import CustomUserReadSerializer
+        
+        response = self.client.get('/api/users/?email=LISTA@example.com')
+        self.assertEqual(response.data['results'], [CustomUserReadSerializer(self.user).data])
+    
+    def test_busca_por_prefixo(self):
+        response = self.client.get('/api/users/?search=pessoa1')
+        self.assertEqual([usuario['email'] for usuario in response.data['results']], ['Pessoa1@example.com'])
+        response = self.client.get('/api/users/?search=NOME')
+        self.assertEqual(len(response.data['results']), 6)
+        response = self.client.get('/api/users/?search=P1')
+        self.assertEqual([usuario['username'] for usuario in response.data['results']], ['p1'])
+        response = self.client.get('/api/users/?search=ome')
+        self.assertEqual(response.data['results'], [])
+
+
+class EmailBackendTestCase(TestCase):
+    """Testes para o custo e o resultado do login (EmailBackend)"""
+    
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(email='Backend@Example.com', password='testpass123', username='backend')
+    
+    def autenticar(self, usuario, senha='testpass123'):
+        from django.contrib.auth import authenticate
+        from django.contrib.auth.hashers import PBKDF2PasswordHasher
+        
+        with mock.patch.object(PBKDF2PasswordHasher, 'encode', autospec=True, side_effect=PBKDF2PasswordHasher.encode) as encode:
+            with self.assertNumQueries(1):
+                user = authenticate(request=None, username=usuario, password=senha)
+        self.assertEqual(encode.call_count, 1, 'um único hash de senha por login')
+        return user
+    
+    def test_uma_consulta_e_um_hash(self):
+        self.assertEqual(self.autenticar('backend@example.com'), self.user)
+        self.assertEqual(self.autenticar('BACKEND'), self.user)
+        self.assertIsNone(self.autenticar('Backend@Example.com', 'errada'))
+        # Usuário desconhecido também calcula o hash (tempo igual)
+        self.assertIsNone(self.autenticar('ninguem@example.com'))
+    
+    def test_email_tem_prioridade_sobre_username(self):
+        outro = CustomUser.objects.create_user(email='outro@example.com', password='testpass123', username='backend@example.com')
+        self.assertEqual(self.autenticar('backend@example.com'), self.user)
+        self.assertEqual(self.autenticar('outro@example.com'), outro)
+
+
+HASHERS_TESTE = ['accounts.hashers.ScryptPasswordHasher', 'accounts.hashers.PBKDF2PasswordHasher']
+CUSTOS_TESTE = {'pbkdf2': {'iterations': 1000}, 'scrypt': {'work_factor': 2 ** 10, 'parallelism': 1}}
+
+
+@override_settings(PASSWORD_HASHERS=HASHERS_TESTE, PASSWORD_HASHER_COSTS=CUSTOS_TESTE)
+class PasswordHasherTestCase(TestCase):
+    """Testes para os hashers configuráveis e a regravação do hash no login"""
+    
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(email='hash@example.com', password='testpass123', username='hash')
+    
+    def autenticar(self, senha='testpass123'):
+        from django.contrib.auth import authenticate
+        return authenticate(request=None, username='hash@example.com', password=senha)
+    
+    def senha_gravada(self):
+        return CustomUser.objects.values_list('password', flat=True).get(pk=self.user.pk)
+    
+    def test_hash_novo_no_algoritmo_e_custo_configurados(self):
+        algoritmo, n, _, r, p, _ = self.senha_gravada().split('$')
+        self.assertEqual((algoritmo, n, r, p), ('scrypt', '1024', '8', '1'))
+    
+    def test_hash_legado_regravado_no_login(self):
+        from django.contrib.auth.hashers import make_password
+        
+        CustomUser.objects.filter(pk=self.user.pk).update(
+            password=make_password('testpass123', hasher='pbkdf2_sha256')
+        )
+        self.assertIsNone(self.autenticar('errada'))
+        self.assertTrue(self.senha_gravada().startswith('pbkdf2_sha256$1000$'), 'senha errada não regrava')
+        
+        self.assertEqual(self.autenticar(), self.user)
+        self.assertTrue(self.senha_gravada().startswith('scrypt$1024$'))
+        self.assertEqual(self.autenticar(), self.user)
+    
+    def test_mudanca_de_custo_regrava_no_login(self):
+        with self.settings(PASSWORD_HASHER_COSTS={'scrypt': {'work_factor': 2 ** 11, 'parallelism': 1}}):
+            self.assertEqual(self.autenticar(), self.user)
+        self.assertTrue(self.senha_gravada().startswith('scrypt$2048$'))
+    
+    @override_settings(PASSWORD_HASHERS=['accounts.hashers.Argon2PasswordHasher', *HASHERS_TESTE])
+    def test_check_da_biblioteca_do_argon2(self):
+        from .checks import verificar_hasher_de_senha
+        
+        erros = verificar_hasher_de_senha(None)
+        if importlib.util.find_spec('argon2') is None:
+            self.assertEqual([erro.id for erro in erros], ['accounts.E001'])
+        else:
+            self.assertEqual(erros, [])
+
+
+class CachedJWTAuthenticationTestCase(TestCase):
+    """Testes para o cache de usuários do JWT (accounts/authentication.py)"""
+    
+    def setUp(self):
+        # Cache novo a cada teste (setting_changed recria o do processo)
+        self.enterContext(override_settings(JWT_USER_CACHE={'TTL': 60, 'MAX_ENTRIES': 100, 'BACKEND': None}))
+        self.user = CustomUser.objects.create_user(email='cache@example.com', password='testpass123', username='cache')
+        self.admin = CustomUser.objects.create_user(email='admin@example.com', password='testpass123', username='admin')
+        self.client = self.cliente(self.user)
+    
+    def cliente(self, user):
+        from rest_framework_simplejwt.tokens import RefreshToken
+        
+        client = APIClient()
+        self.refresh = RefreshToken.for_user(user)
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.refresh.access_token}')
+        return client
+    
+    def test_perfil_sem_consulta_depois_do_primeiro(self):
+        from .authentication import cache_de_usuarios
+        
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/profile/')
+        self.assertEqual(response.status_code, 200)
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/profile/')
+        self.assertEqual(response.json()['email'], 'cache@example.com')
+        self.assertEqual(response.json()['username'], 'cache')
+        
+        estatisticas = cache_de_usuarios().estatisticas()
+        self.assertEqual((estatisticas['hits_local'], estatisticas['misses']), (1, 1))
+        self.assertEqual(estatisticas['hit_rate'], 0.5)
+    
+    def test_edicao_de_perfil_e_senha_invalidam(self):
+        self.client.get('/api/profile/')
+        response = self.client.patch('/api/profile/update/', {'first_name': 'Novo'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.client.get('/api/profile/').json()['first_name'], 'Novo')
+        
+        response = self.client.post('/api/profile/change-password/', {
+            'old_password': 'testpass123', 'new_password': 'outrasenha456', 'new_password_confirm': 'outrasenha456',
+        })
+        self.assertEqual(response.status_code, 200)
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.check_password('outrasenha456'))
+        # O save do usuário vindo do cache grava só os campos carregados
+        self.assertEqual((self.user.first_name, self.user.email), ('Novo', 'cache@example.com'))
+    
+    def test_gravacao_nao_usa_copia_desatualizada(self):
+        self.assertEqual(self.client.get('/api/profile/').status_code, 200)
+        # Alterado por outro processo: a cópia em cache deste fica para trás
+        CustomUser.objects.filter(pk=self.user.pk).update(first_name='Outro', email='outro@example.com')
+        
+        response = self.client.patch('/api/profile/update/', {'last_name': 'Novo'})
+        self.assertEqual(response.status_code, 200)
+        self.user.refresh_from_db()
+        self.assertEqual((self.user.first_name, self.user.email, self.user.last_name), ('Outro', 'outro@example.com', 'Novo'))
+        
+        self.client.get('/api/profile/')
+        CustomUser.objects.filter(pk=self.user.pk).update(is_active=False, username='renomeado')
+        response = self.client.post('/api/profile/change-password/', {
+            'old_password': 'testpass123', 'new_password': 'outrasenha456', 'new_password_confirm': 'outrasenha456',
+        })
+        self.user.refresh_from_db()
+        self.assertFalse(self.user.is_active)
+        self.assertEqual(self.user.username, 'renomeado')
+    
+    def test_desativacao_e_logout_invalidam(self):
+        from .authentication import cache_de_usuarios
+        
+        self.assertEqual(self.client.get('/api/profile/').status_code, 200)
+        response = self.cliente(self.admin).delete(f'/api/users/{self.user.id}/')
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(self.client.get('/api/profile/').status_code, 401)
+        
+        admin = self.cliente(self.admin)
+        admin.get('/api/profile/')
+        self.assertIsNotNone(cache_de_usuarios().obter(self.admin.id))
+        response = admin.post('/api/auth/logout/', {'refresh': str(self.refresh)})
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNone(cache_de_usuarios().obter(self.admin.id))
+    
+    def test_lru_ttl_e_cache_compartilhado(self):
+        from .authentication import CacheDeUsuarios
+        
+        cache = CacheDeUsuarios(ttl=60, maximo=2)
+        for user_id in (1, 2, 3):
+            cache.guardar(user_id, {'id': user_id}, cache.geracao)
+        self.assertIsNone(cache.obter(1))
+        self.assertEqual(cache.obter(3), {'id': 3})
+        
+        with mock.patch('accounts.authentication.time.monotonic', return_value=10 ** 9):
+            self.assertIsNone(cache.obter(3))
+        
+        # Invalidação durante a leitura do banco: o dado lido não entra
+        geracao = cache.geracao
+        cache.invalidar(2)
+        cache.guardar(2, {'id': 2}, geracao)
+        self.assertIsNone(cache.obter(2))
+        
+        # Outro processo (outra instância) acha a entrada no backend compartilhado
+        CacheDeUsuarios(ttl=60, maximo=2, backend='default').guardar(7, {'id': 7}, 0)
+        outro = CacheDeUsuarios(ttl=60, maximo=2, backend='default')
+        self.assertEqual(outro.obter(7), {'id': 7})
+        self.assertEqual(outro.estatisticas()['hits_compartilhado'], 1)
+        outro.invalidar(7)
+        self.assertIsNone(CacheDeUsuarios(ttl=60, maximo=2, backend='default').obter(7))
+    
+    def test_invalidacao_em_outro_processo(self):
+        from .authentication import CacheDeUsuarios
+        
+        # Dois processos com LRUs próprios e a versão num cache compartilhado
+        este = CacheDeUsuarios(ttl=60, maximo=10, versoes='default')
+        outro = CacheDeUsuarios(ttl=60, maximo=10, versoes='default')
+        este.guardar(self.user.id, {'id': self.user.id}, este.geracao, este.versao(self.user.id))
+        self.assertEqual(este.obter(self.user.id), {'id': self.user.id})
+        
+        outro.invalidar(self.user.id)
+        self.assertIsNone(este.obter(self.user.id))
+        self.assertEqual(este.estatisticas()['entradas'], 0)
+        
+        # Guardado com a versão nova, volta a valer
+        este.guardar(self.user.id, {'id': self.user.id}, este.geracao, este.versao(self.user.id))
+        self.assertEqual(este.obter(self.user.id), {'id': self.user.id})
+    
+    async def test_views_assincronas_usam_o_cache(self):
+        from .authentication import cache_de_usuarios
+        
+        client = AsyncClient()
+        cabecalho = {'Authorization': f'Bearer {self.refresh.access_token}'}
+        for _ in range(2):
+            response = await client.get('/api/profile/', headers=cabecalho)
+            self.assertEqual(response.status_code, 200)
+        self.assertEqual(cache_de_usuarios().estatisticas()['hits_local'], 1)
+
+
+class TokenBlacklistTestCase(TestCase):
+    """Testes para a blacklist de refresh tokens (accounts/tokens.py) e a compactação"""
+    
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(email='token@example.com', password='testpass123', username='token')
+        self.client = APIClient()
+        response = self.client.post('/api/auth/login/', {'email': 'token@example.com', 'password': 'testpass123'})
+        self.refresh = response.json()['tokens']['refresh']
+    
+    def renovar(self, refresh):
+        return self.client.post('/api/auth/token/refresh/', {'refresh': refresh})
+    
+    def test_token_reusado_recusado_sem_consulta(self):
+        from .tokens import jtis_bloqueados
+        
+        response = self.renovar(self.refresh)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.renovar(response.json()['refresh']).status_code, 200)
+        
+        with self.assertNumQueries(0):
+            self.assertEqual(self.renovar(self.refresh).status_code, 401)
+        
+        # Bloqueado por outro processo: consulta o banco e passa a lembrar
+        jtis_bloqueados.limpar()
+        with self.assertNumQueries(1):
+            self.assertEqual(self.renovar(self.refresh).status_code, 401)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.renovar(self.refresh).status_code, 401)
+    
+    def test_token_liberado_sempre_consulta(self):
+        from .tokens import RefreshToken
+        
+        # Fora da blacklist: outro processo pode ter bloqueado, então não há cache
+        for _ in range(2):
+            with self.assertNumQueries(1):
+                RefreshToken(self.refresh, verify=False).check_blacklist()
+    
+    def test_logout_bloqueia(self):
+        access = self.client.post('/api/auth/token/refresh/', {'refresh': self.refresh}).json()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {access['access']}")
+        response = self.client.post('/api/auth/logout/', {'refresh': access['refresh']})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.renovar(access['refresh']).status_code, 401)
+        self.assertEqual(self.client.post('/api/auth/logout/', {'refresh': access['refresh']}).status_code, 400)
+    
+    def test_compactacao_em_lotes(self):
+        from datetime import timedelta
+        from django.core.management import call_command
+        from django.utils import timezone
+        from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+        from .tokens import compactar_blacklist
+        
+        self.renovar(self.refresh)  # 1 válido na blacklist
+        passado = timezone.now() - timedelta(days=1)
+        for indice in range(5):
+            token = OutstandingToken.objects.create(jti=f'expirado-{indice}', token='x', expires_at=passado)
+            if indice % 2 == 0:
+                BlacklistedToken.objects.create(token=token)
+        
+        resultado = compactar_blacklist(tamanho_lote=2, max_lotes=1)
+        self.assertEqual((resultado.outstanding, resultado.lotes, resultado.restantes), (2, 1, 3))
+        
+        saida = io.StringIO()
+        call_command('compact_token_blacklist', '--batch-size', '2', stdout=saida)
+        self.assertIn('3 token(s) expirado(s) removido(s)', saida.getvalue())
+        self.assertEqual(OutstandingToken.objects.filter(expires_at__lte=timezone.now()).count(), 0)
+        self.assertEqual(OutstandingToken.objects.count(), 1)
+        self.assertEqual(BlacklistedToken.objects.count(), 1)
+    
+    def test_metricas(self):
+        from auth_project.metricas import exportar
+        from . import tokens
+        
+        self.renovar(self.refresh)
+        self.renovar(self.refresh)
+        tokens._contagem_tabelas = (None, 0.0)
+        texto = exportar()
+        self.assertIn('token_blacklist_rows{tabela="outstanding"} 1', texto)
+        self.assertIn('token_blacklist_rows{tabela="blacklisted"} 1', texto)
+        # Dentro do TTL a contagem não é refeita
+        with self.assertNumQueries(0):
+            tokens.tamanho_das_tabelas()
+        self.assertIn('token_blacklist_check_seconds_count{resultado="cache"}', texto)
+        self.assertIn('token_blacklist_check_seconds_count{resultado="liberado"}', texto)
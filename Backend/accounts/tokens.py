@@ -0,0 +1,162 @@
+"""
+Refresh token com a consulta à blacklist medida e um cache por processo dos
+jti já bloqueados
+
+Com ROTATE_REFRESH_TOKENS e BLACKLIST_AFTER_ROTATION, todo refresh e logout
+consulta a blacklist (token_blacklist) e grava nela. Aqui:
+
+- um LRU por processo guarda os jti que este processo viu bloqueados (no
+  blacklist() ou na consulta) até o token expirar: reenvio de um token já
+  usado (aba duplicada, cliente repetindo o refresh) é recusado sem consulta.
+  Bloqueio é permanente, então esse cache nunca fica errado. Só esses
+  reenvios evitam a consulta: um jti fora do cache sempre vai ao banco,
+  porque outro processo pode tê-lo bloqueado
+- a duração de cada consulta vai para /metrics
+  (token_blacklist_check_seconds, por resultado), e o tamanho das tabelas
+  (token_blacklist_rows) é contado no máximo a cada TOKEN_BLACKLIST_ROWS_TTL
+  segundos, não a cada coleta: COUNT(*) percorre a tabela inteira
+
+Tokens expirados são removidos em lotes pelo comando compact_token_blacklist.
+"""
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+
+from django.conf import settings
+from django.db import transaction
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt import tokens
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+from rest_framework_simplejwt.utils import aware_utcnow
+
+from auth_project import metricas
+
+
+class JtisBloqueados:
+    """LRU de {jti: exp (epoch)} dos tokens bloqueados, seguro entre threads"""
+
+    def __init__(self, maximo):
+        self.maximo = maximo
+        self._entradas = OrderedDict()
+        self._lock = threading.Lock()
+
+    def contem(self, jti):
+        with self._lock:
+            exp = self._entradas.get(jti)
+            if exp is None:
+                return False
+            if exp <= time.time():
+                del self._entradas[jti]
+                return False
+            self._entradas.move_to_end(jti)
+            return True
+
+    def adicionar(self, jti, exp):
+        if self.maximo <= 0:
+            return
+        with self._lock:
+            self._entradas[jti] = exp
+            self._entradas.move_to_end(jti)
+            while len(self._entradas) > self.maximo:
+                self._entradas.popitem(last=False)
+
+    def limpar(self):
+        with self._lock:
+            self._entradas.clear()
+
+    def __len__(self):
+        return len(self._entradas)
+
+
+jtis_bloqueados = JtisBloqueados(getattr(settings, 'TOKEN_BLACKLIST_CACHE_SIZE', 10000))
+
+
+class RefreshToken(tokens.RefreshToken):
+    """RefreshToken do simplejwt com a blacklist consultada via jtis_bloqueados"""
+
+    def check_blacklist(self):
+        jti = self.payload[api_settings.JTI_CLAIM]
+        inicio = time.perf_counter()
+        if jtis_bloqueados.contem(jti):
+            resultado = 'cache'
+        elif BlacklistedToken.objects.filter(token__jti=jti).exists():
+            jtis_bloqueados.adicionar(jti, self.payload['exp'])
+            resultado = 'bloqueado'
+        else:
+            resultado = 'liberado'
+        metricas.observar('token_blacklist_check_seconds', time.perf_counter() - inicio, resultado=resultado)
+
+        if resultado != 'liberado':
+            raise TokenError(_("Token is blacklisted"))
+
+    def blacklist(self):
+        resultado = super().blacklist()
+        jtis_bloqueados.adicionar(self.payload[api_settings.JTI_CLAIM], self.payload['exp'])
+        return resultado
+
+
+# (entradas, validade em time.monotonic()) da última contagem
+_contagem_tabelas = (None, 0.0)
+
+
+def tamanho_das_tabelas():
+    """Coletor do /metrics: linhas em cada tabela do token_blacklist, recontadas após TOKEN_BLACKLIST_ROWS_TTL segundos"""
+    global _contagem_tabelas
+    entradas, validade = _contagem_tabelas
+    agora = time.monotonic()
+    if entradas is None or validade <= agora:
+        entradas = [
+            ('token_blacklist_rows', {'tabela': 'outstanding'}, OutstandingToken.objects.count()),
+            ('token_blacklist_rows', {'tabela': 'blacklisted'}, BlacklistedToken.objects.count()),
+        ]
+        _contagem_tabelas = (entradas, agora + getattr(settings, 'TOKEN_BLACKLIST_ROWS_TTL', 60))
+    return entradas
+
+
+@dataclass
+class ResultadoCompactacao:
+    outstanding: int = 0
+    blacklisted: int = 0
+    lotes: int = 0
+    restantes: int = 0
+
+
+def compactar_blacklist(tamanho_lote=1000, max_lotes=None, pausa=0.0):
+    """
+    Remove tokens expirados do token_blacklist (OutstandingToken e os
+    BlacklistedToken que apontam para eles) em lotes de tamanho_lote, cada um
+    na sua transação, para não travar o banco com um DELETE enorme como o
+    flushexpiredtokens do simplejwt.
+
+    Os lotes andam pela chave primária: a expiração acompanha a criação, então
+    os expirados estão no começo da tabela.
+
+    Returns:
+        ResultadoCompactacao: linhas removidas por tabela, lotes e expirados
+        que ficaram para a próxima execução (max_lotes atingido)
+    """
+    agora = aware_utcnow()
+    expirados = OutstandingToken.objects.filter(expires_at__lte=agora).order_by('id')
+    resultado = ResultadoCompactacao()
+    while max_lotes is None or resultado.lotes < max_lotes:
+        ids = list(expirados.values_list('id', flat=True)[:tamanho_lote])
+        if not ids:
+            break
+        with transaction.atomic():
+            bloqueados = BlacklistedToken.objects.filter(token_id__in=ids).delete()[0]
+            pendentes = OutstandingToken.objects.filter(id__in=ids).delete()[0]
+        resultado.blacklisted += bloqueados
+        resultado.outstanding += pendentes
+        resultado.lotes += 1
+        metricas.incrementar('token_blacklist_compacted_total', bloqueados, tabela='blacklisted')
+        metricas.incrementar('token_blacklist_compacted_total', pendentes, tabela='outstanding')
+        if len(ids) < tamanho_lote:
+            break
+        if pausa:
+            time.sleep(pausa)
+    else:
+        resultado.restantes = expirados.count()
+    return resultado
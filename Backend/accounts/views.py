@@ -3,21 +3,56 @@ from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from rest_framework.response import Response
 from rest_framework_simplejwt.views import TokenObtainPairView
-from rest_framework_simplejwt.tokens import RefreshToken
 from django.contrib.auth import authenticate
-from django.http import HttpResponse
+from django.http import FileResponse, StreamingHttpResponse
+from django.db.models import Q
+from django.db.models.functions import Lower
+from .authentication import invalidar_usuario
 from .models import CustomUser
-from .serializers import CustomUserSerializer, CustomUserReadSerializer, CustomTokenObtainPairSerializer, UserLoginSerializer
-import pandas as pd
-import io
+from .pagination import UserKeysetPagination
+from .serializers import CustomUserSerializer, CustomUserReadSerializer, CustomTokenObtainPairSerializer, UserLoginSerializer, representar_usuarios
+from .tokens import RefreshToken
+import csv
+import tempfile
 
 class CustomTokenObtainPairView(TokenObtainPairView):
     serializer_class = CustomTokenObtainPairSerializer
 
+def filtrar_usuarios(queryset, params):
+    """
+    Filtros opcionais da listagem, todos sem diferenciar maiúsculas:
+    ?email= exato e ?search= prefixo do email, username, nome ou sobrenome
+    (istartswith sobre Lower(campo), com os índices de CustomUser.Meta.indexes).
+    A busca é por prefixo, não por trecho: "ome" não acha "Nome"
+    """
+    email = params.get('email', '').strip().lower()
+    busca = params.get('search', '').strip()
+    if not email and not busca:
+        return queryset
+    
+    queryset = queryset.annotate(
+        email_lower=Lower('email'), username_lower=Lower('username'),
+        first_name_lower=Lower('first_name'), last_name_lower=Lower('last_name')
+    )
+    if email:
+        queryset = queryset.filter(email_lower=email)
+    if busca:
+        queryset = queryset.filter(
+            Q(email_lower__istartswith=busca) | Q(username_lower__istartswith=busca)
+            | Q(first_name_lower__istartswith=busca) | Q(last_name_lower__istartswith=busca)
+        )
+    return queryset
+
 class UserListCreateView(generics.ListCreateAPIView):
+    """
+    GET paginado por chave (UserKeysetPagination), com ?search= e ?email=
+    (filtrar_usuarios). A listagem lê só os campos de leitura com .values()
+    e os formata por representar_usuarios, sem um serializer por usuário.
+    """
     queryset = CustomUser.objects.all()
     serializer_class = CustomUserSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = UserKeysetPagination
     
     def get_queryset(self):
         # Apenas usuários ativos
@@ -27,6 +62,11 @@ class UserListCreateView(generics.ListCreateAPIView):
         if self.request.method == 'GET':
             return CustomUserReadSerializer
         return CustomUserSerializer
+    
+    def list(self, request, *args, **kwargs):
+        queryset = filtrar_usuarios(self.get_queryset(), request.query_params)
+        linhas = self.paginate_queryset(queryset.values(*CustomUserReadSerializer.Meta.fields))
+        return self.get_paginated_response(representar_usuarios(linhas))
 
 class UserRetrieveUpdateDestroyView(generics.RetrieveUpdateDestroyAPIView):
     queryset = CustomUser.objects.all()
@@ -40,7 +80,8 @@ class UserRetrieveUpdateDestroyView(generics.RetrieveUpdateDestroyAPIView):
         return CustomUserSerializer
     
     def perform_destroy(self, instance):
-        # Soft delete - apenas desativa o usuário
+        # Soft delete - apenas desativa o usuário (o save tira ele do cache
+        # de usuários do JWT, ver accounts/authentication.py)
         instance.is_active = False
         instance.save()
 
@@ -104,8 +145,10 @@ def get_user_profile(request):
 @permission_classes([IsAuthenticated])
 def update_user_profile(request):
     """Atualiza o perfil do usuário autenticado"""
+    # request.user pode vir do cache do JWT, com campos de até TTL segundos
+    # atrás: salvá-lo desfaria alterações feitas por outro processo
     serializer = CustomUserSerializer(
-        request.user, 
+        CustomUser.objects.get(pk=request.user.pk), 
         data=request.data, 
         partial=request.method == 'PATCH'
     )
@@ -134,14 +177,16 @@ def change_password(request):
             status=status.HTTP_400_BAD_REQUEST
         )
     
-    if not request.user.check_password(old_password):
+    # Cópia do banco, não a do cache do JWT; e só a senha é gravada
+    user = CustomUser.objects.get(pk=request.user.pk)
+    if not user.check_password(old_password):
         return Response(
             {'error': 'Senha atual incorreta.'}, 
             status=status.HTTP_400_BAD_REQUEST
         )
     
-    request.user.set_password(new_password)
-    request.user.save()
+    user.set_password(new_password)
+    user.save(update_fields=['password'])
     
     return Response({'message': 'Senha alterada com sucesso.'})
 
@@ -153,44 +198,87 @@ def logout_user(request):
         refresh_token = request.data["refresh"]
         token = RefreshToken(refresh_token)
         token.blacklist()
+        invalidar_usuario(request.user.pk)
         return Response({'message': 'Logout realizado com sucesso.'})
     except Exception as e:
         return Response({'error': 'Token inválido.'}, status=status.HTTP_400_BAD_REQUEST)
 
+# Usuários lidos do banco por vez na exportação
+CHUNK_EXPORTACAO = 2000
+
+COLUNAS_EXPORTACAO = ['ID', 'Nome', 'Sobrenome', 'Email', 'Data de Cadastro']
+
+def _linhas_exportacao():
+    """Uma única consulta, lida em blocos: a memória não cresce com o número de usuários"""
+    usuarios = (
+        CustomUser.objects.filter(is_active=True)
+        .order_by('id')
+        .values_list('id', 'first_name', 'last_name', 'email', 'date_joined')
+        .iterator(chunk_size=CHUNK_EXPORTACAO)
+    )
+    for user_id, first_name, last_name, email, date_joined in usuarios:
+        yield [user_id, first_name, last_name, email, date_joined.strftime('%d/%m/%Y %H:%M')]
+
+class _Eco:
+    """'Arquivo' do csv.writer que só devolve a linha escrita"""
+    def write(self, valor):
+        return valor
+
+def _exportar_csv():
+    escritor = csv.writer(_Eco())
+    yield '\ufeff' + escritor.writerow(COLUNAS_EXPORTACAO)  # BOM: acentos corretos no Excel
+    for linha in _linhas_exportacao():
+        yield escritor.writerow(linha)
+
+def _exportar_xlsx():
+    """
+    Planilha gravada em modo constant_memory (uma linha por vez) num arquivo
+    temporário anônimo, que some quando a resposta o fecha
+    """
+    # Import tardio: xlsxwriter só é necessário neste endpoint
+    import xlsxwriter
+    
+    destino = tempfile.TemporaryFile()
+    try:
+        workbook = xlsxwriter.Workbook(destino, {'constant_memory': True})
+        worksheet = workbook.add_worksheet('Relatório de Usuários')
+        negrito = workbook.add_format({'bold': True})
+        worksheet.write_row(0, 0, COLUNAS_EXPORTACAO, negrito)
+        for numero, linha in enumerate(_linhas_exportacao(), start=1):
+            worksheet.write_row(numero, 0, linha)
+        workbook.close()
+    except Exception:
+        destino.close()
+        raise
+    destino.seek(0)
+    return destino
+
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def download_excel_report(request):
-    """Gera e disponibiliza um relatório de usuários em Excel."""
+    """
+    Exporta os usuários ativos em xlsx (padrão) ou, com ?formato=csv, em CSV
+    transmitido linha a linha, sem arquivo intermediário.
+    """
+    formato = request.query_params.get('formato', 'xlsx')
+    
     try:
-        # Obter dados dos usuários
-        users = CustomUser.objects.filter(is_active=True)
-        
-        # Estruturar os dados para o DataFrame
-        data = {
-            'ID': [user.id for user in users],
-            'Nome': [user.first_name for user in users],
-            'Sobrenome': [user.last_name for user in users],
-            'Email': [user.email for user in users],
-            'Data de Cadastro': [user.date_joined.strftime('%d/%m/%Y %H:%M') for user in users],
-        }
-        
-        df = pd.DataFrame(data)
-        
-        # Criar um buffer de memória para o arquivo Excel
-        output = io.BytesIO()
-        with pd.ExcelWriter(output, engine='openpyxl') as writer:
-            df.to_excel(writer, sheet_name='Relatório de Usuários', index=False)
-        
-        output.seek(0)
+        if formato == 'csv':
+            response = StreamingHttpResponse(_exportar_csv(), content_type='text/csv; charset=utf-8')
+            response['Content-Disposition'] = 'attachment; filename="relatorio_usuarios.csv"'
+            return response
+        if formato != 'xlsx':
+            return Response(
+                {'error': 'Formato inválido. Use: xlsx, csv'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
         
-        # Criar a resposta HTTP
-        response = HttpResponse(
-            output,
+        return FileResponse(
+            _exportar_xlsx(),
+            as_attachment=True,
+            filename='relatorio_usuarios.xlsx',
             content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
         )
-        response['Content-Disposition'] = 'attachment; filename="relatorio_usuarios.xlsx"'
-        
-        return response
     
     except Exception as e:
         return Response(
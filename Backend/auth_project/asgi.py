@@ -14,3 +14,10 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'auth_project.settings')
 
 application = get_asgi_application()
+
+# Processos de geração de relatório prontos antes da primeira requisição
+from django.conf import settings  # noqa: E402
+
+if settings.REPORT_POOL_PREFORK:
+    from reports.services import pool  # noqa: E402
+    pool.aquecer()
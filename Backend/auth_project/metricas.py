@@ -0,0 +1,473 @@
+"""
+Métricas de execução no formato texto do Prometheus (GET /metrics)
+
+Sem dependências nem serviços externos: cada processo acumula contadores,
+histogramas e gauges em memória. Com METRICS_DIR configurado (obrigatório sob
+gunicorn com vários workers), cada processo também grava seu estado em
+METRICS_DIR/metricas_<pid>_<id>.json, e o /metrics soma os arquivos de todos
+os processos. A gravação fica fora das requisições: uma thread por processo
+grava a cada METRICS_FLUSH_INTERVAL segundos, se algo mudou, e de novo ao
+sair o processo (os números dos outros processos chegam com até esse atraso):
+
+- contadores e histogramas de processos que já morreram continuam na soma
+  (são consolidados em acumulado.json e o arquivo do processo é removido)
+- gauges só contam processos vivos
+
+O MetricsMiddleware registra, por view (nome da URL):
+
+- http_request_duration_seconds (histograma) e http_requests_total
+- http_requests_in_flight
+- db_queries_per_request e db_query_duration_seconds (histogramas)
+- report_generation_total por resultado, nas views de relatório (e, com
+  view="job", no fim de cada job assíncrono)
+
+report_temp_* vêm da limpeza de MEDIA_ROOT/temp (reports/services/temporarios.py);
+report_cache_lookups_total, do cache de relatórios (reports/services/cache.py);
+auth_user_cache_total, do cache de usuários do JWT (accounts/authentication.py);
+token_blacklist_*, da blacklist de refresh tokens (accounts/tokens.py).
+
+Valores lidos na hora de cada coleta (tamanho de tabelas, por exemplo) vêm de
+funções registradas com registrar_coletor, sem passar pelos arquivos de
+METRICS_DIR.
+
+MetricasPrometheus é o backend de REPORT_METRICS_BACKEND que transforma as
+etapas de reports/services/instrumentacao.py em histogramas.
+"""
+import atexit
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from contextlib import ExitStack
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+
+from django.conf import settings
+from django.db import connections
+from django.http import HttpResponse
+
+logger = logging.getLogger(__name__)
+
+try:
+    import fcntl
+except ImportError:  # Windows: sem consolidação de processos mortos
+    fcntl = None
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+BUCKETS_SEGUNDOS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+BUCKETS_CONSULTAS = (0, 1, 2, 5, 10, 20, 50, 100)
+BUCKETS_CONSULTA_RAPIDA = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1)
+
+CONTADOR = 'counter'
+GAUGE = 'gauge'
+HISTOGRAMA = 'histogram'
+
+# nome: (tipo, ajuda, buckets)
+METRICAS = {
+    'http_request_duration_seconds': (HISTOGRAMA, 'Tempo de resposta por view (até a view retornar)', BUCKETS_SEGUNDOS),
+    'http_requests_total': (CONTADOR, 'Requisições por view, método e status', None),
+    'http_requests_in_flight': (GAUGE, 'Requisições em andamento', None),
+    'db_queries_per_request': (HISTOGRAMA, 'Consultas ao banco por requisição', BUCKETS_CONSULTAS),
+    'db_query_duration_seconds': (HISTOGRAMA, 'Tempo total em consultas ao banco por requisição', BUCKETS_SEGUNDOS),
+    'report_generation_total': (CONTADOR, 'Gerações de relatório por view e resultado', None),
+    'report_stage_duration_seconds': (HISTOGRAMA, 'Tempo de parede por etapa da geração', BUCKETS_SEGUNDOS),
+    'report_stage_cpu_seconds': (HISTOGRAMA, 'Tempo de CPU por etapa da geração', BUCKETS_SEGUNDOS),
+    'report_stage_rows_total': (CONTADOR, 'Linhas processadas por etapa da geração', None),
+    'report_temp_removed_files_total': (CONTADOR, 'Temporários removidos de MEDIA_ROOT/temp por origem', None),
+    'report_temp_reclaimed_bytes_total': (CONTADOR, 'Bytes recuperados em MEDIA_ROOT/temp por origem', None),
+    'report_cache_lookups_total': (CONTADOR, 'Consultas ao cache de relatórios por resultado (hit, miss)', None),
+    'auth_user_cache_total': (CONTADOR, 'Usuários do JWT resolvidos por resultado (local, compartilhado, miss)', None),
+    'token_blacklist_check_seconds': (HISTOGRAMA, 'Consulta à blacklist de refresh tokens por resultado (cache, bloqueado, liberado)', BUCKETS_CONSULTA_RAPIDA),
+    'token_blacklist_rows': (GAUGE, 'Linhas nas tabelas do token_blacklist (lidas a cada coleta)', None),
+    'token_blacklist_compacted_total': (CONTADOR, 'Tokens expirados removidos pelo compact_token_blacklist por tabela', None),
+}
+
+# Views cujas respostas contam em report_generation_total
+VIEWS_RELATORIO = (
+    'generate_report',
+    'generate_report_consolidated',
+    'generate_report_append',
+    'generate_report_batch',
+    'report_forecast',
+    'report_job_list_create',
+)
+
+NOME_ACUMULADO = 'acumulado.json'
+NOME_TRAVA = '.trava'
+
+
+class Registro:
+    """
+    Valores de um processo: {(nome, rótulos): valor}, com rótulos como tupla
+    ordenada de pares. Histogramas guardam [contagens por bucket + +Inf, soma].
+    """
+
+    def __init__(self):
+        self.valores = {}
+        self.lock = threading.Lock()
+        self.alterado = False
+
+    def incrementar(self, nome, valor=1, **rotulos):
+        chave = (nome, tuple(sorted(rotulos.items())))
+        with self.lock:
+            self.valores[chave] = self.valores.get(chave, 0) + valor
+            self.alterado = True
+
+    def observar(self, nome, valor, **rotulos):
+        buckets = METRICAS[nome][2]
+        chave = (nome, tuple(sorted(rotulos.items())))
+        with self.lock:
+            histograma = self.valores.get(chave)
+            if histograma is None:
+                histograma = self.valores[chave] = [[0] * (len(buckets) + 1), 0.0]
+            indice = next((i for i, limite in enumerate(buckets) if valor <= limite), len(buckets))
+            histograma[0][indice] += 1
+            histograma[1] += valor
+            self.alterado = True
+
+    def instantaneo(self):
+        with self.lock:
+            self.alterado = False
+            return [
+                [nome, [list(par) for par in rotulos], json.loads(json.dumps(valor))]
+                for (nome, rotulos), valor in self.valores.items()
+            ]
+
+
+_registro = Registro()
+_arquivo_processo = None
+_coletores = []
+_gravador_pid = None
+_gravador_lock = threading.Lock()
+
+
+def incrementar(nome, valor=1, **rotulos):
+    _registro.incrementar(nome, valor, **rotulos)
+
+
+def observar(nome, valor, **rotulos):
+    _registro.observar(nome, valor, **rotulos)
+
+
+def registrar_coletor(funcao):
+    """
+    funcao() é chamada a cada coleta do /metrics e devolve [(nome, rótulos
+    em dict, valor)] de gauges lidos na hora
+    """
+    if funcao not in _coletores:
+        _coletores.append(funcao)
+    return funcao
+
+
+def _coletar_na_hora(total):
+    for funcao in _coletores:
+        try:
+            entradas = funcao()
+        except Exception as e:
+            logger.warning(f"Erro no coletor de métricas {funcao.__name__}: {e}")
+            continue
+        for nome, rotulos, valor in entradas:
+            total[(nome, tuple(sorted(rotulos.items())))] = valor
+
+
+def pasta_metricas():
+    return getattr(settings, 'METRICS_DIR', None)
+
+
+def gravar():
+    """Grava o estado deste processo em METRICS_DIR (se configurado)"""
+    global _arquivo_processo
+    pasta = pasta_metricas()
+    if not pasta:
+        return
+    if _arquivo_processo is None or not _arquivo_processo.startswith(f"metricas_{os.getpid()}_"):
+        # Nome novo também após fork (pid diferente do processo pai)
+        _arquivo_processo = f"metricas_{os.getpid()}_{uuid.uuid4().hex[:8]}.json"
+    try:
+        os.makedirs(pasta, exist_ok=True)
+        destino = os.path.join(pasta, _arquivo_processo)
+        temporario = f"{destino}.{threading.get_ident()}.tmp"
+        with open(temporario, 'w', encoding='utf-8') as arquivo:
+            json.dump(_registro.instantaneo(), arquivo)
+        os.replace(temporario, destino)
+    except OSError as e:
+        _registro.alterado = True
+        logger.warning(f"Erro ao gravar métricas em {pasta}: {e}")
+
+
+def gravar_periodicamente():
+    """
+    Sobe, uma vez por processo (inclusive após fork), a thread que chama
+    gravar() a cada METRICS_FLUSH_INTERVAL segundos quando houve alteração.
+    Barato o bastante para ser chamada a cada requisição.
+    """
+    global _gravador_pid
+    pid = os.getpid()
+    if _gravador_pid == pid or not pasta_metricas():
+        return
+    with _gravador_lock:
+        if _gravador_pid == pid:
+            return
+        _gravador_pid = pid
+        threading.Thread(target=_gravar_em_intervalos, name='metricas-gravador', daemon=True).start()
+
+
+def _gravar_em_intervalos():
+    while True:
+        time.sleep(getattr(settings, 'METRICS_FLUSH_INTERVAL', 5))
+        if _registro.alterado:
+            gravar()
+
+
+# O que mudou depois da última gravação periódica
+atexit.register(gravar)
+
+
+def _processo_vivo(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _somar(total, entradas, com_gauges=True):
+    for nome, rotulos, valor in entradas:
+        if nome not in METRICAS:
+            continue
+        tipo = METRICAS[nome][0]
+        if tipo == GAUGE and not com_gauges:
+            continue
+        chave = (nome, tuple(tuple(par) for par in rotulos))
+        if tipo == HISTOGRAMA:
+            atual = total.get(chave)
+            if atual is None:
+                total[chave] = [list(valor[0]), valor[1]]
+            else:
+                atual[0] = [a + b for a, b in zip(atual[0], valor[0])]
+                atual[1] += valor[1]
+        else:
+            total[chave] = total.get(chave, 0) + valor
+
+
+def _ler(caminho):
+    try:
+        with open(caminho, encoding='utf-8') as arquivo:
+            return json.load(arquivo)
+    except (OSError, ValueError):
+        return []
+
+
+def coletar():
+    """
+    Soma deste processo com os arquivos dos demais em METRICS_DIR,
+    consolidando em acumulado.json os processos que já terminaram.
+
+    Returns:
+        dict: {(nome, rótulos): valor}
+    """
+    pasta = pasta_metricas()
+    if not pasta:
+        total = {}
+        _somar(total, _registro.instantaneo())
+        return total
+
+    gravar()
+    with ExitStack() as pilha:
+        if fcntl is not None:
+            trava = pilha.enter_context(open(os.path.join(pasta, NOME_TRAVA), 'w'))
+            fcntl.flock(trava, fcntl.LOCK_EX)
+
+        caminho_acumulado = os.path.join(pasta, NOME_ACUMULADO)
+        acumulado = {}
+        _somar(acumulado, _ler(caminho_acumulado), com_gauges=False)
+
+        total = {}
+        mortos = []
+        for nome in os.listdir(pasta):
+            if not (nome.startswith('metricas_') and nome.endswith('.json')):
+                continue
+            caminho = os.path.join(pasta, nome)
+            pid = int(nome.split('_')[1])
+            if fcntl is not None and not _processo_vivo(pid):
+                _somar(acumulado, _ler(caminho), com_gauges=False)
+                mortos.append(caminho)
+            else:
+                _somar(total, _ler(caminho))
+
+        if mortos:
+            temporario = f"{caminho_acumulado}.tmp"
+            with open(temporario, 'w', encoding='utf-8') as arquivo:
+                json.dump([[n, [list(p) for p in r], v] for (n, r), v in acumulado.items()], arquivo)
+            os.replace(temporario, caminho_acumulado)
+            for caminho in mortos:
+                os.remove(caminho)
+
+    _somar(total, [[n, r, v] for (n, r), v in acumulado.items()])
+    return total
+
+
+def _rotulos(pares, extra=None):
+    pares = list(pares) + ([extra] if extra else [])
+    if not pares:
+        return ''
+    escapados = (
+        f'{chave}="' + str(valor).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') + '"'
+        for chave, valor in pares
+    )
+    return '{' + ','.join(escapados) + '}'
+
+
+def _numero(valor):
+    return repr(float(valor)) if isinstance(valor, float) else str(valor)
+
+
+def exportar(total=None):
+    """Texto no formato de exposição do Prometheus (versão 0.0.4)"""
+    if total is None:
+        total = coletar()
+        _coletar_na_hora(total)
+    linhas = []
+    for nome, (tipo, ajuda, buckets) in METRICAS.items():
+        series = sorted((rotulos, valor) for (n, rotulos), valor in total.items() if n == nome)
+        linhas.append(f"# HELP {nome} {ajuda}")
+        linhas.append(f"# TYPE {nome} {tipo}")
+        if tipo == GAUGE and not series:
+            linhas.append(f"{nome} 0")
+        for rotulos, valor in series:
+            if tipo != HISTOGRAMA:
+                linhas.append(f"{nome}{_rotulos(rotulos)} {_numero(valor)}")
+                continue
+            contagens, soma = valor
+            acumulado = 0
+            for limite, contagem in zip(list(buckets) + ['+Inf'], contagens):
+                acumulado += contagem
+                le = limite if limite == '+Inf' else _numero(float(limite))
+                linhas.append(f"{nome}_bucket{_rotulos(rotulos, ('le', le))} {acumulado}")
+            linhas.append(f"{nome}_sum{_rotulos(rotulos)} {_numero(float(soma))}")
+            linhas.append(f"{nome}_count{_rotulos(rotulos)} {acumulado}")
+    return '\n'.join(linhas) + '\n'
+
+
+def resultado_relatorio(response):
+    """Resultado de uma chamada a uma view de relatório, pelo status da resposta"""
+    codigo = response.status_code
+    if codigo < 300:
+        return 'cache' if response.get('X-Report-Cache') == 'HIT' else 'sucesso'
+    if codigo in (401, 403):
+        return 'nao_autorizado'
+    if codigo in (429, 503):
+        return 'ocupado'
+    if codigo < 500:
+        return 'invalido'
+    return 'erro'
+
+
+class _ContadorConsultas:
+    """execute_wrapper que conta e cronometra as consultas da requisição"""
+
+    def __init__(self):
+        self.quantidade = 0
+        self.duracao = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        inicio = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.quantidade += 1
+            self.duracao += time.perf_counter() - inicio
+
+
+class MetricsMiddleware:
+    """
+    Latência, requisições em andamento e consultas ao banco por view
+
+    Funciona nos dois modos: sob ASGI a cadeia continua assíncrona (um
+    middleware só síncrono faria toda requisição passar por uma thread).
+    Nas requisições assíncronas as consultas rodam em threads do ORM, fora
+    do alcance do execute_wrapper, e não entram em db_queries_*.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.assincrono = iscoroutinefunction(get_response)
+        if self.assincrono:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.assincrono:
+            return self.__acall__(request)
+
+        _registro.incrementar('http_requests_in_flight', 1)
+        gravar_periodicamente()
+        consultas = _ContadorConsultas()
+        inicio = time.perf_counter()
+        response = None
+        try:
+            with ExitStack() as pilha:
+                for conexao in connections.all():
+                    pilha.enter_context(conexao.execute_wrapper(consultas))
+                response = self.get_response(request)
+            return response
+        finally:
+            self._registrar(request, response, time.perf_counter() - inicio, consultas)
+
+    async def __acall__(self, request):
+        _registro.incrementar('http_requests_in_flight', 1)
+        gravar_periodicamente()
+        inicio = time.perf_counter()
+        response = None
+        try:
+            response = await self.get_response(request)
+            return response
+        finally:
+            self._registrar(request, response, time.perf_counter() - inicio)
+
+    def _registrar(self, request, response, duracao, consultas=None):
+        match = getattr(request, 'resolver_match', None)
+        view = (match.url_name or match.view_name) if match else 'nao_encontrada'
+
+        _registro.incrementar('http_requests_in_flight', -1)
+        _registro.observar('http_request_duration_seconds', duracao, view=view, method=request.method)
+        _registro.incrementar(
+            'http_requests_total', view=view, method=request.method,
+            status=str(response.status_code) if response is not None else '500'
+        )
+        if consultas is not None:
+            _registro.observar('db_queries_per_request', consultas.quantidade, view=view)
+            _registro.observar('db_query_duration_seconds', consultas.duracao, view=view)
+        if view in VIEWS_RELATORIO and request.method == 'POST':
+            resultado = resultado_relatorio(response) if response is not None else 'erro'
+            _registro.incrementar('report_generation_total', view=view, resultado=resultado)
+
+
+def metrics_view(request):
+    """
+    GET /metrics no formato texto do Prometheus.
+
+    Com METRICS_TOKEN configurado, exige Authorization: Bearer <token>.
+    """
+    token = getattr(settings, 'METRICS_TOKEN', None)
+    if token and request.headers.get('Authorization') != f'Bearer {token}':
+        return HttpResponse('Não autorizado\n', status=401, content_type='text/plain; charset=utf-8')
+    return HttpResponse(exportar(), content_type=CONTENT_TYPE)
+
+
+class MetricasPrometheus:
+    """Backend de REPORT_METRICS_BACKEND: etapas da geração em /metrics"""
+
+    def registrar_etapa(self, relatorio, etapa):
+        _registro.observar('report_stage_duration_seconds', etapa.duracao, relatorio=relatorio, etapa=etapa.nome)
+        _registro.observar('report_stage_cpu_seconds', etapa.cpu, relatorio=relatorio, etapa=etapa.nome)
+        if etapa.linhas is not None:
+            _registro.incrementar('report_stage_rows_total', etapa.linhas, relatorio=relatorio, etapa=etapa.nome)
+        # Workers do pool de relatórios não passam pelo middleware
+        gravar_periodicamente()
@@ -0,0 +1,36 @@
+"""
+Middlewares do projeto (o MetricsMiddleware fica em metricas.py)
+"""
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+
+
+class AsgiUrlconfMiddleware:
+    """
+    Requisições que chegam pelo asgi.py são resolvidas por ASGI_URLCONF,
+    onde login, perfil, geração e download de relatório são assíncronos.
+    Pelo wsgi.py (e no APIClient dos testes) nada muda.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.assincrono = iscoroutinefunction(get_response)
+        if self.assincrono:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.assincrono:
+            return self.__acall__(request)
+        self._definir_urlconf(request)
+        return self.get_response(request)
+
+    async def __acall__(self, request):
+        self._definir_urlconf(request)
+        return await self.get_response(request)
+
+    def _definir_urlconf(self, request):
+        if settings.ASGI_URLCONF and isinstance(request, ASGIRequest):
+            request.urlconf = settings.ASGI_URLCONF
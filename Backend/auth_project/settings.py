@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -46,6 +47,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'auth_project.metricas.MetricsMiddleware',
+    'auth_project.middleware.AsgiUrlconfMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
@@ -58,6 +61,10 @@ MIDDLEWARE = [
 
 ROOT_URLCONF = 'auth_project.urls'
 
+# URLs das requisições que chegam pelo asgi.py: login, perfil, geração e
+# download de relatório em versões assíncronas (None = mesmas do WSGI)
+ASGI_URLCONF = 'auth_project.urls_asgi'
+
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
@@ -127,6 +134,77 @@ STATIC_URL = 'static/'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Uploads até este tamanho ficam em memória e são lidos direto pelo parser
+# de relatórios; acima disso o Django faz spool em FILE_UPLOAD_TEMP_DIR
+# (diretório temporário do sistema por padrão), nunca em MEDIA_ROOT/temp
+FILE_UPLOAD_MAX_MEMORY_SIZE = 10 * 1024 * 1024
+
+# Relatórios
+# Geração síncrona (/api/report/): máximo de gerações simultâneas por processo
+# nas views que ainda geram na própria thread (previsão JSON, incremental)
+REPORT_SYNC_MAX_CONCURRENT = 2
+REPORT_SYNC_MAX_PER_USER = 2      # gerações simultâneas por usuário (acima: 429)
+REPORT_SYNC_TIMEOUT = 120         # segundos; acima disso a geração é cancelada
+
+# Pool local de processos usado pela geração, jobs e lotes (sem broker externo).
+# O pool é POR PROCESSO WEB: com `gunicorn -w N` são N pools. Por padrão as
+# CPUs (ou REPORT_POOL_TOTAL_WORKERS) são divididas entre os WEB_CONCURRENCY
+# processos web (o gunicorn também lê WEB_CONCURRENCY como padrão do -w);
+# REPORT_POOL_WORKERS no ambiente fixa o número por processo web
+_PROCESSOS_WEB = max(1, int(os.environ.get('WEB_CONCURRENCY') or 1))
+_WORKERS_NA_MAQUINA = int(os.environ.get('REPORT_POOL_TOTAL_WORKERS') or os.cpu_count() or 1)
+REPORT_POOL_WORKERS = int(os.environ.get('REPORT_POOL_WORKERS') or max(1, _WORKERS_NA_MAQUINA // _PROCESSOS_WEB))
+REPORT_POOL_MAX_QUEUE = REPORT_POOL_WORKERS * 2   # tarefas síncronas esperando além das em execução (acima: 503)
+# Tarefas de jobs e lotes no pool ao mesmo tempo (o resto espera numa fila
+# local e não tira vaga da geração síncrona)
+REPORT_POOL_BACKGROUND_MAX = max(1, REPORT_POOL_WORKERS - 1)
+REPORT_POOL_MAX_TASKS_PER_CHILD = 50              # recicla o processo após N tarefas (0 desliga)
+REPORT_POOL_PREFORK = True        # sobe os processos junto com o wsgi/asgi
+REPORT_POOL_EAGER = False         # True executa as tarefas inline (útil em testes)
+
+# Geração assíncrona (/api/report/jobs/)
+REPORT_JOBS_MAX_PER_USER = 2      # jobs pendentes/processando por usuário
+REPORT_JOBS_MAX_ACTIVE = 20       # jobs pendentes/processando no sistema inteiro
+REPORT_JOB_RETENTION = 7 * 24 * 60 * 60  # segundos; jobs terminados há mais tempo saem com clean_report_jobs
+
+# Lotes (/api/report/batch/)
+REPORT_BATCH_MAX_FILES = 200      # planilhas por lote
+REPORT_BATCH_MAX_PARALLEL = 4     # arquivos de um mesmo lote processados ao mesmo tempo
+REPORT_BATCH_FILE_TIMEOUT = 120   # segundos por arquivo
+
+# Cache de relatórios por conteúdo do upload (MEDIA_ROOT/report_cache)
+REPORT_CACHE_ENABLED = True
+REPORT_CACHE_MAX_BYTES = 500 * 1024 * 1024  # acima disso remove por LRU
+REPORT_CACHE_ACCESS_FLUSH_INTERVAL = 30     # segundos entre gravações de hits/last_access
+
+# Segundos sugeridos no header Retry-After quando o servidor está saturado
+REPORT_RETRY_AFTER = 5
+
+# Limpeza de MEDIA_ROOT/temp (reports/services/temporarios.py e o comando
+# clean_report_temp). Relatórios enviados já são apagados ao fim do envio;
+# isto cobre o que sobrar (processo morto, cliente que desconectou)
+REPORT_TEMP_MAX_AGE = 60 * 60                 # segundos; remove o que for mais velho
+REPORT_TEMP_MAX_BYTES = 2 * 1024 ** 3         # acima disso remove os mais antigos
+REPORT_TEMP_MIN_AGE = 10 * 60                 # nunca remove nada mais novo (em uso)
+REPORT_TEMP_REAP_INTERVAL = 5 * 60            # limpeza disparada pelas views (0 desliga)
+
+# Métricas por etapa da geração (read, normalize, fit, ...), ver
+# reports/services/instrumentacao.py. Para StatsD:
+#   REPORT_METRICS_BACKEND = 'reports.services.instrumentacao.MetricasStatsD'
+#   REPORT_METRICS_OPTIONS = {'host': 'localhost', 'port': 8125, 'prefixo': 'pi2'}
+# O padrão expõe as etapas em /metrics (auth_project/metricas.py)
+REPORT_METRICS_BACKEND = 'auth_project.metricas.MetricasPrometheus'
+REPORT_METRICS_OPTIONS = {}
+
+# /metrics (formato Prometheus). Com vários processos (gunicorn -w N), aponte
+# METRICS_DIR para um diretório compartilhado, vazio a cada deploy; sem ele
+# cada processo mostra só as próprias métricas
+METRICS_DIR = os.environ.get('METRICS_DIR') or None
+# Segundos entre as gravações de cada processo em METRICS_DIR (só quando algo mudou)
+METRICS_FLUSH_INTERVAL = 5
+# Se definido, /metrics exige Authorization: Bearer <token>
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN') or None
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
@@ -136,11 +214,42 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 AUTH_USER_MODEL = 'accounts.CustomUser'
 
 # Custom Authentication Backend
+# Só o EmailBackend (herda as permissões do ModelBackend): com o ModelBackend
+# na lista, todo login recusado repetia a consulta e o hash da senha
 AUTHENTICATION_BACKENDS = [
     'accounts.backends.EmailBackend',
-    'django.contrib.auth.backends.ModelBackend',
 ]
 
+# Hash de senhas (accounts/hashers.py): PASSWORD_HASHER escolhe o algoritmo
+# dos hashes novos (login, registro, troca de senha). Os outros continuam na
+# lista só para verificar hashes antigos, que o check_password do Django
+# regrava no algoritmo e custo atuais no próximo login bem-sucedido.
+# argon2 requer `pip install argon2-cffi`; scrypt vem do hashlib
+_HASHERS_DE_SENHA = {
+    'pbkdf2': 'accounts.hashers.PBKDF2PasswordHasher',
+    'scrypt': 'accounts.hashers.ScryptPasswordHasher',
+    'argon2': 'accounts.hashers.Argon2PasswordHasher',
+}
+PASSWORD_HASHER = os.environ.get('PASSWORD_HASHER', 'pbkdf2')
+if PASSWORD_HASHER not in _HASHERS_DE_SENHA:
+    from django.core.exceptions import ImproperlyConfigured
+    raise ImproperlyConfigured(
+        f"PASSWORD_HASHER inválido: {PASSWORD_HASHER!r}. Use: {', '.join(_HASHERS_DE_SENHA)}"
+    )
+PASSWORD_HASHERS = [
+    _HASHERS_DE_SENHA[PASSWORD_HASHER],
+    *(caminho for nome, caminho in _HASHERS_DE_SENHA.items() if nome != PASSWORD_HASHER),
+    # Formatos que o Django também aceita por padrão
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+]
+# Custo por algoritmo; o que faltar fica no padrão do Django (pbkdf2:
+# iterations=1_000_000; scrypt: work_factor=2**14, block_size=8,
+# parallelism=5; argon2: time_cost=2, memory_cost=102400 KiB, parallelism=8).
+# Mudar um custo também regrava os hashes no próximo login. Para escolher,
+# compare a latência com `python -m benchmarks.login --hashers pbkdf2,scrypt,argon2`
+PASSWORD_HASHER_COSTS = {}
+
 CORS_ALLOWED_ORIGINS = [
     "http://localhost:5173",
     "http://127.0.0.1:5173",
@@ -156,13 +265,37 @@ CORS_ALLOW_CREDENTIALS = True
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'accounts.authentication.CachedJWTAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
 }
 
+# Cache dos usuários resolvidos a partir do JWT (accounts/authentication.py)
+JWT_USER_CACHE = {
+    # Segundos de validade de cada entrada. Sem um VERSION_BACKEND
+    # compartilhado, é também o atraso máximo (em segundos) para outro
+    # processo perceber uma edição ou desativação feita neste
+    'TTL': 60,
+    # Entradas do LRU local de cada processo
+    'MAX_ENTRIES': 10000,
+    # Alias de CACHES compartilhado entre processos (Redis, Memcached...);
+    # None = só o LRU local
+    'BACKEND': None,
+    # Alias de CACHES onde fica a versão de cada usuário, trocada a cada
+    # invalidação e conferida a cada requisição: com CACHES['default']
+    # compartilhado, uma desativação vale em todos os processos na hora. Com o
+    # LocMemCache padrão (por processo) vale só o TTL; None desliga
+    'VERSION_BACKEND': 'default',
+}
+
+# Refresh tokens bloqueados lembrados por processo (accounts/tokens.py);
+# tokens expirados saem das tabelas com `manage.py compact_token_blacklist`
+TOKEN_BLACKLIST_CACHE_SIZE = 10000
+# Segundos entre as contagens das tabelas da blacklist para o /metrics (token_blacklist_rows)
+TOKEN_BLACKLIST_ROWS_TTL = 60
+
 # JWT Settings
 from datetime import timedelta
 
@@ -171,6 +304,7 @@ SIMPLE_JWT = {
     'REFRESH_TOKEN_LIFETIME': timedelta(days=7),
     'ROTATE_REFRESH_TOKENS': True,
     'BLACKLIST_AFTER_ROTATION': True,
+    'TOKEN_REFRESH_SERIALIZER': 'accounts.serializers.CustomTokenRefreshSerializer',
     'UPDATE_LAST_LOGIN': True,
     'ALGORITHM': 'HS256',
     'SIGNING_KEY': SECRET_KEY,
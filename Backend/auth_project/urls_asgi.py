@@ -0,0 +1,21 @@
+"""
+URLs do asgi.py (ASGI_URLCONF)
+
+As views assíncronas vêm antes e substituem as síncronas de mesmo caminho e
+mesmo nome; o resto é o auth_project.urls sem mudança.
+"""
+from django.urls import path
+from accounts import async_views as accounts_async
+from reports import async_views as reports_async
+from .urls import urlpatterns as urlpatterns_sincronas
+
+urlpatterns = [
+    path('api/auth/login/', accounts_async.login_user, name='login'),
+    path('api/profile/', accounts_async.get_user_profile, name='user_profile'),
+    path('api/report/', reports_async.GenerateReportView.as_view(), name='generate_report'),
+    path(
+        'api/report/jobs/<uuid:job_id>/download/',
+        reports_async.ReportJobDownloadView.as_view(),
+        name='report_job_download'
+    ),
+] + urlpatterns_sincronas
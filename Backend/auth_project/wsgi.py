@@ -14,3 +14,10 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'auth_project.settings')
 
 application = get_wsgi_application()
+
+# Processos de geração de relatório prontos antes da primeira requisição
+from django.conf import settings  # noqa: E402
+
+if settings.REPORT_POOL_PREFORK:
+    from reports.services import pool  # noqa: E402
+    pool.aquecer()
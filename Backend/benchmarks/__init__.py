@@ -0,0 +1,6 @@
+"""
+Benchmarks do pipeline de relatórios
+
+Executar a partir da pasta Backend, por exemplo:
+    python -m benchmarks.bench_ingestao --linhas 100000
+"""
@@ -0,0 +1,72 @@
+"""
+Benchmark da leitura das planilhas: fluxo original (lê tudo, lower nas
+colunas, to_numeric em cada uma) x ingestao.ler_planilha (usecols + dtype,
+pyarrow no CSV, openpyxl read-only no .xlsx).
+
+    python -m benchmarks.bench_ingestao --linhas 100000
+"""
+import argparse
+import os
+import tempfile
+
+import pandas as pd
+
+from benchmarks.comum import formatar_bytes, imprimir_tabela, medir_isolado
+from benchmarks.dados import gerar_planilha
+from reports.services.ingestao import MAPA_COLUNAS, ler_planilha, pyarrow_disponivel
+
+
+def leitura_original(caminho):
+    if caminho.endswith('.csv'):
+        df = pd.read_csv(caminho, header=2)
+    else:
+        df = pd.read_excel(caminho, header=2)
+    df.columns = [str(c).strip().lower() for c in df.columns]
+    df = df.rename(columns=MAPA_COLUNAS)
+    for col in MAPA_COLUNAS.values():
+        df[col] = pd.to_numeric(df[col], errors='coerce')
+    return len(df)
+
+
+def leitura_otimizada(caminho):
+    return len(ler_planilha(caminho))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--linhas', type=int, default=100_000)
+    parser.add_argument('--formatos', default='csv,xlsx')
+    parser.add_argument('--colunas-extras', type=int, default=6, help='Colunas ignoradas pelo relatório')
+    parser.add_argument('--repeticoes', type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"pyarrow disponível: {pyarrow_disponivel()}")
+
+    resultados = []
+    with tempfile.TemporaryDirectory() as pasta:
+        for formato in args.formatos.split(','):
+            caminho = gerar_planilha(
+                os.path.join(pasta, f"entrada.{formato}"), args.linhas, colunas_extras=args.colunas_extras
+            )
+            original = medir_isolado(leitura_original, caminho, repeticoes=args.repeticoes)
+            otimizada = medir_isolado(leitura_otimizada, caminho, repeticoes=args.repeticoes)
+
+            for nome, medida in (('original', original), ('otimizada', otimizada)):
+                resultados.append((
+                    formato, nome, medida['resultado'],
+                    f"{medida['tempo'] * 1000:.1f}ms", formatar_bytes(medida['memoria']),
+                ))
+            resultados.append((
+                formato, 'ganho', '',
+                f"{original['tempo'] / otimizada['tempo']:.2f}x",
+                f"{original['memoria'] / otimizada['memoria']:.2f}x",
+            ))
+
+    imprimir_tabela(
+        f"Ingestão ({args.linhas} linhas, {args.colunas_extras} colunas extras)", resultados,
+        ['formato', 'leitura', 'linhas', 'tempo', 'pico memória'],
+    )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+"""
+Micro-benchmark do ajuste de tendência: dois LinearRegression do
+scikit-learn + list comprehensions (implementação original) x o motor
+NumPy de previsao.py (um ajuste para as três séries, trava vetorizada).
+
+O scikit-learn saiu do requirements.txt: a comparação só roda com ele
+instalado à parte (pip install scikit-learn); sem ele mede só o NumPy.
+
+    python -m benchmarks.bench_previsao --linhas 48,2000,100000
+"""
+import argparse
+import importlib.util
+import timeit
+
+import numpy as np
+
+from benchmarks.comum import imprimir_tabela
+from benchmarks.dados import gerar_dataframe
+from reports.services.previsao import ajustar_tendencias, matriz_series, projetar_resultado
+
+MESES_FUTUROS = 3
+
+
+def previsao_sklearn(df):
+    import pandas as pd
+    from sklearn.linear_model import LinearRegression
+
+    X = df[['mes_sequencial']]
+    model_fat = LinearRegression().fit(X, df['faturamento'])
+    model_desp = LinearRegression().fit(X, df['despesas'])
+
+    ultimo_mes = int(df['mes_sequencial'].max())
+    futuro = pd.DataFrame({'mes_sequencial': [ultimo_mes + i for i in range(1, MESES_FUTUROS + 1)]})
+    prev_fat = [max(0, valor) for valor in model_fat.predict(futuro)]
+    prev_desp = [max(0, valor) for valor in model_desp.predict(futuro)]
+    prev_lucro = [f - d for f, d in zip(prev_fat, prev_desp)]
+    return np.array([prev_fat, prev_desp, prev_lucro])
+
+
+def previsao_numpy(df):
+    tendencia = ajustar_tendencias(df['mes_sequencial'].to_numpy(), matriz_series(df))
+    ultimo_mes = int(df['mes_sequencial'].max())
+    prev = tendencia.prever(np.arange(ultimo_mes + 1, ultimo_mes + MESES_FUTUROS + 1))
+    return np.array(projetar_resultado(prev[:, 0], prev[:, 1]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--linhas', default='48,2000,100000')
+    parser.add_argument('--repeticoes', type=int, default=200)
+    args = parser.parse_args()
+
+    com_sklearn = importlib.util.find_spec('sklearn') is not None
+    if not com_sklearn:
+        print("scikit-learn não instalado: medindo só o motor NumPy")
+
+    resultados = []
+    for linhas in (int(valor) for valor in args.linhas.split(',')):
+        df = gerar_dataframe(linhas).rename(columns={'custos_totais': 'despesas', 'total_vendas': 'qtd_vendas'})
+        df = df.astype('float64')
+
+        t_numpy = min(timeit.repeat(lambda: previsao_numpy(df), number=args.repeticoes, repeat=3)) / args.repeticoes
+        if not com_sklearn:
+            resultados.append((linhas, '-', f"{t_numpy * 1e6:.0f}µs", '-', '-'))
+            continue
+
+        diferenca = np.abs(previsao_sklearn(df) - previsao_numpy(df)).max()
+        t_sklearn = min(timeit.repeat(lambda: previsao_sklearn(df), number=args.repeticoes, repeat=3)) / args.repeticoes
+
+        resultados.append((
+            linhas, f"{t_sklearn * 1e6:.0f}µs", f"{t_numpy * 1e6:.0f}µs",
+            f"{t_sklearn / t_numpy:.1f}x", f"{diferenca:.2e}",
+        ))
+
+    imprimir_tabela(
+        'Ajuste + previsão (3 meses)', resultados,
+        ['linhas', 'sklearn', 'numpy', 'ganho', 'dif. máx.'],
+    )
+
+
+if __name__ == '__main__':
+    main()
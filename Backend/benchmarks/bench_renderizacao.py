@@ -0,0 +1,74 @@
+"""
+Benchmark dos renderizadores: tempo, pico de memória e tamanho do arquivo
+para a mesma tabela final em cada formato (xlsx formatado, xlsx-min, csv,
+parquet).
+
+O relatório normal tem 51 linhas (48 de histórico + 3 previstas); tamanhos
+maiores mostram como cada formato escala.
+
+    python -m benchmarks.bench_renderizacao --linhas 51,10000,100000
+"""
+import argparse
+import os
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.comum import formatar_bytes, imprimir_tabela, medir_isolado
+from reports.services.renderizadores import RENDERIZADORES, obter_renderizador
+
+MESES_PREVISAO = 3
+
+
+def tabela_final(linhas, seed=42):
+    """Tabela no formato de calcular_previsao (as últimas 3 linhas são previsão)"""
+    rng = np.random.default_rng(seed)
+    faturamento = 2000 + np.arange(linhas) * 5 * rng.uniform(0.85, 1.15, linhas)
+    despesas = faturamento * rng.uniform(0.6, 0.9, linhas)
+    tipo = np.where(np.arange(linhas) >= linhas - MESES_PREVISAO, 'Previsão', 'Histórico')
+    return pd.DataFrame({
+        'mes_sequencial': np.arange(1, linhas + 1, dtype='float64'),
+        'faturamento': faturamento,
+        'despesas': despesas,
+        'lucro': faturamento - despesas,
+        'tipo': tipo,
+    })
+
+
+def renderizar(nome, df, caminho):
+    obter_renderizador(nome).escrever(df, caminho)
+    return os.path.getsize(caminho)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--linhas', default='51,10000,100000')
+    parser.add_argument('--renderizadores', default=','.join(RENDERIZADORES))
+    parser.add_argument('--repeticoes', type=int, default=3)
+    args = parser.parse_args()
+
+    resultados = []
+    with tempfile.TemporaryDirectory() as pasta:
+        for linhas in (int(valor) for valor in args.linhas.split(',')):
+            df = tabela_final(linhas)
+            for nome in args.renderizadores.split(','):
+                renderizador = RENDERIZADORES[nome]
+                if not renderizador.disponivel():
+                    resultados.append((linhas, nome, '-', '-', f"requer {renderizador.requer}"))
+                    continue
+                caminho = os.path.join(pasta, f"saida_{linhas}_{nome}{renderizador.extensao}")
+                medida = medir_isolado(renderizar, nome, df, caminho, repeticoes=args.repeticoes)
+                resultados.append((
+                    linhas, nome, f"{medida['tempo'] * 1000:.1f}ms",
+                    formatar_bytes(medida['memoria']), f"{medida['resultado'] / 1024:.1f}KB",
+                ))
+
+    imprimir_tabela(
+        'Renderização da tabela final', resultados,
+        ['linhas', 'formato', 'tempo', 'pico mem.', 'arquivo'],
+    )
+
+
+if __name__ == '__main__':
+    main()
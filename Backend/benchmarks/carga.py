@@ -0,0 +1,283 @@
+"""
+Teste de carga: o mesmo projeto servido por WSGI (gunicorn) e por ASGI
+(uvicorn), com N clientes simultâneos
+
+Cada servidor roda em UM processo (gunicorn com --threads, uvicorn com o
+event loop), para a comparação mostrar o que cada modelo aguenta sozinho.
+Sob ASGI as requisições caem nas views de auth_project/urls_asgi.py.
+
+Cenários:
+
+- perfil:        GET /api/profile/ (autenticação JWT + busca do usuário)
+- relatorio:     POST /api/report/?formato=csv com uma planilha pequena
+- upload-lento:  o mesmo POST, com o corpo enviado em --partes pedaços e
+                 --atraso segundos entre eles (cliente em rede lenta)
+
+Os clientes são conexões keep-alive abertas com asyncio (sem dependências).
+Cada cliente usa um usuário próprio (carga_<n>, criado sem senha), para o
+limite por usuário (REPORT_SYNC_MAX_PER_USER) não dominar o resultado.
+
+    pip install gunicorn uvicorn
+    python -m benchmarks.carga                               # 500 clientes, todos os cenários
+    python -m benchmarks.carga --clientes 100 --cenarios perfil --duracao 10
+    python -m benchmarks.carga --url-wsgi http://127.0.0.1:8000 --url-asgi http://127.0.0.1:8001
+
+Com --url-* o servidor já está rodando (e usa o mesmo banco). 500 clientes
+precisam de ~500 descritores de arquivo dos dois lados (ulimit -n).
+"""
+import argparse
+import asyncio
+import importlib.util
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+from urllib.parse import urlsplit
+
+from benchmarks.comum import imprimir_tabela
+
+CENARIOS = ('perfil', 'relatorio', 'upload-lento')
+SERVIDORES = ('wsgi', 'asgi')
+
+PORTAS = {'wsgi': 8710, 'asgi': 8711}
+
+FRONTEIRA = 'carga-fronteira'
+
+# Sem resposta nesse tempo, a requisição conta como erro
+TIMEOUT_REQUISICAO = 60
+
+
+def comando_servidor(servidor, porta, threads):
+    """Comando que sobe o servidor, ou (None, motivo) se ele não estiver instalado"""
+    if servidor == 'wsgi':
+        if importlib.util.find_spec('gunicorn') is None:
+            return None, 'gunicorn não instalado'
+        return [
+            sys.executable, '-m', 'gunicorn', 'auth_project.wsgi:application',
+            '--workers', '1', '--threads', str(threads), '--bind', f'127.0.0.1:{porta}',
+            '--log-level', 'warning',
+        ], None
+    if importlib.util.find_spec('uvicorn') is None:
+        return None, 'uvicorn não instalado'
+    return [
+        sys.executable, '-m', 'uvicorn', 'auth_project.asgi:application',
+        '--workers', '1', '--host', '127.0.0.1', '--port', str(porta),
+        '--log-level', 'warning', '--no-access-log',
+    ], None
+
+
+def esperar_porta(host, porta, limite=60):
+    fim = time.monotonic() + limite
+    while time.monotonic() < fim:
+        try:
+            with socket.create_connection((host, porta), timeout=1):
+                return True
+        except OSError:
+            time.sleep(0.2)
+    return False
+
+
+def preparar_usuarios(quantidade):
+    """Tokens de acesso de carga_0..carga_<n-1> (criados sem senha, sem custo de hash)"""
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'auth_project.settings')
+    import django
+    django.setup()
+
+    from rest_framework_simplejwt.tokens import AccessToken
+    from accounts.models import CustomUser
+
+    tokens = []
+    for indice in range(quantidade):
+        usuario, criado = CustomUser.objects.get_or_create(
+            email=f'carga_{indice}@example.com', defaults={'username': f'carga_{indice}'}
+        )
+        if criado:
+            usuario.set_unusable_password()
+            usuario.save(update_fields=['password'])
+        tokens.append(str(AccessToken.for_user(usuario)))
+    return tokens
+
+
+def planilha_csv(linhas=24):
+    conteudo = [
+        "MES,faturamento,despesas,qtd_vendas",
+        "Obrigatório,Obrigatório,Obrigatório,Obrigatório",
+        "mes_sequencial,faturamento,custos_totais,total_vendas",
+    ]
+    for i in range(1, linhas + 1):
+        conteudo.append(f"{i},{1000 + i * 50:.2f},{700 + i * 20:.2f},{10 + i}")
+    return ("\n".join(conteudo) + "\n").encode('utf-8')
+
+
+def montar_requisicao(cenario, host, token):
+    """
+    Returns:
+        tuple: (cabeçalho HTTP em bytes, corpo em bytes)
+    """
+    if cenario == 'perfil':
+        return (
+            f"GET /api/profile/ HTTP/1.1\r\nHost: {host}\r\n"
+            f"Authorization: Bearer {token}\r\n\r\n"
+        ).encode(), b''
+
+    corpo = (
+        f'--{FRONTEIRA}\r\nContent-Disposition: form-data; name="file"; filename="dados.csv"\r\n'
+        f'Content-Type: text/csv\r\n\r\n'
+    ).encode() + planilha_csv() + f'\r\n--{FRONTEIRA}--\r\n'.encode()
+    cabecalho = (
+        f"POST /api/report/?formato=csv HTTP/1.1\r\nHost: {host}\r\n"
+        f"Authorization: Bearer {token}\r\n"
+        f"Content-Type: multipart/form-data; boundary={FRONTEIRA}\r\n"
+        f"Content-Length: {len(corpo)}\r\n\r\n"
+    ).encode()
+    return cabecalho, corpo
+
+
+async def ler_resposta(leitor):
+    """
+    Returns:
+        tuple: (status, manter a conexão aberta)
+    """
+    linha_status = await leitor.readline()
+    if not linha_status:
+        raise ConnectionError('conexão fechada pelo servidor')
+    codigo = int(linha_status.split()[1])
+
+    cabecalhos = {}
+    while (linha := await leitor.readline()) not in (b'\r\n', b'\n', b''):
+        nome, _, valor = linha.decode('latin-1').partition(':')
+        cabecalhos[nome.strip().lower()] = valor.strip()
+
+    if cabecalhos.get('transfer-encoding', '').lower() == 'chunked':
+        while True:
+            tamanho = int((await leitor.readline()).split(b';')[0], 16)
+            await leitor.readexactly(tamanho + 2)
+            if tamanho == 0:
+                break
+    elif 'content-length' in cabecalhos:
+        await leitor.readexactly(int(cabecalhos['content-length']))
+    else:
+        await leitor.read()
+        return codigo, False
+    return codigo, cabecalhos.get('connection', '').lower() != 'close'
+
+
+async def cliente(host, porta, cenario, token, fim, partes, atraso, resultados):
+    cabecalho, corpo = montar_requisicao(cenario, f'{host}:{porta}', token)
+    leitor = escritor = None
+    while time.monotonic() < fim:
+        inicio = time.perf_counter()
+        try:
+            if escritor is None:
+                leitor, escritor = await asyncio.open_connection(host, porta)
+            if cenario == 'upload-lento':
+                escritor.write(cabecalho)
+                tamanho_parte = -(-len(corpo) // partes)
+                for posicao in range(0, len(corpo), tamanho_parte):
+                    await asyncio.sleep(atraso)
+                    escritor.write(corpo[posicao:posicao + tamanho_parte])
+                    await escritor.drain()
+            else:
+                escritor.write(cabecalho + corpo)
+                await escritor.drain()
+            codigo, manter = await asyncio.wait_for(ler_resposta(leitor), TIMEOUT_REQUISICAO)
+        except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, ValueError, IndexError):
+            resultados.append((None, time.perf_counter() - inicio))
+            if escritor is not None:
+                escritor.close()
+            leitor = escritor = None
+            await asyncio.sleep(0.05)
+            continue
+        resultados.append((codigo, time.perf_counter() - inicio))
+        if not manter:
+            escritor.close()
+            leitor = escritor = None
+    if escritor is not None:
+        escritor.close()
+
+
+async def disparar(url, cenario, tokens, clientes, duracao, partes, atraso):
+    partes_url = urlsplit(url)
+    resultados = []
+    fim = time.monotonic() + duracao
+    inicio = time.perf_counter()
+    await asyncio.gather(*(
+        cliente(partes_url.hostname, partes_url.port or 80, cenario, tokens[indice % len(tokens)],
+                fim, partes, atraso, resultados)
+        for indice in range(clientes)
+    ))
+    return resultados, time.perf_counter() - inicio
+
+
+def resumir(resultados, tempo_total):
+    respondidas = [duracao for codigo, duracao in resultados if codigo is not None]
+    ok = sum(1 for codigo, _ in resultados if codigo is not None and codigo < 300)
+    ocupado = sum(1 for codigo, _ in resultados if codigo in (429, 503))
+    erros = len(resultados) - ok - ocupado
+    percentis = statistics.quantiles(respondidas, n=100) if len(respondidas) >= 2 else [0.0] * 99
+    return {
+        'req/s': f"{ok / tempo_total:.1f}",
+        'ok': ok,
+        'ocupado': ocupado,
+        'erros': erros,
+        'p50': f"{percentis[49] * 1000:.0f}ms",
+        'p99': f"{percentis[98] * 1000:.0f}ms",
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--clientes', type=int, default=500)
+    parser.add_argument('--duracao', type=float, default=20, help='Segundos de carga por cenário')
+    parser.add_argument('--cenarios', default=','.join(CENARIOS))
+    parser.add_argument('--servidores', default=','.join(SERVIDORES))
+    parser.add_argument('--threads', type=int, default=32, help='Threads do gunicorn (WSGI)')
+    parser.add_argument('--partes', type=int, default=10, help='Pedaços do corpo no upload-lento')
+    parser.add_argument('--atraso', type=float, default=0.5, help='Segundos entre os pedaços no upload-lento')
+    parser.add_argument('--url-wsgi', help='Servidor WSGI já rodando (não sobe o gunicorn)')
+    parser.add_argument('--url-asgi', help='Servidor ASGI já rodando (não sobe o uvicorn)')
+    args = parser.parse_args()
+
+    tokens = preparar_usuarios(args.clientes)
+    from django.conf import settings
+
+    linhas_tabela = []
+    for servidor in args.servidores.split(','):
+        url = getattr(args, f'url_{servidor}')
+        processo = None
+        if url is None:
+            comando, motivo = comando_servidor(servidor, PORTAS[servidor], args.threads)
+            if comando is None:
+                linhas_tabela.append((servidor, '-', '-', '-', '-', '-', '-', '-', f"pulado: {motivo}"))
+                continue
+            processo = subprocess.Popen(comando, cwd=settings.BASE_DIR)
+            url = f'http://127.0.0.1:{PORTAS[servidor]}'
+            if not esperar_porta('127.0.0.1', PORTAS[servidor]):
+                processo.terminate()
+                linhas_tabela.append((servidor, '-', '-', '-', '-', '-', '-', '-', 'pulado: servidor não subiu'))
+                continue
+
+        try:
+            for cenario in args.cenarios.split(','):
+                print(f"{servidor}: {cenario} com {args.clientes} clientes por {args.duracao:.0f}s...", file=sys.stderr)
+                resultados, tempo_total = asyncio.run(disparar(
+                    url, cenario, tokens, args.clientes, args.duracao, args.partes, args.atraso
+                ))
+                resumo = resumir(resultados, tempo_total)
+                linhas_tabela.append((servidor, cenario, *resumo.values(), ''))
+        finally:
+            if processo is not None:
+                processo.terminate()
+                processo.wait(timeout=30)
+
+    imprimir_tabela(
+        f"Carga: {args.clientes} clientes simultâneos, um processo por servidor", linhas_tabela,
+        ['servidor', 'cenário', 'req/s', 'ok', 'ocupado', 'erros', 'p50', 'p99', 'obs.'],
+    )
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,68 @@
+"""
+Utilitários de medição: cada caso roda num processo novo para que imports,
+caches e o pico de memória de um não contaminem o outro.
+"""
+import multiprocessing
+import sys
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+
+
+def _pico_arrow():
+    """Pico do pool de memória do Arrow (alocações que o tracemalloc não vê)"""
+    if 'pyarrow' not in sys.modules:
+        return 0
+    return sys.modules['pyarrow'].default_memory_pool().max_memory() or 0
+
+
+def _medir_no_filho(funcao, args, repeticoes, preparar):
+    if preparar is not None:
+        # Preparação (imports, leitura da entrada etc.) fica fora da medição
+        args = (preparar(*args),)
+
+    # O pool do Arrow só informa o pico histórico: desconta o da preparação
+    arrow_antes = _pico_arrow()
+    tracemalloc.start()
+    resultado = funcao(*args)
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    memoria = pico + max(0, _pico_arrow() - arrow_antes)
+
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        funcao(*args)
+        tempos.append(time.perf_counter() - inicio)
+
+    return {'tempo': min(tempos), 'memoria': memoria, 'resultado': resultado}
+
+
+def medir_isolado(funcao, *args, repeticoes=3, preparar=None):
+    """
+    Mede a função num processo novo.
+
+    O pico de memória vem de uma primeira execução sob tracemalloc (somado ao
+    pico do pool do Arrow); os tempos, de N execuções seguintes sem tracemalloc.
+    Com preparar, o filho chama preparar(*args) antes de medir e mede
+    funcao(estado) com o retorno.
+
+    Returns:
+        dict: tempo (melhor de N, em s), memoria (pico em bytes) e resultado
+        (retorno da função)
+    """
+    contexto = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=1, mp_context=contexto) as executor:
+        return executor.submit(_medir_no_filho, funcao, args, repeticoes, preparar).result()
+
+
+def formatar_bytes(valor):
+    return f"{valor / (1024 * 1024):.1f}MB"
+
+
+def imprimir_tabela(titulo, linhas, colunas):
+    print(f"\n{titulo}")
+    larguras = [max(len(str(c)), *(len(str(l[i])) for l in linhas)) for i, c in enumerate(colunas)]
+    print('  '.join(str(c).ljust(w) for c, w in zip(colunas, larguras)))
+    for linha in linhas:
+        print('  '.join(str(v).ljust(w) for v, w in zip(linha, larguras)))
@@ -0,0 +1,157 @@
+"""
+Geração vetorizada e reprodutível (seed) de planilhas no formato de entrada
+
+Mesmo modelo de IA/testes/gerar_dataset.py (tendência + ruído de ±15%),
+mas com NumPy em vez de um loop linha a linha. Arquivos grandes são gerados
+e gravados em blocos, então 10M de linhas não exigem a tabela inteira em
+memória.
+"""
+import os
+
+import numpy as np
+import pandas as pd
+
+CABECALHO_SUJO = [
+    ["MES", "faturamento", "despesas", "qtd_vendas"],
+    ["Obrigatório", "Obrigatório", "Obrigatório", "Obrigatório"],
+    ["mes_sequencial", "faturamento", "custos_totais", "total_vendas"],
+]
+
+FORMATOS = ('.csv', '.xlsx', '.xls')
+
+# Linhas de dados que cabem em cada formato (limite da planilha menos as 3
+# linhas de cabeçalho)
+LIMITE_LINHAS = {
+    '.xlsx': 1_048_576 - len(CABECALHO_SUJO),
+    '.xls': 65_536 - len(CABECALHO_SUJO),
+}
+
+TAMANHO_BLOCO = 1_000_000
+
+_SUFIXOS = {'k': 1_000, 'm': 1_000_000}
+
+
+def interpretar_tamanho(texto):
+    """'1k' -> 1000, '10m' -> 10000000, '2000' -> 2000"""
+    texto = texto.strip().lower()
+    if texto[-1:] in _SUFIXOS:
+        return int(float(texto[:-1]) * _SUFIXOS[texto[-1]])
+    return int(texto)
+
+
+def formatar_tamanho(linhas):
+    for sufixo, fator in sorted(_SUFIXOS.items(), key=lambda item: -item[1]):
+        if linhas >= fator and linhas % fator == 0:
+            return f"{linhas // fator}{sufixo}"
+    return str(linhas)
+
+
+def gerar_dataframe(linhas, seed=42, colunas_extras=0, inicio=1, rng=None):
+    """
+    Args:
+        linhas: quantidade de meses (linhas de dados)
+        seed: semente do gerador aleatório (ignorada se rng for passado)
+        colunas_extras: colunas de texto adicionais que o relatório ignora
+            (simula planilhas reais com observações, categorias etc.)
+        inicio: primeiro mes_sequencial (para gerar em blocos)
+        rng: gerador já criado, para continuar a mesma sequência entre blocos
+    """
+    rng = rng or np.random.default_rng(seed)
+    mes = np.arange(inicio, inicio + linhas)
+
+    faturamento = (2000 + mes * 5) * rng.uniform(0.85, 1.15, linhas)
+    despesas = 500 + faturamento * 0.60 + rng.uniform(-100, 200, linhas)
+    qtd = (faturamento / rng.uniform(90, 110, linhas)).astype(np.int64)
+
+    df = pd.DataFrame({
+        'mes_sequencial': mes,
+        'faturamento': faturamento.round(2),
+        'custos_totais': despesas.round(2),
+        'total_vendas': qtd,
+    })
+    categorias = np.array(['Loja', 'Online', 'Atacado', 'Franquia'])
+    for i in range(colunas_extras):
+        df[f'observacao_{i + 1}'] = categorias[rng.integers(0, len(categorias), linhas)]
+    return df
+
+
+def _blocos(linhas, seed, colunas_extras):
+    rng = np.random.default_rng(seed)
+    for inicio in range(0, linhas, TAMANHO_BLOCO):
+        yield gerar_dataframe(min(TAMANHO_BLOCO, linhas - inicio), colunas_extras=colunas_extras, inicio=inicio + 1, rng=rng)
+
+
+def gerar_planilha(caminho, linhas, seed=42, colunas_extras=0):
+    """
+    Grava a planilha (.csv, .xlsx ou .xls) com as 2 linhas de cabeçalho 'sujo'.
+
+    O .xls usa o xlwt, que é opcional (só para benchmarks).
+
+    Returns:
+        str: o próprio caminho
+
+    Raises:
+        ValueError: formato desconhecido ou linhas acima do limite do formato
+        ImportError: .xls sem o xlwt instalado
+    """
+    extensao = os.path.splitext(caminho)[1].lower()
+    if extensao not in FORMATOS:
+        raise ValueError(f"Formato não suportado pelo gerador: {extensao}")
+    if linhas > LIMITE_LINHAS.get(extensao, linhas):
+        raise ValueError(f"{extensao} comporta no máximo {LIMITE_LINHAS[extensao]} linhas de dados")
+
+    extras = [''] * colunas_extras
+    colunas = CABECALHO_SUJO[2] + [f'observacao_{i + 1}' for i in range(colunas_extras)]
+
+    if extensao == '.csv':
+        with open(caminho, 'w', encoding='utf-8', newline='') as arquivo:
+            for linha in CABECALHO_SUJO[:2]:
+                arquivo.write(','.join(linha + extras) + '\n')
+            arquivo.write(','.join(colunas) + '\n')
+            for bloco in _blocos(linhas, seed, colunas_extras):
+                bloco.to_csv(arquivo, index=False, header=False)
+    elif extensao == '.xlsx':
+        import xlsxwriter
+
+        wb = xlsxwriter.Workbook(caminho, {'constant_memory': True})
+        ws = wb.add_worksheet()
+        for i, linha in enumerate(CABECALHO_SUJO[:2] + [colunas]):
+            ws.write_row(i, 0, linha)
+        i = len(CABECALHO_SUJO)
+        for bloco in _blocos(linhas, seed, colunas_extras):
+            for linha in bloco.itertuples(index=False):
+                ws.write_row(i, 0, linha)
+                i += 1
+        wb.close()
+    else:
+        import xlwt
+
+        wb = xlwt.Workbook()
+        ws = wb.add_sheet('Dados')
+        for i, linha in enumerate(CABECALHO_SUJO[:2] + [colunas]):
+            for j, valor in enumerate(linha):
+                ws.write(i, j, valor)
+        i = len(CABECALHO_SUJO)
+        for bloco in _blocos(linhas, seed, colunas_extras):
+            for linha in bloco.itertuples(index=False):
+                for j, valor in enumerate(linha):
+                    ws.write(i, j, valor.item() if hasattr(valor, 'item') else valor)
+                i += 1
+        wb.save(caminho)
+
+    return caminho
+
+
+def obter_planilha(pasta, linhas, formato, seed=42, colunas_extras=0):
+    """
+    Caminho da planilha de entrada, gerando só se ainda não existir na pasta
+    (arquivos de 1M+ linhas levam minutos para gerar).
+    """
+    os.makedirs(pasta, exist_ok=True)
+    nome = f"entrada_{formatar_tamanho(linhas)}_s{seed}_x{colunas_extras}{formato}"
+    caminho = os.path.join(pasta, nome)
+    if not os.path.exists(caminho):
+        temporario = f"{caminho}.parcial{formato}"
+        gerar_planilha(temporario, linhas, seed, colunas_extras)
+        os.replace(temporario, caminho)
+    return caminho
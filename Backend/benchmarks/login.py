@@ -0,0 +1,283 @@
+"""
+Benchmark do login: django.contrib.auth.authenticate com os backends de
+AUTHENTICATION_BACKENDS, num banco de teste, para cada hasher de senha
+(PASSWORD_HASHER em auth_project/settings.py)
+
+Para cada hasher e cenário mede logins por segundo, latência p50/p99 por
+login, consultas ao banco e hashes de senha calculados por login:
+
+- sucesso:      email e senha corretos
+- username:     username no lugar do email
+- maiusculas:   email com outra caixa
+- senha-errada: email existente, senha errada
+- desconhecido: email que não existe (deve custar o mesmo que os outros,
+                senão o tempo de resposta revela quais emails têm conta)
+- legado:       primeiro login de quem ainda tem hash PBKDF2 no custo padrão
+                do Django (verifica e regrava no hasher atual; cada usuário
+                passa por ele uma vez)
+
+Com --concorrencia N, N threads fazem logins ao mesmo tempo (os hashers
+liberam o GIL durante o hash): a vazão mostra quantos logins/s o processo
+aguenta e o p99, quanto cada login espera com a CPU disputada.
+
+    python -m benchmarks.login
+    python -m benchmarks.login --hashers pbkdf2,scrypt,argon2 --concorrencia 4
+    python -m benchmarks.login --custos '{"scrypt": {"work_factor": 32768}}'
+
+Os usuários de um hasher compartilham o mesmo hash (calculado uma vez), para
+a carga inicial não levar minutos.
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+from benchmarks.comum import imprimir_tabela
+
+SENHA = 'senha-do-benchmark-123'
+
+CENARIOS = ('sucesso', 'username', 'maiusculas', 'senha-errada', 'desconhecido', 'legado')
+
+HASHERS = {
+    'pbkdf2': 'accounts.hashers.PBKDF2PasswordHasher',
+    'scrypt': 'accounts.hashers.ScryptPasswordHasher',
+    'argon2': 'accounts.hashers.Argon2PasswordHasher',
+}
+
+
+def credenciais(cenario, indice):
+    if cenario in ('sucesso', 'legado'):
+        return f'bench_{indice}@example.com', SENHA
+    if cenario == 'username':
+        return f'bench_{indice}', SENHA
+    if cenario == 'maiusculas':
+        return f'Bench_{indice}@Example.com', SENHA
+    if cenario == 'senha-errada':
+        return f'bench_{indice}@example.com', 'senha-errada'
+    return f'ninguem_{indice}@example.com', SENHA
+
+
+def popular(quantidade):
+    from accounts.models import CustomUser
+
+    CustomUser.objects.bulk_create(
+        [CustomUser(email=f'bench_{indice}@example.com', username=f'bench_{indice}') for indice in range(quantidade)],
+        batch_size=2000,
+    )
+
+
+def gravar_senhas(legado=False):
+    """Mesmo hash para todos os usuários: no hasher atual ou, legado, no PBKDF2 padrão do Django"""
+    from django.contrib.auth import hashers
+    from accounts.models import CustomUser
+
+    if legado:
+        hasher = hashers.PBKDF2PasswordHasher()
+        senha = hasher.encode(SENHA, hasher.salt())
+    else:
+        senha = hashers.make_password(SENHA)
+    CustomUser.objects.update(password=senha)
+
+
+class ContadorDeHashes:
+    """
+    Conta hashes calculados pelos hashers configurados: cada encode ou verify
+    mais externo conta um (o verify do PBKDF2 e do scrypt chama o encode)
+    """
+    def __init__(self):
+        self.total = 0
+        self._trava = threading.Lock()
+        self._local = threading.local()
+
+    def _envolver(self, original):
+        def medido(hasher, *args, **kwargs):
+            profundidade = getattr(self._local, 'profundidade', 0)
+            if profundidade == 0:
+                with self._trava:
+                    self.total += 1
+            self._local.profundidade = profundidade + 1
+            try:
+                return original(hasher, *args, **kwargs)
+            finally:
+                self._local.profundidade = profundidade
+        return medido
+
+    def patches(self):
+        from django.contrib.auth.hashers import get_hashers
+
+        return [
+            mock.patch.object(type(hasher), metodo, self._envolver(getattr(type(hasher), metodo)))
+            for hasher in get_hashers()
+            for metodo in ('encode', 'verify')
+        ]
+
+
+def _fazer_logins(cenario, indices, esperado_sucesso, fim):
+    """
+    Roda numa thread, com a própria conexão ao banco
+
+    Returns:
+        tuple: (latências em s, consultas, todas com o resultado esperado)
+    """
+    from django.contrib.auth import authenticate
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+
+    latencias = []
+    corretos = True
+    try:
+        with CaptureQueriesContext(connection) as consultas:
+            for indice in indices:
+                if time.perf_counter() >= fim:
+                    break
+                usuario, senha = credenciais(cenario, indice)
+                inicio = time.perf_counter()
+                resultado = authenticate(request=None, username=usuario, password=senha)
+                latencias.append(time.perf_counter() - inicio)
+                corretos &= (resultado is not None) == esperado_sucesso
+        return latencias, len(consultas), corretos
+    finally:
+        if threading.current_thread() is not threading.main_thread():
+            connection.close()
+
+
+def _indices(cenario, usuarios, thread, concorrencia):
+    """Usuários de cada thread: no legado, cada um uma vez; nos outros, em ciclo"""
+    if cenario == 'legado':
+        return range(thread, usuarios, concorrencia)
+
+    def ciclo():
+        indice = thread
+        while True:
+            yield indice % usuarios
+            indice += concorrencia
+    return ciclo()
+
+
+def medir_cenario(cenario, usuarios, segundos, concorrencia):
+    """
+    Returns:
+        dict: logins/s, p50 e p99 por login, consultas e hashes por login e
+        se o resultado foi o esperado em todas as tentativas
+    """
+    esperado_sucesso = cenario not in ('senha-errada', 'desconhecido')
+    contador = ContadorDeHashes()
+    patches = contador.patches()
+    for patch in patches:
+        patch.start()
+    try:
+        inicio = time.perf_counter()
+        fim = inicio + segundos
+        if concorrencia == 1:
+            partes = [_fazer_logins(cenario, _indices(cenario, usuarios, 0, 1), esperado_sucesso, fim)]
+        else:
+            with ThreadPoolExecutor(max_workers=concorrencia) as executor:
+                partes = list(executor.map(
+                    lambda thread: _fazer_logins(
+                        cenario, _indices(cenario, usuarios, thread, concorrencia), esperado_sucesso, fim
+                    ),
+                    range(concorrencia),
+                ))
+        decorrido = time.perf_counter() - inicio
+    finally:
+        for patch in patches:
+            patch.stop()
+
+    latencias = [latencia for parte in partes for latencia in parte[0]]
+    logins = len(latencias)
+    if logins == 0:
+        return {'logins/s': '-', 'p50': '-', 'p99': '-', 'consultas/login': '-', 'hashes/login': '-', 'resultado': 'sem logins'}
+    percentis = statistics.quantiles(latencias, n=100) if logins >= 2 else latencias * 99
+    return {
+        'logins/s': f"{logins / decorrido:.2f}",
+        'p50': f"{percentis[49] * 1000:.0f}ms",
+        'p99': f"{percentis[98] * 1000:.0f}ms",
+        'consultas/login': f"{sum(parte[1] for parte in partes) / logins:.1f}",
+        'hashes/login': f"{contador.total / logins:.1f}",
+        'resultado': 'ok' if all(parte[2] for parte in partes) else 'INESPERADO',
+    }
+
+
+def ordem_de_hashers(preferido):
+    """PASSWORD_HASHERS com o preferido na frente, como em auth_project/settings.py"""
+    from django.conf import settings
+
+    caminho = HASHERS[preferido]
+    return [caminho, *(outro for outro in settings.PASSWORD_HASHERS if outro != caminho)]
+
+
+def medir_hasher(preferido, cenarios, usuarios, segundos, concorrencia):
+    """
+    Returns:
+        list: linhas da tabela (uma por cenário, ou uma só se o hasher não
+        estiver disponível)
+    """
+    from django.contrib.auth.hashers import get_hasher
+    from django.test.utils import override_settings
+
+    with override_settings(PASSWORD_HASHERS=ordem_de_hashers(preferido)):
+        hasher = get_hasher()
+        if hasher.library is not None:
+            try:
+                hasher._load_library()
+            except ValueError:
+                return [(preferido, '-', '-', '-', '-', '-', '-', f"pulado: {hasher.library} não instalado")]
+
+        linhas_tabela = []
+        for cenario in cenarios:
+            print(f"{preferido}: medindo {cenario}...", file=sys.stderr)
+            gravar_senhas(legado=cenario == 'legado')
+            linhas_tabela.append((preferido, cenario, *medir_cenario(cenario, usuarios, segundos, concorrencia).values()))
+        return linhas_tabela
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--usuarios', type=int, default=1000)
+    parser.add_argument('--segundos', type=float, default=3, help='Duração de cada cenário')
+    parser.add_argument('--cenarios', default=','.join(CENARIOS))
+    parser.add_argument('--hashers', help='Hashers a comparar (pbkdf2,scrypt,argon2); padrão: o PASSWORD_HASHER atual')
+    parser.add_argument('--custos', type=json.loads, help='PASSWORD_HASHER_COSTS em JSON (padrão: o das settings)')
+    parser.add_argument('--concorrencia', type=int, default=1, help='Threads fazendo login ao mesmo tempo')
+    args = parser.parse_args()
+
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'auth_project.settings')
+    import django
+    django.setup()
+
+    from django.conf import settings
+    from django.db import connection
+    from django.test.utils import override_settings, setup_test_environment
+
+    hashers = (args.hashers or settings.PASSWORD_HASHER).split(',')
+    custos = settings.PASSWORD_HASHER_COSTS if args.custos is None else args.custos
+
+    setup_test_environment()
+    nome_original = connection.settings_dict['NAME']
+    connection.creation.create_test_db(verbosity=0)
+    try:
+        popular(args.usuarios)
+        linhas_tabela = []
+        with override_settings(PASSWORD_HASHER_COSTS=custos):
+            for preferido in hashers:
+                linhas_tabela.extend(medir_hasher(
+                    preferido, args.cenarios.split(','), args.usuarios, args.segundos, args.concorrencia
+                ))
+    finally:
+        connection.creation.destroy_test_db(nome_original, verbosity=0)
+
+    imprimir_tabela(
+        f"Login ({args.usuarios} usuários, {args.concorrencia} thread(s), custos: {json.dumps(custos) if custos else 'padrão'})",
+        linhas_tabela,
+        ['hasher', 'cenário', 'logins/s', 'p50', 'p99', 'consultas/login', 'hashes/login', 'resultado'],
+    )
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
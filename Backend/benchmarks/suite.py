@@ -0,0 +1,258 @@
+"""
+Suíte de benchmarks do pipeline do relatório, com baseline de regressão
+
+Mede tempo e pico de memória de cada etapa separadamente, cada caso num
+processo novo (ver comum.medir_isolado):
+
+- ingestao:     carregar_dados (leitura + limpeza) do arquivo em disco
+- ajuste:       calcular_previsao sobre os dados já carregados
+- renderizacao: gravação da tabela final pelo renderizador escolhido
+- http:         POST /api/report/ completo pelo APIClient do DRF (URLs,
+                middlewares, GenerateReportView, FileResponse), sem cache
+
+As entradas vêm de benchmarks/dados.py (seed fixa) e ficam guardadas em
+--pasta-dados entre execuções. Os resultados são comparados com
+benchmarks/baseline.json; casos acima da tolerância são marcados como
+REGRESSÃO e o processo sai com código 1.
+
+    python -m benchmarks.suite                           # compara com a baseline
+    python -m benchmarks.suite --tamanhos 1k,100k,1m,10m --formatos csv,xlsx,xls
+    python -m benchmarks.suite --salvar-baseline         # grava a baseline atual
+
+Baselines só são comparáveis na mesma máquina; regrave ao trocar de ambiente.
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+
+from benchmarks.comum import formatar_bytes, imprimir_tabela, medir_isolado
+from benchmarks.dados import LIMITE_LINHAS, formatar_tamanho, interpretar_tamanho, obter_planilha
+
+ETAPAS = ('ingestao', 'ajuste', 'renderizacao', 'http')
+
+CAMINHO_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+
+# Variação tolerada antes de acusar regressão (tempo é mais ruidoso)
+TOLERANCIA_TEMPO = 0.25
+TOLERANCIA_MEMORIA = 0.10
+
+# Abaixo disto diferenças são ruído de medição
+TEMPO_MINIMO = 0.02
+MEMORIA_MINIMA = 256 * 1024
+
+
+# Funções medidas (nível de módulo para poderem ir ao processo filho)
+
+def _ingestao(caminho):
+    from reports.services.report_generator import carregar_dados
+    return len(carregar_dados(caminho))
+
+
+def _preparar_ajuste(caminho):
+    from reports.services.report_generator import carregar_dados
+    return carregar_dados(caminho)
+
+
+def _ajuste(df_limpo):
+    from reports.services.report_generator import calcular_previsao
+    return len(calcular_previsao(df_limpo))
+
+
+def _preparar_renderizacao(caminho, renderizador):
+    from reports.services.renderizadores import obter_renderizador
+    from reports.services.report_generator import calcular_previsao, carregar_dados
+
+    saida = obter_renderizador(renderizador)
+    destino = os.path.join(tempfile.mkdtemp(), f"relatorio{saida.extensao}")
+    return saida, calcular_previsao(carregar_dados(caminho)), destino
+
+
+def _renderizacao(estado):
+    saida, df_final, destino = estado
+    saida.escrever(df_final, destino)
+    return os.path.getsize(destino)
+
+
+def _preparar_http(caminho, renderizador):
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'auth_project.settings')
+    import django
+    django.setup()
+
+    from django.test.utils import override_settings, setup_test_environment
+    from rest_framework.test import APIClient
+    from accounts.models import CustomUser
+
+    setup_test_environment()
+    # Sem cache (toda requisição gera o relatório) e sem tocar no banco:
+    # o usuário é autenticado à força e nunca é salvo
+    override_settings(
+        MEDIA_ROOT=tempfile.mkdtemp(),
+        REPORT_CACHE_ENABLED=False,
+        ALLOWED_HOSTS=['testserver'],
+    ).enable()
+
+    cliente = APIClient()
+    cliente.force_authenticate(user=CustomUser(id=1, email='bench@example.com', username='bench'))
+    with open(caminho, 'rb') as arquivo:
+        conteudo = arquivo.read()
+    return cliente, conteudo, os.path.basename(caminho), renderizador
+
+
+def _http(estado):
+    from django.core.files.uploadedfile import SimpleUploadedFile
+
+    cliente, conteudo, nome, renderizador = estado
+    response = cliente.post(
+        f'/api/report/?formato={renderizador}',
+        {'file': SimpleUploadedFile(nome, conteudo)},
+    )
+    if response.status_code != 200:
+        raise RuntimeError(f"HTTP {response.status_code}: {getattr(response, 'data', '')}")
+    tamanho = sum(len(parte) for parte in response.streaming_content)
+    response.close()
+    return tamanho
+
+
+def medir_etapa(etapa, caminho, renderizador, repeticoes):
+    if etapa == 'ingestao':
+        return medir_isolado(_ingestao, caminho, repeticoes=repeticoes)
+    if etapa == 'ajuste':
+        return medir_isolado(_ajuste, caminho, repeticoes=repeticoes, preparar=_preparar_ajuste)
+    if etapa == 'renderizacao':
+        return medir_isolado(_renderizacao, caminho, renderizador, repeticoes=repeticoes, preparar=_preparar_renderizacao)
+    return medir_isolado(_http, caminho, renderizador, repeticoes=repeticoes, preparar=_preparar_http)
+
+
+def motivo_para_pular(linhas, formato):
+    """Casos impossíveis (limite do formato, dependência ausente, upload grande demais)"""
+    limite = LIMITE_LINHAS.get(formato)
+    if limite is not None and linhas > limite:
+        return f"{formato} comporta no máximo {limite} linhas"
+    if formato == '.xls':
+        import importlib.util
+        if importlib.util.find_spec('xlwt') is None:
+            return "gerar .xls requer xlwt"
+    return None
+
+
+# Baseline
+
+def carregar_baseline(caminho):
+    if not os.path.exists(caminho):
+        return {}
+    with open(caminho, encoding='utf-8') as arquivo:
+        return json.load(arquivo).get('resultados', {})
+
+
+def salvar_baseline(caminho, resultados):
+    dados = {
+        'ambiente': {
+            'python': platform.python_version(),
+            'plataforma': platform.platform(),
+            'processador': platform.processor() or platform.machine(),
+            'cpus': os.cpu_count(),
+        },
+        'resultados': resultados,
+    }
+    with open(caminho, 'w', encoding='utf-8') as arquivo:
+        json.dump(dados, arquivo, indent=2, sort_keys=True, ensure_ascii=False)
+        arquivo.write('\n')
+
+
+def comparar(atual, base, tolerancia_tempo, tolerancia_memoria):
+    """
+    Returns:
+        tuple: (status, variação de tempo, variação de memória)
+    """
+    if base is None:
+        return 'novo', '', ''
+
+    var_tempo = atual['tempo'] / base['tempo'] - 1 if base['tempo'] else 0.0
+    var_memoria = atual['memoria'] / base['memoria'] - 1 if base['memoria'] else 0.0
+
+    regressao = (
+        (var_tempo > tolerancia_tempo and atual['tempo'] - base['tempo'] > TEMPO_MINIMO)
+        or (var_memoria > tolerancia_memoria and atual['memoria'] - base['memoria'] > MEMORIA_MINIMA)
+    )
+    return ('REGRESSÃO' if regressao else 'ok'), f"{var_tempo:+.0%}", f"{var_memoria:+.0%}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--tamanhos', default='1k,100k', help='Ex.: 1k,100k,1m,10m')
+    parser.add_argument('--formatos', default='csv,xlsx', help='csv, xlsx e/ou xls')
+    parser.add_argument('--etapas', default=','.join(ETAPAS))
+    parser.add_argument('--renderizador', default='xlsx')
+    parser.add_argument('--repeticoes', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--colunas-extras', type=int, default=6)
+    parser.add_argument('--pasta-dados', default=os.path.join(tempfile.gettempdir(), 'pi2_benchmarks'))
+    parser.add_argument('--baseline', default=CAMINHO_BASELINE)
+    parser.add_argument('--salvar-baseline', action='store_true', help='Grava os resultados como nova baseline')
+    parser.add_argument('--tolerancia-tempo', type=float, default=TOLERANCIA_TEMPO)
+    parser.add_argument('--tolerancia-memoria', type=float, default=TOLERANCIA_MEMORIA)
+    args = parser.parse_args()
+
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'auth_project.settings')
+    import django
+    django.setup()
+    from reports.views import tamanho_maximo
+
+    base = carregar_baseline(args.baseline)
+    resultados = {}
+    linhas_tabela = []
+    regressoes = 0
+
+    for linhas in (interpretar_tamanho(valor) for valor in args.tamanhos.split(',')):
+        for formato in (f".{valor.strip().lstrip('.')}" for valor in args.formatos.split(',')):
+            motivo = motivo_para_pular(linhas, formato)
+            caminho = None if motivo else obter_planilha(
+                args.pasta_dados, linhas, formato, args.seed, args.colunas_extras
+            )
+
+            for etapa in args.etapas.split(','):
+                chave = f"{etapa}/{formato.lstrip('.')}/{formatar_tamanho(linhas)}"
+                motivo_etapa = motivo
+                if not motivo_etapa and etapa == 'http' and os.path.getsize(caminho) > tamanho_maximo(caminho):
+                    motivo_etapa = f"arquivo acima do limite de upload ({formatar_bytes(tamanho_maximo(caminho))})"
+                if motivo_etapa:
+                    linhas_tabela.append((chave, '-', '-', '-', '-', f"pulado: {motivo_etapa}"))
+                    continue
+
+                print(f"medindo {chave}...", file=sys.stderr)
+                medida = medir_etapa(etapa, caminho, args.renderizador, args.repeticoes)
+                atual = {'tempo': medida['tempo'], 'memoria': medida['memoria']}
+                resultados[chave] = atual
+
+                situacao, var_tempo, var_memoria = comparar(
+                    atual, base.get(chave), args.tolerancia_tempo, args.tolerancia_memoria
+                )
+                regressoes += situacao == 'REGRESSÃO'
+                linhas_tabela.append((
+                    chave, f"{atual['tempo'] * 1000:.1f}ms", var_tempo,
+                    formatar_bytes(atual['memoria']), var_memoria, situacao,
+                ))
+
+    imprimir_tabela(
+        f"Pipeline do relatório (renderizador: {args.renderizador})", linhas_tabela,
+        ['caso', 'tempo', 'Δ tempo', 'pico mem.', 'Δ mem.', 'situação'],
+    )
+
+    if args.salvar_baseline:
+        base.update(resultados)
+        salvar_baseline(args.baseline, base)
+        print(f"\nBaseline gravada em {args.baseline}")
+        return 0
+
+    if regressoes:
+        print(f"\n{regressoes} regressão(ões) acima da tolerância "
+              f"(tempo {args.tolerancia_tempo:.0%}, memória {args.tolerancia_memoria:.0%})")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
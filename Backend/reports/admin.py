@@ -2,7 +2,33 @@
 Admin para o app de relatórios
 """
 from django.contrib import admin
+from .models import ReportCacheEntry, ReportDataset, ReportHistory, ReportJob
 
-# Por enquanto, não há models para registrar
-# Mas mantemos o arquivo para estrutura completa do app
 
+@admin.register(ReportJob)
+class ReportJobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'user', 'file_name', 'status', 'created_at', 'finished_at')
+    list_filter = ('status', 'created_at')
+    search_fields = ('file_name', 'user__email')
+    readonly_fields = ('created_at', 'started_at', 'finished_at')
+
+
+@admin.register(ReportCacheEntry)
+class ReportCacheEntryAdmin(admin.ModelAdmin):
+    list_display = ('key', 'size', 'hits', 'created_at', 'last_access')
+    ordering = ('-last_access',)
+    readonly_fields = ('key', 'file_path', 'size', 'hits', 'created_at', 'last_access')
+
+
+@admin.register(ReportDataset)
+class ReportDatasetAdmin(admin.ModelAdmin):
+    list_display = ('name', 'user', 'records', 'version', 'updated_at')
+    search_fields = ('name', 'user__email')
+    readonly_fields = ('state', 'records', 'version', 'created_at', 'updated_at')
+
+
+@admin.register(ReportHistory)
+class ReportHistoryAdmin(admin.ModelAdmin):
+    list_display = ('name', 'user', 'source_name', 'records', 'size', 'updated_at')
+    search_fields = ('name', 'source_name', 'user__email')
+    readonly_fields = ('source_hash', 'file_path', 'records', 'size', 'created_at', 'updated_at')
@@ -0,0 +1,146 @@
+"""
+Versões assíncronas das views de relatório, servidas pelo asgi.py (ver
+auth_project/urls_asgi.py)
+
+Nenhuma etapa segura o event loop nem uma thread por conexão:
+
+- leitura do multipart e hash do cache em threads
+- geração num processo do pool (pool.executar_async); se o cliente
+  desconectar, a tarefa é cancelada
+- envio do arquivo em blocos (temporarios.RespostaArquivoAssincrona)
+
+?dataset= (históricos guardados) continua no caminho síncrono de views.py.
+"""
+import logging
+import os
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import JsonResponse
+from accounts.async_views import AsyncAPIView
+from . import views
+from .models import ReportJob
+from .services import cache as report_cache
+from .services import instrumentacao, pool, renderizadores, temporarios
+
+logger = logging.getLogger(__name__)
+
+
+def _json(response):
+    """Response do DRF (dos helpers de views.py) como JsonResponse, com os mesmos cabeçalhos (ex.: Retry-After)"""
+    json_response = JsonResponse(response.data, status=response.status_code)
+    for cabecalho, valor in response.items():
+        if cabecalho.lower() != 'content-type':
+            json_response[cabecalho] = valor
+    return json_response
+
+
+def _erro(mensagem, status_code):
+    return JsonResponse({'error': mensagem}, status=status_code)
+
+
+def _formato_aceito(request):
+    """Renderizador pedido pelo Accept (só tipos explícitos, como o DRF com JSONRenderer primeiro)"""
+    aceito = request.headers.get('Accept', '')
+    for nome, renderizador in renderizadores.RENDERIZADORES.items():
+        if renderizador.content_type in aceito:
+            return nome
+    return renderizadores.PADRAO
+
+
+class GenerateReportView(AsyncAPIView):
+    """POST /api/report/ assíncrono: mesmos parâmetros e respostas de views.GenerateReportView"""
+
+    variante_cache = ''
+    prefixo_relatorio = 'Relatorio_IA'
+
+    async def post(self, request):
+        if request.GET.get('dataset'):
+            return await sync_to_async(views.GenerateReportView.as_view())(request)
+
+        uploaded_file, erro = await sync_to_async(views.validar_upload, thread_sensitive=False)(request)
+        if erro:
+            return _json(erro)
+        file_name = uploaded_file.name
+
+        try:
+            saida = renderizadores.obter_renderizador(request.GET.get('formato') or _formato_aceito(request))
+        except ValueError as e:
+            return _erro(str(e), 400)
+        logger.info(f"Processando arquivo: {file_name} (tamanho: {uploaded_file.size} bytes, formato: {saida.nome})")
+
+        chave_cache = None
+        if settings.REPORT_CACHE_ENABLED:
+            variante = self.variante_cache
+            if saida.nome != renderizadores.PADRAO:
+                variante = f"{variante}:{saida.nome}"
+            chave_cache = await sync_to_async(report_cache.calcular_chave, thread_sensitive=False)(uploaded_file, variante)
+            em_cache = await sync_to_async(report_cache.buscar)(chave_cache)
+            if em_cache:
+                return self._enviar_arquivo(em_cache, file_name, saida, 'HIT')
+
+        nome_base = os.path.splitext(file_name)[0]
+        output_path = temporarios.caminho_unico(f"{self.prefixo_relatorio}_{request.user.id}_{nome_base}", saida.extensao)
+
+        if not views.reservar_geracao(request.user.pk):
+            return _json(views.servidor_ocupado(
+                'Você já tem relatórios sendo gerados. Aguarde ou use /api/report/jobs/.', 429
+            ))
+        try:
+            with instrumentacao.medir(self.variante_cache or 'relatorio') as medicao:
+                output_path = await pool.executar_async(
+                    'reports.services.report_generator.gerar_relatorio',
+                    views.entrada_para_processo(uploaded_file), output_path,
+                    timeout=settings.REPORT_SYNC_TIMEOUT, nome_arquivo=file_name, renderizador=saida.nome
+                )
+            logger.info(f"Relatório gerado: {output_path}")
+        except pool.PoolSaturado:
+            return _json(views.servidor_ocupado('Servidor ocupado gerando relatórios. Tente novamente ou use /api/report/jobs/.'))
+        except pool.TempoEsgotado as e:
+            return _json(views.servidor_ocupado(f'{e} Para arquivos grandes use /api/report/jobs/.'))
+        except ValueError as e:
+            return _erro(str(e), 400)
+        except Exception as e:
+            logger.error(f"Erro ao gerar relatório: {e}", exc_info=True)
+            return _erro(f'Erro ao processar arquivo: {str(e)}', 500)
+        finally:
+            views.liberar_geracao(request.user.pk)
+            temporarios.agendar_limpeza()
+
+        if not os.path.exists(output_path):
+            return _erro('Erro ao gerar relatório. Arquivo de saída não foi criado.', 500)
+
+        if chave_cache:
+            output_path = await sync_to_async(report_cache.armazenar)(chave_cache, output_path)
+            response = self._enviar_arquivo(output_path, file_name, saida, 'MISS')
+        else:
+            response = self._enviar_arquivo(output_path, file_name, saida, temporario=True)
+        response['Server-Timing'] = medicao.server_timing()
+        return response
+
+    def _enviar_arquivo(self, arquivo, file_name, saida, cache_status=None, temporario=False):
+        response = temporarios.RespostaArquivoAssincrona(arquivo, content_type=saida.content_type, temporario=temporario)
+        download_name = views.nome_download(self.prefixo_relatorio, file_name, saida)
+        response['Content-Disposition'] = f'attachment; filename="{download_name}"'
+        if cache_status:
+            response['X-Report-Cache'] = cache_status
+        return response
+
+
+class ReportJobDownloadView(AsyncAPIView):
+    """Serve o relatório de um job concluído"""
+
+    async def get(self, request, job_id):
+        job = await ReportJob.objects.filter(id=job_id, user=request.user).afirst()
+        if job is None:
+            return JsonResponse({'detail': 'Não encontrado.'}, status=404)
+
+        if job.status != ReportJob.STATUS_DONE:
+            return JsonResponse({'error': 'O relatório ainda não está pronto.', 'status': job.status}, status=409)
+
+        if not os.path.exists(job.output_path):
+            return _erro('Arquivo do relatório não encontrado.', 410)
+
+        response = temporarios.RespostaArquivoAssincrona(job.output_path, content_type=renderizadores.TIPO_XLSX)
+        response['Content-Disposition'] = f'attachment; filename="{os.path.basename(job.output_path)}"'
+        return response
@@ -0,0 +1,29 @@
+"""
+Aplica a retenção dos jobs de relatório: apaga os concluídos ou com erro há
+mais de REPORT_JOB_RETENTION segundos, com os seus diretórios em
+MEDIA_ROOT/jobs.
+
+Rodar periodicamente (cron/systemd timer) ou como processo dedicado com --loop.
+"""
+import time
+
+from django.core.management.base import BaseCommand
+
+from reports.services import jobs
+
+
+class Command(BaseCommand):
+    help = 'Remove jobs de relatório terminados há mais de REPORT_JOB_RETENTION e os seus arquivos'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--retention', type=int, default=None, help='Segundos (padrão: REPORT_JOB_RETENTION)')
+        parser.add_argument('--loop', action='store_true', help='Continua limpando indefinidamente')
+        parser.add_argument('--interval', type=float, default=3600, help='Segundos entre limpezas no modo --loop')
+
+    def handle(self, *args, **options):
+        while True:
+            removidos, orfaos = jobs.remover_jobs_antigos(options['retention'])
+            self.stdout.write(f"{removidos} job(s) removido(s), {orfaos} diretório(s) órfão(s) removido(s)")
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,36 @@
+"""
+Limpa MEDIA_ROOT/temp: remove por idade e aplica a cota de bytes.
+
+Rodar periodicamente (cron/systemd timer) ou como processo dedicado com
+--loop; as views também disparam a mesma limpeza a cada
+REPORT_TEMP_REAP_INTERVAL segundos.
+"""
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from reports.services import temporarios
+
+
+class Command(BaseCommand):
+    help = 'Remove temporários antigos de MEDIA_ROOT/temp e aplica a cota REPORT_TEMP_MAX_BYTES'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--max-age', type=int, default=None, help='Segundos (padrão: REPORT_TEMP_MAX_AGE)')
+        parser.add_argument('--max-bytes', type=int, default=None, help='Cota em bytes (padrão: REPORT_TEMP_MAX_BYTES)')
+        parser.add_argument('--loop', action='store_true', help='Continua limpando indefinidamente')
+        parser.add_argument('--interval', type=float, default=None, help='Segundos entre limpezas no modo --loop')
+
+    def handle(self, *args, **options):
+        intervalo = options['interval'] or settings.REPORT_TEMP_REAP_INTERVAL or 300
+        while True:
+            resultado = temporarios.limpar_temporarios(options['max_age'], options['max_bytes'])
+            self.stdout.write(
+                f"{resultado.removidos} item(ns) removido(s), "
+                f"{resultado.bytes_removidos / (1024 * 1024):.1f}MB recuperados; "
+                f"restam {resultado.restantes} ({resultado.bytes_restantes / (1024 * 1024):.1f}MB)"
+            )
+            if not options['loop']:
+                break
+            time.sleep(intervalo)
@@ -0,0 +1,48 @@
+"""
+Processa jobs de relatório pendentes direto da fila no banco.
+
+Útil para recuperar jobs que ficaram para trás após um restart do servidor
+ou para rodar um worker dedicado (--loop) separado do processo web.
+"""
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from reports.models import ReportJob
+from reports.services.jobs import executar_job
+
+
+class Command(BaseCommand):
+    help = 'Processa jobs de relatório pendentes da fila (tabela report_job)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--stale-minutes', type=int, default=30,
+            help='Devolve para a fila jobs "processando" há mais de N minutos (worker morto)'
+        )
+        parser.add_argument('--loop', action='store_true', help='Continua consultando a fila indefinidamente')
+        parser.add_argument('--interval', type=float, default=2.0, help='Intervalo entre consultas no modo --loop')
+
+    def handle(self, *args, **options):
+        limite = timezone.now() - timedelta(minutes=options['stale_minutes'])
+        devolvidos = ReportJob.objects.filter(
+            status=ReportJob.STATUS_RUNNING, started_at__lt=limite
+        ).update(status=ReportJob.STATUS_PENDING, started_at=None)
+        if devolvidos:
+            self.stdout.write(f'{devolvidos} job(s) travado(s) devolvido(s) para a fila')
+
+        while True:
+            processados = 0
+            pendentes = ReportJob.objects.filter(status=ReportJob.STATUS_PENDING).order_by('created_at')
+            for job_id in pendentes.values_list('id', flat=True):
+                executar_job(str(job_id))
+                processados += 1
+
+            if processados:
+                self.stdout.write(self.style.SUCCESS(f'{processados} job(s) processado(s)'))
+
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,41 @@
+"""
+Inspeciona e limpa o cache de relatórios por conteúdo.
+"""
+from django.core.management.base import BaseCommand
+
+from reports.models import ReportCacheEntry
+from reports.services import cache as report_cache
+
+
+class Command(BaseCommand):
+    help = 'Mostra estatísticas do cache de relatórios e permite limpá-lo'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--purge', action='store_true', help='Remove todas as entradas')
+        parser.add_argument('--evict', action='store_true', help='Aplica a remoção LRU até caber no limite configurado')
+        parser.add_argument('--list', type=int, default=0, metavar='N', help='Lista as N entradas mais recentes')
+
+    def handle(self, *args, **options):
+        if options['purge']:
+            removidas = report_cache.limpar()
+            self.stdout.write(self.style.SUCCESS(f'{removidas} entrada(s) removida(s) do cache'))
+            return
+
+        if options['evict']:
+            removidas = report_cache.remover_excedente()
+            self.stdout.write(self.style.SUCCESS(f'{removidas} entrada(s) removida(s) por LRU'))
+
+        stats = report_cache.estatisticas()
+        self.stdout.write(f"Entradas:     {stats['entradas']}")
+        self.stdout.write(f"Ocupado:      {stats['bytes'] / (1024 * 1024):.1f}MB de {stats['limite_bytes'] / (1024 * 1024):.0f}MB")
+        self.stdout.write(f"Hits:         {stats['hits']}")
+        self.stdout.write(f"Misses:       {stats['misses']}")
+        self.stdout.write(f"Taxa acerto:  {stats['taxa_acerto']:.1%}")
+
+        if options['list']:
+            self.stdout.write('')
+            for entrada in ReportCacheEntry.objects.order_by('-last_access')[:options['list']]:
+                self.stdout.write(
+                    f"{entrada.key[:16]}  {entrada.size:>10} bytes  {entrada.hits:>5} hits  "
+                    f"último acesso {entrada.last_access:%d/%m/%Y %H:%M}"
+                )
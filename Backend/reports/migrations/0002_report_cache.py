@@ -0,0 +1,41 @@
+# Generated by Django 5.2.5 on 2026-10-18 02:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reports', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReportCacheCounter',
+            fields=[
+                ('name', models.CharField(max_length=50, primary_key=True, serialize=False)),
+                ('value', models.BigIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Contador do Cache',
+                'verbose_name_plural': 'Contadores do Cache',
+                'db_table': 'report_cache_counter',
+            },
+        ),
+        migrations.CreateModel(
+            name='ReportCacheEntry',
+            fields=[
+                ('key', models.CharField(max_length=64, primary_key=True, serialize=False)),
+                ('file_path', models.CharField(max_length=500)),
+                ('size', models.BigIntegerField()),
+                ('hits', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('last_access', models.DateTimeField(db_index=True)),
+            ],
+            options={
+                'verbose_name': 'Relatório em Cache',
+                'verbose_name_plural': 'Relatórios em Cache',
+                'db_table': 'report_cache_entry',
+            },
+        ),
+    ]
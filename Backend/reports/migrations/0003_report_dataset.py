@@ -0,0 +1,37 @@
+# Generated by Django 5.2.5 on 2026-10-18 03:07
+
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reports', '0002_report_cache'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReportDataset',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('name', models.CharField(max_length=255)),
+                ('state', models.JSONField()),
+                ('records', models.PositiveIntegerField(default=0)),
+                ('version', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='report_datasets', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Série de Relatório',
+                'verbose_name_plural': 'Séries de Relatório',
+                'db_table': 'report_dataset',
+                'ordering': ['-updated_at'],
+                'constraints': [models.UniqueConstraint(fields=('user', 'name'), name='report_dataset_user_name_uniq')],
+            },
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.5 on 2026-10-18 03:10
+
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reports', '0003_report_dataset'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReportHistory',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('name', models.CharField(max_length=255)),
+                ('source_name', models.CharField(max_length=255)),
+                ('source_hash', models.CharField(max_length=64)),
+                ('file_path', models.CharField(max_length=500)),
+                ('records', models.PositiveIntegerField(default=0)),
+                ('size', models.BigIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='report_histories', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Histórico Guardado',
+                'verbose_name_plural': 'Históricos Guardados',
+                'db_table': 'report_history',
+                'ordering': ['-updated_at'],
+                'constraints': [models.UniqueConstraint(fields=('user', 'name'), name='report_history_user_name_uniq')],
+            },
+        ),
+    ]
@@ -0,0 +1,16 @@
+# Generated by Django 5.2.5 on 2026-10-18 04:14
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reports', '0004_report_history'),
+    ]
+
+    operations = [
+        migrations.DeleteModel(
+            name='ReportCacheCounter',
+        ),
+    ]
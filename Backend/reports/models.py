@@ -1,8 +1,158 @@
 """
-Models para o app de relatórios (se necessário no futuro)
+Models para o app de relatórios
 """
+import uuid
+
+from django.conf import settings
 from django.db import models
 
-# Por enquanto, não precisamos de models
-# Mas mantemos o arquivo para estrutura completa do app
 
+class ReportJob(models.Model):
+    """
+    Job de geração de relatório processado fora do ciclo da requisição.
+
+    A própria tabela funciona como fila: o job nasce 'pendente', um worker
+    do pool de processos o reivindica (pendente -> processando) e grava o
+    resultado final (concluido/erro).
+    """
+    STATUS_PENDING = 'pendente'
+    STATUS_RUNNING = 'processando'
+    STATUS_DONE = 'concluido'
+    STATUS_FAILED = 'erro'
+
+    STATUS_CHOICES = [
+        (STATUS_PENDING, 'Pendente'),
+        (STATUS_RUNNING, 'Processando'),
+        (STATUS_DONE, 'Concluído'),
+        (STATUS_FAILED, 'Erro'),
+    ]
+
+    ACTIVE_STATUSES = (STATUS_PENDING, STATUS_RUNNING)
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='report_jobs'
+    )
+    file_name = models.CharField(max_length=255)
+    input_path = models.CharField(max_length=500)
+    output_path = models.CharField(max_length=500, blank=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_PENDING, db_index=True)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        db_table = 'report_job'
+        ordering = ['-created_at']
+        verbose_name = 'Job de Relatório'
+        verbose_name_plural = 'Jobs de Relatório'
+        indexes = [
+            models.Index(fields=['user', 'status'], name='report_job_user_status_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.file_name} ({self.get_status_display()})"
+
+    @property
+    def is_active(self):
+        return self.status in self.ACTIVE_STATUSES
+
+
+class ReportCacheEntry(models.Model):
+    """
+    Relatório já gerado, endereçado pelo conteúdo do upload.
+
+    A chave é o SHA-256 dos bytes enviados combinado com a assinatura do
+    gerador; last_access ordena a remoção LRU quando o cache passa do limite.
+    """
+    key = models.CharField(max_length=64, primary_key=True)
+    file_path = models.CharField(max_length=500)
+    size = models.BigIntegerField()
+    hits = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    last_access = models.DateTimeField(db_index=True)
+
+    class Meta:
+        db_table = 'report_cache_entry'
+        verbose_name = 'Relatório em Cache'
+        verbose_name_plural = 'Relatórios em Cache'
+
+    def __str__(self):
+        return f"{self.key[:12]}… ({self.size} bytes, {self.hits} hits)"
+
+
+class ReportDataset(models.Model):
+    """
+    Estado do ajuste de uma série de um usuário, para atualizações
+    incrementais (ver services/incremental.py).
+
+    `state` guarda as estatísticas suficientes das tendências, a janela com
+    os últimos registros exibidos e a impressão digital do histórico já
+    incorporado; com isso novas linhas atualizam o ajuste sem reler o
+    histórico inteiro.
+    """
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='report_datasets'
+    )
+    name = models.CharField(max_length=255)
+    state = models.JSONField()
+    records = models.PositiveIntegerField(default=0)
+    version = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'report_dataset'
+        ordering = ['-updated_at']
+        verbose_name = 'Série de Relatório'
+        verbose_name_plural = 'Séries de Relatório'
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'name'], name='report_dataset_user_name_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.name} ({self.records} registros, v{self.version})"
+
+
+
+class ReportHistory(models.Model):
+    """
+    Histórico de um usuário já lido e normalizado, guardado em Arrow IPC
+    (ver services/historicos.py).
+
+    source_hash é o SHA-256 do último upload da série: reenviar o mesmo
+    arquivo não é lido de novo, e gerações com ?dataset= sem arquivo leem
+    direto file_path, mapeado em memória, sem passar por xlrd/openpyxl.
+    """
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='report_histories'
+    )
+    name = models.CharField(max_length=255)
+    source_name = models.CharField(max_length=255)
+    source_hash = models.CharField(max_length=64)
+    file_path = models.CharField(max_length=500)
+    records = models.PositiveIntegerField(default=0)
+    size = models.BigIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'report_history'
+        ordering = ['-updated_at']
+        verbose_name = 'Histórico Guardado'
+        verbose_name_plural = 'Históricos Guardados'
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'name'], name='report_history_user_name_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.name} ({self.source_name}, {self.records} linhas)"
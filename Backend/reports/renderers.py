@@ -0,0 +1,45 @@
+"""
+Renderers DRF para as respostas binárias do app de relatórios
+
+Existem para a negociação de conteúdo do DRF aceitar esses tipos no
+cabeçalho Accept; o corpo já chega pronto da view (bytes ou arquivo).
+"""
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+
+from .services.formatos import TIPO_ARROW
+from .services.renderizadores import TIPO_CSV, TIPO_PARQUET, TIPO_XLSX
+
+
+class BinarioRenderer(BaseRenderer):
+    """Repassa os bytes da view; respostas de erro (dicts) saem em JSON"""
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if isinstance(data, bytes):
+            return data
+        response = (renderer_context or {}).get('response')
+        if response is not None:
+            response['Content-Type'] = JSONRenderer.media_type
+        return JSONRenderer().render(data)
+
+
+class ArrowRenderer(BinarioRenderer):
+    """Arrow IPC (stream)"""
+    media_type = TIPO_ARROW
+    format = 'arrow'
+
+
+class XlsxRenderer(BinarioRenderer):
+    media_type = TIPO_XLSX
+    format = 'xlsx'
+
+
+class CsvRenderer(BinarioRenderer):
+    media_type = TIPO_CSV
+    format = 'csv'
+
+
+class ParquetRenderer(BinarioRenderer):
+    media_type = TIPO_PARQUET
+    format = 'parquet'
@@ -0,0 +1,17 @@
+from rest_framework import serializers
+from django.urls import reverse
+from .models import ReportJob
+
+class ReportJobSerializer(serializers.ModelSerializer):
+    """Serializer de leitura do status de um job de relatório"""
+    download_url = serializers.SerializerMethodField()
+    
+    class Meta:
+        model = ReportJob
+        fields = ('id', 'file_name', 'status', 'error', 'created_at', 'started_at', 'finished_at', 'download_url')
+        read_only_fields = fields
+    
+    def get_download_url(self, obj):
+        if obj.status != ReportJob.STATUS_DONE:
+            return None
+        return reverse('report_job_download', kwargs={'job_id': obj.id})
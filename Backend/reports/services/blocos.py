@@ -0,0 +1,234 @@
+"""
+Previsão em blocos (out-of-core) para CSVs maiores que a memória
+
+O ajuste só precisa das estatísticas suficientes de cada série
+(previsao.EstatisticasTendencia) e a tabela final só mostra os últimos
+JANELA_HISTORICO registros. Então o CSV é lido em blocos de
+LINHAS_POR_BLOCO linhas e cada bloco atualiza:
+
+- as estatísticas do ajuste (combinação de Chan/Welford)
+- uma janela circular com os últimos JANELA_HISTORICO registros válidos
+- a contagem de registros, o maior mês e se há despesas vazias
+
+A memória usada depende do tamanho do bloco, não do arquivo, e a tabela
+final é a mesma de carregar_dados + calcular_previsao (dentro da tolerância
+de ponto flutuante do ajuste).
+"""
+import logging
+import math
+
+import numpy as np
+import pandas as pd
+
+from .ingestao import COLUNAS, ColunasFaltantes, ler_csv_em_blocos
+from .instrumentacao import etapa
+from .previsao import SERIES, EstatisticasTendencia, matriz_series
+
+logger = logging.getLogger(__name__)
+
+LINHAS_POR_BLOCO = 200_000
+
+
+def _lista(valores):
+    """Array -> lista para JSON, com NaN como None (JSON não tem NaN)"""
+    return np.where(np.isnan(valores), None, valores).tolist()
+
+
+def _array(lista):
+    return np.array(lista, dtype='float64').reshape(len(lista), -1) if lista else np.empty((0, 0))
+
+
+_MULT_1 = np.uint64(0xBF58476D1CE4E5B9)
+_MULT_2 = np.uint64(0x94D049BB133111EB)
+_SEMENTE = np.uint64(0x9E3779B97F4A7C15)
+
+
+def _misturar(valores):
+    """Finalizador do splitmix64, vetorizado (overflow de uint64 é módulo 2^64)"""
+    valores = (valores ^ (valores >> np.uint64(30))) * _MULT_1
+    valores = (valores ^ (valores >> np.uint64(27))) * _MULT_2
+    return valores ^ (valores >> np.uint64(31))
+
+
+def impressao_linhas(valores, inicio=0):
+    """
+    Impressão digital de 64 bits das linhas, sensível ao conteúdo e à
+    posição (inicio = índice da primeira linha no histórico).
+
+    É uma soma módulo 2^64 de um hash por linha, então o histórico pode ser
+    resumido em blocos de qualquer tamanho: impressao(a + b) ==
+    impressao(a) + impressao(b, len(a)).
+    """
+    valores = np.where(np.isnan(valores), np.nan, valores)  # NaN canônico
+    bits = np.ascontiguousarray(valores, dtype='float64').view(np.uint64)
+    with np.errstate(over='ignore'):
+        linhas = _misturar(np.arange(inicio, inicio + len(valores), dtype=np.uint64) + _SEMENTE)
+        for coluna in range(bits.shape[1]):
+            linhas = _misturar(linhas ^ bits[:, coluna])
+        return int(linhas.sum(dtype=np.uint64))
+
+
+class JanelaCircular:
+    """Últimas `capacidade` linhas vistas, num array de tamanho fixo"""
+
+    def __init__(self, capacidade, colunas):
+        self.capacidade = capacidade
+        self.colunas = list(colunas)
+        self.dados = np.empty((capacidade, len(self.colunas)))
+        self.posicao = 0  # onde entra a próxima linha
+        self.total = 0
+
+    def adicionar(self, valores):
+        """Inclui as linhas de um array (m, colunas), na ordem"""
+        m = len(valores)
+        if not m:
+            return
+        ultimas = valores[-self.capacidade:]
+        indices = (self.posicao + m - len(ultimas) + np.arange(len(ultimas))) % self.capacidade
+        self.dados[indices] = ultimas
+        self.posicao = (self.posicao + m) % self.capacidade
+        self.total += m
+
+    def linhas(self):
+        """Linhas guardadas, da mais antiga para a mais recente"""
+        if self.total < self.capacidade:
+            return self.dados[:self.total].copy()
+        return np.roll(self.dados, -self.posicao, axis=0)
+
+    def como_dataframe(self):
+        return pd.DataFrame(self.linhas(), columns=self.colunas)
+
+    def como_dict(self):
+        return {'capacidade': self.capacidade, 'colunas': self.colunas, 'linhas': _lista(self.linhas()), 'total': self.total}
+
+    @classmethod
+    def de_dict(cls, dados):
+        janela = cls(dados['capacidade'], dados['colunas'])
+        janela.adicionar(_array(dados['linhas']))
+        janela.total = dados['total']
+        return janela
+
+
+class AcumuladorPrevisao:
+    """
+    Estado do ajuste em blocos: tudo que calcular_previsao usa do histórico.
+
+    Com com_impressao=True também acumula impressao_linhas() dos registros,
+    para reconhecer depois um arquivo que repete este mesmo histórico (ver
+    incremental.py). O estado inteiro vai para JSON com como_dict().
+    """
+
+    def __init__(self, tamanho_janela, com_impressao=False):
+        self.estatisticas = EstatisticasTendencia()
+        self.janela = JanelaCircular(tamanho_janela, COLUNAS)
+        self.registros = 0
+        self.ultimo_mes = -math.inf
+        self.despesas_vazias = False
+        self.impressao = 0 if com_impressao else None
+
+    def adicionar(self, bloco):
+        """Inclui um bloco já limpo (sem linhas sem mês ou faturamento)"""
+        if bloco.empty:
+            return
+        x = bloco['mes_sequencial'].to_numpy(dtype='float64')
+        Y = matriz_series(bloco)
+
+        self.ultimo_mes = max(self.ultimo_mes, float(x.max()))
+        self.despesas_vazias = self.despesas_vazias or bool(np.isnan(Y[:, SERIES.index('despesas')]).any())
+        self.estatisticas.adicionar(x, Y)
+        # COLUNAS = mes_sequencial seguido das SERIES, na mesma ordem
+        linhas = np.column_stack([x, Y])
+        self.janela.adicionar(linhas)
+        if self.impressao is not None:
+            self.impressao = (self.impressao + impressao_linhas(linhas, self.registros)) % 2 ** 64
+        self.registros += len(bloco)
+
+    def previsao(self):
+        """
+        Tabela final a partir do estado acumulado.
+
+        Raises:
+            ValueError: mesmas mensagens de carregar_dados/calcular_previsao
+        """
+        from .report_generator import montar_previsao
+
+        if self.registros < 2:
+            raise ValueError("Poucos dados para análise. É necessário pelo menos 2 registros válidos.")
+        try:
+            if self.despesas_vazias:
+                raise ValueError("A coluna custos_totais contém valores vazios ou não numéricos")
+            tendencia = self.estatisticas.tendencia()
+        except Exception as e:
+            logger.error(f"Erro ao treinar modelos: {e}")
+            raise ValueError(f"Erro ao processar dados com IA: {str(e)}")
+        return montar_previsao(tendencia, int(self.ultimo_mes), self.janela.como_dataframe())
+
+    def como_dict(self):
+        return {
+            'estatisticas': self.estatisticas.como_dict(),
+            'janela': self.janela.como_dict(),
+            'registros': self.registros,
+            'ultimo_mes': None if self.registros == 0 else self.ultimo_mes,
+            'despesas_vazias': self.despesas_vazias,
+            'impressao': None if self.impressao is None else f"{self.impressao:016x}",
+        }
+
+    @classmethod
+    def de_dict(cls, dados):
+        acumulador = cls(dados['janela']['capacidade'])
+        acumulador.estatisticas = EstatisticasTendencia.de_dict(dados['estatisticas'])
+        acumulador.janela = JanelaCircular.de_dict(dados['janela'])
+        acumulador.registros = dados['registros']
+        acumulador.ultimo_mes = -math.inf if dados['ultimo_mes'] is None else dados['ultimo_mes']
+        acumulador.despesas_vazias = dados['despesas_vazias']
+        acumulador.impressao = None if dados['impressao'] is None else int(dados['impressao'], 16)
+        return acumulador
+
+
+def calcular_previsao_em_blocos(entrada, linhas_por_bloco=LINHAS_POR_BLOCO):
+    """
+    Equivalente a calcular_previsao(carregar_dados(entrada)) para CSV, lendo
+    o arquivo em blocos.
+
+    Returns:
+        tuple: (df_final, registros válidos)
+
+    Raises:
+        ValueError: mesmas mensagens do caminho em memória
+    """
+    from .report_generator import JANELA_HISTORICO
+
+    acumulador = None
+    for como_texto in (False, True):
+        acumulador = AcumuladorPrevisao(JANELA_HISTORICO)
+        try:
+            _acumular(acumulador, ler_csv_em_blocos(entrada, linhas_por_bloco, como_texto))
+            break
+        except ColunasFaltantes:
+            raise
+        except ValueError as e:
+            if como_texto:
+                logger.error(f"Erro ao ler arquivo: {e}")
+                raise ValueError(f"Erro ao abrir arquivo: {str(e)}")
+            # Célula não numérica: relê tudo como texto, como _ler_csv
+            logger.info("CSV com células não numéricas, relendo os blocos como texto")
+        except Exception as e:
+            logger.error(f"Erro ao ler arquivo: {e}")
+            raise ValueError(f"Erro ao abrir arquivo: {str(e)}")
+
+    logger.info(f"Dados processados: {acumulador.registros} registros válidos (em blocos)")
+    return acumulador.previsao(), acumulador.registros
+
+
+def _acumular(acumulador, blocos):
+    blocos = iter(blocos)
+    while True:
+        with etapa('read') as leitura:
+            bloco = next(blocos, None)
+            leitura.linhas = 0 if bloco is None else len(bloco)
+        if bloco is None:
+            return
+        with etapa('normalize', linhas=len(bloco)):
+            bloco = bloco.dropna(subset=['mes_sequencial', 'faturamento'])
+        with etapa('fit', linhas=len(bloco)):
+            acumulador.adicionar(bloco)
@@ -0,0 +1,247 @@
+"""
+Cache de relatórios endereçado por conteúdo
+
+Uploads idênticos (mesmos bytes) com a mesma versão do gerador produzem o
+mesmo relatório. A chave é sha256(bytes do upload + assinatura do gerador);
+o arquivo fica em MEDIA_ROOT/report_cache/<chave>.<ext> e é servido direto
+num acerto, sem reprocessar a planilha.
+
+Uma consulta ao cache não escreve no banco: acertos e falhas vão para o
+/metrics (report_cache_lookups_total) e os hits/last_access de cada entrada
+ficam em memória, gravados de uma vez a cada REPORT_CACHE_ACCESS_FLUSH_INTERVAL
+segundos e antes de qualquer remoção LRU.
+"""
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Sum
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+RESULTADO_HIT = 'hit'
+RESULTADO_MISS = 'miss'
+
+# chave -> [hits, último acesso] ainda não gravados no banco
+_acessos = {}
+_acessos_lock = threading.Lock()
+_ultima_gravacao = 0.0
+
+
+def pasta_cache():
+    return os.path.join(settings.MEDIA_ROOT, 'report_cache')
+
+
+def assinatura_gerador():
+    """Hash da versão e dos parâmetros do gerador que afetam o resultado"""
+    from .report_generator import JANELA_HISTORICO, MESES_PREVISAO, VERSAO_GERADOR
+    
+    config = {
+        'versao': VERSAO_GERADOR,
+        'janela_historico': JANELA_HISTORICO,
+        'meses_previsao': MESES_PREVISAO,
+    }
+    return hashlib.sha256(json.dumps(config, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+def calcular_chave(uploaded_file, variante=''):
+    """
+    SHA-256 dos bytes do upload combinado com a assinatura do gerador.
+
+    variante separa relatórios diferentes gerados a partir do mesmo upload
+    (ex.: 'consolidado'); vazia mantém as chaves do relatório padrão.
+    uploaded_file também pode ser um caminho em disco (ex.: um histórico
+    guardado por historicos.py).
+    """
+    sha = hashlib.sha256()
+    if isinstance(uploaded_file, (str, os.PathLike)):
+        with open(uploaded_file, 'rb') as arquivo:
+            for chunk in iter(lambda: arquivo.read(1024 * 1024), b''):
+                sha.update(chunk)
+    else:
+        for chunk in uploaded_file.chunks():
+            sha.update(chunk)
+        uploaded_file.seek(0)
+    base = f"{sha.hexdigest()}:{assinatura_gerador()}"
+    if variante:
+        base = f"{base}:{variante}"
+    return hashlib.sha256(base.encode('utf-8')).hexdigest()
+
+
+def _contar(resultado):
+    from auth_project import metricas
+
+    metricas.incrementar('report_cache_lookups_total', resultado=resultado)
+
+
+def _registrar_acesso(chave):
+    global _ultima_gravacao
+    with _acessos_lock:
+        acesso = _acessos.setdefault(chave, [0, None])
+        acesso[0] += 1
+        acesso[1] = timezone.now()
+        agora = time.monotonic()
+        if agora - _ultima_gravacao < settings.REPORT_CACHE_ACCESS_FLUSH_INTERVAL:
+            return
+        _ultima_gravacao = agora
+    gravar_acessos()
+
+
+def gravar_acessos():
+    """
+    Grava numa transação os hits/last_access acumulados em memória.
+
+    Returns:
+        int: quantidade de entradas atualizadas
+    """
+    from reports.models import ReportCacheEntry
+
+    with _acessos_lock:
+        pendentes = dict(_acessos)
+        _acessos.clear()
+    if not pendentes:
+        return 0
+
+    with transaction.atomic():
+        for chave, (hits, ultimo_acesso) in pendentes.items():
+            ReportCacheEntry.objects.filter(key=chave).update(hits=F('hits') + hits, last_access=ultimo_acesso)
+    return len(pendentes)
+
+
+def buscar(chave):
+    """
+    Procura um relatório em cache e já abre o arquivo: uma remoção LRU
+    concorrente depois disso não atrapalha o envio.
+
+    Returns:
+        file | None: relatório em cache aberto em modo binário (quem chama
+        fecha), ou None se não houver
+    """
+    from reports.models import ReportCacheEntry
+
+    entrada = ReportCacheEntry.objects.filter(key=chave).first()
+    arquivo = None
+    if entrada is not None:
+        try:
+            arquivo = open(entrada.file_path, 'rb')
+        except FileNotFoundError:
+            # Removido por fora (limpeza manual da pasta) ou por uma remoção
+            # LRU entre a consulta e a abertura: vale como falha
+            ReportCacheEntry.objects.filter(key=chave, file_path=entrada.file_path).delete()
+
+    if arquivo is None:
+        _contar(RESULTADO_MISS)
+        return None
+
+    _registrar_acesso(chave)
+    _contar(RESULTADO_HIT)
+    logger.info(f"Relatório servido do cache: {chave[:12]}")
+    return arquivo
+
+
+def armazenar(chave, caminho_relatorio):
+    """
+    Move um relatório recém-gerado para o cache e aplica a remoção LRU.
+
+    Returns:
+        str: novo caminho do relatório (dentro da pasta do cache)
+    """
+    from reports.models import ReportCacheEntry
+
+    os.makedirs(pasta_cache(), exist_ok=True)
+    extensao = os.path.splitext(caminho_relatorio)[1] or '.xlsx'
+    destino = os.path.join(pasta_cache(), f"{chave}{extensao}")
+    os.replace(caminho_relatorio, destino)
+
+    ReportCacheEntry.objects.update_or_create(
+        key=chave,
+        defaults={
+            'file_path': destino,
+            'size': os.path.getsize(destino),
+            'last_access': timezone.now(),
+        }
+    )
+    remover_excedente()
+    return destino
+
+
+def remover_excedente(limite_bytes=None):
+    """
+    Remove as entradas menos usadas recentemente até o cache caber no limite.
+
+    Returns:
+        int: quantidade de entradas removidas
+    """
+    from reports.models import ReportCacheEntry
+
+    if limite_bytes is None:
+        limite_bytes = settings.REPORT_CACHE_MAX_BYTES
+
+    # Ordem LRU com os acessos ainda em memória
+    gravar_acessos()
+    total = ReportCacheEntry.objects.aggregate(total=Sum('size'))['total'] or 0
+    removidas = 0
+
+    for entrada in ReportCacheEntry.objects.order_by('last_access').iterator():
+        if total <= limite_bytes:
+            break
+        _remover_entrada(entrada)
+        total -= entrada.size
+        removidas += 1
+
+    if removidas:
+        logger.info(f"Cache de relatórios: {removidas} entrada(s) removida(s) por LRU")
+    return removidas
+
+
+def _remover_entrada(entrada):
+    try:
+        os.remove(entrada.file_path)
+    except FileNotFoundError:
+        pass
+    except OSError as e:
+        logger.warning(f"Erro ao remover arquivo do cache: {e}")
+    entrada.delete()
+
+
+def limpar():
+    """Remove todas as entradas do cache"""
+    from reports.models import ReportCacheEntry
+
+    with _acessos_lock:
+        _acessos.clear()
+    removidas = 0
+    for entrada in ReportCacheEntry.objects.iterator():
+        _remover_entrada(entrada)
+        removidas += 1
+    return removidas
+
+
+def estatisticas():
+    """
+    Resumo do cache: entradas, bytes ocupados e acertos/falhas somados
+    entre os processos (os do /metrics, desde o último deploy)
+    """
+    from auth_project import metricas
+    from reports.models import ReportCacheEntry
+
+    gravar_acessos()
+    total = metricas.coletar()
+    hits = total.get(('report_cache_lookups_total', (('resultado', RESULTADO_HIT),)), 0)
+    misses = total.get(('report_cache_lookups_total', (('resultado', RESULTADO_MISS),)), 0)
+    consultas = hits + misses
+
+    return {
+        'entradas': ReportCacheEntry.objects.count(),
+        'bytes': ReportCacheEntry.objects.aggregate(total=Sum('size'))['total'] or 0,
+        'limite_bytes': settings.REPORT_CACHE_MAX_BYTES,
+        'hits': hits,
+        'misses': misses,
+        'taxa_acerto': hits / consultas if consultas else 0.0,
+    }
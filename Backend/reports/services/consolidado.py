@@ -0,0 +1,287 @@
+"""
+Relatório consolidado de várias entidades (filiais/lojas)
+
+A entrada é um único arquivo em formato longo: as colunas de sempre mais
+uma coluna de entidade (ver ingestao.NOMES_ENTIDADE), com uma linha por
+entidade e mês. Todas as entidades são ajustadas de uma vez
+(previsao.ajustar_tendencias_agrupadas) e a seleção do histórico exibido é
+feita por índices, sem laço por entidade; o laço só existe na escrita das
+abas do Excel.
+
+Saída: uma aba 'Consolidado' com uma linha por entidade e uma aba por
+entidade no mesmo layout do relatório individual.
+"""
+import logging
+import re
+
+import numpy as np
+import pandas as pd
+import xlsxwriter
+
+from .ingestao import COLUNA_ENTIDADE, ler_planilha
+from .instrumentacao import etapa, medir
+from .previsao import SERIES, ajustar_tendencias_agrupadas, matriz_series, projetar_resultado
+from .report_generator import JANELA_HISTORICO, MESES_PREVISAO
+
+logger = logging.getLogger(__name__)
+
+ABA_CONSOLIDADO = 'Consolidado'
+
+# Acima disto as abas por entidade saem sem gráficos: os gráficos são a
+# parte mais cara da escrita e deixariam o arquivo enorme
+LIMITE_GRAFICOS = 200
+
+# Caracteres não permitidos em nomes de aba do Excel
+_INVALIDOS_ABA = re.compile(r'[\[\]:*?/\\]')
+
+_COLUNAS_RESUMO = [
+    'Entidade', 'Registros', 'Último Mês', 'Faturamento Previsto',
+    'Despesas Previstas', 'Lucro Previsto', 'Tendência Faturamento (R$/mês)', 'Status', 'Erro'
+]
+
+
+def gerar_relatorio_consolidado(entrada, caminho_saida, nome_arquivo=None):
+    """
+    Gera o relatório consolidado de um arquivo com várias entidades.
+
+    Args:
+        entrada: caminho em disco ou objeto arquivo já aberto
+        caminho_saida: onde gravar o .xlsx
+        nome_arquivo: nome original (obrigatório para objetos arquivo sem .name)
+
+    Returns:
+        str: caminho_saida
+
+    Raises:
+        ValueError: se o arquivo não puder ser processado
+    """
+    with medir('consolidado'):
+        df = carregar_dados_agrupados(entrada, nome_arquivo or getattr(entrada, 'name', None))
+        df_final, resumo = calcular_previsao_agrupada(df)
+        return escrever_relatorio_consolidado(df_final, resumo, caminho_saida)
+
+
+def carregar_dados_agrupados(entrada, nome_arquivo=None):
+    """
+    Lê o arquivo com a coluna de entidade e descarta linhas sem mês,
+    faturamento ou entidade.
+
+    Raises:
+        ValueError: se o arquivo não puder ser lido ou não tiver registros válidos
+    """
+    with etapa('read') as leitura:
+        df = ler_planilha(entrada, nome_arquivo, com_entidade=True)
+        leitura.linhas = len(df)
+
+    with etapa('normalize', linhas=len(df)):
+        df = df.dropna(subset=['mes_sequencial', 'faturamento', COLUNA_ENTIDADE])
+        df[COLUNA_ENTIDADE] = df[COLUNA_ENTIDADE].astype(str).str.strip()
+        df = df[df[COLUNA_ENTIDADE] != '']
+
+    if df.empty:
+        raise ValueError("Nenhum registro válido encontrado no arquivo.")
+
+    logger.info(f"Dados consolidados: {len(df)} registros válidos")
+    return df.reset_index(drop=True)
+
+
+def calcular_previsao_agrupada(df):
+    """
+    Ajusta e projeta todas as entidades de uma vez.
+
+    Entidades com menos de 2 registros ou com despesas vazias ficam fora das
+    abas e aparecem no consolidado com o erro, como no relatório individual.
+
+    Returns:
+        tuple: (df_final, resumo)
+            df_final: colunas codigo, mes_sequencial, faturamento, despesas,
+                lucro, tipo; ordenado por entidade, histórico antes da previsão
+            resumo: uma linha por entidade (colunas de _COLUNAS_RESUMO)
+    """
+    with etapa('fit', linhas=len(df)):
+        codigos, entidades = pd.factorize(df[COLUNA_ENTIDADE], sort=True)
+        n_grupos = len(entidades)
+
+        x = df['mes_sequencial'].to_numpy(dtype='float64')
+        Y = matriz_series(df)
+
+        registros = np.bincount(codigos, minlength=n_grupos)
+        despesas_vazias = np.bincount(codigos, weights=np.isnan(Y[:, SERIES.index('despesas')]), minlength=n_grupos) > 0
+        validas = (registros >= 2) & ~despesas_vazias
+
+        tendencia = ajustar_tendencias_agrupadas(codigos, x, Y, n_grupos)
+
+    with etapa('predict') as projecao:
+        # Ordena por entidade mantendo a ordem do arquivo dentro de cada uma;
+        # a posição a partir do fim de cada segmento dá o tail() de cada entidade
+        ordem = np.argsort(codigos, kind='stable')
+        codigos_ordenados = codigos[ordem]
+        fim = np.cumsum(registros)
+        inicio = fim - registros
+        ultimo_mes = np.maximum.reduceat(x[ordem], inicio)
+
+        pos_do_fim = fim[codigos_ordenados] - np.arange(len(ordem)) - 1
+        no_historico = (pos_do_fim < JANELA_HISTORICO) & validas[codigos_ordenados]
+        linhas_historico = ordem[no_historico]
+
+        meses_futuros = ultimo_mes[:, None] + np.arange(1, MESES_PREVISAO + 1)
+        previsao_bruta = tendencia.prever_grupos(meses_futuros)
+        prev_fat, prev_desp, prev_lucro = projetar_resultado(
+            previsao_bruta[:, :, SERIES.index('faturamento')],
+            previsao_bruta[:, :, SERIES.index('despesas')]
+        )
+        projecao.linhas = int(validas.sum()) * MESES_PREVISAO
+
+    with etapa('assemble') as montagem:
+        historico = pd.DataFrame({
+            'codigo': codigos[linhas_historico],
+            'mes_sequencial': x[linhas_historico],
+            'faturamento': Y[linhas_historico, SERIES.index('faturamento')],
+            'despesas': Y[linhas_historico, SERIES.index('despesas')],
+        })
+        historico['lucro'] = historico['faturamento'] - historico['despesas']
+        historico['tipo'] = 'Histórico'
+
+        grupos_validos = np.flatnonzero(validas)
+        futuro = pd.DataFrame({
+            'codigo': np.repeat(grupos_validos, MESES_PREVISAO),
+            'mes_sequencial': meses_futuros[grupos_validos].ravel(),
+            'faturamento': prev_fat[grupos_validos].ravel(),
+            'despesas': prev_desp[grupos_validos].ravel(),
+            'lucro': prev_lucro[grupos_validos].ravel(),
+            'tipo': 'Previsão',
+        })
+
+        df_final = pd.concat([historico, futuro], ignore_index=True)
+        df_final = df_final.iloc[np.argsort(df_final['codigo'].to_numpy(), kind='stable')].reset_index(drop=True)
+
+        erros = np.where(
+            registros < 2,
+            'Poucos dados para análise. É necessário pelo menos 2 registros válidos.',
+            np.where(despesas_vazias, 'A coluna custos_totais contém valores vazios ou não numéricos', '')
+        )
+        resumo = pd.DataFrame({
+            'Entidade': np.asarray(entidades, dtype=object),
+            'Registros': registros,
+            'Último Mês': ultimo_mes.astype('int64'),
+            'Faturamento Previsto': np.where(validas, prev_fat.sum(axis=1), np.nan),
+            'Despesas Previstas': np.where(validas, prev_desp.sum(axis=1), np.nan),
+            'Lucro Previsto': np.where(validas, prev_lucro.sum(axis=1), np.nan),
+            'Tendência Faturamento (R$/mês)': np.where(validas, tendencia.inclinacao[:, SERIES.index('faturamento')], np.nan),
+            'Status': np.where(validas, 'OK', 'Erro'),
+            'Erro': erros,
+        })
+        montagem.linhas = len(df_final)
+
+    logger.info(f"Previsão consolidada: {n_grupos} entidades, {int((~validas).sum())} com erro")
+    return df_final, resumo
+
+
+def nomes_abas(entidades):
+    """
+    Nome de aba válido e único para cada entidade (máx. 31 caracteres, sem
+    []:*?/\\ e sem colidir com 'Consolidado', ignorando maiúsculas)
+    """
+    usados = {ABA_CONSOLIDADO.lower(), 'history'}
+    nomes = []
+    for entidade in entidades:
+        base = _INVALIDOS_ABA.sub('_', str(entidade)).strip("'") or 'Entidade'
+        nome = base[:31]
+        contador = 2
+        while nome.lower() in usados:
+            sufixo = f"~{contador}"
+            nome = base[:31 - len(sufixo)] + sufixo
+            contador += 1
+        usados.add(nome.lower())
+        nomes.append(nome)
+    return nomes
+
+
+def escrever_relatorio_consolidado(df_final, resumo, caminho_saida):
+    """
+    Grava a aba consolidada e uma aba por entidade válida.
+
+    Escreve direto com xlsxwriter (colunas inteiras com write_column), sem o
+    to_excel do pandas por aba, que domina o tempo com milhares de entidades.
+
+    Raises:
+        ValueError: se o arquivo Excel não puder ser gerado
+    """
+    logger.info(f"Salvando relatório consolidado: {caminho_saida}")
+
+    try:
+        with etapa('render', linhas=len(df_final)):
+            wb = xlsxwriter.Workbook(caminho_saida, {'in_memory': True})
+
+            fmt_head = wb.add_format({'bold': True, 'font_color': 'white', 'bg_color': '#4A235A', 'align': 'center', 'border': 1})
+            fmt_money = wb.add_format({'num_format': 'R$ #,##0.00'})
+            fmt_prev = wb.add_format({'bg_color': '#D7BDE2', 'italic': True})
+            fmt_lucro_pos = wb.add_format({'num_format': 'R$ #,##0.00', 'font_color': 'green', 'bold': True})
+            fmt_lucro_neg = wb.add_format({'num_format': 'R$ #,##0.00', 'font_color': 'red', 'bold': True})
+            fmt_erro = wb.add_format({'font_color': 'red'})
+
+            # Aba consolidada
+            ws = wb.add_worksheet(ABA_CONSOLIDADO)
+            for i, titulo in enumerate(_COLUNAS_RESUMO):
+                ws.write(0, i, titulo, fmt_head)
+                ws.write_column(1, i, _valores_celula(resumo[titulo]))
+            ws.set_column('A:A', 30)
+            ws.set_column('B:C', 12)
+            ws.set_column('D:G', 20, fmt_money)
+            ws.set_column('I:I', 60)
+            ultima = len(resumo) + 1
+            ws.conditional_format(f'F2:F{ultima}', {'type': 'cell', 'criteria': '>', 'value': 0, 'format': fmt_lucro_pos})
+            ws.conditional_format(f'F2:F{ultima}', {'type': 'cell', 'criteria': '<', 'value': 0, 'format': fmt_lucro_neg})
+            ws.conditional_format(f'H2:H{ultima}', {'type': 'cell', 'criteria': '==', 'value': '"Erro"', 'format': fmt_erro})
+            ws.write(ultima, 0, 'Total', fmt_head)
+            for coluna in 'DEF':
+                ws.write_formula(ultima, 'DEF'.index(coluna) + 3, f'=SUM({coluna}2:{coluna}{ultima})', fmt_head)
+            ws.freeze_panes(1, 1)
+
+            # Uma aba por entidade, no layout do relatório individual
+            codigos = df_final['codigo'].to_numpy()
+            grupos, inicios = np.unique(codigos, return_index=True)
+            fins = np.append(inicios[1:], len(codigos))
+            abas = nomes_abas(resumo['Entidade'].to_numpy()[grupos])
+            com_graficos = len(grupos) <= LIMITE_GRAFICOS
+
+            colunas = [df_final[c].to_numpy() for c in ('mes_sequencial', 'faturamento', 'despesas', 'lucro', 'tipo')]
+            titulos = ['Mês', 'Faturamento', 'Despesas', 'Lucro', 'Status']
+
+            for aba, ini, fim in zip(abas, inicios, fins):
+                ws = wb.add_worksheet(aba)
+                n = fim - ini
+                for i, t in enumerate(titulos):
+                    ws.write(0, i, t, fmt_head)
+                    ws.write_column(1, i, colunas[i][ini:fim].tolist())
+
+                ws.set_column('B:D', 18, fmt_money)
+                ws.conditional_format(f'A2:E{n+1}', {'type': 'formula', 'criteria': '=$E2="Previsão"', 'format': fmt_prev})
+                ws.conditional_format(f'D2:D{n+1}', {'type': 'cell', 'criteria': '>', 'value': 0, 'format': fmt_lucro_pos})
+                ws.conditional_format(f'D2:D{n+1}', {'type': 'cell', 'criteria': '<', 'value': 0, 'format': fmt_lucro_neg})
+
+                if com_graficos:
+                    chart1 = wb.add_chart({'type': 'column'})
+                    chart1.add_series({'name': 'Faturamento', 'categories': [aba, 1, 0, n, 0], 'values': [aba, 1, 1, n, 1], 'fill': {'color': '#5DADE2'}})
+                    chart1.add_series({'name': 'Despesas', 'values': [aba, 1, 2, n, 2], 'fill': {'color': '#E74C3C'}})
+                    chart1.set_title({'name': 'Faturamento vs Despesas'})
+                    ws.insert_chart('G2', chart1)
+
+                    chart2 = wb.add_chart({'type': 'line'})
+                    chart2.add_series({'name': 'Lucro', 'categories': [aba, 1, 0, n, 0], 'values': [aba, 1, 3, n, 3], 'line': {'color': '#229954', 'width': 3}})
+                    chart2.set_title({'name': 'Evolução do Lucro'})
+                    ws.insert_chart('G21', chart2)
+
+        with etapa('write', linhas=len(df_final)):
+            wb.close()
+        logger.info(f"Relatório consolidado gerado com sucesso: {caminho_saida}")
+        return caminho_saida
+
+    except Exception as e:
+        logger.error(f"Erro ao salvar relatório consolidado: {e}")
+        raise ValueError(f"Erro ao gerar arquivo Excel: {str(e)}")
+
+
+def _valores_celula(serie):
+    """Valores da coluna prontos para o xlsxwriter (NaN vira célula vazia)"""
+    return [None if isinstance(v, float) and np.isnan(v) else v for v in serie.tolist()]
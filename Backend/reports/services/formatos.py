@@ -0,0 +1,92 @@
+"""
+Serialização da previsão para consumo direto pelo frontend
+
+Converte a tabela final de calcular_previsao (histórico exibido + meses
+previstos) em JSON compacto, por linhas ou por colunas, ou em Arrow IPC
+(stream), sem montar o Excel. Os gráficos ficam a cargo do cliente.
+"""
+import importlib.util
+
+FORMATO_JSON = 'json'
+FORMATO_COLUNAR = 'colunar'
+FORMATO_ARROW = 'arrow'
+FORMATOS_PREVISAO = (FORMATO_JSON, FORMATO_COLUNAR, FORMATO_ARROW)
+
+TIPO_ARROW = 'application/vnd.apache.arrow.stream'
+
+# Nome no JSON -> coluna da tabela final
+CAMPOS = {
+    'mes': 'mes_sequencial',
+    'faturamento': 'faturamento',
+    'despesas': 'despesas',
+    'lucro': 'lucro',
+}
+
+# Valores monetários vão com centavos: é o que o relatório exibe
+CASAS_DECIMAIS = 2
+
+
+def arrow_disponivel():
+    return importlib.util.find_spec('pyarrow') is not None
+
+
+def _colunas(df):
+    """Colunas da tabela como listas Python (mês inteiro, valores arredondados)"""
+    colunas = {}
+    for campo, coluna in CAMPOS.items():
+        if campo == 'mes':
+            colunas[campo] = df[coluna].astype('int64').tolist()
+        else:
+            colunas[campo] = df[coluna].astype('float64').round(CASAS_DECIMAIS).tolist()
+    return colunas
+
+
+def _linhas(colunas):
+    campos = list(colunas)
+    return [dict(zip(campos, valores)) for valores in zip(*colunas.values())]
+
+
+def previsao_para_dict(df_final, colunar=False):
+    """
+    Monta o corpo JSON da previsão.
+
+    Args:
+        df_final: tabela de calcular_previsao
+        colunar: True devolve {campo: [valores]} em vez de uma lista de objetos
+
+    Returns:
+        dict: historico, previsao e ultimo_mes (último mês do histórico)
+    """
+    historico = df_final[df_final['tipo'] == 'Histórico']
+    previsao = df_final[df_final['tipo'] == 'Previsão']
+
+    corpo = {'ultimo_mes': int(historico['mes_sequencial'].max()) if len(historico) else None}
+    for chave, parte in (('historico', historico), ('previsao', previsao)):
+        colunas = _colunas(parte)
+        corpo[chave] = colunas if colunar else _linhas(colunas)
+    return corpo
+
+
+def previsao_para_arrow(df_final, metadados=None):
+    """
+    Serializa a tabela final em Arrow IPC (formato stream).
+
+    Raises:
+        ImportError: se o pyarrow não estiver instalado
+    """
+    import pyarrow as pa
+
+    tabela = pa.table({
+        'mes': pa.array(df_final['mes_sequencial'].to_numpy(dtype='int64'), type=pa.int32()),
+        'faturamento': df_final['faturamento'].to_numpy(dtype='float64'),
+        'despesas': df_final['despesas'].to_numpy(dtype='float64'),
+        'lucro': df_final['lucro'].to_numpy(dtype='float64'),
+        'tipo': pa.array(df_final['tipo'].tolist()).dictionary_encode(),
+    })
+    if metadados:
+        tabela = tabela.replace_schema_metadata({str(k): str(v) for k, v in metadados.items()})
+
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, tabela.schema) as writer:
+        writer.write_table(tabela)
+    return sink.getvalue().to_pybytes()
@@ -0,0 +1,134 @@
+"""
+Históricos normalizados guardados por usuário e série
+
+Sem isto, toda requisição relê a planilha enviada (e .xls via xlrd é a
+leitura mais lenta de todas). Com ?dataset=<nome>, o upload é lido uma vez
+por ler_planilha e as colunas já normalizadas (float64) vão para um arquivo
+Arrow IPC sem compressão em MEDIA_ROOT/report_histories/<usuário>/,
+indexado por ReportHistory. Depois disso:
+
+- gerar de novo com ?dataset=<nome> e sem arquivo lê o .arrow mapeado em
+  memória (ingestao._ler_historico), sem parsing
+- reenviar o mesmo arquivo (mesmo SHA-256) não é lido de novo
+- um arquivo diferente substitui o histórico da série
+
+Arrow IPC e não Parquet: o arquivo é lido direto do mapa de memória, sem
+descompressão nem decodificação de páginas.
+"""
+import hashlib
+import logging
+import os
+import uuid
+
+from django.conf import settings
+from django.db import transaction
+from django.utils.text import slugify
+
+from .ingestao import COLUNAS, EXTENSAO_HISTORICO, ler_planilha, pyarrow_disponivel
+from .instrumentacao import etapa
+
+logger = logging.getLogger(__name__)
+
+
+class HistoricoNaoEncontrado(ValueError):
+    """Série pedida em ?dataset= não foi guardada (ou o arquivo sumiu)"""
+
+
+def pasta_historicos():
+    return os.path.join(settings.MEDIA_ROOT, 'report_histories')
+
+
+def nome_arquivo(historico):
+    """Nome usado na leitura (extensão .arrow) e nos nomes de download"""
+    return f"{slugify(historico.name) or 'serie'}{EXTENSAO_HISTORICO}"
+
+
+def guardar_historico(usuario, nome, uploaded_file):
+    """
+    Lê o upload e guarda as colunas normalizadas como a série `nome`.
+
+    Returns:
+        ReportHistory
+
+    Raises:
+        ValueError: pyarrow ausente ou arquivo ilegível (a série guardada,
+            se houver, continua a mesma)
+    """
+    from reports.models import ReportHistory
+
+    if not pyarrow_disponivel():
+        raise ValueError("Séries guardadas (?dataset=) exigem pyarrow no servidor.")
+
+    hash_upload = _sha256(uploaded_file)
+    historico = ReportHistory.objects.filter(user=usuario, name=nome).first()
+    if historico and historico.source_hash == hash_upload and os.path.exists(historico.file_path):
+        logger.info(f"Histórico {nome!r} do usuário {usuario.pk} já guardado, sem releitura")
+        return historico
+
+    with etapa('read') as leitura:
+        df = ler_planilha(uploaded_file, uploaded_file.name)
+        leitura.linhas = len(df)
+
+    caminho = os.path.join(pasta_historicos(), str(usuario.pk), f"{uuid.uuid4().hex}{EXTENSAO_HISTORICO}")
+    with etapa('write', linhas=len(df)):
+        gravar_historico(df, caminho)
+
+    with transaction.atomic():
+        historico, _ = ReportHistory.objects.select_for_update().get_or_create(
+            user=usuario, name=nome, defaults={'file_path': caminho}
+        )
+        anterior = historico.file_path
+        historico.source_name = uploaded_file.name[:255]
+        historico.source_hash = hash_upload
+        historico.file_path = caminho
+        historico.records = len(df)
+        historico.size = os.path.getsize(caminho)
+        historico.save()
+
+    if anterior != caminho:
+        _remover(anterior)
+    logger.info(f"Histórico {nome!r} do usuário {usuario.pk} guardado: {len(df)} linhas em {caminho}")
+    return historico
+
+
+def obter_historico(usuario, nome):
+    """
+    Raises:
+        HistoricoNaoEncontrado: série inexistente ou arquivo removido
+    """
+    from reports.models import ReportHistory
+
+    historico = ReportHistory.objects.filter(user=usuario, name=nome).first()
+    if historico is None:
+        raise HistoricoNaoEncontrado(f"Série não encontrada: {nome}. Envie a planilha com ?dataset={nome}.")
+    if not os.path.exists(historico.file_path):
+        raise HistoricoNaoEncontrado(f"O arquivo da série {nome} não existe mais. Envie a planilha de novo.")
+    return historico
+
+
+def gravar_historico(df, caminho):
+    """Grava as COLUNAS de df em Arrow IPC (NaN preservado como valor, não nulo)"""
+    import pyarrow as pa
+
+    os.makedirs(os.path.dirname(caminho), exist_ok=True)
+    tabela = pa.table({coluna: pa.array(df[coluna].to_numpy(dtype='float64')) for coluna in COLUNAS})
+    temporario = f"{caminho}.tmp"
+    with pa.OSFile(temporario, 'wb') as destino, pa.ipc.new_file(destino, tabela.schema) as escritor:
+        escritor.write_table(tabela)
+    os.replace(temporario, caminho)
+
+
+def _sha256(uploaded_file):
+    sha = hashlib.sha256()
+    for chunk in uploaded_file.chunks():
+        sha.update(chunk)
+    uploaded_file.seek(0)
+    return sha.hexdigest()
+
+
+def _remover(caminho):
+    try:
+        if caminho and os.path.exists(caminho):
+            os.remove(caminho)
+    except OSError as e:
+        logger.warning(f"Erro ao remover histórico antigo {caminho}: {e}")
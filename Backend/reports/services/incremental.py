@@ -0,0 +1,120 @@
+"""
+Atualização incremental da previsão de uma série já enviada
+
+Cada usuário pode manter séries nomeadas (ReportDataset). O estado guardado
+é o mesmo AcumuladorPrevisao da leitura em blocos (blocos.py): estatísticas
+suficientes das tendências, a janela com os últimos JANELA_HISTORICO
+registros e a impressão digital dos registros já incorporados. Um upload
+novo é comparado com esse estado:
+
+- mesma série com linhas a mais no fim (o prefixo tem a mesma impressão
+  digital): só as linhas novas entram no ajuste
+- só linhas novas, todas com mês depois do último já visto: idem
+- qualquer outra coisa (meses reescritos, linhas removidas, mudança do
+  gerador): o histórico mudou e o ajuste é refeito a partir do upload
+
+Nos dois primeiros casos o custo do ajuste é O(linhas novas), não do
+histórico inteiro; a tabela final é a mesma de um upload completo.
+"""
+import logging
+from dataclasses import dataclass
+
+import numpy as np
+from django.db import transaction
+
+from .blocos import AcumuladorPrevisao, impressao_linhas
+from .cache import assinatura_gerador
+from .ingestao import ler_planilha
+from .instrumentacao import etapa, medir
+from .previsao import matriz_series
+from .renderizadores import obter_renderizador
+
+logger = logging.getLogger(__name__)
+
+MODO_COMPLETO = 'completo'      # primeira carga da série
+MODO_ANEXADO = 'anexado'        # linhas novas somadas ao estado guardado
+MODO_INALTERADO = 'inalterado'  # upload sem nenhuma linha nova
+MODO_REFEITO = 'refeito'        # histórico mudou: ajuste refeito do zero
+
+
+@dataclass
+class Atualizacao:
+    modo: str
+    linhas_novas: int
+    registros: int
+    versao: int
+
+
+def atualizar_relatorio(usuario, nome_dataset, entrada, caminho_saida, nome_arquivo=None, renderizador=None):
+    """
+    Incorpora o upload à série `nome_dataset` do usuário e gera o relatório.
+
+    Args:
+        entrada: caminho ou objeto arquivo com a série completa ou só as
+            linhas novas
+        caminho_saida: onde gravar o relatório
+        renderizador: formato de saída (ver renderizadores.py)
+
+    Returns:
+        tuple: (caminho do relatório, Atualizacao)
+
+    Raises:
+        ValueError: arquivo ilegível ou série sem dados suficientes (o
+            estado guardado não é alterado)
+    """
+    from reports.models import ReportDataset
+
+    saida = obter_renderizador(renderizador)
+
+    with medir('incremental'):
+        with etapa('read') as leitura:
+            df = ler_planilha(entrada, nome_arquivo)
+            leitura.linhas = len(df)
+        with etapa('normalize', linhas=len(df)):
+            df = df.dropna(subset=['mes_sequencial', 'faturamento'])
+            linhas = np.column_stack([df['mes_sequencial'].to_numpy(dtype='float64'), matriz_series(df)])
+
+        with transaction.atomic():
+            dataset, _ = ReportDataset.objects.select_for_update().get_or_create(
+                user=usuario, name=nome_dataset, defaults={'state': {}}
+            )
+            acumulador, inicio, modo = _planejar(dataset.state, linhas)
+            novas = df.iloc[inicio:]
+            with etapa('fit', linhas=len(novas)):
+                acumulador.adicionar(novas)
+            df_final = acumulador.previsao()
+
+            dataset.state = {'assinatura': assinatura_gerador(), 'acumulador': acumulador.como_dict()}
+            dataset.records = acumulador.registros
+            dataset.version += 1
+            dataset.save()
+
+        atualizacao = Atualizacao(modo, len(novas), acumulador.registros, dataset.version)
+        logger.info(
+            f"Série {nome_dataset!r} do usuário {usuario.pk}: {modo}, {len(novas)} linhas novas, "
+            f"{acumulador.registros} registros (v{dataset.version})"
+        )
+        return saida.escrever(df_final, caminho_saida), atualizacao
+
+
+def _planejar(estado, linhas):
+    """
+    Returns:
+        tuple: (acumulador, índice da primeira linha nova do upload, modo)
+    """
+    from .report_generator import JANELA_HISTORICO
+
+    if estado and estado.get('assinatura') == assinatura_gerador():
+        acumulador = AcumuladorPrevisao.de_dict(estado['acumulador'])
+        vistos = acumulador.registros
+
+        # Série inteira reenviada com linhas a mais no fim
+        if len(linhas) >= vistos and impressao_linhas(linhas[:vistos]) == acumulador.impressao:
+            return acumulador, vistos, MODO_ANEXADO if len(linhas) > vistos else MODO_INALTERADO
+
+        # Só as linhas novas, depois do último mês conhecido
+        if len(linhas) and linhas[:, 0].min() > acumulador.ultimo_mes:
+            return acumulador, 0, MODO_ANEXADO
+
+    modo = MODO_REFEITO if estado else MODO_COMPLETO
+    return AcumuladorPrevisao(JANELA_HISTORICO, com_impressao=True), 0, modo
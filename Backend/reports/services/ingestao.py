@@ -0,0 +1,315 @@
+"""
+Leitura rápida das planilhas de entrada do relatório
+
+Lê apenas as quatro colunas usadas pelo relatório, já com dtype float64
+definido na leitura, em vez de carregar a planilha inteira como texto e
+converter coluna a coluna depois:
+
+- CSV: engine pyarrow quando instalado (senão o parser C do pandas), com
+  usecols + dtype
+- .xlsx: openpyxl em modo read-only (streaming), convertendo só as células
+  das colunas mapeadas
+- .xls: xlrd via pandas (formato legado), com usecols
+- .arrow: histórico já normalizado por historicos.py (Arrow IPC mapeado em
+  memória, sem parsing)
+
+O resultado é idêntico ao fluxo original (read + lower + to_numeric).
+"""
+import importlib.util
+import logging
+import math
+import os
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# Cabeçalho real fica na linha 3 (as 2 primeiras são cabeçalho 'sujo')
+LINHA_CABECALHO = 2
+
+# Coluna da planilha -> nome interno
+MAPA_COLUNAS = {
+    'mes_sequencial': 'mes_sequencial',
+    'faturamento': 'faturamento',
+    'custos_totais': 'despesas',
+    'total_vendas': 'qtd_vendas'
+}
+
+COLUNAS = list(MAPA_COLUNAS.values())
+
+# Nomes aceitos para a coluna de entidade (filial/loja) nos arquivos
+# consolidados, em formato longo: uma linha por entidade e mês
+NOMES_ENTIDADE = ('entidade', 'filial', 'loja', 'unidade')
+COLUNA_ENTIDADE = 'entidade'
+
+# Bytes lidos por vez pelo leitor incremental do pyarrow (ler_csv_em_blocos).
+# O leitor faz readahead de dezenas de blocos; com 1MB isso fica em ~35MB
+BYTES_BLOCO_ARROW = 1024 * 1024
+
+# Históricos já normalizados (ver historicos.py)
+EXTENSAO_HISTORICO = '.arrow'
+
+
+class ColunasFaltantes(ValueError):
+    """Cabeçalho da planilha não tem todas as colunas obrigatórias"""
+
+
+def pyarrow_disponivel():
+    return importlib.util.find_spec('pyarrow') is not None
+
+
+def normalizar_nome(coluna):
+    return str(coluna).strip().lower()
+
+
+def ler_planilha(entrada, nome_arquivo=None, com_entidade=False):
+    """
+    Lê a planilha de entrada e devolve as colunas mapeadas como float64.
+
+    Args:
+        entrada: caminho em disco ou objeto arquivo (binário) já aberto
+        nome_arquivo: nome original, usado para identificar o formato
+            (opcional quando a entrada é um caminho)
+        com_entidade: exige e inclui também a coluna de entidade
+            (NOMES_ENTIDADE), lida como texto
+
+    Returns:
+        pd.DataFrame: colunas mes_sequencial, faturamento, despesas, qtd_vendas
+        (e entidade, se pedida); valores não numéricos viram NaN
+
+    Raises:
+        ValueError: se o arquivo não puder ser lido ou faltar coluna obrigatória
+    """
+    nome_arquivo = (nome_arquivo or str(entrada)).lower()
+    extensao = os.path.splitext(nome_arquivo)[1]
+
+    try:
+        if extensao == '.csv':
+            return _ler_csv(entrada, com_entidade)
+        if extensao == '.xlsx':
+            return _ler_xlsx(entrada, com_entidade)
+        if extensao == EXTENSAO_HISTORICO:
+            return _ler_historico(entrada, com_entidade)
+        return _ler_excel_legado(entrada, com_entidade)
+    except ColunasFaltantes:
+        raise
+    except Exception as e:
+        logger.error(f"Erro ao ler arquivo: {e}")
+        raise ValueError(f"Erro ao abrir arquivo: {str(e)}")
+
+
+def _resolver_colunas(nomes, com_entidade=False):
+    """
+    Associa os nomes reais do cabeçalho às colunas mapeadas.
+
+    Returns:
+        dict: nome real no arquivo -> nome interno
+    """
+    encontradas = {}
+    for nome in nomes:
+        normalizado = normalizar_nome(nome)
+        if normalizado in MAPA_COLUNAS and MAPA_COLUNAS[normalizado] not in encontradas.values():
+            encontradas[nome] = MAPA_COLUNAS[normalizado]
+        elif com_entidade and normalizado in NOMES_ENTIDADE and COLUNA_ENTIDADE not in encontradas.values():
+            encontradas[nome] = COLUNA_ENTIDADE
+
+    faltantes = [col for col, interno in MAPA_COLUNAS.items() if interno not in encontradas.values()]
+    if com_entidade and COLUNA_ENTIDADE not in encontradas.values():
+        faltantes.append(' ou '.join(NOMES_ENTIDADE))
+    if faltantes:
+        logger.error(f"Colunas não encontradas: {faltantes}")
+        raise ColunasFaltantes(f"Colunas obrigatórias não encontradas na linha 3: {', '.join(faltantes)}")
+
+    return encontradas
+
+
+def _rebobinar(entrada):
+    if hasattr(entrada, 'seek'):
+        entrada.seek(0)
+
+
+def _finalizar(df, colunas):
+    df = df.rename(columns=colunas)
+    saida = COLUNAS + ([COLUNA_ENTIDADE] if COLUNA_ENTIDADE in df.columns else [])
+    return df[saida].reset_index(drop=True)
+
+
+def _numericas(colunas):
+    """Nomes reais das colunas numéricas (todas menos a entidade)"""
+    return [nome for nome, interno in colunas.items() if interno != COLUNA_ENTIDADE]
+
+
+def _ler_csv(entrada, com_entidade=False):
+    _rebobinar(entrada)
+    cabecalho = pd.read_csv(entrada, header=LINHA_CABECALHO, nrows=0).columns
+    colunas = _resolver_colunas(cabecalho, com_entidade)
+    numericas = _numericas(colunas)
+    tipos = {nome: ('float64' if nome in numericas else str) for nome in colunas}
+
+    engine = 'pyarrow' if pyarrow_disponivel() else 'c'
+    _rebobinar(entrada)
+    try:
+        df = pd.read_csv(
+            entrada,
+            header=LINHA_CABECALHO,
+            usecols=list(colunas),
+            dtype=tipos,
+            engine=engine,
+        )
+    except ValueError:
+        # Alguma célula não numérica: relê as colunas como texto e converte
+        # com errors='coerce', como o fluxo original
+        _rebobinar(entrada)
+        df = pd.read_csv(entrada, header=LINHA_CABECALHO, usecols=list(colunas), dtype=str)
+        for nome in numericas:
+            df[nome] = pd.to_numeric(df[nome], errors='coerce').astype('float64')
+
+    return _finalizar(df, colunas)
+
+
+def ler_csv_em_blocos(entrada, linhas_por_bloco, como_texto=False):
+    """
+    Lê o CSV de entrada em blocos de até linhas_por_bloco linhas, com as
+    mesmas colunas e tipos de ler_planilha, sem carregar o arquivo inteiro.
+
+    Usa o leitor incremental do pyarrow quando instalado (lê BYTES_BLOCO_ARROW
+    por vez) e o parser C do pandas com chunksize caso contrário.
+
+    Args:
+        como_texto: lê as colunas como texto e converte com errors='coerce'
+            (para arquivos com células não numéricas; ver _ler_csv)
+
+    Yields:
+        pd.DataFrame: colunas mes_sequencial, faturamento, despesas, qtd_vendas
+
+    Raises:
+        ColunasFaltantes: se faltar coluna obrigatória no cabeçalho
+        ValueError: célula não numérica com como_texto=False
+    """
+    _rebobinar(entrada)
+    cabecalho = pd.read_csv(entrada, header=LINHA_CABECALHO, nrows=0).columns
+    colunas = _resolver_colunas(cabecalho)
+
+    _rebobinar(entrada)
+    if not como_texto and pyarrow_disponivel():
+        yield from _blocos_arrow(entrada, colunas, linhas_por_bloco)
+        return
+
+    leitor = pd.read_csv(
+        entrada,
+        header=LINHA_CABECALHO,
+        usecols=list(colunas),
+        dtype=str if como_texto else 'float64',
+        chunksize=linhas_por_bloco,
+    )
+    with leitor:
+        for bloco in leitor:
+            if como_texto:
+                for nome in colunas:
+                    bloco[nome] = pd.to_numeric(bloco[nome], errors='coerce').astype('float64')
+            yield _finalizar(bloco, colunas)
+
+
+def _blocos_arrow(entrada, colunas, linhas_por_bloco):
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+
+    try:
+        leitor = pa_csv.open_csv(
+            entrada,
+            read_options=pa_csv.ReadOptions(skip_rows=LINHA_CABECALHO, block_size=BYTES_BLOCO_ARROW),
+            convert_options=pa_csv.ConvertOptions(
+                include_columns=list(colunas),
+                column_types={nome: pa.float64() for nome in colunas},
+            ),
+        )
+        # Junta os lotes lidos até linhas_por_bloco linhas antes de converter
+        # para pandas (cada lote de 1MB tem só dezenas de milhares de linhas)
+        pendentes, linhas = [], 0
+        for lote in leitor:
+            pendentes.append(lote)
+            linhas += lote.num_rows
+            if linhas < linhas_por_bloco:
+                continue
+            tabela = pa.Table.from_batches(pendentes)
+            for inicio in range(0, tabela.num_rows, linhas_por_bloco):
+                yield _finalizar(tabela.slice(inicio, linhas_por_bloco).to_pandas(), colunas)
+            pendentes, linhas = [], 0
+        if pendentes:
+            yield _finalizar(pa.Table.from_batches(pendentes).to_pandas(), colunas)
+    except pa.ArrowInvalid as e:
+        # Mesmo tratamento do parser do pandas: o chamador relê como texto
+        raise ValueError(str(e))
+
+
+def _para_float(valor):
+    if valor is None:
+        return math.nan
+    if isinstance(valor, (int, float)):
+        return float(valor)
+    try:
+        return float(str(valor).strip())
+    except ValueError:
+        return math.nan
+
+
+def _para_texto(valor):
+    return None if valor is None else str(valor).strip()
+
+
+def _ler_historico(caminho, com_entidade=False):
+    """Arrow IPC gravado por historicos.gravar_historico, mapeado em memória"""
+    import pyarrow as pa
+
+    with pa.memory_map(str(caminho)) as fonte:
+        tabela = pa.ipc.open_file(fonte).read_all()
+        colunas = COLUNAS + ([COLUNA_ENTIDADE] if com_entidade else [])
+        faltantes = [coluna for coluna in colunas if coluna not in tabela.column_names]
+        if faltantes:
+            logger.error(f"Colunas não encontradas: {faltantes}")
+            raise ColunasFaltantes(f"Colunas obrigatórias não encontradas no histórico guardado: {', '.join(faltantes)}")
+        return tabela.select(colunas).to_pandas()
+
+
+def _ler_xlsx(entrada, com_entidade=False):
+    import openpyxl
+
+    _rebobinar(entrada)
+    wb = openpyxl.load_workbook(entrada, read_only=True, data_only=True)
+    try:
+        linhas = wb.worksheets[0].iter_rows(values_only=True)
+
+        cabecalho = None
+        for _ in range(LINHA_CABECALHO + 1):
+            cabecalho = next(linhas, None)
+        if cabecalho is None:
+            raise ColunasFaltantes(f"Colunas obrigatórias não encontradas na linha 3: {', '.join(MAPA_COLUNAS)}")
+
+        nomes = [f"Unnamed: {i}" if nome is None else nome for i, nome in enumerate(cabecalho)]
+        colunas = _resolver_colunas(nomes, com_entidade)
+        indices = [nomes.index(nome) for nome in colunas]
+        conversores = [_para_texto if interno == COLUNA_ENTIDADE else _para_float for interno in colunas.values()]
+
+        valores = {nome: [] for nome in colunas}
+        for linha in linhas:
+            for nome, indice, converter in zip(colunas, indices, conversores):
+                valores[nome].append(converter(linha[indice] if indice < len(linha) else None))
+    finally:
+        wb.close()
+
+    df = pd.DataFrame({
+        nome: np.asarray(lista, dtype=object if interno == COLUNA_ENTIDADE else 'float64')
+        for (nome, lista), interno in zip(valores.items(), colunas.values())
+    })
+    return _finalizar(df, colunas)
+
+
+def _ler_excel_legado(entrada, com_entidade=False):
+    aceitas = set(MAPA_COLUNAS) | (set(NOMES_ENTIDADE) if com_entidade else set())
+    _rebobinar(entrada)
+    df = pd.read_excel(entrada, header=LINHA_CABECALHO, usecols=lambda nome: normalizar_nome(nome) in aceitas)
+    colunas = _resolver_colunas(df.columns, com_entidade)
+    for nome in _numericas(colunas):
+        df[nome] = pd.to_numeric(df[nome], errors='coerce').astype('float64')
+    return _finalizar(df, colunas)
@@ -0,0 +1,266 @@
+"""
+Medição por etapa da geração do relatório
+
+Cada etapa (read, normalize, fit, predict, assemble, render, write) registra
+tempo de parede, tempo de CPU da thread, linhas processadas e quanto o pico
+de RSS do processo subiu durante ela.
+
+A medição ativa fica numa ContextVar: as funções do gerador só abrem
+`with etapa('fit'):` e, se ninguém estiver medindo, isso não faz nada. Quem
+quer os números (a view, para o Server-Timing) abre `with medir('relatorio')`
+em volta da chamada; ao final as etapas vão para o log e para o backend de
+métricas configurado em REPORT_METRICS_BACKEND.
+"""
+import contextvars
+import logging
+import socket
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+logger = logging.getLogger(__name__)
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+ETAPAS = ('read', 'normalize', 'fit', 'predict', 'assemble', 'render', 'write')
+
+_medicao_atual = contextvars.ContextVar('medicao_relatorio', default=None)
+
+# Chamado no início de cada etapa; nos processos do pool levanta
+# TarefaCancelada quando a tarefa foi cancelada (ver pool.py)
+_verificador = None
+
+
+def pico_rss():
+    """Pico de RSS do processo em bytes (None onde não há getrusage)"""
+    if resource is None:
+        return None
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss vem em KB no Linux e em bytes no macOS
+    return pico if sys.platform == 'darwin' else pico * 1024
+
+
+@dataclass
+class Etapa:
+    nome: str
+    duracao: float = 0.0          # segundos (parede)
+    cpu: float = 0.0              # segundos de CPU da thread
+    linhas: Optional[int] = None
+    rss_pico_delta: Optional[int] = None  # bytes
+
+    def como_dict(self):
+        return {
+            'etapa': self.nome,
+            'duracao_ms': round(self.duracao * 1000, 3),
+            'cpu_ms': round(self.cpu * 1000, 3),
+            'linhas': self.linhas,
+            'rss_pico_delta': self.rss_pico_delta,
+        }
+
+
+@dataclass
+class Medicao:
+    """Etapas de uma geração de relatório, na ordem em que rodaram"""
+    relatorio: str
+    etapas: List[Etapa] = field(default_factory=list)
+    duracao: float = 0.0
+
+    def adicionar(self, registro):
+        anterior = next((e for e in self.etapas if e.nome == registro.nome), None)
+        if anterior is None:
+            self.etapas.append(registro)
+            return
+        anterior.duracao += registro.duracao
+        anterior.cpu += registro.cpu
+        if registro.linhas is not None:
+            anterior.linhas = (anterior.linhas or 0) + registro.linhas
+        if registro.rss_pico_delta is not None:
+            anterior.rss_pico_delta = (anterior.rss_pico_delta or 0) + registro.rss_pico_delta
+
+    def server_timing(self):
+        """Valor do cabeçalho Server-Timing (durações em ms)"""
+        partes = []
+        for etapa in self.etapas:
+            parte = f"{etapa.nome};dur={etapa.duracao * 1000:.1f}"
+            if etapa.linhas is not None:
+                parte += f';desc="{etapa.linhas} linhas"'
+            partes.append(parte)
+        partes.append(f"total;dur={self.duracao * 1000:.1f}")
+        return ', '.join(partes)
+
+    def resumo(self):
+        return ' '.join(
+            f"{e.nome}={e.duracao * 1000:.1f}ms(cpu {e.cpu * 1000:.1f}ms"
+            + (f", {e.linhas} linhas" if e.linhas is not None else '')
+            + (f", +{e.rss_pico_delta / (1024 * 1024):.1f}MB" if e.rss_pico_delta else '')
+            + ')'
+            for e in self.etapas
+        )
+
+
+@contextmanager
+def medir(relatorio='relatorio', publicar=True):
+    """
+    Abre uma medição (ou reaproveita a que já estiver ativa no contexto).
+
+    Ao sair da medição mais externa, as etapas vão para o log e para o
+    backend de métricas (publicar=False só coleta: usado no processo do
+    pool, que devolve as etapas para o processo web publicar).
+    """
+    atual = _medicao_atual.get()
+    if atual is not None:
+        yield atual
+        return
+
+    medicao = Medicao(relatorio)
+    token = _medicao_atual.set(medicao)
+    inicio = time.perf_counter()
+    try:
+        yield medicao
+    finally:
+        medicao.duracao = time.perf_counter() - inicio
+        _medicao_atual.reset(token)
+        if publicar:
+            _publicar(medicao)
+
+
+def incorporar(etapas):
+    """Soma à medição ativa etapas medidas em outro processo"""
+    medicao = _medicao_atual.get()
+    if medicao is not None:
+        for registro in etapas:
+            medicao.adicionar(registro)
+
+
+def definir_verificador(funcao):
+    """Instala a função chamada no início de cada etapa (ponto de cancelamento)"""
+    global _verificador
+    _verificador = funcao
+
+
+@contextmanager
+def etapa(nome, linhas=None):
+    """
+    Mede uma etapa da medição ativa; sem medição ativa, não faz nada.
+
+    O objeto retornado aceita `.linhas = n` quando a contagem só é conhecida
+    no fim da etapa. Uma etapa repetida (ex.: a leitura de cada bloco de um
+    CSV grande) é somada à anterior de mesmo nome. O início de cada etapa
+    também é ponto de cancelamento (definir_verificador).
+    """
+    if _verificador is not None:
+        _verificador()
+    medicao = _medicao_atual.get()
+    registro = Etapa(nome, linhas=linhas)
+    if medicao is None:
+        yield registro
+        return
+
+    rss_antes = pico_rss()
+    cpu_antes = time.thread_time()
+    inicio = time.perf_counter()
+    try:
+        yield registro
+    finally:
+        registro.duracao = time.perf_counter() - inicio
+        registro.cpu = time.thread_time() - cpu_antes
+        if rss_antes is not None:
+            registro.rss_pico_delta = pico_rss() - rss_antes
+        medicao.adicionar(registro)
+
+
+def _publicar(medicao):
+    if not medicao.etapas:
+        return
+    logger.info(
+        f"Etapas do {medicao.relatorio} ({medicao.duracao * 1000:.1f}ms): {medicao.resumo()}",
+        extra={'etapas': [e.como_dict() for e in medicao.etapas]}
+    )
+    try:
+        metricas = obter_metricas()
+        for registro in medicao.etapas:
+            metricas.registrar_etapa(medicao.relatorio, registro)
+    except Exception as e:
+        # Métrica nunca derruba a geração do relatório
+        logger.warning(f"Erro ao publicar métricas do relatório: {e}")
+
+
+# Backends de métricas
+
+class MetricasNulas:
+    """Padrão local: não envia nada"""
+
+    def registrar_etapa(self, relatorio, etapa):
+        pass
+
+
+class MetricasStatsD:
+    """
+    Envia cada etapa por UDP no formato StatsD:
+
+        <prefixo>.<relatorio>.<etapa>.tempo:12.3|ms
+        <prefixo>.<relatorio>.<etapa>.cpu:11.0|ms
+        <prefixo>.<relatorio>.<etapa>.linhas:1000|c
+        <prefixo>.<relatorio>.<etapa>.rss_pico_delta:2097152|g
+    """
+
+    def __init__(self, host='localhost', port=8125, prefixo='pi2'):
+        self.endereco = (host, int(port))
+        self.prefixo = prefixo
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+
+    def registrar_etapa(self, relatorio, etapa):
+        base = f"{self.prefixo}.{relatorio}.{etapa.nome}"
+        linhas = [
+            f"{base}.tempo:{etapa.duracao * 1000:.3f}|ms",
+            f"{base}.cpu:{etapa.cpu * 1000:.3f}|ms",
+        ]
+        if etapa.linhas is not None:
+            linhas.append(f"{base}.linhas:{etapa.linhas}|c")
+        if etapa.rss_pico_delta is not None:
+            linhas.append(f"{base}.rss_pico_delta:{etapa.rss_pico_delta}|g")
+        self.socket.sendto('\n'.join(linhas).encode('ascii'), self.endereco)
+
+
+_metricas = None
+_metricas_lock = threading.Lock()
+
+
+def obter_metricas():
+    """
+    Backend de REPORT_METRICS_BACKEND (caminho pontilhado da classe, com
+    REPORT_METRICS_OPTIONS como kwargs). Fora do Django, MetricasNulas.
+    """
+    global _metricas
+    if _metricas is None:
+        with _metricas_lock:
+            if _metricas is None:
+                _metricas = _criar_metricas()
+    return _metricas
+
+
+def _criar_metricas():
+    from django.conf import settings
+
+    if not settings.configured:
+        return MetricasNulas()
+
+    from django.utils.module_loading import import_string
+
+    caminho = getattr(settings, 'REPORT_METRICS_BACKEND', None)
+    if not caminho:
+        return MetricasNulas()
+    return import_string(caminho)(**getattr(settings, 'REPORT_METRICS_OPTIONS', {}))
+
+
+def redefinir_metricas():
+    """Descarta o backend atual (ex.: após override_settings em testes)"""
+    global _metricas
+    with _metricas_lock:
+        _metricas = None
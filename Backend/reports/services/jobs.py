@@ -0,0 +1,215 @@
+"""
+Fila de jobs de geração de relatório
+
+A fila é a própria tabela ReportJob (sem broker externo). A view cria o job
+como 'pendente' e o envia para um pool local de processos; o worker
+reivindica o job no banco, executa gerar_relatorio e grava o resultado.
+Assim a geração (pandas + ML + xlsxwriter) nunca ocupa os workers HTTP.
+
+Jobs concluídos ou com erro ficam disponíveis por REPORT_JOB_RETENTION
+segundos; depois remover_jobs_antigos (comando clean_report_jobs) apaga o
+registro e o diretório em MEDIA_ROOT/jobs.
+"""
+import logging
+import os
+import shutil
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from . import pool
+
+logger = logging.getLogger(__name__)
+
+
+class LimiteJobsExcedido(Exception):
+    """Limite de jobs simultâneos atingido (por usuário ou no sistema)"""
+
+    def __init__(self, mensagem, por_usuario=False):
+        super().__init__(mensagem)
+        self.por_usuario = por_usuario
+
+
+def pasta_jobs():
+    """Diretório base onde ficam entrada e saída de cada job"""
+    return os.path.join(settings.MEDIA_ROOT, 'jobs')
+
+
+def pasta_job(job_id):
+    return os.path.join(pasta_jobs(), str(job_id))
+
+
+def verificar_limites(user):
+    """
+    Valida os limites de concorrência antes de aceitar um novo job.
+
+    Raises:
+        LimiteJobsExcedido: se o usuário ou o sistema já tiver jobs ativos demais
+    """
+    from reports.models import ReportJob
+
+    ativos = ReportJob.objects.filter(status__in=ReportJob.ACTIVE_STATUSES)
+
+    if ativos.filter(user=user).count() >= settings.REPORT_JOBS_MAX_PER_USER:
+        raise LimiteJobsExcedido(
+            f'Você já possui {settings.REPORT_JOBS_MAX_PER_USER} relatório(s) em processamento. '
+            'Aguarde a conclusão para enviar outro.',
+            por_usuario=True
+        )
+
+    if ativos.count() >= settings.REPORT_JOBS_MAX_ACTIVE:
+        raise LimiteJobsExcedido('Servidor ocupado gerando relatórios. Tente novamente em instantes.')
+
+
+def criar_job(user, uploaded_file):
+    """
+    Persiste o upload e cria o job pendente.
+
+    O arquivo precisa ir para disco aqui: o worker roda em outro processo.
+    Os limites são conferidos antes da gravação (recusa barata) e de novo
+    junto com o INSERT, com a linha do usuário travada: duas requisições
+    simultâneas do mesmo usuário não passam ambas do limite.
+
+    Raises:
+        LimiteJobsExcedido: se o usuário ou o sistema já tiver jobs ativos demais
+    """
+    from reports.models import ReportJob
+
+    verificar_limites(user)
+
+    job = ReportJob(user=user, file_name=uploaded_file.name)
+    pasta = pasta_job(job.id)
+    os.makedirs(pasta, exist_ok=True)
+
+    job.input_path = os.path.join(pasta, f"input{os.path.splitext(uploaded_file.name)[1].lower()}")
+    with open(job.input_path, 'wb') as destination:
+        for chunk in uploaded_file.chunks():
+            destination.write(chunk)
+
+    nome_base = os.path.splitext(os.path.basename(uploaded_file.name))[0]
+    job.output_path = os.path.join(pasta, f"Relatorio_IA_{nome_base}.xlsx")
+    try:
+        with transaction.atomic():
+            type(user).objects.select_for_update().filter(pk=user.pk).exists()
+            verificar_limites(user)
+            job.save()
+    except LimiteJobsExcedido:
+        shutil.rmtree(pasta, ignore_errors=True)
+        raise
+
+    logger.info(f"Job {job.id} criado para o arquivo {uploaded_file.name}")
+    return job
+
+
+def enfileirar_job(job):
+    """Envia o job para o pool após o commit da transação corrente"""
+    if settings.REPORT_POOL_EAGER:
+        executar_job(str(job.id))
+        return
+
+    job_id = str(job.id)
+    transaction.on_commit(lambda: pool.submeter(executar_job, job_id))
+
+
+def executar_job(job_id):
+    """
+    Processa um job. Roda no processo worker (ou inline no modo eager).
+
+    O job só é processado se ainda estiver pendente; a transição é feita com
+    UPDATE condicional para que dois workers nunca peguem o mesmo job.
+    """
+    from auth_project import metricas
+    from reports.models import ReportJob
+    from .report_generator import gerar_relatorio
+
+    reivindicado = ReportJob.objects.filter(id=job_id, status=ReportJob.STATUS_PENDING).update(
+        status=ReportJob.STATUS_RUNNING,
+        started_at=timezone.now()
+    )
+    if not reivindicado:
+        logger.info(f"Job {job_id} já foi reivindicado por outro worker")
+        return
+
+    job = ReportJob.objects.get(id=job_id)
+
+    try:
+        gerar_relatorio(job.input_path, job.output_path)
+        job.status = ReportJob.STATUS_DONE
+        resultado = 'sucesso'
+        logger.info(f"Job {job_id} concluído: {job.output_path}")
+    except ValueError as e:
+        job.status = ReportJob.STATUS_FAILED
+        job.error = str(e)
+        resultado = 'invalido'
+    except Exception as e:
+        logger.error(f"Erro ao processar job {job_id}: {e}", exc_info=True)
+        job.status = ReportJob.STATUS_FAILED
+        job.error = f'Erro ao processar arquivo: {str(e)}'
+        resultado = 'erro'
+    finally:
+        if os.path.exists(job.input_path):
+            try:
+                os.remove(job.input_path)
+            except OSError as e:
+                logger.warning(f"Erro ao remover arquivo temporário: {e}")
+
+    job.finished_at = timezone.now()
+    job.save(update_fields=['status', 'error', 'finished_at'])
+
+    metricas.incrementar('report_generation_total', view='job', resultado=resultado)
+    metricas.gravar_periodicamente()
+
+
+def remover_arquivos_job(job):
+    """Apaga o diretório do job (entrada e saída)"""
+    shutil.rmtree(pasta_job(job.id), ignore_errors=True)
+
+
+def remover_jobs_antigos(retencao=None, agora=None):
+    """
+    Apaga os jobs concluídos ou com erro há mais de retencao segundos
+    (padrão: REPORT_JOB_RETENTION) e os seus diretórios, além de diretórios
+    em MEDIA_ROOT/jobs sem job no banco (usuário removido, por exemplo) e
+    sem alteração nesse mesmo período.
+
+    Returns:
+        tuple: (jobs removidos, diretórios órfãos removidos)
+    """
+    from reports.models import ReportJob
+
+    retencao = settings.REPORT_JOB_RETENTION if retencao is None else retencao
+    agora = timezone.now() if agora is None else agora
+    limite = agora - timedelta(seconds=retencao)
+
+    antigos = ReportJob.objects.filter(
+        status__in=(ReportJob.STATUS_DONE, ReportJob.STATUS_FAILED), finished_at__lt=limite
+    )
+    removidos = 0
+    for job in antigos.only('id'):
+        remover_arquivos_job(job)
+        job.delete()
+        removidos += 1
+
+    try:
+        pastas = list(os.scandir(pasta_jobs()))
+    except FileNotFoundError:
+        pastas = []
+    existentes = {str(job_id) for job_id in ReportJob.objects.values_list('id', flat=True)}
+    orfaos = 0
+    for pasta in pastas:
+        if not pasta.is_dir(follow_symlinks=False) or pasta.name in existentes:
+            continue
+        try:
+            modificado = pasta.stat(follow_symlinks=False).st_mtime
+        except FileNotFoundError:
+            continue
+        if modificado < limite.timestamp():
+            shutil.rmtree(pasta.path, ignore_errors=True)
+            orfaos += 1
+
+    if removidos or orfaos:
+        logger.info(f"Retenção de jobs: {removidos} job(s) e {orfaos} diretório(s) órfão(s) removidos")
+    return removidos, orfaos
@@ -0,0 +1,276 @@
+"""
+Geração de relatórios em lote
+
+Recebe várias planilhas (soltas ou dentro de um .zip), gera um relatório
+por arquivo no pool de processos (pool.py) e devolve um único .zip com todos
+os relatórios e uma planilha de resumo consolidada. Falhas em um arquivo são
+registradas no resumo e não interrompem o restante do lote.
+"""
+import logging
+import os
+import shutil
+import uuid
+import zipfile
+from concurrent.futures import FIRST_COMPLETED, wait
+from datetime import datetime
+
+from django.conf import settings
+
+from . import pool
+
+logger = logging.getLogger(__name__)
+
+EXTENSOES_PLANILHA = ('.xlsx', '.xls', '.csv')
+
+NOME_RESUMO = 'Resumo_Lote.xlsx'
+
+STATUS_OK = 'ok'
+STATUS_ERRO = 'erro'
+
+
+def pasta_lotes():
+    return os.path.join(settings.MEDIA_ROOT, 'temp')
+
+
+def criar_pasta_lote():
+    """Cria o diretório de trabalho de um lote (entrada/ e saida/)"""
+    pasta = os.path.join(pasta_lotes(), f"lote_{uuid.uuid4().hex}")
+    os.makedirs(os.path.join(pasta, 'entrada'))
+    os.makedirs(os.path.join(pasta, 'saida'))
+    return pasta
+
+
+def salvar_upload(uploaded_file, destino):
+    with open(destino, 'wb') as f:
+        for chunk in uploaded_file.chunks():
+            f.write(chunk)
+
+
+def extrair_zip(arquivo_zip, pasta_entrada, max_arquivos, max_bytes):
+    """
+    Extrai as planilhas de um .zip para a pasta de entrada.
+
+    Somente o nome base de cada membro é usado (caminhos dentro do zip são
+    ignorados) e os limites de quantidade e tamanho descompactado são
+    checados antes de extrair qualquer coisa.
+
+    Returns:
+        list: (nome_original, caminho_em_disco) para cada planilha
+
+    Raises:
+        ValueError: se o zip for inválido ou exceder os limites
+    """
+    try:
+        zf = zipfile.ZipFile(arquivo_zip)
+    except zipfile.BadZipFile:
+        raise ValueError('Arquivo .zip inválido ou corrompido.')
+
+    with zf:
+        membros = [
+            info for info in zf.infolist()
+            if not info.is_dir()
+            and not info.filename.startswith('__MACOSX/')
+            and not os.path.basename(info.filename).startswith('.')
+            and os.path.splitext(info.filename)[1].lower() in EXTENSOES_PLANILHA
+        ]
+
+        if not membros:
+            raise ValueError('O arquivo .zip não contém planilhas (.xlsx, .xls ou .csv).')
+        if len(membros) > max_arquivos:
+            raise ValueError(f'O lote pode ter no máximo {max_arquivos} planilhas.')
+        if any(info.file_size > max_bytes for info in membros):
+            raise ValueError(f'Cada planilha do lote deve ter no máximo {max_bytes // (1024 * 1024)}MB.')
+
+        extraidos = []
+        for indice, info in enumerate(membros):
+            nome = os.path.basename(info.filename)
+            destino = os.path.join(pasta_entrada, f"{indice:04d}{os.path.splitext(nome)[1].lower()}")
+            with zf.open(info) as origem, open(destino, 'wb') as f:
+                shutil.copyfileobj(origem, f)
+            extraidos.append((nome, destino))
+
+    return extraidos
+
+
+def processar_arquivo(nome, caminho_entrada, caminho_saida):
+    """
+    Gera o relatório de um arquivo do lote. Roda no processo worker.
+
+    Nunca levanta exceção: o erro volta descrito no resumo.
+
+    Returns:
+        dict: linha do resumo do lote
+    """
+    from .renderizadores import escrever_relatorio
+    from .report_generator import calcular_previsao, carregar_dados
+
+    resumo = {'arquivo': nome, 'status': STATUS_ERRO, 'relatorio': None, 'erro': ''}
+    try:
+        df_limpo = carregar_dados(caminho_entrada, nome)
+        df_final = calcular_previsao(df_limpo)
+        escrever_relatorio(df_final, caminho_saida)
+    except ValueError as e:
+        resumo['erro'] = str(e)
+        return resumo
+    except Exception as e:
+        logger.error(f"Erro ao processar {nome} no lote: {e}", exc_info=True)
+        resumo['erro'] = f'Erro ao processar arquivo: {str(e)}'
+        return resumo
+
+    previsao = df_final[df_final['tipo'] == 'Previsão']
+    resumo.update({
+        'status': STATUS_OK,
+        'relatorio': caminho_saida,
+        'registros': len(df_limpo),
+        'ultimo_mes': int(df_limpo['mes_sequencial'].max()),
+        'faturamento_previsto': float(previsao['faturamento'].sum()),
+        'despesas_previstas': float(previsao['despesas'].sum()),
+        'lucro_previsto': float(previsao['lucro'].sum()),
+    })
+    return resumo
+
+
+def processar_lote(entradas, pasta_saida):
+    """
+    Processa as entradas no pool, com no máximo REPORT_BATCH_MAX_PARALLEL
+    arquivos do lote em andamento ao mesmo tempo.
+
+    Args:
+        entradas: lista de (nome_original, caminho_em_disco)
+        pasta_saida: onde gravar os relatórios
+
+    Returns:
+        list: linhas do resumo, na mesma ordem das entradas
+    """
+    resultados = [None] * len(entradas)
+    pendentes = {}
+    proxima = 0
+    limite = max(1, settings.REPORT_BATCH_MAX_PARALLEL)
+    timeout = settings.REPORT_BATCH_FILE_TIMEOUT
+
+    while proxima < len(entradas) or pendentes:
+        while proxima < len(entradas) and len(pendentes) < limite:
+            nome, caminho = entradas[proxima]
+            saida = os.path.join(pasta_saida, f"{proxima:04d}.xlsx")
+            pendentes[pool.submeter(processar_arquivo, nome, caminho, saida)] = proxima
+            proxima += 1
+
+        concluidos, _ = wait(pendentes, timeout=timeout, return_when=FIRST_COMPLETED)
+
+        if not concluidos:
+            # Nenhum arquivo terminou dentro do prazo: marca os da janela atual
+            for future, indice in pendentes.items():
+                future.cancel()
+                resultados[indice] = _resumo_erro(entradas[indice][0], 'Tempo limite de processamento excedido.')
+            pendentes.clear()
+            continue
+
+        for future in concluidos:
+            indice = pendentes.pop(future)
+            try:
+                resultados[indice] = future.result()
+            except Exception as e:
+                logger.error(f"Falha no worker do lote: {e}", exc_info=True)
+                resultados[indice] = _resumo_erro(entradas[indice][0], f'Erro ao processar arquivo: {str(e)}')
+
+    return resultados
+
+
+def _resumo_erro(nome, mensagem):
+    return {'arquivo': nome, 'status': STATUS_ERRO, 'relatorio': None, 'erro': mensagem}
+
+
+def escrever_resumo(resultados, caminho):
+    """Planilha consolidada com uma linha por arquivo do lote"""
+    import pandas as pd
+
+    df = pd.DataFrame([{
+        'Arquivo': r['arquivo'],
+        'Status': 'OK' if r['status'] == STATUS_OK else 'Erro',
+        'Registros': r.get('registros'),
+        'Último Mês': r.get('ultimo_mes'),
+        'Faturamento Previsto': r.get('faturamento_previsto'),
+        'Despesas Previstas': r.get('despesas_previstas'),
+        'Lucro Previsto': r.get('lucro_previsto'),
+        'Erro': r['erro'],
+    } for r in resultados])
+
+    sheet = 'Resumo'
+    with pd.ExcelWriter(caminho, engine='xlsxwriter') as writer:
+        df.to_excel(writer, sheet_name=sheet, startrow=1, header=False, index=False)
+        wb = writer.book
+        ws = writer.sheets[sheet]
+
+        fmt_head = wb.add_format({'bold': True, 'font_color': 'white', 'bg_color': '#4A235A', 'align': 'center', 'border': 1})
+        fmt_money = wb.add_format({'num_format': 'R$ #,##0.00'})
+        fmt_erro = wb.add_format({'font_color': 'red'})
+
+        for i, titulo in enumerate(df.columns):
+            ws.write(0, i, titulo, fmt_head)
+
+        ws.set_column('A:A', 30)
+        ws.set_column('B:D', 12)
+        ws.set_column('E:G', 20, fmt_money)
+        ws.set_column('H:H', 60)
+        if len(df):
+            ws.conditional_format(f'B2:B{len(df)+1}', {'type': 'cell', 'criteria': '==', 'value': '"Erro"', 'format': fmt_erro})
+
+    return caminho
+
+
+def nomes_relatorios(resultados):
+    """Nome de cada relatório dentro do zip, sem repetições"""
+    usados = set()
+    nomes = []
+    for r in resultados:
+        base = os.path.splitext(r['arquivo'])[0]
+        nome = f"Relatorio_IA_{base}.xlsx"
+        contador = 2
+        while nome.lower() in usados:
+            nome = f"Relatorio_IA_{base}_{contador}.xlsx"
+            contador += 1
+        usados.add(nome.lower())
+        nomes.append(nome)
+    return nomes
+
+
+def gerar_lote(entradas, pasta_lote):
+    """
+    Processa o lote e empacota relatórios + resumo num .zip.
+
+    Args:
+        entradas: lista de (nome_original, caminho_em_disco); entradas com
+            caminho None entram no resumo como erro (ex.: formato inválido)
+        pasta_lote: diretório criado por criar_pasta_lote()
+
+    Returns:
+        tuple: (caminho do .zip, lista de linhas do resumo)
+    """
+    validas = [(i, e) for i, e in enumerate(entradas) if e[1] is not None]
+    resultados = [_resumo_erro(nome, 'Formato não suportado. Use .xlsx, .xls ou .csv.') for nome, _ in entradas]
+
+    processados = processar_lote([e for _, e in validas], os.path.join(pasta_lote, 'saida'))
+    for (indice, _), resultado in zip(validas, processados):
+        resultados[indice] = resultado
+
+    caminho_resumo = escrever_resumo(resultados, os.path.join(pasta_lote, NOME_RESUMO))
+
+    data_hora = datetime.now().strftime("%d-%m-%Y_%H-%M-%S")
+    caminho_zip = os.path.join(pasta_lotes(), f"Relatorios_IA_Lote_{data_hora}_{uuid.uuid4().hex[:8]}.zip")
+
+    # Os .xlsx já são comprimidos; ZIP_STORED evita recomprimir à toa
+    with zipfile.ZipFile(caminho_zip, 'w', compression=zipfile.ZIP_STORED) as zf:
+        zf.write(caminho_resumo, NOME_RESUMO)
+        for resultado, nome in zip(resultados, nomes_relatorios(resultados)):
+            if resultado['status'] == STATUS_OK:
+                zf.write(resultado['relatorio'], nome)
+
+    logger.info(
+        f"Lote concluído: {len(resultados)} arquivo(s), "
+        f"{sum(r['status'] == STATUS_ERRO for r in resultados)} com erro"
+    )
+    return caminho_zip, resultados
+
+
+def remover_pasta_lote(pasta_lote):
+    shutil.rmtree(pasta_lote, ignore_errors=True)
@@ -0,0 +1,351 @@
+"""
+Pool de processos compartilhado pela geração de relatórios
+
+A geração é CPU-bound (pandas + NumPy + xlsxwriter) e segura o GIL; rodando
+em processos separados ela não disputa CPU com as threads que atendem HTTP.
+O pool é reaproveitado por jobs, lotes e pela geração síncrona:
+
+- REPORT_POOL_WORKERS processos por processo web (cada worker do gunicorn
+  tem o seu pool), com pandas, NumPy, xlsxwriter e o gerador já importados
+  pelo inicializador; aquecer() sobe todos de uma vez (chamado pelo
+  wsgi.py/asgi.py com REPORT_POOL_PREFORK)
+- cada processo é trocado por um novo após REPORT_POOL_MAX_TASKS_PER_CHILD
+  tarefas, para a memória fragmentada pelo pandas não crescer sem limite
+- executar() é a chamada síncrona das views: recusa com PoolSaturado quando
+  já há REPORT_POOL_WORKERS + REPORT_POOL_MAX_QUEUE tarefas síncronas em
+  andamento (a view responde 503 com Retry-After em vez de deixar a fila
+  crescer) e cancela a tarefa que passar do timeout
+- submeter() é a chamada dos jobs e lotes: no máximo
+  REPORT_POOL_BACKGROUND_MAX dessas tarefas ficam no pool ao mesmo tempo, e
+  as demais esperam numa fila local. Elas não contam na capacidade de
+  executar(), e uma tarefa síncrona passa na frente das que estão na fila
+
+Cancelamento: uma tarefa ainda na fila é só descartada; uma que já está
+rodando recebe uma marca numa área de memória compartilhada, conferida no
+início de cada etapa medida (instrumentacao.etapa), e termina com
+TarefaCancelada sem derrubar o processo nem o pool.
+"""
+import asyncio
+import functools
+import logging
+import multiprocessing
+import os
+import threading
+from collections import deque
+from concurrent.futures import CancelledError, Future, ProcessPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+
+from django.conf import settings
+
+from . import instrumentacao
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_marcas = None             # marcas de cancelamento, uma por vaga
+_vagas_livres = []
+_em_andamento = 0          # tarefas submetidas e ainda não concluídas
+_sincronas = 0             # dessas, as de executar() (limitadas por capacidade())
+_em_segundo_plano = 0      # dessas, as de submeter() (limitadas por REPORT_POOL_BACKGROUND_MAX)
+_fila_segundo_plano = deque()  # (Future, funcao, args) de submeter() esperando vez
+_executor_lock = threading.RLock()  # callbacks de futures já concluídos rodam na hora
+
+# No processo filho: marcas herdadas e vaga da tarefa em execução
+_marcas_worker = None
+_vaga_worker = None
+
+
+class PoolSaturado(Exception):
+    """Todas as vagas do pool (processos + fila) estão ocupadas"""
+
+
+class TempoEsgotado(Exception):
+    """A tarefa passou do timeout e foi cancelada"""
+
+
+class TarefaCancelada(Exception):
+    """Levantada no processo filho quando a tarefa atual foi cancelada"""
+
+
+def capacidade():
+    """Tarefas simultâneas aceitas por executar(): processos + fila"""
+    return settings.REPORT_POOL_WORKERS + settings.REPORT_POOL_MAX_QUEUE
+
+
+def limite_segundo_plano():
+    """Tarefas de submeter() no pool ao mesmo tempo"""
+    return max(1, settings.REPORT_POOL_BACKGROUND_MAX)
+
+
+def get_executor():
+    """Pool de processos do processo web atual (criado na primeira chamada)"""
+    with _executor_lock:
+        return _obter_executor()
+
+
+def _obter_executor():
+    global _executor, _marcas, _vagas_livres
+    if _executor is None:
+        contexto = multiprocessing.get_context('spawn')
+        _marcas = contexto.Array('b', capacidade(), lock=False)
+        _vagas_livres = list(range(capacidade()))
+        _executor = ProcessPoolExecutor(
+            max_workers=settings.REPORT_POOL_WORKERS,
+            mp_context=contexto,
+            initializer=_inicializar_worker,
+            initargs=(_marcas,),
+            max_tasks_per_child=settings.REPORT_POOL_MAX_TASKS_PER_CHILD or None,
+        )
+    return _executor
+
+
+def reiniciar():
+    """Descarta o pool atual; o próximo get_executor() cria outro"""
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+def aquecer():
+    """
+    Sobe todos os processos do pool agora (em segundo plano), em vez de na
+    primeira requisição de relatório
+    """
+    if settings.REPORT_POOL_EAGER:
+        return []
+    # Direto no pool: pela fila de submeter() os processos subiriam um por vez
+    with _executor_lock:
+        return [_submeter(None, os.getpid) for _ in range(settings.REPORT_POOL_WORKERS)]
+
+
+def em_andamento():
+    return _em_andamento
+
+
+def submeter(funcao, *args):
+    """
+    Envia uma tarefa de segundo plano para o pool (sem limite de fila: jobs e
+    lotes têm os seus próprios limites). Além de REPORT_POOL_BACKGROUND_MAX
+    tarefas no pool, ela espera na fila local; cancelar o Future nesse
+    período a descarta.
+
+    Com REPORT_POOL_EAGER a tarefa roda inline e o Future já volta resolvido
+    (útil em testes e em ambientes sem multiprocessing).
+    """
+    if settings.REPORT_POOL_EAGER:
+        return _executar_inline(funcao, *args)
+
+    future = Future()
+    with _executor_lock:
+        _fila_segundo_plano.append((future, funcao, args))
+        _liberar_segundo_plano()
+    return future
+
+
+def executar(funcao, *args, timeout=None, **kwargs):
+    """
+    Roda funcao(*args, **kwargs) no pool e espera o resultado. As etapas
+    medidas no processo filho entram na medição ativa (Server-Timing).
+
+    funcao pode ser o caminho pontilhado ('reports.services.x.f'): assim o
+    processo web não precisa importar pandas só para mandar a tarefa.
+
+    Raises:
+        PoolSaturado: sem vaga no pool
+        TempoEsgotado: passou de timeout segundos (a tarefa é cancelada)
+        Exception: o erro levantado pela própria funcao
+    """
+    if settings.REPORT_POOL_EAGER:
+        return _executar_inline(functools.partial(_resolver(funcao), **kwargs), *args).result()
+
+    future, vaga, marcas = _reservar(funcao, args, kwargs)
+    try:
+        resultado, etapas = future.result(timeout=timeout)
+    except FutureTimeoutError:
+        _cancelar(future, vaga, marcas)
+        logger.warning(f"Tarefa do pool cancelada após {timeout}s")
+        raise TempoEsgotado(f"A geração passou do limite de {timeout}s e foi cancelada.")
+
+    instrumentacao.incorporar(etapas)
+    return resultado
+
+
+async def executar_async(funcao, *args, timeout=None, **kwargs):
+    """
+    executar() para views assíncronas: espera o resultado sem bloquear o
+    event loop. Se a requisição for cancelada (cliente desconectou), a
+    tarefa no pool também é.
+    """
+    if settings.REPORT_POOL_EAGER:
+        return _executar_inline(functools.partial(_resolver(funcao), **kwargs), *args).result()
+
+    future, vaga, marcas = _reservar(funcao, args, kwargs)
+    try:
+        # shield: o timeout não deve cancelar o Future por baixo (_cancelar decide)
+        resultado, etapas = await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(future)), timeout)
+    except asyncio.TimeoutError:
+        _cancelar(future, vaga, marcas)
+        logger.warning(f"Tarefa do pool cancelada após {timeout}s")
+        raise TempoEsgotado(f"A geração passou do limite de {timeout}s e foi cancelada.")
+    except asyncio.CancelledError:
+        _cancelar(future, vaga, marcas)
+        raise
+
+    instrumentacao.incorporar(etapas)
+    return resultado
+
+
+def _reservar(funcao, args, kwargs):
+    """
+    Ocupa uma vaga e submete a tarefa
+
+    Returns:
+        tuple: (Future, vaga, marcas de cancelamento do pool atual)
+
+    Raises:
+        PoolSaturado: sem vaga no pool
+    """
+    global _sincronas
+    with _executor_lock:
+        _obter_executor()
+        if _sincronas >= capacidade() or not _vagas_livres:
+            raise PoolSaturado(f"Pool de relatórios ocupado ({_sincronas} gerações síncronas em andamento)")
+        vaga, marcas = _vagas_livres.pop(), _marcas
+        marcas[vaga] = 0
+        _sincronas += 1
+        try:
+            return _submeter(vaga, _executar_tarefa, vaga, funcao, args, kwargs), vaga, marcas
+        except Exception:
+            _sincronas -= 1
+            if marcas is _marcas:
+                _vagas_livres.append(vaga)
+            raise
+
+
+def _cancelar(future, vaga, marcas):
+    """Descarta a tarefa se ainda está na fila, senão marca para parar na próxima etapa"""
+    with _executor_lock:
+        # Com o lock, a vaga só volta para a lista depois da marca
+        if not future.cancel() and not future.done():
+            marcas[vaga] = 1
+
+
+def _submeter(vaga, funcao, *args):
+    """Submete com o lock já adquirido, contando a tarefa até ela terminar"""
+    global _em_andamento
+    marcas = _marcas
+    try:
+        future = _obter_executor().submit(funcao, *args)
+    except BrokenProcessPool:
+        # Um worker morreu (ex.: OOM); recria o pool e tenta de novo
+        logger.warning("Pool de relatórios quebrado, recriando")
+        _descartar_quebrado()
+        future = _obter_executor().submit(funcao, *args)
+    _em_andamento += 1
+    future.add_done_callback(functools.partial(_concluir, vaga, marcas))
+    return future
+
+
+def _liberar_segundo_plano():
+    """Com o lock já adquirido: passa da fila local para o pool o que couber"""
+    global _em_segundo_plano
+    while _fila_segundo_plano and _em_segundo_plano < limite_segundo_plano():
+        future, funcao, args = _fila_segundo_plano.popleft()
+        if not future.set_running_or_notify_cancel():
+            continue
+        _em_segundo_plano += 1
+        try:
+            interno = _submeter(None, funcao, *args)
+        except Exception as e:
+            _em_segundo_plano -= 1
+            future.set_exception(e)
+            continue
+        interno.add_done_callback(functools.partial(_concluir_segundo_plano, future))
+
+
+def _concluir_segundo_plano(future, interno):
+    global _em_segundo_plano
+    if interno.cancelled():
+        future.set_exception(CancelledError())
+    elif interno.exception() is not None:
+        future.set_exception(interno.exception())
+    else:
+        future.set_result(interno.result())
+    with _executor_lock:
+        _em_segundo_plano -= 1
+        _liberar_segundo_plano()
+
+
+def _descartar_quebrado():
+    global _executor
+    _executor.shutdown(wait=False, cancel_futures=True)
+    _executor = None
+
+
+def _concluir(vaga, marcas, future):
+    global _em_andamento, _sincronas
+    with _executor_lock:
+        _em_andamento -= 1
+        if vaga is not None:
+            _sincronas -= 1
+        # Vagas de um pool já descartado não voltam para o novo
+        if vaga is not None and marcas is _marcas:
+            _vagas_livres.append(vaga)
+
+
+def _executar_inline(funcao, *args):
+    future = Future()
+    try:
+        future.set_result(funcao(*args))
+    except Exception as e:
+        future.set_exception(e)
+    return future
+
+
+# Processo filho
+
+def _inicializar_worker(marcas):
+    """Configura o Django e importa de antemão tudo que a geração usa"""
+    global _marcas_worker
+    _marcas_worker = marcas
+
+    import django
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'auth_project.settings')
+    django.setup()
+
+    import numpy  # noqa: F401
+    import pandas  # noqa: F401
+    import xlsxwriter  # noqa: F401
+    from . import consolidado, lote, report_generator  # noqa: F401
+
+    instrumentacao.definir_verificador(verificar_cancelamento)
+
+
+def verificar_cancelamento():
+    """
+    Raises:
+        TarefaCancelada: a tarefa em execução neste processo foi cancelada
+    """
+    if _vaga_worker is not None and _marcas_worker[_vaga_worker]:
+        raise TarefaCancelada("Tarefa cancelada pelo processo web")
+
+
+def _resolver(funcao):
+    if isinstance(funcao, str):
+        from django.utils.module_loading import import_string
+        return import_string(funcao)
+    return funcao
+
+
+def _executar_tarefa(vaga, funcao, args, kwargs):
+    global _vaga_worker
+    _vaga_worker = vaga
+    try:
+        with instrumentacao.medir(publicar=False) as medicao:
+            resultado = _resolver(funcao)(*args, **kwargs)
+        return resultado, medicao.etapas
+    finally:
+        _vaga_worker = None
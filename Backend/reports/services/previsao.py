@@ -0,0 +1,252 @@
+"""
+Motor de tendência linear em NumPy
+
+Substitui os dois LinearRegression do scikit-learn por mínimos quadrados em
+forma fechada, resolvidos de uma vez para todas as séries (uma coluna por
+série). Para uma única variável (mes_sequencial), o LinearRegression faz
+exatamente isto: centraliza x e y e calcula
+
+    inclinacao = Σ(x - x̄)(y - ȳ) / Σ(x - x̄)²
+    intercepto = ȳ - inclinacao * x̄
+
+então os resultados batem com o scikit-learn dentro da tolerância de ponto
+flutuante, sem importar o sklearn no caminho da requisição.
+"""
+from dataclasses import dataclass
+
+import numpy as np
+
+# Séries previstas, na ordem das colunas da matriz Y
+SERIES = ('faturamento', 'despesas', 'qtd_vendas')
+
+
+@dataclass
+class Tendencia:
+    """Retas ajustadas: um coeficiente por série (arrays de shape (k,))"""
+    inclinacao: np.ndarray
+    intercepto: np.ndarray
+
+    def prever(self, meses):
+        """
+        Projeta as séries para os meses informados.
+
+        Returns:
+            np.ndarray: shape (len(meses), k)
+        """
+        meses = np.asarray(meses, dtype='float64')
+        return self.intercepto + np.outer(meses, self.inclinacao)
+
+    def prever_grupos(self, meses):
+        """
+        Projeta as séries de cada grupo (tendência de ajustar_tendencias_agrupadas).
+
+        Args:
+            meses: array (G, m) com os meses a prever de cada grupo
+
+        Returns:
+            np.ndarray: shape (G, m, k)
+        """
+        meses = np.asarray(meses, dtype='float64')
+        return self.intercepto[:, None, :] + meses[:, :, None] * self.inclinacao[:, None, :]
+
+
+def matriz_series(dados, series=SERIES):
+    """
+    Empilha as séries de um DataFrame (ou dict de arrays) numa matriz (n, k).
+
+    Mais barato que dados[list(series)].to_numpy(), que passa pelo
+    mecanismo de indexação do pandas.
+    """
+    return np.column_stack([np.asarray(dados[serie], dtype='float64') for serie in series])
+
+
+def ajustar_tendencias(x, Y):
+    """
+    Ajusta uma reta por coluna de Y em função de x, numa única passada.
+
+    Valores NaN em Y são ignorados apenas na coluna em que aparecem (cada
+    série usa as suas linhas válidas). Se todos os x forem iguais a
+    inclinação é 0 e o intercepto é a média, como no scikit-learn. Uma série
+    sem nenhum valor recebe coeficientes NaN, sem erro: quem usa a série
+    (faturamento e despesas, em calcular_previsao) é que valida os dados.
+
+    Args:
+        x: array (n,) com o mês sequencial
+        Y: array (n, k) com as séries
+
+    Returns:
+        Tendencia
+    """
+    x = np.asarray(x, dtype='float64')
+    Y = np.asarray(Y, dtype='float64')
+    if Y.ndim == 1:
+        Y = Y[:, None]
+
+    validos = ~np.isnan(Y)
+
+    if validos.all():
+        # Caminho comum (sem lacunas): um único produto matricial para todas as séries
+        media_x = x.mean()
+        media_y = Y.mean(axis=0)
+        xc = x - media_x
+        sxx = np.full(Y.shape[1], xc @ xc)
+        sxy = xc @ (Y - media_y)
+    else:
+        n = validos.sum(axis=0)
+
+        X = np.where(validos, x[:, None], 0.0)
+        Yz = np.where(validos, Y, 0.0)
+
+        with np.errstate(invalid='ignore', divide='ignore'):
+            # NaN nas séries com n == 0
+            media_x = X.sum(axis=0) / n
+            media_y = Yz.sum(axis=0) / n
+
+        xc = np.where(validos, x[:, None] - media_x, 0.0)
+        sxx = (xc * xc).sum(axis=0)
+        sxy = (xc * (Yz - media_y)).sum(axis=0)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        inclinacao = np.where(sxx > 0, sxy / sxx, 0.0)
+    inclinacao = np.where(np.isnan(media_y), np.nan, inclinacao)
+
+    return Tendencia(inclinacao=inclinacao, intercepto=media_y - inclinacao * media_x)
+
+
+class EstatisticasTendencia:
+    """
+    Estatísticas suficientes do ajuste de ajustar_tendencias, acumuladas bloco
+    a bloco: por série, n, médias de x e y e as somas centradas Sxx e Sxy.
+
+    Cada bloco é resumido em forma centrada e combinado com o acumulado pela
+    fórmula de Chan et al. (a versão em blocos do algoritmo de Welford), que
+    não perde precisão como Σx² - n·x̄² perderia com milhões de linhas. O
+    resultado de tendencia() é o mesmo de ajustar_tendencias sobre todas as
+    linhas juntas, dentro da tolerância de ponto flutuante.
+    """
+
+    def __init__(self, k=len(SERIES)):
+        self.n = np.zeros(k)
+        self.media_x = np.zeros(k)
+        self.media_y = np.zeros(k)
+        self.sxx = np.zeros(k)
+        self.sxy = np.zeros(k)
+
+    def adicionar(self, x, Y):
+        """Inclui um bloco de linhas (x: (n,), Y: (n, k)); NaN ignorado por série"""
+        x = np.asarray(x, dtype='float64')
+        Y = np.asarray(Y, dtype='float64')
+        if Y.ndim == 1:
+            Y = Y[:, None]
+
+        validos = ~np.isnan(Y)
+        n_b = validos.sum(axis=0).astype('float64')
+        if not n_b.any():
+            return
+
+        with np.errstate(invalid='ignore', divide='ignore'):
+            X = np.where(validos, x[:, None], 0.0)
+            media_x_b = np.where(n_b > 0, X.sum(axis=0) / n_b, 0.0)
+            media_y_b = np.where(n_b > 0, np.where(validos, Y, 0.0).sum(axis=0) / n_b, 0.0)
+        xc = np.where(validos, x[:, None] - media_x_b, 0.0)
+        yc = np.where(validos, Y - media_y_b, 0.0)
+        sxx_b = (xc * xc).sum(axis=0)
+        sxy_b = (xc * yc).sum(axis=0)
+
+        n = self.n + n_b
+        with np.errstate(invalid='ignore', divide='ignore'):
+            peso = np.where(n > 0, self.n * n_b / n, 0.0)
+            fracao = np.where(n > 0, n_b / n, 0.0)
+        delta_x = media_x_b - self.media_x
+        delta_y = media_y_b - self.media_y
+
+        self.sxx = self.sxx + sxx_b + delta_x * delta_x * peso
+        self.sxy = self.sxy + sxy_b + delta_x * delta_y * peso
+        self.media_x = self.media_x + delta_x * fracao
+        self.media_y = self.media_y + delta_y * fracao
+        self.n = n
+
+    def tendencia(self):
+        """Mesmas regras de ajustar_tendencias: coeficientes NaN nas séries sem nenhum valor"""
+        with np.errstate(invalid='ignore', divide='ignore'):
+            inclinacao = np.where(self.sxx > 0, self.sxy / self.sxx, 0.0)
+        vazias = self.n == 0
+        return Tendencia(
+            inclinacao=np.where(vazias, np.nan, inclinacao),
+            intercepto=np.where(vazias, np.nan, self.media_y - inclinacao * self.media_x),
+        )
+
+    def como_dict(self):
+        """Estado em tipos JSON (para guardar no banco, ver incremental.py)"""
+        return {nome: getattr(self, nome).tolist() for nome in ('n', 'media_x', 'media_y', 'sxx', 'sxy')}
+
+    @classmethod
+    def de_dict(cls, dados):
+        estatisticas = cls(len(dados['n']))
+        for nome in ('n', 'media_x', 'media_y', 'sxx', 'sxy'):
+            setattr(estatisticas, nome, np.array(dados[nome], dtype='float64'))
+        return estatisticas
+
+
+def ajustar_tendencias_agrupadas(grupos, x, Y, n_grupos=None):
+    """
+    Ajusta uma reta por (grupo, série) de uma só vez, sem laço por grupo.
+
+    As somas por grupo são feitas com np.bincount sobre índices planos
+    grupo * k + série, então o custo é O(n * k) independente do número de
+    grupos. Mesmas regras de ajustar_tendencias: NaN ignorado só na série em
+    que aparece e inclinação 0 quando todos os x do grupo são iguais.
+
+    Args:
+        grupos: array (n,) com o código inteiro (0..G-1) do grupo de cada linha
+        x: array (n,) com o mês sequencial
+        Y: array (n, k) com as séries
+        n_grupos: G (opcional; padrão grupos.max() + 1)
+
+    Returns:
+        Tendencia: inclinacao e intercepto com shape (G, k); NaN nos pares
+        (grupo, série) sem nenhum valor
+    """
+    grupos = np.asarray(grupos, dtype=np.intp)
+    x = np.asarray(x, dtype='float64')
+    Y = np.asarray(Y, dtype='float64')
+    if Y.ndim == 1:
+        Y = Y[:, None]
+
+    k = Y.shape[1]
+    if n_grupos is None:
+        n_grupos = int(grupos.max()) + 1 if len(grupos) else 0
+
+    indices = (grupos[:, None] * k + np.arange(k)).ravel()
+
+    def somar(valores):
+        return np.bincount(indices, weights=valores.ravel(), minlength=n_grupos * k).reshape(n_grupos, k)
+
+    validos = ~np.isnan(Y)
+    Yz = np.where(validos, Y, 0.0)
+    X = np.where(validos, x[:, None], 0.0)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        n = somar(validos.astype('float64'))
+        media_x = somar(X) / n
+        media_y = somar(Yz) / n
+
+        xc = np.where(validos, x[:, None] - media_x[grupos], 0.0)
+        sxx = somar(xc * xc)
+        sxy = somar(xc * (Yz - media_y[grupos]))
+
+        inclinacao = np.where(sxx > 0, sxy / sxx, 0.0)
+
+    return Tendencia(inclinacao=inclinacao, intercepto=media_y - inclinacao * media_x)
+
+
+def projetar_resultado(prev_faturamento, prev_despesas):
+    """
+    Trava as previsões em zero (não deixa ser negativo) e calcula o lucro.
+
+    Returns:
+        tuple: (faturamento, despesas, lucro) como arrays
+    """
+    faturamento = np.maximum(prev_faturamento, 0)
+    despesas = np.maximum(prev_despesas, 0)
+    return faturamento, despesas, faturamento - despesas
@@ -0,0 +1,194 @@
+"""
+Renderizadores da tabela final do relatório
+
+Cada renderizador grava a mesma tabela (histórico exibido + previsão) num
+formato diferente:
+
+- xlsx: relatório formatado original (R$, formatação condicional, 2 gráficos),
+  escrito por escrever_relatorio
+- xlsx-min: .xlsx sem formatação nem gráficos, em modo constant_memory
+- csv: texto, para integrações automáticas
+- parquet: colunar, para pipelines de dados (requer pyarrow)
+
+Novos formatos entram com registrar().
+"""
+import importlib.util
+import logging
+from dataclasses import dataclass
+from typing import Callable, Optional
+
+from .instrumentacao import etapa
+
+logger = logging.getLogger(__name__)
+
+COLUNAS_EXPORT = ['mes_sequencial', 'faturamento', 'despesas', 'lucro', 'tipo']
+TITULOS = ['Mês', 'Faturamento', 'Despesas', 'Lucro', 'Status']
+
+TIPO_XLSX = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+TIPO_CSV = 'text/csv'
+TIPO_PARQUET = 'application/vnd.apache.parquet'
+
+PADRAO = 'xlsx'
+
+
+@dataclass(frozen=True)
+class Renderizador:
+    """Formato de saída do relatório"""
+    nome: str
+    extensao: str
+    content_type: str
+    escrever: Callable  # (df_final, caminho_saida) -> caminho_saida
+    requer: Optional[str] = None  # módulo opcional necessário
+
+    def disponivel(self):
+        return self.requer is None or importlib.util.find_spec(self.requer) is not None
+
+
+RENDERIZADORES = {}
+
+
+def registrar(renderizador):
+    RENDERIZADORES[renderizador.nome] = renderizador
+    return renderizador
+
+
+def obter_renderizador(nome=None):
+    """
+    Raises:
+        ValueError: se o renderizador não existir ou não estiver disponível
+    """
+    nome = nome or PADRAO
+    renderizador = RENDERIZADORES.get(nome)
+    if renderizador is None:
+        raise ValueError(f"Formato de saída inválido: {nome}. Use: {', '.join(RENDERIZADORES)}")
+    if not renderizador.disponivel():
+        raise ValueError(f"Formato de saída {nome} indisponível: {renderizador.requer} não está instalado no servidor.")
+    return renderizador
+
+
+def escrever_relatorio(df_final, caminho_saida):
+    """
+    Renderizador xlsx (padrão): grava a tabela final no Excel formatado, com
+    os dois gráficos.
+
+    Returns:
+        str: caminho_saida
+
+    Raises:
+        ValueError: Se o arquivo Excel não puder ser gerado
+    """
+    import pandas as pd
+
+    logger.info(f"Salvando relatório: {caminho_saida}")
+
+    try:
+        # render: planilha, estilos e gráficos montados em memória;
+        # write: serialização do .xlsx (XML + zip) no disco
+        with etapa('render', linhas=len(df_final)):
+            writer = pd.ExcelWriter(caminho_saida, engine='xlsxwriter')
+            sheet = 'Relatório IA'
+            df_final.to_excel(writer, sheet_name=sheet, startrow=1, header=False, index=False)
+
+            wb = writer.book
+            ws = writer.sheets[sheet]
+
+            # Estilos - Idênticos ao arquivo original
+            fmt_head = wb.add_format({'bold': True, 'font_color': 'white', 'bg_color': '#4A235A', 'align': 'center', 'border': 1})
+            fmt_money = wb.add_format({'num_format': 'R$ #,##0.00'})
+            fmt_prev = wb.add_format({'bg_color': '#D7BDE2', 'italic': True})
+            fmt_lucro_pos = wb.add_format({'num_format': 'R$ #,##0.00', 'font_color': 'green', 'bold': True})
+            fmt_lucro_neg = wb.add_format({'num_format': 'R$ #,##0.00', 'font_color': 'red', 'bold': True})
+
+            for i, t in enumerate(TITULOS):
+                ws.write(0, i, t, fmt_head)
+
+            ws.set_column('B:D', 18, fmt_money)
+            # Formatação condicional - Idêntica ao original
+            ws.conditional_format(f'A2:E{len(df_final)+1}', {'type': 'formula', 'criteria': '=$E2="Previsão"', 'format': fmt_prev})
+            ws.conditional_format(f'D2:D{len(df_final)+1}', {'type': 'cell', 'criteria': '>', 'value': 0, 'format': fmt_lucro_pos})
+            ws.conditional_format(f'D2:D{len(df_final)+1}', {'type': 'cell', 'criteria': '<', 'value': 0, 'format': fmt_lucro_neg})
+
+            # Gráficos - Idênticos ao arquivo original
+            chart1 = wb.add_chart({'type': 'column'})
+            chart1.add_series({'name': 'Faturamento', 'categories': [sheet, 1, 0, len(df_final), 0], 'values': [sheet, 1, 1, len(df_final), 1], 'fill': {'color': '#5DADE2'}})
+            chart1.add_series({'name': 'Despesas', 'values': [sheet, 1, 2, len(df_final), 2], 'fill': {'color': '#E74C3C'}})
+            chart1.set_title({'name': 'Faturamento vs Despesas'})
+            ws.insert_chart('G2', chart1)
+
+            chart2 = wb.add_chart({'type': 'line'})
+            chart2.add_series({'name': 'Lucro', 'categories': [sheet, 1, 0, len(df_final), 0], 'values': [sheet, 1, 3, len(df_final), 3], 'line': {'color': '#229954', 'width': 3}})
+            chart2.set_title({'name': 'Evolução do Lucro'})
+            ws.insert_chart('G21', chart2)
+
+        with etapa('write', linhas=len(df_final)):
+            writer.close()
+        logger.info(f"Relatório gerado com sucesso: {caminho_saida}")
+
+        return caminho_saida
+
+    except Exception as e:
+        logger.error(f"Erro ao salvar relatório: {e}")
+        raise ValueError(f"Erro ao gerar arquivo Excel: {str(e)}")
+
+
+def _tabela_simples(df_final):
+    """Tabela final com o mês como inteiro (sem o .0 do float)"""
+    df = df_final[COLUNAS_EXPORT].copy()
+    df['mes_sequencial'] = df['mes_sequencial'].astype('int64')
+    return df
+
+
+def _xlsx_simples(df_final, caminho_saida):
+    """
+    .xlsx só com os dados: sem estilos, formatação condicional nem gráficos.
+
+    Em constant_memory o xlsxwriter grava cada linha no disco assim que a
+    próxima começa, em vez de manter a planilha inteira em memória.
+    """
+    import xlsxwriter
+
+    try:
+        with etapa('render', linhas=len(df_final)):
+            df = _tabela_simples(df_final)
+        # Em constant_memory as linhas já vão para o disco durante a escrita
+        with etapa('write', linhas=len(df)):
+            wb = xlsxwriter.Workbook(caminho_saida, {'constant_memory': True})
+            ws = wb.add_worksheet('Relatório IA')
+            ws.write_row(0, 0, TITULOS)
+            for linha, valores in enumerate(zip(*(df[coluna].tolist() for coluna in COLUNAS_EXPORT)), start=1):
+                ws.write_row(linha, 0, valores)
+            wb.close()
+        return caminho_saida
+    except Exception as e:
+        logger.error(f"Erro ao salvar relatório: {e}")
+        raise ValueError(f"Erro ao gerar arquivo Excel: {str(e)}")
+
+
+def _csv(df_final, caminho_saida):
+    try:
+        with etapa('render', linhas=len(df_final)):
+            df = _tabela_simples(df_final)
+        with etapa('write', linhas=len(df)):
+            df.to_csv(caminho_saida, index=False, encoding='utf-8')
+        return caminho_saida
+    except Exception as e:
+        logger.error(f"Erro ao salvar relatório: {e}")
+        raise ValueError(f"Erro ao gerar arquivo CSV: {str(e)}")
+
+
+def _parquet(df_final, caminho_saida):
+    try:
+        with etapa('render', linhas=len(df_final)):
+            df = _tabela_simples(df_final)
+        with etapa('write', linhas=len(df)):
+            df.to_parquet(caminho_saida, index=False, engine='pyarrow')
+        return caminho_saida
+    except Exception as e:
+        logger.error(f"Erro ao salvar relatório: {e}")
+        raise ValueError(f"Erro ao gerar arquivo Parquet: {str(e)}")
+
+
+registrar(Renderizador('xlsx', '.xlsx', TIPO_XLSX, escrever_relatorio))
+registrar(Renderizador('xlsx-min', '.xlsx', TIPO_XLSX, _xlsx_simples))
+registrar(Renderizador('csv', '.csv', TIPO_CSV, _csv))
+registrar(Renderizador('parquet', '.parquet', TIPO_PARQUET, _parquet, requer='pyarrow'))
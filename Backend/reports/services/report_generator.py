@@ -3,13 +3,17 @@ Serviço de geração de relatório financeiro usando IA (Machine Learning)
 Baseado em IA/app_ia_v12.py - Refatorado para funcionar como módulo Django
 Removida dependência de Tkinter e adaptado para uso em backend web
 """
+import numpy as np
 import pandas as pd
-from sklearn.linear_model import LinearRegression
 import os
 from pathlib import Path
 import warnings
 from datetime import datetime
 import logging
+from .ingestao import ler_planilha
+from .instrumentacao import etapa, medir
+from .previsao import SERIES, ajustar_tendencias, matriz_series, projetar_resultado
+from .renderizadores import obter_renderizador
 
 # Configurar logging
 logger = logging.getLogger(__name__)
@@ -17,8 +21,24 @@ logger = logging.getLogger(__name__)
 # Ignora avisos técnicos irrelevantes
 warnings.filterwarnings("ignore")
 
+# Versão da lógica de geração. Incrementar sempre que cálculos ou layout do
+# Excel mudarem, para invalidar os relatórios já guardados em cache.
+#   2: tendência por mínimos quadrados em NumPy (previsao.py) no lugar do sklearn
+#   3: gravação pelos renderizadores (renderizadores.py)
+#   4: CSVs grandes previstos em blocos (blocos.py)
+VERSAO_GERADOR = '4'
 
-def gerar_relatorio(caminho_arquivo_entrada: str, caminho_saida: str = None) -> str:
+# Quantidade de meses históricos exibidos e de meses previstos
+JANELA_HISTORICO = 48
+MESES_PREVISAO = 3
+
+# CSVs acima deste tamanho são processados em blocos (ver blocos.py), com
+# memória constante em vez de proporcional ao arquivo
+LIMIAR_BLOCOS = 16 * 1024 * 1024
+
+
+def gerar_relatorio(caminho_arquivo_entrada, caminho_saida: str = None, nome_arquivo: str = None,
+                    renderizador: str = None, em_blocos: bool = None) -> str:
     """
     Função baseada em processar_previsao_final() do arquivo original IA/app_ia_v12.py
     Refatorada para funcionar como módulo Django sem Tkinter
@@ -26,14 +46,27 @@ def gerar_relatorio(caminho_arquivo_entrada: str, caminho_saida: str = None) ->
     Mantém TODA a lógica original:
     - Mesma leitura de arquivo (pula 2 linhas)
     - Mesmo mapeamento de colunas
-    - Mesmos cálculos ML (LinearRegression)
+    - Mesmos cálculos (regressão linear, resolvida em NumPy - ver previsao.py)
     - Mesmas previsões (próximos 3 meses)
     - Mesma formatação Excel
     - Mesmos gráficos
     
     Args:
-        caminho_arquivo_entrada: Caminho completo do arquivo Excel/CSV de entrada
-        caminho_saida: Caminho onde salvar o relatório (opcional)
+        caminho_arquivo_entrada: Caminho do arquivo Excel/CSV de entrada, ou um
+            objeto arquivo já aberto (ex.: o UploadedFile do Django), que é lido
+            direto sem passar pelo disco
+        caminho_saida: Caminho onde salvar o relatório (opcional para caminhos,
+            obrigatório quando a entrada é um objeto arquivo)
+        nome_arquivo: Nome original do arquivo, usado para identificar o formato
+            quando a entrada é um objeto arquivo
+        renderizador: Formato de saída (ver renderizadores.py); padrão 'xlsx',
+            o relatório formatado com gráficos
+        em_blocos: lê o CSV em blocos, com memória constante (padrão: só
+            CSVs acima de LIMIAR_BLOCOS)
+    
+    Cada etapa (read, normalize, fit, predict, assemble, render, write) é
+    medida por instrumentacao.py; quem chama pode abrir `medir()` antes para
+    ler os números (ex.: o cabeçalho Server-Timing da view).
     
     Returns:
         str: Caminho completo do arquivo gerado
@@ -45,149 +78,170 @@ def gerar_relatorio(caminho_arquivo_entrada: str, caminho_saida: str = None) ->
     if not caminho_arquivo_entrada:
         raise ValueError("Caminho do arquivo de entrada não fornecido")
     
-    if not os.path.exists(caminho_arquivo_entrada):
-        raise FileNotFoundError(f"Arquivo não encontrado: {caminho_arquivo_entrada}")
+    saida = obter_renderizador(renderizador)
     
-    logger.info(f"Processando arquivo: {os.path.basename(caminho_arquivo_entrada)}")
+    em_memoria = hasattr(caminho_arquivo_entrada, 'read')
     
-    # 1. Leitura (Pula as 2 primeiras linhas de cabeçalho 'sujo')
-    try:
-        if caminho_arquivo_entrada.endswith('.csv'):
-            df = pd.read_csv(caminho_arquivo_entrada, header=2)
-        else:
-            df = pd.read_excel(caminho_arquivo_entrada, header=2)
-    except Exception as e:
-        logger.error(f"Erro ao ler arquivo: {e}")
-        raise ValueError(f"Erro ao abrir arquivo: {str(e)}")
+    if em_memoria:
+        nome_arquivo = nome_arquivo or getattr(caminho_arquivo_entrada, 'name', None)
+        if not nome_arquivo:
+            raise ValueError("Nome do arquivo não fornecido para a entrada em memória")
+        if not caminho_saida:
+            raise ValueError("Caminho de saída é obrigatório quando a entrada não é um caminho em disco")
+        caminho_arquivo_entrada.seek(0)
+    else:
+        if not os.path.exists(caminho_arquivo_entrada):
+            raise FileNotFoundError(f"Arquivo não encontrado: {caminho_arquivo_entrada}")
+        nome_arquivo = nome_arquivo or caminho_arquivo_entrada
     
-    # Limpeza dos nomes das colunas
-    df.columns = [str(c).strip().lower() for c in df.columns]
+    logger.info(f"Processando arquivo: {os.path.basename(nome_arquivo)}")
     
-    # 2. Mapeamento
-    mapa_colunas = {
-        'mes_sequencial': 'mes_sequencial',
-        'faturamento': 'faturamento',
-        'custos_totais': 'despesas',
-        'total_vendas': 'qtd_vendas'
-    }
+    # 5. SALVAMENTO COM DATA E HORA
+    if not caminho_saida:
+        # Criar diretório temporário se não existir
+        pasta_temp = os.path.join(os.path.dirname(caminho_arquivo_entrada), 'temp')
+        os.makedirs(pasta_temp, exist_ok=True)
+        
+        nome_base = os.path.splitext(os.path.basename(caminho_arquivo_entrada))[0]
+        data_hora = datetime.now().strftime("%d-%m-%Y_%H-%M-%S")
+        nome_saida = f"Relatorio_IA_{nome_base}_{data_hora}{saida.extensao}"
+        caminho_saida = os.path.join(pasta_temp, nome_saida)
     
-    # Verificar se todas as colunas necessárias existem
-    colunas_faltantes = [col for col in mapa_colunas.keys() if col not in df.columns]
-    if colunas_faltantes:
-        logger.error(f"Colunas não encontradas: {colunas_faltantes}")
-        raise ValueError(f"Colunas obrigatórias não encontradas na linha 3: {', '.join(colunas_faltantes)}")
+    with medir('relatorio'):
+        df_final, _ = preparar_previsao(caminho_arquivo_entrada, nome_arquivo, em_blocos)
+        return saida.escrever(df_final, caminho_saida)
+
+
+def preparar_previsao(entrada, nome_arquivo=None, em_blocos=None):
+    """
+    Lê a entrada e calcula a tabela final, em blocos para CSVs grandes.
     
-    df = df.rename(columns=mapa_colunas)
+    Returns:
+        tuple: (df_final, registros válidos)
     
-    # Converte tudo para número
-    for col in ['mes_sequencial', 'faturamento', 'despesas', 'qtd_vendas']:
-        df[col] = pd.to_numeric(df[col], errors='coerce')
+    Raises:
+        ValueError: Se o arquivo não puder ser processado
+    """
+    nome_arquivo = nome_arquivo or getattr(entrada, 'name', None) or str(entrada)
+    if em_blocos is None:
+        em_blocos = deve_ler_em_blocos(entrada, nome_arquivo)
+    
+    if em_blocos:
+        from .blocos import calcular_previsao_em_blocos
+        return calcular_previsao_em_blocos(entrada)
+    
+    df_limpo = carregar_dados(entrada, nome_arquivo)
+    return calcular_previsao(df_limpo), len(df_limpo)
+
+
+def deve_ler_em_blocos(entrada, nome_arquivo):
+    """Só CSV pode ser lido em blocos; vale a pena acima de LIMIAR_BLOCOS"""
+    if os.path.splitext(str(nome_arquivo).lower())[1] != '.csv':
+        return False
+    if hasattr(entrada, 'read'):
+        tamanho = getattr(entrada, 'size', None)
+        if tamanho is None:
+            posicao = entrada.tell()
+            tamanho = entrada.seek(0, os.SEEK_END)
+            entrada.seek(posicao)
+    else:
+        tamanho = os.path.getsize(entrada)
+    return tamanho > LIMIAR_BLOCOS
+
+
+def carregar_dados(entrada, nome_arquivo=None):
+    """
+    Lê a planilha e descarta as linhas sem mês ou faturamento.
     
-    df_limpo = df.dropna(subset=['mes_sequencial', 'faturamento'])
+    Returns:
+        pd.DataFrame: registros válidos (mes_sequencial, faturamento, despesas, qtd_vendas)
+    
+    Raises:
+        ValueError: Se o arquivo não puder ser lido ou tiver menos de 2 registros válidos
+    """
+    # 1. Leitura (Pula as 2 primeiras linhas de cabeçalho 'sujo')
+    # 2. Mapeamento e conversão para número, feitos já na leitura
+    # (somente as colunas mapeadas, com dtype float64) - ver ingestao.py
+    with etapa('read') as leitura:
+        df = ler_planilha(entrada, nome_arquivo)
+        leitura.linhas = len(df)
+    
+    with etapa('normalize', linhas=len(df)):
+        df_limpo = df.dropna(subset=['mes_sequencial', 'faturamento'])
     
     if len(df_limpo) < 2:
         raise ValueError("Poucos dados para análise. É necessário pelo menos 2 registros válidos.")
     
     logger.info(f"Dados processados: {len(df_limpo)} registros válidos")
+    return df_limpo
+
+
+def calcular_previsao(df_limpo):
+    """
+    Ajusta as tendências e monta a tabela final: últimos JANELA_HISTORICO
+    meses do histórico seguidos dos MESES_PREVISAO meses previstos.
     
-    # 3. Cálculos e IA (Machine Learning)
-    X = df_limpo[['mes_sequencial']]
+    Returns:
+        pd.DataFrame: colunas mes_sequencial, faturamento, despesas, lucro, tipo
     
+    Raises:
+        ValueError: Se o ajuste não puder ser feito
+    """
+    # 3. Cálculos e IA (tendência linear por mínimos quadrados, ver previsao.py)
+    # Faturamento, despesas e quantidade de vendas são ajustados de uma vez
     try:
-        model_fat = LinearRegression().fit(X, df_limpo['faturamento'])
-        model_desp = LinearRegression().fit(X, df_limpo['despesas'])
+        with etapa('fit', linhas=len(df_limpo)):
+            if df_limpo['despesas'].isna().any():
+                raise ValueError("A coluna custos_totais contém valores vazios ou não numéricos")
+            tendencia = ajustar_tendencias(df_limpo['mes_sequencial'].to_numpy(), matriz_series(df_limpo))
     except Exception as e:
         logger.error(f"Erro ao treinar modelos: {e}")
         raise ValueError(f"Erro ao processar dados com IA: {str(e)}")
     
-    # Previsão Futura
     ultimo_mes = int(df_limpo['mes_sequencial'].max())
+    return montar_previsao(tendencia, ultimo_mes, df_limpo.tail(JANELA_HISTORICO))
+
+
+def montar_previsao(tendencia, ultimo_mes, df_historico):
+    """
+    Projeta os MESES_PREVISAO meses seguintes a ultimo_mes e monta a tabela
+    final com o histórico exibido.
     
-    # Cria input futuro
-    df_futuro_input = pd.DataFrame({
-        'mes_sequencial': [ultimo_mes + 1, ultimo_mes + 2, ultimo_mes + 3]
-    })
-    
-    prev_fat_bruto = model_fat.predict(df_futuro_input[['mes_sequencial']])
-    prev_desp_bruto = model_desp.predict(df_futuro_input[['mes_sequencial']])
-    
-    # Trava (Não deixa ser negativo) - Lógica idêntica ao original
-    prev_fat = [max(0, valor) for valor in prev_fat_bruto]
-    prev_desp = [max(0, valor) for valor in prev_desp_bruto]
-    prev_lucro = [f - d for f, d in zip(prev_fat, prev_desp)]
-    
-    # 4. Monta Dados Finais
-    df_futuro = pd.DataFrame({
-        'mes_sequencial': df_futuro_input['mes_sequencial'],
-        'faturamento': prev_fat,
-        'despesas': prev_desp,
-        'lucro': prev_lucro,
-        'tipo': 'Previsão'
-    })
-    
-    df_visual = df_limpo.tail(48).copy()
-    df_visual['lucro'] = df_visual['faturamento'] - df_visual['despesas']
-    df_visual['tipo'] = 'Histórico'
-    
-    cols_export = ['mes_sequencial', 'faturamento', 'despesas', 'lucro', 'tipo']
-    df_final = pd.concat([df_visual[cols_export], df_futuro[cols_export]], ignore_index=True)
-    
-    # 5. SALVAMENTO COM DATA E HORA
-    if not caminho_saida:
-        # Criar diretório temporário se não existir
-        pasta_temp = os.path.join(os.path.dirname(caminho_arquivo_entrada), 'temp')
-        os.makedirs(pasta_temp, exist_ok=True)
-        
-        nome_base = os.path.splitext(os.path.basename(caminho_arquivo_entrada))[0]
-        data_hora = datetime.now().strftime("%d-%m-%Y_%H-%M-%S")
-        nome_saida = f"Relatorio_IA_{nome_base}_{data_hora}.xlsx"
-        caminho_saida = os.path.join(pasta_temp, nome_saida)
-    
-    logger.info(f"Salvando relatório: {caminho_saida}")
+    Args:
+        tendencia: retas ajustadas (previsao.Tendencia)
+        ultimo_mes: maior mes_sequencial do histórico
+        df_historico: últimos JANELA_HISTORICO registros válidos
     
-    try:
-        writer = pd.ExcelWriter(caminho_saida, engine='xlsxwriter')
-        sheet = 'Relatório IA'
-        df_final.to_excel(writer, sheet_name=sheet, startrow=1, header=False, index=False)
-        
-        wb = writer.book
-        ws = writer.sheets[sheet]
-        
-        # Estilos - Idênticos ao arquivo original
-        fmt_head = wb.add_format({'bold': True, 'font_color': 'white', 'bg_color': '#4A235A', 'align': 'center', 'border': 1})
-        fmt_money = wb.add_format({'num_format': 'R$ #,##0.00'})
-        fmt_prev = wb.add_format({'bg_color': '#D7BDE2', 'italic': True})
-        fmt_lucro_pos = wb.add_format({'num_format': 'R$ #,##0.00', 'font_color': 'green', 'bold': True})
-        fmt_lucro_neg = wb.add_format({'num_format': 'R$ #,##0.00', 'font_color': 'red', 'bold': True})
-        
-        titulos = ['Mês', 'Faturamento', 'Despesas', 'Lucro', 'Status']
-        for i, t in enumerate(titulos):
-            ws.write(0, i, t, fmt_head)
-        
-        ws.set_column('B:D', 18, fmt_money)
-        # Formatação condicional - Idêntica ao original
-        ws.conditional_format(f'A2:E{len(df_final)+1}', {'type': 'formula', 'criteria': '=$E2="Previsão"', 'format': fmt_prev})
-        ws.conditional_format(f'D2:D{len(df_final)+1}', {'type': 'cell', 'criteria': '>', 'value': 0, 'format': fmt_lucro_pos})
-        ws.conditional_format(f'D2:D{len(df_final)+1}', {'type': 'cell', 'criteria': '<', 'value': 0, 'format': fmt_lucro_neg})
-        
-        # Gráficos - Idênticos ao arquivo original
-        chart1 = wb.add_chart({'type': 'column'})
-        chart1.add_series({'name': 'Faturamento', 'categories': [sheet, 1, 0, len(df_final), 0], 'values': [sheet, 1, 1, len(df_final), 1], 'fill': {'color': '#5DADE2'}})
-        chart1.add_series({'name': 'Despesas', 'values': [sheet, 1, 2, len(df_final), 2], 'fill': {'color': '#E74C3C'}})
-        chart1.set_title({'name': 'Faturamento vs Despesas'})
-        ws.insert_chart('G2', chart1)
+    Returns:
+        pd.DataFrame: colunas mes_sequencial, faturamento, despesas, lucro, tipo
+    """
+    with etapa('predict', linhas=MESES_PREVISAO):
+        # Previsão Futura
+        meses_futuros = np.arange(ultimo_mes + 1, ultimo_mes + MESES_PREVISAO + 1)
         
-        chart2 = wb.add_chart({'type': 'line'})
-        chart2.add_series({'name': 'Lucro', 'categories': [sheet, 1, 0, len(df_final), 0], 'values': [sheet, 1, 3, len(df_final), 3], 'line': {'color': '#229954', 'width': 3}})
-        chart2.set_title({'name': 'Evolução do Lucro'})
-        ws.insert_chart('G21', chart2)
+        previsao_bruta = tendencia.prever(meses_futuros)
         
-        writer.close()
-        logger.info(f"Relatório gerado com sucesso: {caminho_saida}")
+        # Trava (Não deixa ser negativo) - mesma regra do original, vetorizada
+        prev_fat, prev_desp, prev_lucro = projetar_resultado(
+            previsao_bruta[:, SERIES.index('faturamento')],
+            previsao_bruta[:, SERIES.index('despesas')]
+        )
+    
+    # 4. Monta Dados Finais
+    with etapa('assemble') as montagem:
+        df_futuro = pd.DataFrame({
+            'mes_sequencial': meses_futuros,
+            'faturamento': prev_fat,
+            'despesas': prev_desp,
+            'lucro': prev_lucro,
+            'tipo': 'Previsão'
+        })
         
-        return caminho_saida
+        df_visual = df_historico.copy()
+        df_visual['lucro'] = df_visual['faturamento'] - df_visual['despesas']
+        df_visual['tipo'] = 'Histórico'
         
-    except Exception as e:
-        logger.error(f"Erro ao salvar relatório: {e}")
-        raise ValueError(f"Erro ao gerar arquivo Excel: {str(e)}")
-
+        cols_export = ['mes_sequencial', 'faturamento', 'despesas', 'lucro', 'tipo']
+        df_final = pd.concat([df_visual[cols_export], df_futuro[cols_export]], ignore_index=True)
+        montagem.linhas = len(df_final)
+    return df_final
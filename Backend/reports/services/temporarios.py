@@ -0,0 +1,258 @@
+"""
+Arquivos temporários dos relatórios em MEDIA_ROOT/temp
+
+- caminho_unico(): nome com sufixo aleatório, para dois uploads simultâneos
+  do mesmo usuário com o mesmo nome de arquivo não gravarem no mesmo lugar
+- RespostaTemporaria: FileResponse que apaga o arquivo no close(), chamado
+  pelo servidor depois que a resposta terminou de ser enviada
+  (RespostaArquivoAssincrona é o equivalente das views assíncronas)
+- limpar_temporarios(): remove o que ficou para trás (processo morto,
+  cliente que desconectou antes do close) por idade e, acima da cota
+  REPORT_TEMP_MAX_BYTES, os mais antigos primeiro. Roda pelo comando
+  clean_report_temp e, no máximo a cada REPORT_TEMP_REAP_INTERVAL, numa
+  thread disparada pelas próprias views (agendar_limpeza)
+
+Nada mais novo que REPORT_TEMP_MIN_AGE é removido: pode ser um relatório
+ainda sendo gerado ou uma pasta de lote em andamento.
+
+Espaço recuperado vai para o /metrics em report_temp_removed_files_total e
+report_temp_reclaimed_bytes_total (rótulo origem: resposta ou limpeza).
+"""
+import asyncio
+import logging
+import os
+import shutil
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+
+from django.conf import settings
+from django.http import FileResponse, StreamingHttpResponse
+
+logger = logging.getLogger(__name__)
+
+ORIGEM_RESPOSTA = 'resposta'
+ORIGEM_LIMPEZA = 'limpeza'
+
+# Bloco lido por vez no envio assíncrono
+TAMANHO_BLOCO = 256 * 1024
+
+_ultima_limpeza = 0.0
+_limpeza_lock = threading.Lock()
+
+
+def pasta_temp():
+    return os.path.join(settings.MEDIA_ROOT, 'temp')
+
+
+def caminho_unico(nome, extensao):
+    """Caminho novo em pasta_temp() (cria a pasta se preciso)"""
+    pasta = pasta_temp()
+    os.makedirs(pasta, exist_ok=True)
+    return os.path.join(pasta, f"{nome}_{uuid.uuid4().hex[:12]}{extensao}")
+
+
+class RespostaTemporaria(FileResponse):
+    """FileResponse de um arquivo temporário, removido ao fim do envio"""
+
+    def __init__(self, caminho, *args, **kwargs):
+        self.caminho_temporario = caminho
+        super().__init__(open(caminho, 'rb'), *args, **kwargs)
+
+    def close(self):
+        try:
+            super().close()
+        finally:
+            remover_enviado(self.caminho_temporario)
+
+
+class RespostaArquivoAssincrona(StreamingHttpResponse):
+    """
+    Envio de arquivo pelas views assíncronas: cada bloco é lido numa thread,
+    sem segurar o event loop. Sob ASGI o FileResponse seria consumido inteiro
+    em memória antes do envio (iterador síncrono).
+
+    arquivo é um caminho ou um arquivo binário já aberto (fechado ao fim do
+    envio); temporario=True apaga o caminho ao fim do envio, como
+    RespostaTemporaria.
+    """
+
+    def __init__(self, arquivo, *args, temporario=False, **kwargs):
+        self.caminho_temporario = arquivo if temporario else None
+        aberto = not isinstance(arquivo, (str, os.PathLike))
+        tamanho = os.fstat(arquivo.fileno()).st_size if aberto else os.path.getsize(arquivo)
+        super().__init__(_ler_em_blocos(arquivo), *args, **kwargs)
+        if aberto:
+            # Fecha também se o envio nem começar (cliente desconectou)
+            self._resource_closers.append(arquivo.close)
+        self['Content-Length'] = tamanho
+
+    def close(self):
+        try:
+            super().close()
+        finally:
+            if self.caminho_temporario:
+                remover_enviado(self.caminho_temporario)
+
+
+async def _ler_em_blocos(arquivo):
+    if isinstance(arquivo, (str, os.PathLike)):
+        arquivo = await asyncio.to_thread(open, arquivo, 'rb')
+    try:
+        while bloco := await asyncio.to_thread(arquivo.read, TAMANHO_BLOCO):
+            yield bloco
+    finally:
+        arquivo.close()
+
+
+def remover_enviado(caminho):
+    """Remove o arquivo de uma resposta já enviada (registrado nas métricas)"""
+    try:
+        tamanho = os.path.getsize(caminho)
+        os.remove(caminho)
+    except FileNotFoundError:
+        pass
+    except OSError as e:
+        logger.warning(f"Erro ao remover arquivo temporário {caminho}: {e}")
+    else:
+        logger.info(f"Arquivo temporário removido: {caminho}")
+        _registrar(ORIGEM_RESPOSTA, 1, tamanho)
+
+
+@dataclass
+class ResultadoLimpeza:
+    removidos: int = 0
+    bytes_removidos: int = 0
+    restantes: int = 0
+    bytes_restantes: int = 0
+
+
+def limpar_temporarios(idade_maxima=None, limite_bytes=None, idade_minima=None, agora=None, pasta=None):
+    """
+    Remove de pasta (padrão: pasta_temp()) os itens (arquivos ou pastas de lote) mais velhos
+    que idade_maxima e, se o total ainda passar de limite_bytes, os mais
+    antigos até caber. Padrões: REPORT_TEMP_MAX_AGE, REPORT_TEMP_MAX_BYTES e
+    REPORT_TEMP_MIN_AGE (segundos/bytes).
+
+    Returns:
+        ResultadoLimpeza
+    """
+    idade_maxima = settings.REPORT_TEMP_MAX_AGE if idade_maxima is None else idade_maxima
+    limite_bytes = settings.REPORT_TEMP_MAX_BYTES if limite_bytes is None else limite_bytes
+    idade_minima = settings.REPORT_TEMP_MIN_AGE if idade_minima is None else idade_minima
+    agora = time.time() if agora is None else agora
+
+    # (modificado, tamanho, caminho), do mais antigo para o mais novo
+    itens = sorted(_listar(pasta or pasta_temp()))
+    total = sum(tamanho for _, tamanho, _ in itens)
+    resultado = ResultadoLimpeza()
+
+    for modificado, tamanho, caminho in itens:
+        idade = agora - modificado
+        if idade < idade_minima:
+            break
+        if idade <= idade_maxima and total <= limite_bytes:
+            break
+        if _remover(caminho):
+            resultado.removidos += 1
+            resultado.bytes_removidos += tamanho
+            total -= tamanho
+
+    resultado.restantes = len(itens) - resultado.removidos
+    resultado.bytes_restantes = total
+    if resultado.removidos:
+        logger.info(
+            f"Limpeza de temporários: {resultado.removidos} item(ns), "
+            f"{resultado.bytes_removidos / (1024 * 1024):.1f}MB recuperados"
+        )
+        _registrar(ORIGEM_LIMPEZA, resultado.removidos, resultado.bytes_removidos)
+    return resultado
+
+
+def agendar_limpeza():
+    """Dispara limpar_temporarios numa thread, no máximo a cada REPORT_TEMP_REAP_INTERVAL"""
+    global _ultima_limpeza
+    intervalo = settings.REPORT_TEMP_REAP_INTERVAL
+    if not intervalo:
+        return
+    with _limpeza_lock:
+        agora = time.monotonic()
+        if _ultima_limpeza and agora - _ultima_limpeza < intervalo:
+            return
+        _ultima_limpeza = agora
+    # Configuração lida aqui, na thread da requisição, e não na thread nova
+    parametros = {
+        'idade_maxima': settings.REPORT_TEMP_MAX_AGE,
+        'limite_bytes': settings.REPORT_TEMP_MAX_BYTES,
+        'idade_minima': settings.REPORT_TEMP_MIN_AGE,
+        'pasta': pasta_temp(),
+    }
+    threading.Thread(
+        target=_limpar_em_segundo_plano, kwargs=parametros, name='limpeza-temporarios', daemon=True
+    ).start()
+
+
+def _limpar_em_segundo_plano(**parametros):
+    try:
+        limpar_temporarios(**parametros)
+    except Exception as e:
+        logger.warning(f"Erro na limpeza de temporários: {e}")
+
+
+def _listar(pasta):
+    try:
+        entradas = list(os.scandir(pasta))
+    except FileNotFoundError:
+        return
+    for entrada in entradas:
+        try:
+            if entrada.is_dir(follow_symlinks=False):
+                yield (*_medir_pasta(entrada.path), entrada.path)
+            else:
+                info = entrada.stat(follow_symlinks=False)
+                yield info.st_mtime, info.st_size, entrada.path
+        except FileNotFoundError:
+            continue  # removido por outro processo durante a listagem
+
+
+def _medir_pasta(caminho):
+    """(modificação mais recente, bytes) de uma pasta e de tudo dentro dela"""
+    info = os.stat(caminho)
+    modificado, tamanho = info.st_mtime, 0
+    for raiz, pastas, arquivos in os.walk(caminho):
+        for nome, eh_arquivo in [(nome, False) for nome in pastas] + [(nome, True) for nome in arquivos]:
+            try:
+                info = os.stat(os.path.join(raiz, nome), follow_symlinks=False)
+            except FileNotFoundError:
+                continue
+            modificado = max(modificado, info.st_mtime)
+            if eh_arquivo:
+                tamanho += info.st_size
+    return modificado, tamanho
+
+
+def _remover(caminho):
+    try:
+        if os.path.isdir(caminho) and not os.path.islink(caminho):
+            shutil.rmtree(caminho)
+        else:
+            os.remove(caminho)
+        return True
+    except FileNotFoundError:
+        return False
+    except OSError as e:
+        logger.warning(f"Erro ao remover temporário {caminho}: {e}")
+        return False
+
+
+def _registrar(origem, arquivos, tamanho):
+    from auth_project import metricas
+
+    try:
+        metricas.incrementar('report_temp_removed_files_total', arquivos, origem=origem)
+        metricas.incrementar('report_temp_reclaimed_bytes_total', tamanho, origem=origem)
+        metricas.gravar()
+    except Exception as e:
+        # Métrica nunca derruba a limpeza
+        logger.warning(f"Erro ao registrar métricas da limpeza: {e}")
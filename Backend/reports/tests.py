@@ -1,13 +1,37 @@
 """
 Tests para o app de relatórios
 """
-from django.test import TestCase
+from django.test import AsyncClient, TestCase, override_settings
 from django.contrib.auth import get_user_model
 from rest_framework.test import APIClient
 from rest_framework import status
+from rest_framework_simplejwt.tokens import AccessToken
+import importlib.util
+import io
+import json
 import os
+import shutil
+import subprocess
+import sys
 import tempfile
+import time
+import unittest
+from unittest import mock
+import zipfile
+import numpy as np
+import pandas as pd
+from django.conf import settings
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from auth_project import metricas
+from .models import ReportCacheEntry, ReportDataset, ReportHistory, ReportJob
+from .services import cache as report_cache
+from .services import instrumentacao, jobs, pool, temporarios
+from .services.ingestao import ler_planilha
+from .services.blocos import AcumuladorPrevisao, JanelaCircular, calcular_previsao_em_blocos, impressao_linhas
+from .services.previsao import EstatisticasTendencia, ajustar_tendencias, ajustar_tendencias_agrupadas, projetar_resultado
 
 User = get_user_model()
 
@@ -46,3 +70,1061 @@ class ReportGenerationTestCase(TestCase):
         response = client.post('/api/report/', {'file': file})
         self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
 
+
+
+def gerar_csv_valido(linhas=12):
+    """Gera um CSV no formato esperado (2 linhas de cabeçalho 'sujo')"""
+    conteudo = [
+        "MES,faturamento,despesas,qtd_vendas",
+        "Obrigatório,Obrigatório,Obrigatório,Obrigatório",
+        "mes_sequencial,faturamento,custos_totais,total_vendas",
+    ]
+    for i in range(1, linhas + 1):
+        conteudo.append(f"{i},{1000 + i * 50:.2f},{700 + i * 20:.2f},{10 + i}")
+    return ("\n".join(conteudo) + "\n").encode('utf-8')
+
+
+class RelatorioTestCase(TestCase):
+    """
+    Base dos testes que geram arquivos: MEDIA_ROOT temporário (mais as
+    configuracoes da subclasse) e o usuário '<usuario>@example.com' autenticado
+    """
+    usuario = 'relatorio'
+    configuracoes = {}
+    
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.override = override_settings(MEDIA_ROOT=self.media_root, **self.configuracoes)
+        self.override.enable()
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            email=f'{self.usuario}@example.com',
+            password='testpass123',
+            username=f'{self.usuario}user'
+        )
+        self.client.force_authenticate(user=self.user)
+    
+    def tearDown(self):
+        self.override.disable()
+        shutil.rmtree(self.media_root, ignore_errors=True)
+
+
+@override_settings(REPORT_POOL_EAGER=True)
+class ReportJobTestCase(RelatorioTestCase):
+    """Testes para a geração assíncrona via jobs"""
+    
+    usuario = 'jobs'
+    
+    def test_job_concluido_e_download(self):
+        """Testa criação do job, consulta de status e download do resultado"""
+        file = SimpleUploadedFile("dados.csv", gerar_csv_valido(), content_type="text/csv")
+        response = self.client.post('/api/report/jobs/', {'file': file})
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        job_id = response.data['id']
+        
+        response = self.client.get(f'/api/report/jobs/{job_id}/')
+        self.assertEqual(response.data['status'], ReportJob.STATUS_DONE)
+        self.assertIsNotNone(response.data['download_url'])
+        
+        response = self.client.get(response.data['download_url'])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(b''.join(response.streaming_content).startswith(b'PK'))
+    
+    def test_job_com_erro(self):
+        """Testa job com colunas faltando"""
+        file = SimpleUploadedFile("dados.csv", b"a\nb\nc,d\n1,2\n", content_type="text/csv")
+        response = self.client.post('/api/report/jobs/', {'file': file})
+        self.assertEqual(response.data['status'], ReportJob.STATUS_FAILED)
+        self.assertIn('Colunas obrigatórias', response.data['error'])
+    
+    @override_settings(REPORT_JOBS_MAX_PER_USER=1)
+    def test_limite_por_usuario(self):
+        """Testa o limite de jobs ativos por usuário"""
+        ReportJob.objects.create(user=self.user, file_name='a.csv', input_path='x')
+        file = SimpleUploadedFile("dados.csv", gerar_csv_valido(), content_type="text/csv")
+        response = self.client.post('/api/report/jobs/', {'file': file})
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertIn('Retry-After', response)
+    
+    @override_settings(REPORT_JOBS_MAX_PER_USER=1)
+    def test_limite_conferido_junto_com_a_criacao(self):
+        """Testa que um job criado entre a primeira verificação e o INSERT ainda conta no limite"""
+        verificar = jobs.verificar_limites
+        chamadas = []
+        
+        def concorrente(user):
+            # Outra requisição do usuário cria o job enquanto o upload é gravado
+            chamadas.append(user)
+            if len(chamadas) == 1:
+                ReportJob.objects.create(user=user, file_name='a.csv', input_path='x')
+                return
+            verificar(user)
+        
+        file = SimpleUploadedFile("dados.csv", gerar_csv_valido(), content_type="text/csv")
+        with mock.patch.object(jobs, 'verificar_limites', side_effect=concorrente):
+            response = self.client.post('/api/report/jobs/', {'file': file})
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertEqual(ReportJob.objects.filter(user=self.user).count(), 1)
+        self.assertEqual(os.listdir(jobs.pasta_jobs()), [])
+    
+    def test_retencao_de_jobs(self):
+        """Testa a remoção de jobs terminados há mais de REPORT_JOB_RETENTION e de diretórios órfãos"""
+        from datetime import timedelta
+        from django.core.management import call_command
+        from django.utils import timezone
+        
+        agora = timezone.now()
+        antigo = ReportJob.objects.create(
+            user=self.user, file_name='a.csv', input_path='x', status=ReportJob.STATUS_DONE,
+            finished_at=agora - timedelta(days=8)
+        )
+        recente = ReportJob.objects.create(
+            user=self.user, file_name='b.csv', input_path='x', status=ReportJob.STATUS_FAILED,
+            finished_at=agora - timedelta(days=1)
+        )
+        ativo = ReportJob.objects.create(user=self.user, file_name='c.csv', input_path='x')
+        for job_id in (antigo.id, recente.id, ativo.id, 'orfao'):
+            os.makedirs(jobs.pasta_job(job_id))
+        velho = (agora - timedelta(days=8)).timestamp()
+        os.utime(jobs.pasta_job('orfao'), (velho, velho))
+        
+        saida = io.StringIO()
+        call_command('clean_report_jobs', stdout=saida)
+        self.assertIn('1 job(s) removido(s), 1 diretório(s) órfão(s)', saida.getvalue())
+        self.assertEqual(set(ReportJob.objects.values_list('id', flat=True)), {recente.id, ativo.id})
+        self.assertEqual(sorted(os.listdir(jobs.pasta_jobs())), sorted([str(recente.id), str(ativo.id)]))
+    
+    def test_job_de_outro_usuario(self):
+        """Testa que um usuário não acessa jobs de outro"""
+        outro = User.objects.create_user(email='outro@example.com', password='testpass123', username='outro')
+        job = ReportJob.objects.create(user=outro, file_name='a.csv', input_path='x')
+        response = self.client.get(f'/api/report/jobs/{job.id}/')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+@override_settings(REPORT_POOL_EAGER=True)
+class ReportBatchTestCase(RelatorioTestCase):
+    """Testes para a geração em lote"""
+    
+    usuario = 'lote'
+    
+    def baixar_zip(self, response):
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return zipfile.ZipFile(io.BytesIO(b''.join(response.streaming_content)))
+    
+    def test_lote_zip_com_arquivo_invalido(self):
+        """Testa que um arquivo com erro entra no resumo sem abortar o lote"""
+        buffer = io.BytesIO()
+        with zipfile.ZipFile(buffer, 'w') as zf:
+            zf.writestr('loja_a.csv', gerar_csv_valido())
+            zf.writestr('pasta/loja_b.csv', gerar_csv_valido(20))
+            zf.writestr('quebrado.csv', b"a\nb\nc,d\n1,2\n")
+            zf.writestr('__MACOSX/._loja_a.csv', b'lixo')
+        file = SimpleUploadedFile("lote.zip", buffer.getvalue(), content_type="application/zip")
+        
+        response = self.client.post('/api/report/batch/', {'file': file})
+        self.assertEqual((response['X-Batch-Total'], response['X-Batch-Failed']), ('3', '1'))
+        
+        zf = self.baixar_zip(response)
+        self.assertEqual(
+            sorted(zf.namelist()),
+            ['Relatorio_IA_loja_a.xlsx', 'Relatorio_IA_loja_b.xlsx', 'Resumo_Lote.xlsx']
+        )
+        resumo = pd.read_excel(io.BytesIO(zf.read('Resumo_Lote.xlsx')))
+        self.assertEqual(list(resumo['Status']), ['OK', 'OK', 'Erro'])
+        self.assertEqual(list(resumo['Registros'][:2]), [12, 20])
+        self.assertIn('Colunas obrigatórias', resumo['Erro'][2])
+        
+        # Diretório de trabalho do lote removido; sobra apenas o .zip enviado
+        self.assertEqual(
+            [nome for nome in os.listdir(os.path.join(self.media_root, 'temp')) if nome.startswith('lote_')],
+            []
+        )
+    
+    def test_lote_varios_arquivos_com_nome_repetido(self):
+        """Testa envio de várias planilhas soltas, incluindo formato inválido"""
+        arquivos = [
+            SimpleUploadedFile("dados.csv", gerar_csv_valido(), content_type="text/csv"),
+            SimpleUploadedFile("dados.csv", gerar_csv_valido(15), content_type="text/csv"),
+            SimpleUploadedFile("notas.txt", b"texto", content_type="text/plain"),
+        ]
+        response = self.client.post('/api/report/batch/', {'files': arquivos})
+        self.assertEqual(response['X-Batch-Failed'], '1')
+        
+        zf = self.baixar_zip(response)
+        self.assertIn('Relatorio_IA_dados.xlsx', zf.namelist())
+        self.assertIn('Relatorio_IA_dados_2.xlsx', zf.namelist())
+    
+    def test_csv_solto_com_limite_em_memoria(self):
+        """Testa que CSVs do lote ficam no limite de MAX_FILE_SIZE (não são lidos em blocos)"""
+        conteudo = gerar_csv_valido()
+        arquivo = SimpleUploadedFile("dados.csv", conteudo, content_type="text/csv")
+        with mock.patch('reports.views.MAX_FILE_SIZE', len(conteudo) - 1):
+            response = self.client.post('/api/report/batch/', {'files': [arquivo]})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('Arquivo muito grande', response.json()['error'])
+    
+    @override_settings(REPORT_BATCH_MAX_FILES=1)
+    def test_limite_de_arquivos(self):
+        """Testa o limite de planilhas por lote"""
+        buffer = io.BytesIO()
+        with zipfile.ZipFile(buffer, 'w') as zf:
+            zf.writestr('a.csv', gerar_csv_valido())
+            zf.writestr('b.csv', gerar_csv_valido())
+        file = SimpleUploadedFile("lote.zip", buffer.getvalue(), content_type="application/zip")
+        response = self.client.post('/api/report/batch/', {'file': file})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class ForecastTestCase(RelatorioTestCase):
+    """Testes para a previsão em JSON/Arrow"""
+    
+    usuario = 'previsao'
+    
+    def enviar(self, url='/api/report/forecast/', **extra):
+        file = SimpleUploadedFile("dados.csv", gerar_csv_valido(60), content_type="text/csv")
+        return self.client.post(url, {'file': file}, **extra)
+    
+    def test_json_por_linhas(self):
+        """Testa histórico (últimos 48 meses) e previsão, sem gerar arquivo"""
+        response = self.enviar()
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['registros'], 60)
+        self.assertEqual(len(response.data['historico']), 48)
+        self.assertEqual(response.data['historico'][0], {'mes': 13, 'faturamento': 1650.0, 'despesas': 960.0, 'lucro': 690.0})
+        self.assertEqual([linha['mes'] for linha in response.data['previsao']], [61, 62, 63])
+        self.assertAlmostEqual(response.data['previsao'][0]['faturamento'], 1000 + 61 * 50, places=2)
+        self.assertFalse(os.path.exists(os.path.join(self.media_root, 'temp')))
+    
+    def test_json_colunar(self):
+        """Testa o formato colunar"""
+        response = self.enviar('/api/report/forecast/?formato=colunar')
+        self.assertEqual(response.data['previsao']['mes'], [61, 62, 63])
+        self.assertEqual(len(response.data['historico']['lucro']), 48)
+    
+    def test_formato_invalido(self):
+        response = self.enviar('/api/report/forecast/?formato=xml')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+    
+    @unittest.skipUnless(importlib.util.find_spec('pyarrow'), 'pyarrow não instalado')
+    def test_arrow_via_accept(self):
+        """Testa a resposta Arrow IPC negociada pelo cabeçalho Accept"""
+        import pyarrow as pa
+        
+        response = self.enviar(HTTP_ACCEPT='application/vnd.apache.arrow.stream')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Type'], 'application/vnd.apache.arrow.stream')
+        tabela = pa.ipc.open_stream(response.content).read_all()
+        self.assertEqual(tabela.num_rows, 51)
+        self.assertEqual(tabela.column('tipo').to_pylist()[-1], 'Previsão')
+
+
+class RenderizadorTestCase(RelatorioTestCase):
+    """Testes para os formatos de saída do relatório"""
+    
+    usuario = 'formatos'
+    
+    def enviar(self, url='/api/report/', **extra):
+        file = SimpleUploadedFile("dados.csv", gerar_csv_valido(), content_type="text/csv")
+        response = self.client.post(url, {'file': file}, **extra)
+        conteudo = b''.join(response.streaming_content) if response.streaming else response.content
+        return response, conteudo
+    
+    def test_csv_por_query_e_por_accept(self):
+        """Testa CSV via ?formato= e via Accept, com chaves de cache separadas do xlsx"""
+        _, xlsx = self.enviar()
+        esperado = pd.read_excel(io.BytesIO(xlsx))
+        
+        for extra in ({'path': '/api/report/?formato=csv'}, {'HTTP_ACCEPT': 'text/csv'}):
+            with self.subTest(**extra):
+                url = extra.pop('path', '/api/report/')
+                response, conteudo = self.enviar(url, **extra)
+                self.assertEqual(response['Content-Type'], 'text/csv')
+                self.assertTrue(response['Content-Disposition'].endswith('.csv"'))
+                df = pd.read_csv(io.BytesIO(conteudo))
+                self.assertEqual(list(df.columns), ['mes_sequencial', 'faturamento', 'despesas', 'lucro', 'tipo'])
+                np.testing.assert_allclose(df['lucro'], esperado['Lucro'])
+        
+        self.assertEqual(report_cache.estatisticas()['entradas'], 2)
+    
+    def test_xlsx_minimo_mesmos_dados(self):
+        """Testa que o xlsx mínimo tem os mesmos dados do relatório formatado"""
+        _, formatado = self.enviar()
+        response, minimo = self.enviar('/api/report/?formato=xlsx-min')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        pd.testing.assert_frame_equal(
+            pd.read_excel(io.BytesIO(minimo)), pd.read_excel(io.BytesIO(formatado)), check_dtype=False
+        )
+    
+    @unittest.skipUnless(importlib.util.find_spec('pyarrow'), 'pyarrow não instalado')
+    def test_parquet(self):
+        response, conteudo = self.enviar(HTTP_ACCEPT='application/vnd.apache.parquet')
+        self.assertEqual(response['Content-Type'], 'application/vnd.apache.parquet')
+        self.assertEqual(len(pd.read_parquet(io.BytesIO(conteudo))), 15)
+    
+    def test_formato_invalido(self):
+        response, _ = self.enviar('/api/report/?formato=pdf')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response, _ = self.enviar('/api/report/consolidated/?formato=csv')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        
+        # Erros continuam em JSON mesmo com Accept de arquivo
+        response = self.client.post('/api/report/', HTTP_ACCEPT='text/csv')
+        self.assertEqual(response['Content-Type'], 'application/json')
+        self.assertIn('error', response.json())
+
+
+class ConsolidatedReportTestCase(RelatorioTestCase):
+    """Testes para o relatório consolidado de várias entidades"""
+    
+    usuario = 'consolidado'
+    
+    def test_aba_por_entidade_e_consolidado(self):
+        """Testa abas por entidade, consolidado e entidade com poucos dados"""
+        linhas = [
+            "MES,faturamento,despesas,qtd_vendas,loja",
+            "x,x,x,x,x",
+            "mes_sequencial,faturamento,custos_totais,total_vendas,Filial",
+        ]
+        for mes in range(1, 61):
+            linhas.append(f"{mes},{1000 + mes * 10},{600 + mes * 5},{mes},Centro")
+            linhas.append(f"{mes},{500 + mes * 2},{450 + mes * 4},{mes},Norte/Sul")
+        linhas.append("1,100,50,1,Isolada")
+        file = SimpleUploadedFile("filiais.csv", ("\n".join(linhas) + "\n").encode('utf-8'), content_type="text/csv")
+        
+        response = self.client.post('/api/report/consolidated/', {'file': file})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        planilhas = pd.read_excel(io.BytesIO(b''.join(response.streaming_content)), sheet_name=None)
+        
+        self.assertEqual(list(planilhas), ['Consolidado', 'Centro', 'Norte_Sul'])
+        centro = planilhas['Centro']
+        self.assertEqual(len(centro), 48 + 3)
+        self.assertEqual(list(centro['Mês'].tail(3)), [61, 62, 63])
+        np.testing.assert_allclose(centro['Faturamento'].tail(3), [1610, 1620, 1630])
+        
+        consolidado = planilhas['Consolidado'].set_index('Entidade')
+        self.assertEqual(consolidado.loc['Isolada', 'Status'], 'Erro')
+        self.assertEqual(consolidado.loc['Centro', 'Registros'], 60)
+        np.testing.assert_allclose(consolidado.loc['Centro', 'Faturamento Previsto'], 1610 + 1620 + 1630)
+    
+    def test_sem_coluna_entidade(self):
+        """Testa erro quando o arquivo não tem a coluna de entidade"""
+        file = SimpleUploadedFile("dados.csv", gerar_csv_valido(), content_type="text/csv")
+        response = self.client.post('/api/report/consolidated/', {'file': file})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('entidade', response.data['error'])
+
+
+class MetricasMemoria:
+    """Backend de métricas de teste: guarda as etapas recebidas"""
+    recebidas = []
+    
+    def registrar_etapa(self, relatorio, etapa):
+        self.recebidas.append((relatorio, etapa.nome))
+
+
+@override_settings(REPORT_CACHE_ENABLED=False, REPORT_METRICS_BACKEND='reports.tests.MetricasMemoria')
+class InstrumentacaoTestCase(RelatorioTestCase):
+    """Testes para a medição por etapa da geração"""
+    
+    usuario = 'etapas'
+    
+    def setUp(self):
+        super().setUp()
+        instrumentacao.redefinir_metricas()
+        MetricasMemoria.recebidas = []
+    
+    def tearDown(self):
+        instrumentacao.redefinir_metricas()
+        super().tearDown()
+    
+    def test_server_timing_log_e_metricas(self):
+        """Testa as 7 etapas no Server-Timing, no log e no backend de métricas"""
+        file = SimpleUploadedFile("dados.csv", gerar_csv_valido(60), content_type="text/csv")
+        with self.assertLogs('reports.services.instrumentacao', level='INFO') as logs:
+            response = self.client.post('/api/report/', {'file': file})
+        b''.join(response.streaming_content)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        
+        etapas = [parte.split(';')[0] for parte in response['Server-Timing'].split(', ')]
+        self.assertEqual(etapas, list(instrumentacao.ETAPAS) + ['total'])
+        self.assertIn('read;dur=', response['Server-Timing'])
+        self.assertIn('desc="60 linhas"', response['Server-Timing'])
+        self.assertEqual(MetricasMemoria.recebidas, [('relatorio', nome) for nome in instrumentacao.ETAPAS])
+        
+        registro = logs.records[0]
+        self.assertEqual([e['etapa'] for e in registro.etapas], list(instrumentacao.ETAPAS))
+        self.assertEqual(registro.etapas[0]['linhas'], 60)
+        self.assertEqual(registro.etapas[-1]['linhas'], 51)
+    
+    def test_previsao_e_etapa_sem_medicao(self):
+        """Testa o Server-Timing da previsão e que etapa() fora de medir() não registra nada"""
+        file = SimpleUploadedFile("dados.csv", gerar_csv_valido(), content_type="text/csv")
+        response = self.client.post('/api/report/forecast/', {'file': file})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response['Server-Timing'].startswith('read;dur='))
+        self.assertNotIn('render', response['Server-Timing'])
+        
+        MetricasMemoria.recebidas = []
+        with instrumentacao.etapa('fit') as registro:
+            pass
+        self.assertEqual(registro.duracao, 0.0)
+        self.assertEqual(MetricasMemoria.recebidas, [])
+
+
+class MetricsTestCase(RelatorioTestCase):
+    """Testes para o endpoint /metrics"""
+    
+    usuario = 'metricas'
+    configuracoes = {'REPORT_CACHE_ENABLED': False}
+    
+    def setUp(self):
+        super().setUp()
+        instrumentacao.redefinir_metricas()
+        # Autenticação pelo login, com o JWT de verdade
+        self.client.force_authenticate(user=None)
+    
+    def tearDown(self):
+        instrumentacao.redefinir_metricas()
+        super().tearDown()
+    
+    def test_metricas_por_view_e_relatorio(self):
+        """Testa latência por view, consultas ao banco e resultados de relatório"""
+        resposta = self.client.post('/api/auth/login/', {'email': 'metricas@example.com', 'password': 'testpass123'})
+        self.assertEqual(resposta.status_code, status.HTTP_200_OK)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {resposta.data['tokens']['access']}")
+        file = SimpleUploadedFile("dados.csv", gerar_csv_valido(), content_type="text/csv")
+        resposta = self.client.post('/api/report/', {'file': file})
+        b''.join(resposta.streaming_content)
+        self.client.post('/api/report/', {'file': SimpleUploadedFile("dados.txt", b"x")})
+        
+        response = self.client.get('/metrics')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+        texto = response.content.decode()
+        self.assertIn('# TYPE http_request_duration_seconds histogram', texto)
+        self.assertIn('http_request_duration_seconds_bucket{method="POST",view="login",le="+Inf"}', texto)
+        self.assertIn('http_requests_total{method="POST",status="200",view="login"}', texto)
+        self.assertIn('http_requests_in_flight 1', texto)
+        self.assertIn('db_queries_per_request_count{view="login"}', texto)
+        self.assertIn('report_generation_total{resultado="sucesso",view="generate_report"}', texto)
+        self.assertIn('report_generation_total{resultado="invalido",view="generate_report"}', texto)
+        self.assertIn('report_stage_duration_seconds_count{etapa="fit",relatorio="relatorio"}', texto)
+    
+    def test_agregacao_entre_processos(self):
+        """Testa a soma dos arquivos de METRICS_DIR e a consolidação de processos mortos"""
+        pasta = os.path.join(self.media_root, 'metricas')
+        os.makedirs(pasta)
+        morto = subprocess.Popen([sys.executable, '-c', 'pass'])
+        morto.wait()
+        for pid, em_andamento in ((os.getppid(), 2), (morto.pid, 5)):
+            with open(os.path.join(pasta, f'metricas_{pid}_teste.json'), 'w') as arquivo:
+                json.dump([
+                    ['report_generation_total', [['resultado', 'sucesso'], ['view', 'outro']], 3],
+                    ['http_requests_in_flight', [], em_andamento],
+                ], arquivo)
+        
+        chave = ('report_generation_total', (('resultado', 'sucesso'), ('view', 'outro')))
+        with override_settings(METRICS_DIR=pasta):
+            total = metricas.coletar()
+            self.assertEqual(total[chave], 6)
+            self.assertEqual(total[('http_requests_in_flight', ())], 2)
+            self.assertFalse(os.path.exists(os.path.join(pasta, f'metricas_{morto.pid}_teste.json')))
+            self.assertTrue(os.path.exists(os.path.join(pasta, metricas.NOME_ACUMULADO)))
+            # O processo morto continua somado depois de consolidado
+            self.assertEqual(metricas.coletar()[chave], 6)
+    
+    def test_gravacao_periodica(self):
+        """Testa que o estado do processo vai para METRICS_DIR pela thread de gravação, fora da requisição"""
+        pasta = os.path.join(self.media_root, 'metricas')
+        with override_settings(METRICS_DIR=pasta, METRICS_FLUSH_INTERVAL=0.05):
+            self.client.get('/api/auth/profile/')
+            arquivos = []
+            for _ in range(100):
+                arquivos = [nome for nome in os.listdir(pasta) if nome.endswith('.json')] if os.path.isdir(pasta) else []
+                if arquivos:
+                    break
+                time.sleep(0.05)
+            self.assertEqual(len(arquivos), 1)
+            self.assertTrue(arquivos[0].startswith(f'metricas_{os.getpid()}_'))
+    
+    @override_settings(METRICS_TOKEN='segredo')
+    def test_token(self):
+        """Testa que /metrics exige o token quando configurado"""
+        self.assertEqual(self.client.get('/metrics').status_code, status.HTTP_401_UNAUTHORIZED)
+        response = self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer segredo')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+
+class ReportCacheTestCase(RelatorioTestCase):
+    """Testes para o cache de relatórios por conteúdo"""
+    
+    usuario = 'cache'
+    
+    def enviar(self, conteudo):
+        file = SimpleUploadedFile("dados.csv", conteudo, content_type="text/csv")
+        response = self.client.post('/api/report/', {'file': file})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response
+    
+    def test_upload_repetido_servido_do_cache(self):
+        """Testa que o mesmo upload é gerado uma vez e depois servido do cache"""
+        antes = report_cache.estatisticas()
+        primeira = self.enviar(gerar_csv_valido())
+        self.assertEqual(primeira['X-Report-Cache'], 'MISS')
+        conteudo = b''.join(primeira.streaming_content)
+        
+        with mock.patch.object(report_cache, '_ultima_gravacao', time.monotonic()), \
+                CaptureQueriesContext(connection) as consultas:
+            segunda = self.enviar(gerar_csv_valido())
+        self.assertEqual(segunda['X-Report-Cache'], 'HIT')
+        self.assertEqual(b''.join(segunda.streaming_content), conteudo)
+        # Acerto dentro do intervalo de gravação: nenhuma escrita no banco
+        self.assertFalse([q for q in consultas.captured_queries if q['sql'].startswith('UPDATE')])
+        
+        stats = report_cache.estatisticas()
+        self.assertEqual(
+            (stats['hits'] - antes['hits'], stats['misses'] - antes['misses'], stats['entradas']), (1, 1, 1)
+        )
+        self.assertEqual(ReportCacheEntry.objects.get().hits, 1)
+    
+    def test_arquivo_removido_apos_consulta_vira_miss(self):
+        """Testa que uma remoção LRU entre a consulta e a abertura não gera 500"""
+        self.enviar(gerar_csv_valido())
+        entrada = ReportCacheEntry.objects.get()
+        abrir = open
+        
+        def abrir_apos_remocao(caminho, *args, **kwargs):
+            if caminho == entrada.file_path:
+                os.remove(caminho)
+            return abrir(caminho, *args, **kwargs)
+        
+        with mock.patch('builtins.open', abrir_apos_remocao):
+            self.assertIsNone(report_cache.buscar(entrada.key))
+        self.assertFalse(ReportCacheEntry.objects.exists())
+        
+        self.assertEqual(self.enviar(gerar_csv_valido())['X-Report-Cache'], 'MISS')
+    
+    def test_remocao_lru(self):
+        """Testa que a entrada menos usada recentemente é removida primeiro"""
+        self.enviar(gerar_csv_valido(12))
+        self.enviar(gerar_csv_valido(13))
+        self.enviar(gerar_csv_valido(12))  # hit: vira a mais recente
+        report_cache.gravar_acessos()
+        
+        mais_antiga = ReportCacheEntry.objects.order_by('last_access').first()
+        self.assertEqual(report_cache.remover_excedente(limite_bytes=mais_antiga.size + 1), 1)
+        self.assertFalse(ReportCacheEntry.objects.filter(key=mais_antiga.key).exists())
+        self.assertFalse(os.path.exists(mais_antiga.file_path))
+    
+    def test_comando_purge(self):
+        """Testa o comando de gerenciamento que limpa o cache"""
+        self.enviar(gerar_csv_valido())
+        call_command('report_cache', '--purge', stdout=io.StringIO())
+        self.assertEqual(report_cache.estatisticas()['entradas'], 0)
+    
+    @override_settings(REPORT_CACHE_ENABLED=False)
+    def test_upload_nao_e_copiado_para_media(self):
+        """Testa que a entrada é lida direto do upload, em memória ou em spool"""
+        for limite in (10 * 1024 * 1024, 1):
+            with self.subTest(limite_memoria=limite), override_settings(FILE_UPLOAD_MAX_MEMORY_SIZE=limite):
+                self.enviar(gerar_csv_valido())
+                arquivos = os.listdir(os.path.join(self.media_root, 'temp'))
+                self.assertFalse([nome for nome in arquivos if nome.startswith('input_')])
+
+
+class TemporariosTestCase(RelatorioTestCase):
+    """Testes para a limpeza de MEDIA_ROOT/temp"""
+    
+    usuario = 'temporarios'
+    configuracoes = {'REPORT_CACHE_ENABLED': False, 'REPORT_TEMP_REAP_INTERVAL': 0}
+    
+    def setUp(self):
+        super().setUp()
+        self.pasta = temporarios.pasta_temp()
+    
+    def recuperado(self, origem):
+        return metricas.coletar().get(('report_temp_reclaimed_bytes_total', (('origem', origem),)), 0)
+    
+    def criar(self, nome, tamanho, idade):
+        caminho = os.path.join(self.pasta, nome)
+        with open(caminho, 'wb') as arquivo:
+            arquivo.write(b'x' * tamanho)
+        instante = time.time() - idade
+        os.utime(caminho, (instante, instante))
+        return caminho
+    
+    def test_relatorio_removido_apos_envio(self):
+        """Testa que o relatório some ao fim do envio e que nomes iguais não colidem"""
+        antes = self.recuperado(temporarios.ORIGEM_RESPOSTA)
+        respostas = [
+            self.client.post('/api/report/', {'file': SimpleUploadedFile("dados.csv", gerar_csv_valido(), content_type="text/csv")})
+            for _ in range(2)
+        ]
+        caminhos = [resposta.caminho_temporario for resposta in respostas]
+        self.assertNotEqual(*caminhos)
+        self.assertTrue(all(os.path.exists(caminho) for caminho in caminhos))
+        
+        tamanho = 0
+        for resposta in respostas:
+            tamanho += len(b''.join(resposta.streaming_content))
+            resposta.close()
+        self.assertEqual(os.listdir(self.pasta), [])
+        self.assertEqual(self.recuperado(temporarios.ORIGEM_RESPOSTA) - antes, tamanho)
+    
+    def test_limpeza_por_idade_e_cota(self):
+        """Testa a remoção por idade, a cota (mais antigos primeiro) e a proteção dos recentes"""
+        os.makedirs(os.path.join(self.pasta, 'lote_antigo', 'saida'))
+        self.criar(os.path.join('lote_antigo', 'saida', '0000.xlsx'), 100, 7200)
+        os.utime(os.path.join(self.pasta, 'lote_antigo', 'saida'), (time.time() - 7200,) * 2)
+        os.utime(os.path.join(self.pasta, 'lote_antigo'), (time.time() - 7200,) * 2)
+        self.criar('velho.xlsx', 100, 7200)
+        self.criar('medio.xlsx', 300, 1800)
+        self.criar('recente.xlsx', 300, 1200)
+        self.criar('em_uso.xlsx', 1000, 10)
+        
+        antes = self.recuperado(temporarios.ORIGEM_LIMPEZA)
+        resultado = temporarios.limpar_temporarios(idade_maxima=3600, limite_bytes=1500, idade_minima=600)
+        self.assertEqual((resultado.removidos, resultado.bytes_removidos), (3, 500))
+        self.assertEqual(sorted(os.listdir(self.pasta)), ['em_uso.xlsx', 'recente.xlsx'])
+        self.assertEqual(self.recuperado(temporarios.ORIGEM_LIMPEZA) - antes, 500)
+        
+        # Acima da cota só com arquivos novos demais: nada é removido
+        saida = io.StringIO()
+        call_command('clean_report_temp', '--max-bytes', '0', stdout=saida)
+        self.assertEqual(sorted(os.listdir(self.pasta)), ['em_uso.xlsx'])
+        self.assertIn('1 item(ns) removido(s)', saida.getvalue())
+
+
+class PoolTestCase(RelatorioTestCase):
+    """Testes para o pool de processos e o backpressure da geração síncrona"""
+    
+    usuario = 'pool'
+    configuracoes = {'REPORT_CACHE_ENABLED': False}
+    
+    def enviar(self):
+        arquivo = SimpleUploadedFile("dados.csv", gerar_csv_valido(), content_type="text/csv")
+        return self.client.post('/api/report/', {'file': arquivo})
+    
+    @override_settings(REPORT_SYNC_MAX_PER_USER=0)
+    def test_limite_por_usuario(self):
+        """Testa o 429 com Retry-After quando o usuário já tem gerações em andamento"""
+        response = self.enviar()
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertEqual(response['Retry-After'], str(settings.REPORT_RETRY_AFTER))
+    
+    def test_pool_saturado(self):
+        """Testa o 503 com Retry-After quando o pool não tem vaga"""
+        with mock.patch.object(pool, 'executar', side_effect=pool.PoolSaturado('cheio')):
+            response = self.enviar()
+        self.assertEqual(response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertIn('Retry-After', response)
+        
+        with override_settings(REPORT_POOL_WORKERS=0, REPORT_POOL_MAX_QUEUE=0):
+            with self.assertRaises(pool.PoolSaturado):
+                pool.executar('reports.tests.gerar_csv_valido')
+    
+    def test_segundo_plano_nao_satura_geracao_sincrona(self):
+        """Testa que jobs e lotes esperam na fila local sem tirar vaga da geração síncrona"""
+        with override_settings(REPORT_POOL_WORKERS=1, REPORT_POOL_MAX_QUEUE=0, REPORT_POOL_BACKGROUND_MAX=1):
+            futuros = [pool.submeter(time.sleep, 0.5) for _ in range(3)]
+            self.assertTrue(pool._fila_segundo_plano)
+            self.assertEqual(pool.executar('reports.tests.gerar_csv_valido', 2, timeout=60), gerar_csv_valido(2))
+            for futuro in futuros:
+                self.assertIsNone(futuro.result(timeout=60))
+    
+    def test_geracao_no_pool_e_timeout(self):
+        """Testa a geração num processo filho e o cancelamento por timeout"""
+        response = self.enviar()
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        # As etapas medidas no processo filho chegam ao Server-Timing
+        self.assertIn('fit;', response['Server-Timing'])
+        response.close()
+        
+        self.assertEqual(pool.executar('reports.tests.gerar_csv_valido', 2, timeout=60), gerar_csv_valido(2))
+        with self.assertRaises(pool.TempoEsgotado):
+            pool.executar('time.sleep', 5, timeout=0.01)
+        # A vaga volta quando a tarefa cancelada termina
+        limite = time.monotonic() + 30
+        while pool.em_andamento() and time.monotonic() < limite:
+            time.sleep(0.05)
+        self.assertEqual(pool.em_andamento(), 0)
+    
+    def test_cancelamento_cooperativo(self):
+        """Testa que a marca de cancelamento interrompe a próxima etapa"""
+        marcas = [0, 1]
+        with mock.patch.multiple(pool, _marcas_worker=marcas, _vaga_worker=1):
+            instrumentacao.definir_verificador(pool.verificar_cancelamento)
+            try:
+                with self.assertRaises(pool.TarefaCancelada):
+                    with instrumentacao.etapa('fit'):
+                        pass
+            finally:
+                instrumentacao.definir_verificador(None)
+
+
+class AsyncViewsTestCase(RelatorioTestCase):
+    """Testes para as views assíncronas servidas pelo asgi.py"""
+    
+    usuario = 'async'
+    configuracoes = {'REPORT_CACHE_ENABLED': False}
+    
+    def setUp(self):
+        super().setUp()
+        self.headers = {'Authorization': f'Bearer {AccessToken.for_user(self.user)}'}
+        self.client = AsyncClient()
+    
+    async def test_geracao_assincrona(self):
+        """Testa a geração pela view assíncrona e a remoção do arquivo após o envio"""
+        file = SimpleUploadedFile("dados.csv", gerar_csv_valido(), content_type="text/csv")
+        response = await self.client.post('/api/report/?formato=csv', {'file': file}, headers=self.headers)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.resolver_match.func.view_class.__module__, 'reports.async_views')
+        self.assertIn('fit;', response['Server-Timing'])
+        
+        conteudo = b''.join([bloco async for bloco in response.streaming_content])
+        self.assertEqual(len(conteudo), int(response['Content-Length']))
+        self.assertTrue(conteudo.startswith(b'mes_sequencial,'))
+        response.close()
+        self.assertEqual(os.listdir(temporarios.pasta_temp()), [])
+        
+        response = await AsyncClient().post('/api/report/', {'file': file})
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+    
+    async def test_download_de_job(self):
+        """Testa o download assíncrono e o isolamento entre usuários"""
+        caminho = os.path.join(self.media_root, 'relatorio.xlsx')
+        with open(caminho, 'wb') as arquivo:
+            arquivo.write(b'PK' + b'x' * 300_000)
+        job = await ReportJob.objects.acreate(
+            user=self.user, file_name='a.csv', input_path='x', output_path=caminho, status=ReportJob.STATUS_DONE
+        )
+        response = await self.client.get(f'/api/report/jobs/{job.id}/download/', headers=self.headers)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        conteudo = b''.join([bloco async for bloco in response.streaming_content])
+        self.assertEqual(len(conteudo), 300_002)
+        
+        outro = await User.objects.acreate(email='outro_async@example.com', username='outroasync')
+        job.user = outro
+        await job.asave()
+        response = await self.client.get(f'/api/report/jobs/{job.id}/download/', headers=self.headers)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class IngestaoTestCase(TestCase):
+    """Testes para a leitura das planilhas de entrada"""
+    
+    def test_csv_le_apenas_colunas_mapeadas(self):
+        """Testa projeção de colunas, nomes sujos e valores não numéricos"""
+        conteudo = (
+            "a,b,c,d,e\nx,x,x,x,x\n"
+            " Mes_Sequencial ,FATURAMENTO,custos_totais,total_vendas,obs\n"
+            "1,10.5,3,4,a\n2,,3,5,b\n3,12,x,6,c\n"
+        ).encode('utf-8')
+        df = ler_planilha(io.BytesIO(conteudo), 'dados.csv')
+        self.assertEqual(list(df.columns), ['mes_sequencial', 'faturamento', 'despesas', 'qtd_vendas'])
+        self.assertTrue(all(str(dtype) == 'float64' for dtype in df.dtypes))
+        self.assertTrue(df['faturamento'].isna().iloc[1])
+        self.assertTrue(df['despesas'].isna().iloc[2])
+    
+    def test_xlsx_igual_ao_csv(self):
+        """Testa que o leitor streaming de .xlsx produz o mesmo resultado do CSV"""
+        csv = ler_planilha(io.BytesIO(gerar_csv_valido()), 'dados.csv')
+        
+        bruto = pd.read_csv(io.BytesIO(gerar_csv_valido()), header=None)
+        xlsx = io.BytesIO()
+        bruto.to_excel(xlsx, header=False, index=False)
+        
+        pd.testing.assert_frame_equal(ler_planilha(xlsx, 'dados.xlsx'), csv)
+    
+    def test_colunas_faltantes(self):
+        """Testa a mensagem de erro quando falta coluna obrigatória"""
+        with self.assertRaisesMessage(ValueError, 'total_vendas'):
+            ler_planilha(io.BytesIO(b"a\nb\nmes_sequencial,faturamento,custos_totais\n1,2,3\n"), 'dados.csv')
+
+
+class PrevisaoEmBlocosTestCase(TestCase):
+    """Testes para a previsão out-of-core de CSVs grandes"""
+    
+    def comparar(self, conteudo, linhas_por_bloco):
+        from .services.report_generator import calcular_previsao, carregar_dados
+        
+        df_limpo = carregar_dados(io.BytesIO(conteudo), 'dados.csv')
+        esperado = calcular_previsao(df_limpo)
+        df_final, registros = calcular_previsao_em_blocos(io.BytesIO(conteudo), linhas_por_bloco)
+        self.assertEqual(registros, len(df_limpo))
+        pd.testing.assert_frame_equal(df_final, esperado, check_exact=False, rtol=1e-9)
+    
+    def test_igual_ao_caminho_em_memoria(self):
+        """Testa a mesma tabela final com blocos menores que a janela e com linhas descartadas"""
+        linhas = gerar_csv_valido(500).decode('utf-8').splitlines()
+        linhas[100] = "101,,700,10"
+        linhas[450] = ",1000,700,10"
+        conteudo = ("\n".join(linhas) + "\n").encode('utf-8')
+        self.comparar(conteudo, 37)
+        self.comparar(conteudo, 100_000)
+    
+    def test_celula_nao_numerica_e_erros(self):
+        """Testa a releitura como texto e as mesmas mensagens de erro do caminho em memória"""
+        linhas = gerar_csv_valido(200).decode('utf-8').splitlines()
+        linhas[150] = "148,abc,700,10"
+        self.comparar(("\n".join(linhas) + "\n").encode('utf-8'), 50)
+        
+        with self.assertRaisesMessage(ValueError, 'Poucos dados'):
+            calcular_previsao_em_blocos(io.BytesIO(gerar_csv_valido(1)), 10)
+        linhas[60] = "58,1000,,10"
+        with self.assertRaisesMessage(ValueError, 'custos_totais contém valores vazios'):
+            calcular_previsao_em_blocos(io.BytesIO(("\n".join(linhas) + "\n").encode('utf-8')), 50)
+    
+    def test_total_vendas_vazio(self):
+        """Testa que total_vendas vazio (série não usada na tabela) não impede o relatório, nos dois caminhos"""
+        linhas = gerar_csv_valido(3).decode('utf-8').splitlines()
+        linhas[3:] = [linha.rsplit(',', 1)[0] + ',' for linha in linhas[3:]]
+        conteudo = ("\n".join(linhas) + "\n").encode('utf-8')
+        self.comparar(conteudo, 2)
+        
+        acumulador = AcumuladorPrevisao(48)
+        acumulador.adicionar(ler_planilha(io.BytesIO(conteudo), 'dados.csv'))
+        self.assertEqual(len(acumulador.previsao()), 3 + 3)
+    
+    def test_janela_circular(self):
+        """Testa que a janela guarda as últimas linhas em ordem, com blocos maiores que ela"""
+        janela = JanelaCircular(4, ['a'])
+        janela.adicionar(np.array([[1.0], [2.0]]))
+        np.testing.assert_array_equal(janela.linhas()[:, 0], [1, 2])
+        janela.adicionar(np.array([[3.0], [4.0], [5.0]]))
+        np.testing.assert_array_equal(janela.linhas()[:, 0], [2, 3, 4, 5])
+        janela.adicionar(np.arange(6.0, 16.0)[:, None])
+        np.testing.assert_array_equal(janela.linhas()[:, 0], [12, 13, 14, 15])
+    
+    def test_estado_serializado(self):
+        """Testa a impressão digital independente dos blocos e o estado de ida e volta em JSON"""
+        linhas = np.random.default_rng(0).normal(size=(100, 4))
+        linhas[5, 2] = np.nan
+        self.assertEqual(
+            impressao_linhas(linhas),
+            (impressao_linhas(linhas[:37]) + impressao_linhas(linhas[37:], 37)) % 2 ** 64
+        )
+        self.assertNotEqual(impressao_linhas(linhas[::-1]), impressao_linhas(linhas))
+        
+        df = ler_planilha(io.BytesIO(gerar_csv_valido(60)), 'dados.csv')
+        acumulador = AcumuladorPrevisao(48, com_impressao=True)
+        acumulador.adicionar(df.iloc[:20])
+        copia = AcumuladorPrevisao.de_dict(json.loads(json.dumps(acumulador.como_dict())))
+        acumulador.adicionar(df.iloc[20:])
+        copia.adicionar(df.iloc[20:])
+        self.assertEqual(copia.impressao, acumulador.impressao)
+        pd.testing.assert_frame_equal(copia.previsao(), acumulador.previsao())
+
+
+class AppendReportTestCase(RelatorioTestCase):
+    """Testes para a atualização incremental de séries guardadas"""
+    
+    usuario = 'incremental'
+    
+    def enviar(self, conteudo, dataset='vendas'):
+        file = SimpleUploadedFile("dados.csv", conteudo, content_type="text/csv")
+        response = self.client.post(f'/api/report/append/?formato=csv&dataset={dataset}', {'file': file})
+        self.assertEqual(response.status_code, status.HTTP_200_OK, getattr(response, 'data', None))
+        tabela = pd.read_csv(io.BytesIO(b''.join(response.streaming_content)))
+        response.close()
+        return response, tabela
+    
+    def esperado(self, conteudo):
+        from .services.report_generator import calcular_previsao, carregar_dados
+        return calcular_previsao(carregar_dados(io.BytesIO(conteudo), 'dados.csv'))
+    
+    def comparar(self, tabela, conteudo):
+        esperado = self.esperado(conteudo)
+        np.testing.assert_allclose(tabela['faturamento'], esperado['faturamento'], rtol=1e-9)
+        np.testing.assert_allclose(tabela['mes_sequencial'], esperado['mes_sequencial'])
+    
+    def test_so_linhas_novas(self):
+        """Testa a carga inicial e o envio só das linhas novas, com o mesmo resultado do arquivo inteiro"""
+        completo = gerar_csv_valido(70)
+        linhas = completo.decode('utf-8').splitlines()
+        
+        response, _ = self.enviar(("\n".join(linhas[:63]) + "\n").encode('utf-8'))
+        self.assertEqual(response['X-Report-Update'], 'completo')
+        self.assertEqual(response['X-Report-Records'], '60')
+        
+        response, tabela = self.enviar(("\n".join(linhas[:3] + linhas[63:]) + "\n").encode('utf-8'))
+        self.assertEqual(response['X-Report-Update'], 'anexado')
+        self.assertEqual(response['X-Report-Records'], '70')
+        self.comparar(tabela, completo)
+        
+        dataset = ReportDataset.objects.get(user=self.user, name='vendas')
+        self.assertEqual((dataset.records, dataset.version), (70, 2))
+    
+    def test_serie_reenviada_e_historico_alterado(self):
+        """Testa a série inteira reenviada (anexa só o fim) e a detecção de histórico reescrito"""
+        self.enviar(gerar_csv_valido(50))
+        response, tabela = self.enviar(gerar_csv_valido(55))
+        self.assertEqual(response['X-Report-Update'], 'anexado')
+        self.comparar(tabela, gerar_csv_valido(55))
+        
+        response, _ = self.enviar(gerar_csv_valido(55))
+        self.assertEqual(response['X-Report-Update'], 'inalterado')
+        
+        linhas = gerar_csv_valido(56).decode('utf-8').splitlines()
+        linhas[10] = "8,9999,700,10"
+        alterado = ("\n".join(linhas) + "\n").encode('utf-8')
+        response, tabela = self.enviar(alterado)
+        self.assertEqual(response['X-Report-Update'], 'refeito')
+        self.assertEqual(response['X-Report-Records'], '56')
+        self.comparar(tabela, alterado)
+    
+    def test_erro_preserva_estado(self):
+        """Testa que um upload inválido não altera a série guardada, que é separada por nome"""
+        self.enviar(gerar_csv_valido(30))
+        estado = ReportDataset.objects.get(name='vendas').state
+        
+        file = SimpleUploadedFile("dados.csv", b"a,b\n1,2\n3,4\n", content_type="text/csv")
+        response = self.client.post('/api/report/append/?dataset=vendas', {'file': file})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(ReportDataset.objects.get(name='vendas').state, estado)
+        
+        response, _ = self.enviar(gerar_csv_valido(30), dataset='outra')
+        self.assertEqual(response['X-Report-Update'], 'completo')
+
+
+@unittest.skipUnless(importlib.util.find_spec('pyarrow'), 'pyarrow não instalado')
+class HistoricoTestCase(RelatorioTestCase):
+    """Testes para os históricos normalizados guardados em Arrow (?dataset=)"""
+    
+    usuario = 'historico'
+    configuracoes = {'REPORT_CACHE_ENABLED': False}
+    
+    def prever(self, conteudo=None, dataset='vendas'):
+        dados = {'file': SimpleUploadedFile("dados.csv", conteudo, content_type="text/csv")} if conteudo else {}
+        return self.client.post(f'/api/report/forecast/?dataset={dataset}', dados)
+    
+    def test_guarda_e_reusa_sem_reler(self):
+        """Testa que a série guardada é gerada de novo sem reler (nem reenviar) a planilha"""
+        esperado = self.client.post('/api/report/forecast/', {
+            'file': SimpleUploadedFile("dados.csv", gerar_csv_valido(60), content_type="text/csv")
+        }).data
+        response = self.prever(gerar_csv_valido(60))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        historico = ReportHistory.objects.get(user=self.user, name='vendas')
+        self.assertEqual((historico.records, historico.source_name), (60, 'dados.csv'))
+        self.assertTrue(os.path.exists(historico.file_path))
+        
+        with mock.patch('reports.services.ingestao._ler_csv', side_effect=AssertionError('planilha relida')):
+            response = self.prever()
+            self.assertEqual(response.data['previsao'], esperado['previsao'])
+            self.assertEqual(response.data['historico'], esperado['historico'])
+            # Mesmo arquivo reenviado: não é lido de novo
+            self.assertEqual(self.prever(gerar_csv_valido(60)).status_code, status.HTTP_200_OK)
+            
+            response = self.client.post('/api/report/?dataset=vendas&formato=csv')
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertIn('vendas', response['Content-Disposition'])
+            response.close()
+    
+    def test_substitui_e_serie_inexistente(self):
+        """Testa a troca do histórico por outro arquivo e a série inexistente"""
+        self.prever(gerar_csv_valido(60))
+        anterior = ReportHistory.objects.get(name='vendas').file_path
+        response = self.prever(gerar_csv_valido(30))
+        self.assertEqual(response.data['registros'], 30)
+        self.assertFalse(os.path.exists(anterior))
+        self.assertEqual(ReportHistory.objects.get(name='vendas').records, 30)
+        
+        self.assertEqual(self.prever(dataset='outra').status_code, status.HTTP_404_NOT_FOUND)
+
+
+class PrevisaoTestCase(TestCase):
+    """Testes para o motor de tendência em NumPy"""
+    
+    @unittest.skipUnless(importlib.util.find_spec('sklearn'), 'scikit-learn não instalado')
+    def test_igual_ao_linear_regression(self):
+        """Testa que as retas batem com o LinearRegression do scikit-learn"""
+        from sklearn.linear_model import LinearRegression
+        
+        rng = np.random.default_rng(7)
+        x = np.arange(1, 501, dtype='float64')
+        Y = np.column_stack([2000 + 5 * x + rng.normal(0, 200, 500), 800 + 3 * x + rng.normal(0, 90, 500)])
+        
+        tendencia = ajustar_tendencias(x, Y)
+        futuro = np.array([501.0, 502.0, 503.0])
+        for coluna in range(Y.shape[1]):
+            modelo = LinearRegression().fit(x[:, None], Y[:, coluna])
+            np.testing.assert_allclose(tendencia.prever(futuro)[:, coluna], modelo.predict(futuro[:, None]), rtol=1e-10)
+    
+    def test_nan_ignorado_apenas_na_serie(self):
+        """Testa que lacunas numa série não afetam as demais"""
+        x = np.array([1.0, 2.0, 3.0, 4.0])
+        Y = np.array([[10.0, 1.0], [20.0, np.nan], [30.0, 3.0], [40.0, 4.0]])
+        tendencia = ajustar_tendencias(x, Y)
+        np.testing.assert_allclose(tendencia.inclinacao[0], 10.0)
+        np.testing.assert_allclose(tendencia.prever([5.0])[0, 1], 5.0)
+    
+    def test_x_constante(self):
+        """Testa inclinação zero quando todos os meses são iguais"""
+        tendencia = ajustar_tendencias(np.array([3.0, 3.0]), np.array([[10.0], [20.0]]))
+        np.testing.assert_allclose(tendencia.prever([4.0]), [[15.0]])
+    
+    def test_agrupado_igual_ao_ajuste_por_grupo(self):
+        """Testa que o ajuste agrupado bate com ajustar_tendencias grupo a grupo"""
+        rng = np.random.default_rng(3)
+        grupos = rng.integers(0, 40, 2000)
+        x = rng.integers(1, 100, 2000).astype('float64')
+        Y = np.column_stack([50 * x + rng.normal(0, 10, 2000), rng.normal(0, 1, 2000)])
+        Y[rng.random(2000) < 0.05, 1] = np.nan
+        
+        tendencia = ajustar_tendencias_agrupadas(grupos, x, Y)
+        for grupo in range(40):
+            esperada = ajustar_tendencias(x[grupos == grupo], Y[grupos == grupo])
+            np.testing.assert_allclose(tendencia.inclinacao[grupo], esperada.inclinacao, rtol=1e-9)
+            np.testing.assert_allclose(tendencia.intercepto[grupo], esperada.intercepto, rtol=1e-9)
+    
+    def test_estatisticas_em_blocos(self):
+        """Testa que as estatísticas combinadas bloco a bloco dão o mesmo ajuste"""
+        rng = np.random.default_rng(11)
+        x = np.arange(1, 10_001, dtype='float64') + 1e6
+        Y = np.column_stack([2000 + 5 * x + rng.normal(0, 200, len(x)), rng.normal(0, 1, len(x))])
+        Y[rng.random(len(x)) < 0.1, 1] = np.nan
+        
+        estatisticas = EstatisticasTendencia(k=2)
+        for inicio, fim in zip([0, 1, 700, 5000], [1, 700, 5000, len(x)]):
+            estatisticas.adicionar(x[inicio:fim], Y[inicio:fim])
+        tendencia, esperada = estatisticas.tendencia(), ajustar_tendencias(x, Y)
+        np.testing.assert_allclose(tendencia.inclinacao, esperada.inclinacao, rtol=1e-9)
+        np.testing.assert_allclose(tendencia.intercepto, esperada.intercepto, rtol=1e-9)
+    
+    def test_trava_e_lucro(self):
+        """Testa que previsões negativas viram zero antes do cálculo do lucro"""
+        fat, desp, lucro = projetar_resultado(np.array([100.0, -5.0]), np.array([-1.0, 30.0]))
+        np.testing.assert_array_equal(fat, [100.0, 0.0])
+        np.testing.assert_array_equal(lucro, [100.0, -30.0])
+    
+    def test_gerador_nao_importa_sklearn(self):
+        """Testa que o caminho da requisição não importa o scikit-learn"""
+        codigo = "import sys, reports.services.report_generator; print('sklearn' in sys.modules)"
+        saida = subprocess.run([sys.executable, '-c', codigo], capture_output=True, text=True, cwd=settings.BASE_DIR)
+        self.assertEqual(saida.stdout.strip(), 'False', saida.stderr)
+
+
+class ImportBudgetTestCase(TestCase):
+    """Garante que as dependências pesadas só são carregadas sob demanda"""
+    
+    MODULOS_PESADOS = ('pandas', 'numpy', 'sklearn', 'scipy', 'xlsxwriter', 'openpyxl', 'xlrd', 'pyarrow')
+    
+    def test_urls_nao_importam_dependencias_pesadas(self):
+        """Testa com python -X importtime que as URLs (WSGI e ASGI) não puxam pandas & cia."""
+        codigo = "import django; django.setup(); import auth_project.urls, auth_project.urls_asgi"
+        env = {**os.environ, 'DJANGO_SETTINGS_MODULE': 'auth_project.settings'}
+        saida = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', codigo],
+            capture_output=True, text=True, cwd=settings.BASE_DIR, env=env
+        )
+        self.assertEqual(saida.returncode, 0, saida.stderr)
+        
+        importados = {
+            linha.rsplit('|', 1)[1].strip().split('.')[0]
+            for linha in saida.stderr.splitlines()
+            if linha.startswith('import time:')
+        }
+        carregados = sorted(importados & set(self.MODULOS_PESADOS))
+        self.assertEqual(carregados, [], f'Importados na carga das URLs: {", ".join(carregados)}')
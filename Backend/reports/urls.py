@@ -6,5 +6,13 @@ from . import views
 
 urlpatterns = [
     path('report/', views.GenerateReportView.as_view(), name='generate_report'),
+    path('report/forecast/', views.ForecastView.as_view(), name='report_forecast'),
+    path('report/consolidated/', views.ConsolidatedReportView.as_view(), name='generate_report_consolidated'),
+    path('report/append/', views.AppendReportView.as_view(), name='generate_report_append'),
+    path('report/batch/', views.ReportBatchView.as_view(), name='generate_report_batch'),
+    
+    # Geração assíncrona (jobs)
+    path('report/jobs/', views.ReportJobListCreateView.as_view(), name='report_job_list_create'),
+    path('report/jobs/<uuid:job_id>/', views.ReportJobDetailView.as_view(), name='report_job_detail'),
+    path('report/jobs/<uuid:job_id>/download/', views.ReportJobDownloadView.as_view(), name='report_job_download'),
 ]
-
@@ -1,108 +1,267 @@
 """
 Views para geração de relatórios financeiros
 """
+import io
 import os
 import tempfile
 import logging
+import threading
+from collections import Counter
+from datetime import datetime
 from django.conf import settings
-from django.http import FileResponse, JsonResponse
-from rest_framework import status
+from django.http import FileResponse, HttpResponse, JsonResponse
+from django.shortcuts import get_object_or_404
+from django.urls import reverse
+from rest_framework import generics, status
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.renderers import JSONRenderer
 from rest_framework.response import Response
 from rest_framework.views import APIView
-from .services.report_generator import gerar_relatorio
+from .models import ReportJob
+from .renderers import ArrowRenderer, CsvRenderer, ParquetRenderer, XlsxRenderer
+from .serializers import ReportJobSerializer
+from .services import cache as report_cache
+from .services import formatos, instrumentacao, jobs, pool, renderizadores, temporarios
+
+# Os serviços de geração (pandas, NumPy, xlsxwriter) são importados dentro das
+# views: assim login, perfil e comandos de gerenciamento não pagam esse custo
 
 logger = logging.getLogger(__name__)
 
 # Tamanho máximo do arquivo: 50MB
 MAX_FILE_SIZE = 50 * 1024 * 1024
 
+# CSVs grandes são lidos em blocos, com memória constante (services/blocos.py)
+MAX_CSV_FILE_SIZE = 1024 * 1024 * 1024
+
 # Extensões permitidas
 ALLOWED_EXTENSIONS = ['.xlsx', '.xls', '.csv']
 
+# Limita quantas threads deste processo geram relatório ao mesmo tempo,
+# para que uploads grandes não ocupem todos os workers HTTP (as gerações
+# que vão para o pool de processos são limitadas pelo próprio pool)
+_geracoes_sincronas = threading.BoundedSemaphore(settings.REPORT_SYNC_MAX_CONCURRENT)
+
+# Gerações síncronas em andamento por usuário, neste processo
+_geracoes_por_usuario = Counter()
+_geracoes_por_usuario_lock = threading.Lock()
+
+
+def tamanho_maximo(nome_arquivo, em_blocos=True):
+    """Limite de upload: CSV pode ser maior quando é lido em blocos"""
+    if em_blocos and os.path.splitext(nome_arquivo)[1].lower() == '.csv':
+        return MAX_CSV_FILE_SIZE
+    return MAX_FILE_SIZE
+
+
+def validar_upload(request, em_blocos=True):
+    """
+    Valida o arquivo enviado na chave "file".
+    
+    em_blocos=False para views que carregam o arquivo inteiro em memória
+    (o limite maior de CSV não vale para elas).
+    
+    Returns:
+        tuple: (uploaded_file, None) se válido, ou (None, Response de erro)
+    """
+    if 'file' not in request.FILES:
+        return None, Response(
+            {'error': 'Nenhum arquivo foi enviado. Use a chave "file".'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    uploaded_file = request.FILES['file']
+    
+    # Validar extensão
+    file_ext = os.path.splitext(uploaded_file.name)[1].lower()
+    
+    if file_ext not in ALLOWED_EXTENSIONS:
+        return None, Response(
+            {
+                'error': f'Formato de arquivo não suportado. Use: {", ".join(ALLOWED_EXTENSIONS)}'
+            },
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    # Validar tamanho
+    limite = tamanho_maximo(uploaded_file.name, em_blocos)
+    if uploaded_file.size > limite:
+        return None, Response(
+            {'error': f'Arquivo muito grande. Tamanho máximo: {limite / (1024*1024):.0f}MB'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    return uploaded_file, None
+
+
+def resolver_entrada(request, em_blocos=True, com_historico=True):
+    """
+    Entrada da geração: o upload em "file" ou, com ?dataset=<nome>, o
+    histórico guardado da série (um upload junto substitui o histórico antes
+    de ser usado; ver services/historicos.py).
+    
+    Returns:
+        tuple: (entrada, nome_arquivo, None) - entrada é o UploadedFile ou o
+        caminho do histórico - ou (None, None, Response de erro)
+    """
+    nome_dataset = request.query_params.get('dataset') if com_historico else None
+    if not nome_dataset:
+        uploaded_file, erro = validar_upload(request, em_blocos)
+        return uploaded_file, getattr(uploaded_file, 'name', None), erro
+    
+    from .services import historicos
+    
+    try:
+        if 'file' not in request.FILES:
+            historico = historicos.obter_historico(request.user, nome_dataset)
+        else:
+            # O histórico é lido inteiro em memória: vale o limite padrão
+            uploaded_file, erro = validar_upload(request, em_blocos=False)
+            if erro:
+                return None, None, erro
+            if not _geracoes_sincronas.acquire(blocking=False):
+                return None, None, servidor_ocupado('Servidor ocupado gerando relatórios. Tente novamente em instantes.')
+            try:
+                historico = historicos.guardar_historico(request.user, nome_dataset[:255], uploaded_file)
+            finally:
+                _geracoes_sincronas.release()
+    except historicos.HistoricoNaoEncontrado as e:
+        return None, None, Response({'error': str(e)}, status=status.HTTP_404_NOT_FOUND)
+    except ValueError as e:
+        return None, None, Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    
+    return historico.file_path, historicos.nome_arquivo(historico), None
+
+
+def reservar_geracao(user_id):
+    """Conta uma geração do usuário; False se ele já está no limite"""
+    with _geracoes_por_usuario_lock:
+        if _geracoes_por_usuario[user_id] >= settings.REPORT_SYNC_MAX_PER_USER:
+            return False
+        _geracoes_por_usuario[user_id] += 1
+        return True
+
+
+def liberar_geracao(user_id):
+    with _geracoes_por_usuario_lock:
+        _geracoes_por_usuario[user_id] -= 1
+        if _geracoes_por_usuario[user_id] <= 0:
+            del _geracoes_por_usuario[user_id]
+
+
+def entrada_para_processo(entrada):
+    """
+    Entrada que pode ir para um processo do pool: o caminho do spool quando
+    o Django gravou o upload em disco (ou de um histórico guardado), senão os
+    bytes do upload em memória
+    """
+    if isinstance(entrada, str):
+        return entrada
+    if hasattr(entrada, 'temporary_file_path'):
+        return entrada.temporary_file_path()
+    entrada.seek(0)
+    return io.BytesIO(entrada.read())
+
+
+def nome_download(prefixo, file_name, saida):
+    """Nome do arquivo entregue: prefixo, nome do upload e data/hora da geração"""
+    nome_base = os.path.splitext(file_name)[0]
+    data_hora = datetime.now().strftime("%d-%m-%Y_%H-%M-%S")
+    return f"{prefixo}_{nome_base}_{data_hora}{saida.extensao}"
+
+
+def servidor_ocupado(mensagem, status_code=status.HTTP_503_SERVICE_UNAVAILABLE):
+    """Resposta de backpressure com Retry-After"""
+    response = Response({'error': mensagem}, status=status_code)
+    response['Retry-After'] = str(settings.REPORT_RETRY_AFTER)
+    return response
+
 
 class GenerateReportView(APIView):
     """
     View para receber upload de arquivo e gerar relatório financeiro
+    
+    O formato de saída vem de ?formato= (xlsx, xlsx-min, csv, parquet) ou do
+    cabeçalho Accept; sem nenhum dos dois, o relatório formatado em xlsx.
+    Com ?dataset=<nome> a planilha é guardada já normalizada e pode ser
+    gerada de novo sem reenviar o arquivo (ver resolver_entrada).
+    O tempo de cada etapa da geração volta no cabeçalho Server-Timing.
     """
     permission_classes = [IsAuthenticated]
+    renderer_classes = [JSONRenderer, XlsxRenderer, CsvRenderer, ParquetRenderer]
+    
+    # Separa no cache relatórios diferentes gerados a partir do mesmo upload
+    variante_cache = ''
+    prefixo_relatorio = 'Relatorio_IA'
+    # Formatos de saída aceitos por esta view (None = todos os registrados)
+    saidas_aceitas = None
+    # CSVs grandes lidos em blocos (aceita até MAX_CSV_FILE_SIZE)
+    em_blocos = True
+    # Relatório depende só do upload (False quando depende de estado guardado)
+    usar_cache = True
+    # Aceita ?dataset= para guardar/reusar o histórico normalizado
+    com_historico = True
     
     def post(self, request):
         """
         Recebe arquivo via multipart/form-data e retorna relatório gerado
         """
         try:
-            # Verificar se arquivo foi enviado
-            if 'file' not in request.FILES:
-                return Response(
-                    {'error': 'Nenhum arquivo foi enviado. Use a chave "file".'},
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-            
-            uploaded_file = request.FILES['file']
+            entrada, file_name, erro = resolver_entrada(request, self.em_blocos, self.com_historico)
+            if erro:
+                return erro
             
-            # Validar extensão
-            file_name = uploaded_file.name
-            file_ext = os.path.splitext(file_name)[1].lower()
-            
-            if file_ext not in ALLOWED_EXTENSIONS:
-                return Response(
-                    {
-                        'error': f'Formato de arquivo não suportado. Use: {", ".join(ALLOWED_EXTENSIONS)}'
-                    },
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-            
-            # Validar tamanho
-            if uploaded_file.size > MAX_FILE_SIZE:
-                return Response(
-                    {'error': f'Arquivo muito grande. Tamanho máximo: {MAX_FILE_SIZE / (1024*1024):.0f}MB'},
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-            
-            logger.info(f"Processando arquivo: {file_name} (tamanho: {uploaded_file.size} bytes)")
+            try:
+                saida = self._escolher_renderizador(request)
+            except ValueError as e:
+                return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
             
-            # Criar diretório temporário se não existir
-            temp_dir = os.path.join(settings.MEDIA_ROOT, 'temp')
-            os.makedirs(temp_dir, exist_ok=True)
+            tamanho = entrada.size if hasattr(entrada, 'size') else os.path.getsize(entrada)
+            logger.info(f"Processando arquivo: {file_name} (tamanho: {tamanho} bytes, formato: {saida.nome})")
             
-            # Salvar arquivo temporariamente
-            temp_input_path = os.path.join(temp_dir, f"input_{request.user.id}_{file_name}")
-            with open(temp_input_path, 'wb+') as destination:
-                for chunk in uploaded_file.chunks():
-                    destination.write(chunk)
+            # Upload idêntico já processado: servir o relatório do cache
+            chave_cache = None
+            if settings.REPORT_CACHE_ENABLED and self.usar_cache:
+                variante = self.variante_cache
+                if saida.nome != renderizadores.PADRAO:
+                    variante = f"{variante}:{saida.nome}"
+                chave_cache = report_cache.calcular_chave(entrada, variante)
+                em_cache = report_cache.buscar(chave_cache)
+                if em_cache:
+                    return self._enviar_arquivo(em_cache, self._nome_download(file_name, saida), saida, 'HIT')
             
-            logger.info(f"Arquivo salvo temporariamente: {temp_input_path}")
+            # Nome único: uploads simultâneos com o mesmo nome não colidem
+            nome_base = os.path.splitext(file_name)[0]
+            output_path = temporarios.caminho_unico(f"{self.prefixo_relatorio}_{request.user.id}_{nome_base}", saida.extensao)
             
-            # Gerar relatório
+            if not reservar_geracao(request.user.pk):
+                return servidor_ocupado(
+                    'Você já tem relatórios sendo gerados. Aguarde ou use /api/report/jobs/.',
+                    status.HTTP_429_TOO_MANY_REQUESTS
+                )
             try:
-                output_path = gerar_relatorio(temp_input_path)
+                with instrumentacao.medir(self.variante_cache or 'relatorio') as medicao:
+                    output_path = self.gerar(entrada, output_path, file_name, saida.nome)
                 logger.info(f"Relatório gerado: {output_path}")
+            except pool.PoolSaturado:
+                return servidor_ocupado('Servidor ocupado gerando relatórios. Tente novamente ou use /api/report/jobs/.')
+            except pool.TempoEsgotado as e:
+                return servidor_ocupado(f'{e} Para arquivos grandes use /api/report/jobs/.')
             except ValueError as e:
-                # Limpar arquivo temporário em caso de erro
-                if os.path.exists(temp_input_path):
-                    os.remove(temp_input_path)
                 return Response(
                     {'error': str(e)},
                     status=status.HTTP_400_BAD_REQUEST
                 )
             except Exception as e:
                 logger.error(f"Erro ao gerar relatório: {e}", exc_info=True)
-                # Limpar arquivo temporário em caso de erro
-                if os.path.exists(temp_input_path):
-                    os.remove(temp_input_path)
                 return Response(
                     {'error': f'Erro ao processar arquivo: {str(e)}'},
                     status=status.HTTP_500_INTERNAL_SERVER_ERROR
                 )
             finally:
-                # Limpar arquivo de entrada após processamento
-                if os.path.exists(temp_input_path):
-                    try:
-                        os.remove(temp_input_path)
-                    except Exception as e:
-                        logger.warning(f"Erro ao remover arquivo temporário: {e}")
+                liberar_geracao(request.user.pk)
+                temporarios.agendar_limpeza()
             
             # Verificar se arquivo de saída existe
             if not os.path.exists(output_path):
@@ -111,28 +270,17 @@ class GenerateReportView(APIView):
                     status=status.HTTP_500_INTERNAL_SERVER_ERROR
                 )
             
-            # Retornar arquivo para download
-            file_handle = open(output_path, 'rb')
-            response = FileResponse(
-                file_handle,
-                content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-            )
-            response['Content-Disposition'] = f'attachment; filename="{os.path.basename(output_path)}"'
-            response['Content-Length'] = os.path.getsize(output_path)
-            
-            # Agendar limpeza do arquivo de saída após envio
-            # Usar callback para limpar após resposta ser enviada
-            def cleanup_file():
-                try:
-                    if os.path.exists(output_path):
-                        os.remove(output_path)
-                        logger.info(f"Arquivo temporário removido: {output_path}")
-                except Exception as e:
-                    logger.warning(f"Erro ao remover arquivo temporário: {e}")
-            
-            # Em produção, usar celery ou similar para limpeza assíncrona
-            # Por enquanto, vamos deixar o arquivo para limpeza manual periódica
+            download_name = self._nome_download(file_name, saida)
+            if chave_cache:
+                output_path = report_cache.armazenar(chave_cache, output_path)
             
+            # Retornar arquivo para download; fora do cache, o arquivo é
+            # apagado quando a resposta termina de ser enviada
+            if chave_cache:
+                response = self._enviar_arquivo(output_path, download_name, saida, 'MISS')
+            else:
+                response = self._enviar_arquivo(output_path, download_name, saida, temporario=True)
+            response['Server-Timing'] = medicao.server_timing()
             return response
             
         except Exception as e:
@@ -141,4 +289,340 @@ class GenerateReportView(APIView):
                 {'error': f'Erro interno do servidor: {str(e)}'},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
+    
+    def gerar(self, uploaded_file, output_path, file_name, renderizador):
+        """
+        Gera o relatório num processo do pool, lendo o upload direto: os
+        bytes em memória até FILE_UPLOAD_MAX_MEMORY_SIZE, acima disso o spool
+        do próprio Django em FILE_UPLOAD_TEMP_DIR (sem cópia extra em
+        MEDIA_ROOT/temp)
+        
+        Raises:
+            pool.PoolSaturado, pool.TempoEsgotado: ver pool.executar
+        """
+        return pool.executar(
+            'reports.services.report_generator.gerar_relatorio',
+            entrada_para_processo(uploaded_file), output_path,
+            timeout=settings.REPORT_SYNC_TIMEOUT, nome_arquivo=file_name, renderizador=renderizador
+        )
+    
+    def _escolher_renderizador(self, request):
+        """
+        Renderizador pedido em ?formato= ou, na falta dele, pelo Accept
+        
+        Raises:
+            ValueError: formato desconhecido, indisponível ou não aceito pela view
+        """
+        nome = request.query_params.get('formato')
+        if not nome:
+            formato_aceito = request.accepted_renderer.format
+            nome = formato_aceito if formato_aceito in renderizadores.RENDERIZADORES else renderizadores.PADRAO
+        
+        if self.saidas_aceitas is not None and nome not in self.saidas_aceitas:
+            raise ValueError(f"Formato de saída inválido: {nome}. Use: {', '.join(self.saidas_aceitas)}")
+        return renderizadores.obter_renderizador(nome)
+    
+    def _nome_download(self, file_name, saida):
+        return nome_download(self.prefixo_relatorio, file_name, saida)
+    
+    def _enviar_arquivo(self, arquivo, download_name, saida, cache_status=None, temporario=False):
+        """
+        Monta o FileResponse do relatório a partir de um caminho ou de um
+        arquivo já aberto (X-Report-Cache indica HIT/MISS); temporario=True
+        apaga o arquivo ao fim do envio. O FileResponse calcula o
+        Content-Length pelo próprio arquivo aberto
+        """
+        if temporario:
+            response = temporarios.RespostaTemporaria(arquivo, content_type=saida.content_type)
+        else:
+            if isinstance(arquivo, (str, os.PathLike)):
+                arquivo = open(arquivo, 'rb')
+            response = FileResponse(arquivo, content_type=saida.content_type)
+        response['Content-Disposition'] = f'attachment; filename="{download_name}"'
+        if cache_status:
+            response['X-Report-Cache'] = cache_status
+        return response
 
+
+class ForecastView(APIView):
+    """
+    Previsão sem gerar o Excel: histórico exibido (últimos 48 meses) e os 3
+    meses previstos, para o frontend montar os gráficos.
+    
+    ?formato=json (padrão, lista de objetos), colunar ({campo: [valores]}) ou
+    arrow (Arrow IPC stream, também via Accept: application/vnd.apache.arrow.stream).
+    Aceita ?dataset= como GenerateReportView.
+    """
+    permission_classes = [IsAuthenticated]
+    renderer_classes = [JSONRenderer, ArrowRenderer]
+    
+    def post(self, request):
+        formato = request.query_params.get('formato')
+        if formato is None:
+            formato = formatos.FORMATO_ARROW if request.accepted_renderer.format == 'arrow' else formatos.FORMATO_JSON
+        
+        if formato not in formatos.FORMATOS_PREVISAO:
+            return Response(
+                {'error': f'Formato inválido. Use: {", ".join(formatos.FORMATOS_PREVISAO)}'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if formato == formatos.FORMATO_ARROW and not formatos.arrow_disponivel():
+            return Response(
+                {'error': 'Formato arrow indisponível: pyarrow não está instalado no servidor.'},
+                status=status.HTTP_406_NOT_ACCEPTABLE
+            )
+        
+        entrada, file_name, erro = resolver_entrada(request)
+        if erro:
+            return erro
+        
+        # Mesma leitura e mesmo motor de previsão do gerar_relatorio
+        from .services.report_generator import preparar_previsao
+        
+        if not _geracoes_sincronas.acquire(blocking=False):
+            return servidor_ocupado('Servidor ocupado gerando relatórios. Tente novamente em instantes.')
+        try:
+            with instrumentacao.medir('previsao') as medicao:
+                df_final, registros = preparar_previsao(entrada, file_name)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        except Exception as e:
+            logger.error(f"Erro ao calcular previsão: {e}", exc_info=True)
+            return Response(
+                {'error': f'Erro ao processar arquivo: {str(e)}'},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+        finally:
+            _geracoes_sincronas.release()
+        
+        if formato == formatos.FORMATO_ARROW:
+            corpo = formatos.previsao_para_arrow(df_final, {'arquivo': file_name, 'registros': registros})
+            response = HttpResponse(corpo, content_type=formatos.TIPO_ARROW)
+        else:
+            response = Response({
+                'arquivo': file_name,
+                'registros': registros,
+                **formatos.previsao_para_dict(df_final, colunar=formato == formatos.FORMATO_COLUNAR),
+            })
+        response['Server-Timing'] = medicao.server_timing()
+        return response
+
+
+class ConsolidatedReportView(GenerateReportView):
+    """
+    Relatório consolidado de várias entidades (filiais/lojas) num único
+    arquivo em formato longo com a coluna entidade/filial/loja: uma aba
+    'Consolidado' e uma aba por entidade
+    """
+    variante_cache = 'consolidado'
+    prefixo_relatorio = 'Relatorio_IA_Consolidado'
+    saidas_aceitas = (renderizadores.PADRAO,)
+    em_blocos = False
+    # O histórico guardado não tem a coluna de entidade
+    com_historico = False
+    
+    def gerar(self, uploaded_file, output_path, file_name, renderizador):
+        return pool.executar(
+            'reports.services.consolidado.gerar_relatorio_consolidado',
+            entrada_para_processo(uploaded_file), output_path,
+            timeout=settings.REPORT_SYNC_TIMEOUT, nome_arquivo=file_name
+        )
+
+
+class AppendReportView(GenerateReportView):
+    """
+    Atualização incremental de uma série guardada (?dataset=, padrão: nome
+    do arquivo sem extensão). Aceita só as linhas novas ou a série inteira
+    de novo; quando o histórico mudou, refaz o ajuste (ver
+    services/incremental.py). X-Report-Update informa o que foi feito
+    (completo, anexado, inalterado ou refeito) e X-Report-Records o total
+    de registros da série.
+    """
+    variante_cache = 'incremental'
+    prefixo_relatorio = 'Relatorio_IA_Incremental'
+    em_blocos = False
+    usar_cache = False
+    # ?dataset= aqui é a série incremental (ReportDataset)
+    com_historico = False
+    
+    def post(self, request):
+        self.atualizacao = None
+        response = super().post(request)
+        if self.atualizacao is not None:
+            response['X-Report-Update'] = self.atualizacao.modo
+            response['X-Report-Records'] = str(self.atualizacao.registros)
+        return response
+    
+    def gerar(self, uploaded_file, output_path, file_name, renderizador):
+        # Usa o banco (estado da série): gera na própria thread, não no pool
+        from .services.incremental import atualizar_relatorio
+        
+        if not _geracoes_sincronas.acquire(blocking=False):
+            raise pool.PoolSaturado('Limite de gerações na thread atingido')
+        try:
+            nome_dataset = self.request.query_params.get('dataset') or os.path.splitext(file_name)[0]
+            output_path, self.atualizacao = atualizar_relatorio(
+                self.request.user, nome_dataset[:255], uploaded_file, output_path,
+                nome_arquivo=file_name, renderizador=renderizador
+            )
+        finally:
+            _geracoes_sincronas.release()
+        return output_path
+
+
+class ReportBatchView(APIView):
+    """
+    Gera relatórios em lote: recebe um .zip na chave "file" e/ou várias
+    planilhas na chave "files" e devolve um .zip com um relatório por
+    arquivo mais a planilha Resumo_Lote.xlsx. Arquivos com erro aparecem no
+    resumo sem interromper o lote.
+    """
+    permission_classes = [IsAuthenticated]
+    
+    def post(self, request):
+        from .services import lote
+        
+        uploads = request.FILES.getlist('file') + request.FILES.getlist('files')
+        if not uploads:
+            return Response(
+                {'error': 'Nenhum arquivo foi enviado. Use a chave "file" (.zip) ou "files".'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        for uploaded_file in uploads:
+            # lote.processar_arquivo carrega cada planilha inteira na memória
+            limite = tamanho_maximo(uploaded_file.name, em_blocos=False)
+            if uploaded_file.size > limite:
+                return Response(
+                    {'error': f'Arquivo muito grande: {uploaded_file.name}. Tamanho máximo: {limite / (1024*1024):.0f}MB'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+        
+        if not _geracoes_sincronas.acquire(blocking=False):
+            return servidor_ocupado('Servidor ocupado gerando relatórios. Tente novamente em instantes.')
+        
+        pasta_lote = lote.criar_pasta_lote()
+        pasta_entrada = os.path.join(pasta_lote, 'entrada')
+        try:
+            # (nome original, caminho em disco); caminho None = formato não suportado
+            entradas = []
+            for uploaded_file in uploads:
+                file_ext = os.path.splitext(uploaded_file.name)[1].lower()
+                if file_ext == '.zip':
+                    restantes = settings.REPORT_BATCH_MAX_FILES - len(entradas)
+                    entradas += lote.extrair_zip(uploaded_file, pasta_entrada, restantes, MAX_FILE_SIZE)
+                elif file_ext in ALLOWED_EXTENSIONS:
+                    destino = os.path.join(pasta_entrada, f"u{len(entradas):04d}{file_ext}")
+                    lote.salvar_upload(uploaded_file, destino)
+                    entradas.append((uploaded_file.name, destino))
+                else:
+                    entradas.append((uploaded_file.name, None))
+            
+            if len(entradas) > settings.REPORT_BATCH_MAX_FILES:
+                return Response(
+                    {'error': f'O lote pode ter no máximo {settings.REPORT_BATCH_MAX_FILES} planilhas.'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            
+            logger.info(f"Processando lote com {len(entradas)} arquivo(s)")
+            caminho_zip, resultados = lote.gerar_lote(entradas, pasta_lote)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        except Exception as e:
+            logger.error(f"Erro ao gerar lote: {e}", exc_info=True)
+            return Response(
+                {'error': f'Erro interno do servidor: {str(e)}'},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+        finally:
+            _geracoes_sincronas.release()
+            lote.remover_pasta_lote(pasta_lote)
+            temporarios.agendar_limpeza()
+        
+        # O .zip fica em MEDIA_ROOT/temp só até terminar de ser enviado
+        response = temporarios.RespostaTemporaria(caminho_zip, content_type='application/zip')
+        response['Content-Disposition'] = f'attachment; filename="{os.path.basename(caminho_zip)}"'
+        response['Content-Length'] = os.path.getsize(caminho_zip)
+        response['X-Batch-Total'] = str(len(resultados))
+        response['X-Batch-Failed'] = str(sum(r['status'] == lote.STATUS_ERRO for r in resultados))
+        return response
+
+
+class ReportJobListCreateView(generics.ListAPIView):
+    """
+    Modo assíncrono: POST cria um job e retorna imediatamente (202) com o id;
+    GET lista os jobs do usuário autenticado
+    """
+    serializer_class = ReportJobSerializer
+    permission_classes = [IsAuthenticated]
+    
+    def get_queryset(self):
+        return ReportJob.objects.filter(user=self.request.user)
+    
+    def post(self, request):
+        uploaded_file, erro = validar_upload(request)
+        if erro:
+            return erro
+        
+        try:
+            job = jobs.criar_job(request.user, uploaded_file)
+        except jobs.LimiteJobsExcedido as e:
+            if e.por_usuario:
+                return servidor_ocupado(str(e), status.HTTP_429_TOO_MANY_REQUESTS)
+            return servidor_ocupado(str(e))
+        
+        jobs.enfileirar_job(job)
+        job.refresh_from_db()
+        
+        response = Response(ReportJobSerializer(job).data, status=status.HTTP_202_ACCEPTED)
+        response['Location'] = reverse('report_job_detail', kwargs={'job_id': job.id})
+        return response
+
+
+class ReportJobDetailView(APIView):
+    """Consulta o status de um job (GET) ou cancela/remove o job (DELETE)"""
+    permission_classes = [IsAuthenticated]
+    
+    def get(self, request, job_id):
+        job = get_object_or_404(ReportJob, id=job_id, user=request.user)
+        return Response(ReportJobSerializer(job).data)
+    
+    def delete(self, request, job_id):
+        job = get_object_or_404(ReportJob, id=job_id, user=request.user)
+        if job.status == ReportJob.STATUS_RUNNING:
+            return Response(
+                {'error': 'O job já está em processamento e não pode ser cancelado.'},
+                status=status.HTTP_409_CONFLICT
+            )
+        # Job pendente removido nunca será reivindicado por um worker
+        job.delete()
+        jobs.remover_arquivos_job(job)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class ReportJobDownloadView(APIView):
+    """Serve o relatório de um job concluído"""
+    permission_classes = [IsAuthenticated]
+    
+    def get(self, request, job_id):
+        job = get_object_or_404(ReportJob, id=job_id, user=request.user)
+        
+        if job.status != ReportJob.STATUS_DONE:
+            return Response(
+                {'error': 'O relatório ainda não está pronto.', 'status': job.status},
+                status=status.HTTP_409_CONFLICT
+            )
+        
+        if not os.path.exists(job.output_path):
+            return Response(
+                {'error': 'Arquivo do relatório não encontrado.'},
+                status=status.HTTP_410_GONE
+            )
+        
+        response = FileResponse(
+            open(job.output_path, 'rb'),
+            content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+        )
+        response['Content-Disposition'] = f'attachment; filename="{os.path.basename(job.output_path)}"'
+        response['Content-Length'] = os.path.getsize(job.output_path)
+        return response
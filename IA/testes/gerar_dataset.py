@@ -1,50 +1,57 @@
-import pandas as pd
+import argparse
+
 import numpy as np
-import random
+import pandas as pd
+
 
-def gerar_dados_realistas(linhas=2000):
+def gerar_dados_realistas(linhas=2000, seed=None, nome_arquivo="dataset_gigante.csv"):
     print(f"--- Gerando dataset com {linhas} registros ---")
-    
+
     # 1. Configurações da Simulação
     # Começa vendendo R$ 2.000 e cresce aprox R$ 5,00 a cada período
     inicio_vendas = 2000
-    crescimento_tendencia = 5 
-    
-    dados = []
-    
-    # Cabeçalho "sujo" igual ao seu padrão
-    dados.append(["MES", "faturamento", "despesas", "qtd_vendas"])
-    dados.append(["Obrigatório", "Obrigatório", "Obrigatório", "Obrigatório"])
-    dados.append(["mes_sequencial", "faturamento", "custos_totais", "total_vendas"])
-
-    # 2. Loop Matemático
-    for i in range(1, linhas + 1):
-        # Faturamento base cresce com o tempo
-        base = inicio_vendas + (i * crescimento_tendencia)
-        
-        # Adiciona "Ruído" (Variação aleatória do mercado de +/- 15%)
-        variacao = random.uniform(0.85, 1.15)
-        faturamento = base * variacao
-        
-        # Despesas: Custos fixos (R$ 500) + Custos variáveis (60% do faturamento) + Variação
-        despesas = 500 + (faturamento * 0.60) + random.uniform(-100, 200)
-        
-        # Quantidade de vendas: Depende do preço médio (ex: R$ 100 por item)
-        preco_medio = random.uniform(90, 110)
-        qtd = int(faturamento / preco_medio)
-        
-        # Arredondar valores
-        faturamento = round(faturamento, 2)
-        despesas = round(despesas, 2)
-
-        dados.append([i, faturamento, despesas, qtd])
-
-    # 3. Salvar
-    df = pd.DataFrame(dados)
-    nome_arquivo = "dataset_gigante.csv"
-    # Header=False e Index=False porque nós já criamos o header manualmente na lista
-    df.to_csv(nome_arquivo, header=False, index=False)
+    crescimento_tendencia = 5
+
+    # Gerador com semente opcional: a mesma seed gera sempre o mesmo arquivo
+    rng = np.random.default_rng(seed)
+
+    # 2. Cálculo vetorizado (todas as linhas de uma vez, sem loop)
+    mes = np.arange(1, linhas + 1)
+
+    # Faturamento base cresce com o tempo
+    base = inicio_vendas + (mes * crescimento_tendencia)
+
+    # Adiciona "Ruído" (Variação aleatória do mercado de +/- 15%)
+    faturamento = base * rng.uniform(0.85, 1.15, linhas)
+
+    # Despesas: Custos fixos (R$ 500) + Custos variáveis (60% do faturamento) + Variação
+    despesas = 500 + (faturamento * 0.60) + rng.uniform(-100, 200, linhas)
+
+    # Quantidade de vendas: Depende do preço médio (ex: R$ 100 por item)
+    preco_medio = rng.uniform(90, 110, linhas)
+    qtd = (faturamento / preco_medio).astype(np.int64)
+
+    df = pd.DataFrame({
+        'mes_sequencial': mes,
+        'faturamento': faturamento.round(2),
+        'custos_totais': despesas.round(2),
+        'total_vendas': qtd,
+    })
+
+    # 3. Salvar com o cabeçalho "sujo" igual ao seu padrão
+    with open(nome_arquivo, 'w', encoding='utf-8', newline='') as arquivo:
+        arquivo.write("MES,faturamento,despesas,qtd_vendas\n")
+        arquivo.write("Obrigatório,Obrigatório,Obrigatório,Obrigatório\n")
+        df.to_csv(arquivo, index=False)
     print(f"Sucesso! Arquivo '{nome_arquivo}' criado com {linhas} linhas.")
 
+
 if __name__ == "__main__":
-    gerar_dados_realistas()
\ No newline at end of file
+    # Para os benchmarks do backend (1k a 10M linhas, csv/xlsx/xls), use
+    # Backend/benchmarks/dados.py e python -m benchmarks.suite
+    parser = argparse.ArgumentParser(description="Gera um dataset sintético no formato de entrada do relatório")
+    parser.add_argument('--linhas', type=int, default=2000)
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--saida', default="dataset_gigante.csv")
+    args = parser.parse_args()
+    gerar_dados_realistas(args.linhas, args.seed, args.saida)
@@ -10,6 +10,7 @@ import { Plus, Edit, Trash2, Search, Download } from 'lucide-react';
 
 export default function UserManagement() {
   const [users, setUsers] = useState<User[]>([]);
+  const [nextPage, setNextPage] = useState<string | null>(null);
   const [isLoading, setIsLoading] = useState(false);
   const [searchTerm, setSearchTerm] = useState('');
   const [showForm, setShowForm] = useState(false);
@@ -24,14 +25,17 @@ export default function UserManagement() {
   });
 
   useEffect(() => {
-    loadUsers();
-  }, []);
+    // Busca feita no servidor (prefixo de email, username, nome ou sobrenome)
+    const timer = setTimeout(() => loadUsers(), 300);
+    return () => clearTimeout(timer);
+  }, [searchTerm]);
 
   const loadUsers = async () => {
     setIsLoading(true);
     try {
-      const usersData = await apiService.getUsers();
-      setUsers(usersData);
+      const page = await apiService.getUsers({ search: searchTerm.trim() });
+      setUsers(page.results);
+      setNextPage(page.next);
     } catch (error: any) {
       toast.error('Erro ao carregar usuários: ' + error.message);
     } finally {
@@ -39,6 +43,16 @@ export default function UserManagement() {
     }
   };
 
+  const loadMoreUsers = async () => {
+    try {
+      const page = await apiService.getUsers({ next: nextPage });
+      setUsers(prev => [...prev, ...page.results]);
+      setNextPage(page.next);
+    } catch (error: any) {
+      toast.error('Erro ao carregar usuários: ' + error.message);
+    }
+  };
+
   const handleInputChange = (e: React.ChangeEvent<HTMLInputElement>) => {
     const { name, value } = e.target;
     setFormData(prev => ({
@@ -136,13 +150,6 @@ export default function UserManagement() {
     }
   };
 
-  const filteredUsers = users.filter(user =>
-    user.first_name.toLowerCase().includes(searchTerm.toLowerCase()) ||
-    user.last_name.toLowerCase().includes(searchTerm.toLowerCase()) ||
-    user.email.toLowerCase().includes(searchTerm.toLowerCase()) ||
-    user.username.toLowerCase().includes(searchTerm.toLowerCase())
-  );
-
   return (
     <div className="space-y-6">
       <Card className="bg-gray-900/80 backdrop-blur-md border-gray-800">
@@ -294,7 +301,7 @@ export default function UserManagement() {
             <div className="text-center py-8 text-gray-400">Carregando usuários...</div>
           ) : (
             <div className="space-y-3">
-              {filteredUsers.map((user) => (
+              {users.map((user) => (
                 <div
                   key={user.id}
                   className="flex items-center justify-between p-4 bg-gray-800/50 rounded-lg border border-gray-700"
@@ -336,11 +343,22 @@ export default function UserManagement() {
                   </div>
                 </div>
               ))}
-              {filteredUsers.length === 0 && (
+              {users.length === 0 && (
                 <div className="text-center py-8 text-gray-400">
                   {searchTerm ? 'Nenhum usuário encontrado' : 'Nenhum usuário cadastrado'}
                 </div>
               )}
+              {nextPage && (
+                <div className="text-center pt-2">
+                  <Button
+                    variant="outline"
+                    onClick={loadMoreUsers}
+                    className="border-gray-700 text-gray-300 hover:bg-gray-800 hover:text-white"
+                  >
+                    Carregar mais
+                  </Button>
+                </div>
+              )}
             </div>
           )}
         </CardContent>
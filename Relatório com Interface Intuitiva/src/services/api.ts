@@ -10,6 +10,11 @@ export interface User {
   is_active: boolean;
 }
 
+export interface UserPage {
+  next: string | null;
+  results: User[];
+}
+
 export interface LoginCredentials {
   email: string;
   password: string;
@@ -32,6 +37,21 @@ export interface AuthResponse {
   };
 }
 
+export interface ForecastPoint {
+  mes: number;
+  faturamento: number;
+  despesas: number;
+  lucro: number;
+}
+
+export interface ForecastResponse {
+  arquivo: string;
+  registros: number;
+  ultimo_mes: number | null;
+  historico: ForecastPoint[];
+  previsao: ForecastPoint[];
+}
+
 class ApiService {
   private getAuthToken(): string | null {
     return localStorage.getItem('access_token');
@@ -204,8 +224,13 @@ class ApiService {
   }
 
   // CRUD de usuários
-  async getUsers(): Promise<User[]> {
-    return this.request<User[]>('/users/');
+  // Paginado por cursor: passe o `next` da página anterior para continuar
+  async getUsers(params: { search?: string; next?: string | null } = {}): Promise<UserPage> {
+    if (params.next) {
+      return this.request<UserPage>(params.next.slice(params.next.indexOf('/users/')));
+    }
+    const query = params.search ? `?search=${encodeURIComponent(params.search)}` : '';
+    return this.request<UserPage>(`/users/${query}`);
   }
 
   async getUser(id: number): Promise<User> {
@@ -304,6 +329,33 @@ class ApiService {
     throw new Error(lastError?.message || 'Erro ao gerar relatório (falha no upload)');
   }
 
+  // Relatórios - Previsão em JSON (sem gerar o Excel), para gráficos no cliente
+  async getForecast(file: File): Promise<ForecastResponse> {
+    const token = this.getAuthToken();
+
+    if (!token) {
+      throw new Error('Usuário não autenticado');
+    }
+
+    const formData = new FormData();
+    formData.append('file', file, file.name);
+
+    const response = await fetch(`${API_BASE_URL}/report/forecast/`, {
+      method: 'POST',
+      headers: {
+        Authorization: `Bearer ${token}`,
+      },
+      body: formData,
+    });
+
+    if (!response.ok) {
+      const errorData = await response.json().catch(() => ({}));
+      throw new Error(errorData.error || errorData.detail || `HTTP ${response.status}`);
+    }
+
+    return response.json();
+  }
+
   // Verificar se o usuário está autenticado
   isAuthenticated(): boolean {
     return !!this.getAuthToken();